@@ -1,14 +1,71 @@
 import multiprocessing
 import os
+import shutil
+import tempfile
+
+# Профиль запуска (GUNICORN_PROFILE):
+#   sync - WSGI: gunicorn -c gunicorn_config.py todo_project.wsgi:application
+#   asgi - uvicorn-воркеры: GUNICORN_PROFILE=asgi gunicorn -c gunicorn_config.py todo_project.asgi:application
+#          (нужен для потока /api/events/; асинхронные действия - еще и ASYNC_VIEWS=True). В замере
+#          manage.py benchmark_servers он медленнее sync и занимает больше памяти - см. README
+profile = os.environ.get('GUNICORN_PROFILE', 'sync')
 
 # Основные настройки
 bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
-workers = multiprocessing.cpu_count() * 2 + 1
-worker_class = "sync"
+if profile == 'asgi':
+    # Воркер обслуживает сотни соединений сразу: медленный SQL ждет в пуле потоков БД
+    # (ASYNC_DB_THREADS подключений на воркер), а не занимает процесс, поэтому воркеров - по числу ядер
+    workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() + 1))
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+    # gthread: главный поток воркера отвечает арбитру, пока поток отдает длинный ответ
+    # (потоковая выгрузка /api/tasks/export/), поэтому timeout не обрывает выгрузку
+    worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+    threads = int(os.environ.get('GUNICORN_THREADS', 4))
 worker_connections = 1000
 timeout = 30
 keepalive = 2
 
+# Метрики Prometheus: каждый воркер пишет значения в общий каталог, /metrics суммирует их
+# (переменная должна быть задана до импорта prometheus_client, то есть до загрузки приложения)
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'todo-prometheus'))
+
+
+def on_starting(server):
+    """Метрики прошлого запуска удаляем"""
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+    # Брокер local (по умолчанию) раздает события только подписчикам своего процесса:
+    # при нескольких воркерах клиент не узнает об изменениях, сделанных в другом воркере
+    if profile == 'asgi' and server.cfg.workers > 1 and not os.environ.get('PUSH_BROKER', 'local').startswith('unix:'):
+        server.log.warning(
+            'PUSH_BROKER=local при %d воркерах: поток /api/events/ получит только изменения своего воркера. '
+            'Запустите manage.py push_broker и задайте PUSH_BROKER=unix:/путь/к/сокету', server.cfg.workers,
+        )
+
+
+def pre_fork(server, worker):
+    """Подключения к БД, открытые при загрузке приложения (preload_app), воркерам не передаем"""
+    from django.db import connections
+    from tasks.db.base import close_pools
+    connections.close_all()
+    close_pools()
+
+
+def post_fork(server, worker):
+    """Пул подключений воркера открывается сразу: после перезапуска по max_requests запросы не ждут подключения"""
+    from tasks.db.base import fill_pools
+    fill_pools()
+
+
+def child_exit(server, worker):
+    """Файлы метрик завершившегося воркера (max_requests) остаются в сумме, убираем только его живые значения"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
 # Логирование
 accesslog = "-"
 errorlog = "-"
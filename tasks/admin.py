@@ -4,11 +4,42 @@ from django.urls import reverse  # Для создания ссылок на д
 from import_export.admin import ImportExportModelAdmin  # Для экспорта в Excel
 from import_export import resources  # Для настройки экспорта
 from simple_history.admin import SimpleHistoryAdmin  # Для отображения истории изменений
-from .models import Priority, Status, Tag, Project, Task  # Импортируем наши модели
+from .models import Priority, Status, Tag, Project, Task, ImportJob  # Импортируем наши модели
+from .counters import deferred_counters  # Пересчет счетчиков проектов один раз на массовую операцию
+from .deadlines import deferred_deadlines  # Пересчет сроков задач один раз на массовую операцию
+from .history import deferred_history  # Пакетная запись истории изменений
+from .images import THUMB, ready_variants  # Уменьшенные копии изображений для превью
+from .admin_filters import AutocompleteFilter, AutocompleteFilterMixin  # Фильтры по FK с автодополнением
+from .pagination import EstimatedCountPaginator  # Оценка количества строк вместо COUNT(*) на больших таблицах
+from .reference import reference_data  # Приоритеты и статусы из кэша справочников
+
+
+# Базовый ресурс импорта: история импортированных строк уходит в очередь (см. process_history_queue)
+class QueuedHistoryResource(resources.ModelResource):
+    def import_data(self, dataset, dry_run=False, **kwargs):
+        if dry_run:  # Предпросмотр откатывается целиком - историю копить незачем
+            return super().import_data(dataset, dry_run=dry_run, **kwargs)
+        with deferred_history(queue=True):
+            return super().import_data(dataset, dry_run=dry_run, **kwargs)
+
+
+def image_preview_html(obj):
+    """Превью изображения: уменьшенная копия (WebP, для старых браузеров JPEG), пока ее нет - оригинал"""
+    if not obj.image:
+        return 'Нет изображения'
+    style = 'max-height: 200px; max-width: 300px;'
+    thumb = ready_variants(obj.image_variants, obj.image.name).get(THUMB[0])
+    if thumb is None:
+        return format_html('<img src="{}" style="{}" />', obj.image.url, style)
+    storage = obj.image.storage
+    return format_html(
+        '<picture><source srcset="{}" type="image/webp"><img src="{}" width="{}" height="{}" style="{}" /></picture>',
+        storage.url(thumb['webp']), storage.url(thumb['jpeg']), thumb['width'], thumb['height'], style,
+    )
 
 
 # Ресурс для экспорта Priority в Excel
-class PriorityResource(resources.ModelResource):
+class PriorityResource(QueuedHistoryResource):
     class Meta:
         model = Priority  # Модель для экспорта
         fields = ('id', 'name', 'level')  # Поля для экспорта
@@ -43,7 +74,7 @@ class PriorityAdmin(ImportExportModelAdmin, SimpleHistoryAdmin):  # Подклю
 
 
 # Ресурс для экспорта Status в Excel
-class StatusResource(resources.ModelResource):
+class StatusResource(QueuedHistoryResource):
     class Meta:
         model = Status
         fields = ('id', 'name', 'color')
@@ -75,7 +106,7 @@ class StatusAdmin(ImportExportModelAdmin, SimpleHistoryAdmin):
 
 
 # Ресурс для экспорта Tag в Excel
-class TagResource(resources.ModelResource):
+class TagResource(QueuedHistoryResource):
     class Meta:
         model = Tag
         fields = ('id', 'name', 'color', 'user__username')  # __ для связанных полей
@@ -84,12 +115,13 @@ class TagResource(resources.ModelResource):
 
 # Админка для модели Tag (Тег)
 @admin.register(Tag)
-class TagAdmin(ImportExportModelAdmin, SimpleHistoryAdmin):
+class TagAdmin(AutocompleteFilterMixin, ImportExportModelAdmin, SimpleHistoryAdmin):
     resource_class = TagResource
 
     list_display = ('id', 'name', 'color_preview', 'user_link')  # Поля в списке
     list_display_links = ('id', 'name')
-    list_filter = ('user', 'color')  # Фильтры
+    list_select_related = ('user',)  # Пользователи - тем же запросом, что и теги
+    list_filter = (('user', AutocompleteFilter), 'color')  # Фильтры (пользователь - поиском, а не списком всех)
     search_fields = ('name', 'user__username')  # Поиск по имени тега и имени пользователя
     raw_id_fields = ('user',)  # Виджет для выбора пользователя (удобно при большом количестве)
 
@@ -108,12 +140,12 @@ class TagAdmin(ImportExportModelAdmin, SimpleHistoryAdmin):
 
     @admin.display(description='Пользователь')  # Гиперссылка на пользователя
     def user_link(self, obj):
-        url = reverse('admin:auth_user_change', args=[obj.user.id])  # URL страницы пользователя
+        url = reverse('admin:auth_user_change', args=[obj.user_id])  # URL страницы пользователя
         return format_html('<a href="{}">{}</a>', url, obj.user.username)  # Ссылка
 
 
 # Ресурс для экспорта Project в Excel
-class ProjectResource(resources.ModelResource):
+class ProjectResource(QueuedHistoryResource):
     class Meta:
         model = Project
         fields = ('id', 'name', 'description', 'owner__username', 'created_at', 'updated_at')
@@ -132,21 +164,34 @@ class TaskInline(admin.TabularInline):  # Табличное отображен
 
 # Админка для модели Project (Проект)
 @admin.register(Project)
-class ProjectAdmin(ImportExportModelAdmin, SimpleHistoryAdmin):
+class ProjectAdmin(AutocompleteFilterMixin, ImportExportModelAdmin, SimpleHistoryAdmin):
     resource_class = ProjectResource
 
     list_display = ('id', 'name', 'owner_link', 'tasks_count', 'created_at', 'updated_at')  # Поля в списке
     list_display_links = ('id', 'name')
-    list_filter = ('owner', 'created_at')  # Фильтры
+    list_select_related = ('owner',)  # Владельцы - тем же запросом, что и проекты
+    list_filter = (('owner', AutocompleteFilter), 'created_at')  # Фильтры (владелец - поиском, а не списком всех)
+    paginator = EstimatedCountPaginator  # Без COUNT(*) по всей таблице на больших объемах
+    show_full_result_count = False  # Без второго COUNT(*) при включенных фильтрах
     search_fields = ('name', 'description', 'owner__username')  # Поиск
     raw_id_fields = ('owner',)
-    readonly_fields = ('created_at', 'updated_at')  # Поля только для чтения
-    date_hierarchy = 'created_at'  # Навигация по датам вверху списка
+    readonly_fields = (
+        'created_at', 'updated_at', 'image_preview',
+        'tasks_total', 'tasks_open', 'tasks_completed', 'tasks_overdue', 'counters_refreshed_at'
+    )  # Поля только для чтения
 
     fieldsets = (
         ('Основная информация', {
             'fields': ('name', 'description', 'owner')
         }),
+        ('Изображение', {
+            'fields': ('image', 'image_preview'),
+            'classes': ('collapse',)
+        }),
+        ('Счетчики задач', {
+            'fields': ('tasks_total', 'tasks_open', 'tasks_completed', 'tasks_overdue', 'counters_refreshed_at'),
+            'classes': ('collapse',)
+        }),
         ('Даты', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)  # Свернутая секция
@@ -157,17 +202,24 @@ class ProjectAdmin(ImportExportModelAdmin, SimpleHistoryAdmin):
 
     @admin.display(description='Владелец')  # Ссылка на владельца
     def owner_link(self, obj):
-        url = reverse('admin:auth_user_change', args=[obj.owner.id])
+        url = reverse('admin:auth_user_change', args=[obj.owner_id])
         return format_html('<a href="{}">{}</a>', url, obj.owner.username)
 
-    @admin.display(description='Количество задач')  # Кастомный метод: количество задач в проекте
+    @admin.display(description='Количество задач', ordering='tasks_total')  # Кастомный метод: количество задач в проекте
     def tasks_count(self, obj):
-        count = obj.tasks.count()  # Подсчитываем задачи через related_name
-        return format_html('<b>{}</b>', count)
+        return format_html('<b>{}</b>', obj.tasks_total)  # Берем готовый счетчик вместо COUNT на каждую строку
+
+    @admin.display(description='Превью изображения')
+    def image_preview(self, obj):
+        return image_preview_html(obj)
+
+    def save_related(self, request, form, formsets, change):  # Задачи из inline сохраняются пачкой
+        with deferred_counters(), deferred_deadlines(), deferred_history():
+            super().save_related(request, form, formsets, change)
 
 
 # Ресурс для экспорта Task в Excel с кастомизацией
-class TaskResource(resources.ModelResource):
+class TaskResource(QueuedHistoryResource):
 
     # Метод 1: get_export_queryset - фильтруем только задачи с высоким приоритетом (4-5)
     def get_export_queryset(self, queryset):
@@ -204,17 +256,19 @@ class TaskResource(resources.ModelResource):
 
 # Админка для модели Task (Задача)
 @admin.register(Task)
-class TaskAdmin(ImportExportModelAdmin, SimpleHistoryAdmin):
+class TaskAdmin(AutocompleteFilterMixin, ImportExportModelAdmin, SimpleHistoryAdmin):
     resource_class = TaskResource
 
-    list_display = ('id', 'title', 'project_link', 'status', 'priority_display', 'assigned_to_link', 'due_date', 'created_at')  # Поля в списке
+    list_display = ('id', 'title', 'project_link', 'status_display', 'priority_display', 'assigned_to_link', 'due_date', 'created_at')  # Поля в списке
     list_display_links = ('id', 'title')
-    list_filter = ('status', 'priority', 'project', 'created_at', 'due_date')  # Фильтры
+    list_select_related = ('project', 'assigned_to')  # Проекты и исполнители - одним запросом; статус и приоритет - из кэша справочников
+    list_filter = ('status', 'priority', ('project', AutocompleteFilter), 'created_at', 'due_date')  # Фильтры (проект - поиском)
+    paginator = EstimatedCountPaginator  # Без COUNT(*) по всей таблице на больших объемах
+    show_full_result_count = False  # Без второго COUNT(*) при включенных фильтрах
     search_fields = ('title', 'description', 'project__name', 'assigned_to__username')  # Поиск
     raw_id_fields = ('project', 'priority', 'status', 'assigned_to', 'created_by')  # Виджеты для FK
     readonly_fields = ('created_at', 'updated_at', 'image_preview')  # Поля только для чтения
     filter_horizontal = ('tags',)  # Виджет для ManyToMany (удобный выбор тегов)
-    date_hierarchy = 'created_at'  # Навигация по датам
 
     fieldsets = (
         ('Основная информация', {
@@ -233,31 +287,70 @@ class TaskAdmin(ImportExportModelAdmin, SimpleHistoryAdmin):
         }),
     )
 
+    def delete_queryset(self, request, queryset):  # Массовое удаление: один пересчет счетчиков на проект
+        with deferred_counters(), deferred_deadlines(), deferred_history():
+            super().delete_queryset(request, queryset)
+
     @admin.display(description='Проект')  # Ссылка на проект
     def project_link(self, obj):
-        url = reverse('admin:tasks_project_change', args=[obj.project.id])
+        url = reverse('admin:tasks_project_change', args=[obj.project_id])
         return format_html('<a href="{}">{}</a>', url, obj.project.name)
 
-    @admin.display(description='Приоритет')  # Цветной приоритет
+    @admin.display(description='Статус', ordering='status__name')  # Название статуса из кэша справочников
+    def status_display(self, obj):
+        task_status = reference_data.status(obj.status_id)
+        return task_status['name'] if task_status else '-'
+
+    @admin.display(description='Приоритет', ordering='priority__level')  # Цветной приоритет
     def priority_display(self, obj):
-        if obj.priority:
+        priority = reference_data.priority(obj.priority_id)
+        if priority:
             colors = {1: '#28a745', 2: '#17a2b8', 3: '#ffc107', 4: '#fd7e14', 5: '#dc3545'}
-            color = colors.get(obj.priority.level, '#6c757d')
+            color = colors.get(priority['level'], '#6c757d')
             return format_html(
                 '<span style="color: {}; font-weight: bold;">{}</span>',
-                color, obj.priority.name
+                color, priority['name']
             )
         return '-'
 
     @admin.display(description='Назначена')  # Ссылка на пользователя
     def assigned_to_link(self, obj):
-        if obj.assigned_to:
-            url = reverse('admin:auth_user_change', args=[obj.assigned_to.id])
+        if obj.assigned_to_id:
+            url = reverse('admin:auth_user_change', args=[obj.assigned_to_id])
             return format_html('<a href="{}">{}</a>', url, obj.assigned_to.username)
         return '-'
 
     @admin.display(description='Превью изображения')  # Превью прикрепленного изображения
     def image_preview(self, obj):
-        if obj.image:
-            return format_html('<img src="{}" style="max-height: 200px; max-width: 300px;" />', obj.image.url)
-        return 'Нет изображения'
+        return image_preview_html(obj)
+
+
+# Админка для заданий массового импорта (большие файлы задач и проектов)
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'model', 'file', 'status', 'progress', 'created_count', 'updated_count', 'error_count', 'created_by', 'created_at')
+    list_display_links = ('id', 'model')
+    list_filter = ('status', 'model')
+    list_select_related = ('created_by',)
+    readonly_fields = (
+        'status', 'progress', 'total_rows', 'processed_rows', 'created_count', 'updated_count', 'error_count', 'errors',
+        'created_by', 'created_at', 'started_at', 'finished_at',
+    )
+
+    @admin.display(description='Прогресс')
+    def progress(self, obj):
+        if not obj.total_rows:
+            return f'{obj.processed_rows}'
+        return f'{obj.processed_rows} из {obj.total_rows} ({obj.processed_rows * 100 // obj.total_rows}%)'
+
+    def get_readonly_fields(self, request, obj=None):  # Файл и тип меняются только при создании задания
+        if obj is not None:
+            return ('model', 'file') + self.readonly_fields
+        return self.readonly_fields
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.created_by = request.user  # От имени этого пользователя пишется история импорта
+        super().save_model(request, obj, form, change)
+        if not change:
+            self.message_user(request, 'Задание поставлено в очередь: его выполнит команда process_import_jobs')
@@ -0,0 +1,52 @@
+from django import forms  # Поле выбора с виджетом автодополнения
+from django.contrib import admin  # Базовые классы фильтров админки
+from django.contrib.admin.widgets import AutocompleteSelect  # Виджет автодополнения (select2) из админки
+from django.utils.translation import gettext_lazy as _  # Подпись "Все" как у стандартных фильтров
+
+
+# Фильтр по связанной модели с автодополнением вместо списка всех объектов
+class AutocompleteFilter(admin.FieldListFilter):
+    """
+    Стандартный фильтр по ForeignKey выводит все объекты связанной модели (все проекты,
+    всех пользователей) и строит этот список на каждой странице. Здесь в фильтре одно поле
+    с поиском через autocomplete_view админки (нужны search_fields у админки связанной модели),
+    а выборка фильтруется по индексированной колонке FK. Админке нужен AutocompleteFilterMixin.
+    """
+    template = 'admin/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = f'{field_path}__{field.target_field.name}__exact'  # Тот же параметр, что у стандартного фильтра
+        self.lookup_val = params.get(self.lookup_kwarg)
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.form_field = forms.ModelChoiceField(
+            queryset=field.remote_field.model._default_manager.all(),
+            widget=AutocompleteSelect(field, model_admin.admin_site),
+            required=False,
+        )
+        self.widget_id = f'autocomplete-filter-{field_path}'
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.lookup_val is None,
+            'query_string': changelist.get_query_string(remove=[self.lookup_kwarg]),
+            'display': _('All'),
+        }
+
+    def widget(self):
+        """Поле выбора (загружается только выбранный объект, остальные - поиском)"""
+        return self.form_field.widget.render(
+            self.lookup_kwarg, self.lookup_val, attrs={'id': self.widget_id, 'data-filter-param': self.lookup_kwarg, 'style': 'width: 100%'}
+        )
+
+
+# Миксин для ModelAdmin: скрипты и стили автодополнения на странице списка
+class AutocompleteFilterMixin:
+    @property
+    def media(self):
+        return super().media + AutocompleteSelect(None, self.admin_site).media
@@ -0,0 +1,183 @@
+import asyncio  # Одновременные запросы к БД
+import threading  # Пул потоков создается один раз на процесс
+from concurrent.futures import ThreadPoolExecutor  # Потоки с собственными подключениями к БД
+from functools import update_wrapper  # Имя и описание view, как у DRF
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings  # ASYNC_DB_THREADS и настройки WhiteNoise
+from django.core.paginator import InvalidPage  # Неверный номер страницы
+from django.db import close_old_connections  # Устаревшие и сломанные подключения потоков пула
+from django.urls import URLPattern  # Маршруты роутера DRF с асинхронными view
+from rest_framework.exceptions import NotFound  # Ошибка при неверной странице
+from rest_framework.pagination import PageNumberPagination  # Пагинация по умолчанию (REST_FRAMEWORK)
+from whitenoise.middleware import WhiteNoiseMiddleware  # Статические файлы
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def db_executor():
+    """
+    Пул потоков для запросов к БД из асинхронного кода: у каждого потока свое постоянное
+    подключение, поэтому подключений у процесса не больше ASYNC_DB_THREADS
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'ASYNC_DB_THREADS', 8), thread_name_prefix='db',
+            )
+        return _executor
+
+
+def shutdown_db_executor():
+    """Остановка процесса (lifespan в todo_project/asgi.py)"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False)
+
+
+def _run(func, args, kwargs):
+    close_old_connections()  # Как в начале обычного запроса: CONN_MAX_AGE и подключения после ошибок
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()  # С пулом (tasks.db, CONN_MAX_AGE=0) подключение сразу возвращается в пул
+
+
+async def run_db(func, *args, **kwargs):
+    """Синхронный код с запросами к БД - в потоке пула (контекст запроса, в том числе метрики, переходит с ним)"""
+    return await sync_to_async(_run, thread_sensitive=False, executor=db_executor())(func, args, kwargs)
+
+
+async def gather_db(*funcs):
+    """
+    Независимые запросы одного HTTP-запроса - одновременно, каждый на своем подключении.
+    Асинхронные методы ORM Django 4.2 (acount, aget...) выполняются в одном потоке запроса
+    по очереди, поэтому здесь - пул
+    """
+    return await asyncio.gather(*(run_db(func) for func in funcs))
+
+
+# Миксин для ViewSet: асинхронные версии читающих действий (включаются настройкой ASYNC_VIEWS)
+class AsyncReadMixin:
+    """
+    Для действий из async_actions вызывается корутина a<действие> (alist, aretrieve, aoverdue...):
+    проверки DRF выполняются в пуле потоков БД, запросы данных - одновременно (gather_db).
+    Остальные методы того же маршрута (POST, PATCH, DELETE) обрабатывает обычный синхронный view.
+    """
+    async_actions = ()
+
+    @classmethod
+    def as_async_view(cls, actions, **initkwargs):
+        sync_view = cls.as_view(actions, **initkwargs)
+
+        async def view(request, *args, **kwargs):
+            action = actions.get(request.method.lower())
+            if action not in cls.async_actions:
+                return await sync_to_async(sync_view)(request, *args, **kwargs)
+            self = cls(**initkwargs)
+            self.action_map = actions
+            for method, name in actions.items():  # Как в ViewSetMixin.as_view
+                setattr(self, method, getattr(self, name))
+            self.request = request
+            self.args = args
+            self.kwargs = kwargs
+            return await self.adispatch(request, *args, **kwargs)
+
+        update_wrapper(view, cls, updated=())
+        view.cls = cls
+        view.initkwargs = initkwargs
+        view.actions = actions
+        view.csrf_exempt = True  # Как у APIView.as_view (csrf_exempt() в Django 4.2 делает view синхронным)
+        return view
+
+    async def adispatch(self, request, *args, **kwargs):
+        """APIView.dispatch(): аутентификация (сессия из БД), права и лимиты - в пуле, действие - корутина"""
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await run_db(self.initial, request, *args, **kwargs)
+            response = await getattr(self, f'a{self.action}')(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def apaginated_response(self, request, queryset, render):
+        """
+        Страница по номеру (PageNumberPagination): COUNT(*) и строки страницы - одновременно.
+        render(строки) -> данные страницы. None - нужна обычная пагинация (курсор, ?page=last и т.п.)
+        """
+        paginator = self.paginator
+        if type(paginator) is not PageNumberPagination:
+            return None
+        page_size = paginator.get_page_size(request)
+        number = request.query_params.get(paginator.page_query_param) or 1
+        try:
+            number = int(number)
+        except (TypeError, ValueError):  # В том числе ?page=last - нужно количество страниц
+            return None
+        if not page_size or number < 1:
+            return None
+
+        pages = paginator.django_paginator_class(queryset, page_size)
+        offset = (number - 1) * page_size
+        pages.count, data = await gather_db(queryset.count, lambda: render(queryset[offset:offset + page_size]))
+        try:
+            paginator.page = pages.page(number)  # Строки уже выбраны: страница нужна для count и ссылок
+        except InvalidPage as exc:
+            raise NotFound(paginator.invalid_page_message.format(page_number=number, message=str(exc)))
+        paginator.request = request
+        if pages.num_pages > 1 and paginator.template is not None:
+            paginator.display_page_controls = True
+        return paginator.get_paginated_response(data)
+
+
+def async_read_urls(patterns):
+    """Маршруты роутера DRF: ViewSet с AsyncReadMixin получают асинхронный view с тем же путем и именем"""
+    result = []
+    for pattern in patterns:
+        callback = getattr(pattern, 'callback', None)
+        cls = getattr(callback, 'cls', None)
+        actions = getattr(callback, 'actions', None)
+        if actions and issubclass(cls, AsyncReadMixin) and set(actions.values()) & set(cls.async_actions):
+            view = cls.as_async_view(actions, **callback.initkwargs)
+            pattern = URLPattern(pattern.pattern, view, pattern.default_args, pattern.name)
+        result.append(pattern)
+    return result
+
+
+# WhiteNoise, который под ASGI не переводит цепочку middleware в синхронный режим
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    Синхронный middleware в цепочке заставляет Django выполнять весь запрос в отдельном потоке.
+    Здесь в поток уходит только отдача файла, остальные запросы проходят дальше асинхронно.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)  # Поиск файла на диске
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,191 @@
+from django.contrib.auth.models import User  # Модель пользователя
+from django.db import transaction  # Все изменения пачки - в одной транзакции
+from django.utils import timezone  # Для работы с датами и временем
+
+from .conditional import schedule_version_bump  # Новые ETag для списков задач
+from .counters import schedule_counters_refresh  # Пересчет счетчиков проектов
+from .deadlines import delete_deadlines, schedule_deadline_sync  # Таблицы сроков задач
+from .history import bulk_history  # История пачкой (одним INSERT на модель)
+from .images import release_images  # Файлы изображений удаленных задач
+from .models import Project, Tag, Task
+from .push import record_changes  # События для открытых страниц
+from .reference import reference_data  # Проверка приоритетов и статусов без запросов к БД
+from .serializers import BulkTaskCreateSerializer, BulkTaskUpdateSerializer, BulkTaskDeleteSerializer
+
+MAX_BULK_ITEMS = 500  # Максимум задач в одном запросе
+TaskTag = Task.tags.through  # Промежуточная таблица задача-тег
+
+
+class BulkError(Exception):
+    """Ошибка валидации пачки: detail возвращается клиентом как есть (с номерами элементов и id)"""
+
+    def __init__(self, detail):
+        super().__init__(detail)
+        self.detail = detail
+
+
+def _existing(queryset, ids):
+    """Какие из переданных id существуют (один запрос)"""
+    ids = {pk for pk in ids if pk is not None}
+    if not ids:
+        return set()
+    return set(queryset.filter(pk__in=ids).values_list('pk', flat=True))
+
+
+def _reference_errors(items):
+    """Проверяем связанные объекты сразу для всех элементов: по одному запросу на модель"""
+    projects = _existing(Project.objects, (item.get('project') for item in items))
+    users = _existing(User.objects, (item.get('assigned_to') for item in items))
+    tags = _existing(Tag.objects, (
+        tag for item in items
+        for tag in item.get('tags', []) + item.get('tags_add', []) + item.get('tags_remove', [])
+    ))
+
+    errors = []
+    for item in items:
+        item_errors = {}
+        if 'project' in item and item['project'] not in projects:
+            item_errors['project'] = 'Проект не найден'
+        if item.get('priority') is not None and reference_data.priority(item['priority']) is None:
+            item_errors['priority'] = 'Приоритет не найден'
+        if item.get('status') is not None and reference_data.status(item['status']) is None:
+            item_errors['status'] = 'Статус не найден'
+        if item.get('assigned_to') is not None and item['assigned_to'] not in users:
+            item_errors['assigned_to'] = 'Пользователь не найден'
+        for field in ('tags', 'tags_add', 'tags_remove'):
+            unknown = [tag for tag in item.get(field, []) if tag not in tags]
+            if unknown:
+                item_errors[field] = f'Теги не найдены: {unknown}'
+        errors.append(item_errors)
+    return errors
+
+
+def _check_size(items):
+    if not isinstance(items, list) or not items:
+        raise BulkError({'error': 'Передайте непустой список задач'})
+    if len(items) > MAX_BULK_ITEMS:
+        raise BulkError({'error': f'Не больше {MAX_BULK_ITEMS} задач за один запрос'})
+
+
+def _visible_ids(queryset, ids):
+    """Проверяем, что все задачи существуют и видны пользователю"""
+    _check_size(ids)
+    found = set(queryset.filter(pk__in=ids).order_by().values_list('pk', flat=True))
+    missing = [{'id': pk, 'errors': {'id': 'Задача не найдена'}} for pk in ids if pk not in found]
+    if missing:
+        raise BulkError({'errors': missing})
+    return found
+
+
+def bulk_create_tasks(items, user):
+    """Создаем пачку задач: проверка всей пачки, затем bulk_create и история одним запросом"""
+    _check_size(items)
+    serializers_list = [BulkTaskCreateSerializer(data=item) for item in items]
+    errors = [{} if serializer.is_valid() else dict(serializer.errors) for serializer in serializers_list]
+    valid = [serializer.validated_data if serializer.is_valid() else {} for serializer in serializers_list]
+
+    for item_errors, reference_errors in zip(errors, _reference_errors(valid)):
+        for field, message in reference_errors.items():
+            item_errors.setdefault(field, message)
+
+    # Уникальность названия в проекте: один запрос на всю пачку + дубликаты внутри пачки
+    pairs = {(item['project'], item['title']) for item in valid if item}
+    taken = set(Task.objects.filter(
+        project_id__in={project for project, _ in pairs},
+        title__in={title for _, title in pairs},
+    ).values_list('project_id', 'title')) if pairs else set()
+    for item, item_errors in zip(valid, errors):
+        if not item:
+            continue
+        pair = (item['project'], item['title'])
+        if pair in taken:
+            item_errors.setdefault('title', 'Задача с таким названием уже существует в данном проекте')
+        taken.add(pair)
+
+    if any(errors):
+        raise BulkError({
+            'errors': [{'index': index, 'errors': item_errors} for index, item_errors in enumerate(errors) if item_errors]
+        })
+
+    created_by = user if user.is_authenticated else None
+    with transaction.atomic():
+        tasks = Task.objects.bulk_create([
+            Task(
+                title=item['title'],
+                description=item.get('description'),
+                project_id=item['project'],
+                priority_id=item.get('priority'),
+                status_id=item.get('status'),
+                assigned_to_id=item.get('assigned_to'),
+                due_date=item.get('due_date'),
+                created_by=created_by,
+            )
+            for item in valid
+        ])
+        TaskTag.objects.bulk_create([
+            TaskTag(task_id=task.pk, tag_id=tag)
+            for task, item in zip(tasks, valid)
+            for tag in set(item.get('tags', []))
+        ])
+        bulk_history(tasks, '+', user)
+        schedule_counters_refresh({task.project_id for task in tasks})
+        schedule_deadline_sync({task.pk for task in tasks})
+        record_changes(tasks, 'created')
+        schedule_version_bump(Task._meta.label)  # Сигналы post_save/post_delete при массовых операциях не отправляются
+    return tasks
+
+
+def bulk_update_tasks(queryset, data, user):
+    """Одни и те же изменения для пачки задач одним UPDATE"""
+    serializer = BulkTaskUpdateSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    changes = dict(serializer.validated_data)
+    ids = _visible_ids(queryset, changes.pop('ids'))
+
+    reference_errors = _reference_errors([changes])[0]
+    if reference_errors:
+        raise BulkError(reference_errors)
+
+    tags_add = set(changes.pop('tags_add', []))
+    tags_remove = set(changes.pop('tags_remove', []))
+    fields = {Task._meta.get_field(name).attname: value for name, value in changes.items()}  # status -> status_id
+
+    with transaction.atomic():
+        before = Task.objects.in_bulk(ids)  # Прежние значения: кому и какие поля показать в событиях
+        Task.objects.filter(pk__in=ids).update(updated_at=timezone.now(), **fields)
+        if tags_add:
+            TaskTag.objects.bulk_create(
+                [TaskTag(task_id=task_id, tag_id=tag) for task_id in ids for tag in tags_add],
+                ignore_conflicts=True,  # Тег уже был у задачи
+            )
+        if tags_remove:
+            TaskTag.objects.filter(task_id__in=ids, tag_id__in=tags_remove).delete()
+        tasks = list(Task.objects.filter(pk__in=ids))
+        bulk_history(tasks, '~', user)
+        schedule_counters_refresh({task.project_id for task in tasks})
+        schedule_deadline_sync(ids)
+        for task in tasks:
+            task._loaded_values = before[task.pk]._loaded_values
+        record_changes(tasks, 'updated', fields=set(changes) | ({'tags'} if tags_add or tags_remove else set()))
+        schedule_version_bump(Task._meta.label)  # Сигналы post_save/post_delete при массовых операциях не отправляются
+    return tasks
+
+
+def bulk_delete_tasks(queryset, data, user):
+    """Удаляем пачку задач: история одним INSERT, затем удаление без обработки каждой строки"""
+    serializer = BulkTaskDeleteSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    ids = _visible_ids(queryset, serializer.validated_data['ids'])
+
+    with transaction.atomic():
+        tasks = list(Task.objects.filter(pk__in=ids))
+        bulk_history(tasks, '-', user)
+        TaskTag.objects.filter(task_id__in=ids).delete()
+        delete_deadlines(ids)
+        # Сигналы post_delete (история и счетчики) по каждой строке не нужны - все сделано пачкой
+        Task.objects.filter(pk__in=ids)._raw_delete(Task.objects.db)
+        schedule_counters_refresh({task.project_id for task in tasks})
+        record_changes(tasks, 'deleted')
+        release_images(Task._meta.get_field('image').storage, [(task.image.name, task.image_variants) for task in tasks])
+        schedule_version_bump(Task._meta.label)  # Сигналы post_save/post_delete при массовых операциях не отправляются
+    return tasks
@@ -0,0 +1,145 @@
+import hashlib  # Для построения ETag
+import time  # Текущая секунда (для Last-Modified)
+import uuid  # Для генерации новых версий
+
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone  # Время изменения версии (для Last-Modified)
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag  # Форматирование заголовков Last-Modified и ETag
+
+from .asgi import run_db  # Версии в асинхронных действиях читаются в пуле потоков
+from .metrics import cache_event  # Доля ответов 304 в метриках
+from .models import DataVersion  # Версии данных хранятся в БД - одни и те же для всех воркеров
+from .replicas import replica_may_lag  # Ответ с реплики сразу после изменения не получает ETag новой версии
+from .transactions import commit_batch  # Версии меняются только после коммита, одним запросом на транзакцию
+
+CONDITIONAL_METHODS = ('GET', 'HEAD')
+
+
+def _new_versions(labels, now):
+    return [DataVersion(label=label, version=uuid.uuid4().hex, changed_at=now) for label in labels]
+
+
+def get_versions(labels):
+    """
+    Версии данных по моделям: {'tasks.Task': {'v': ..., 't': ...}} одним запросом по первичному ключу.
+    Читаются из основной базы: по ним проверяется, не отстает ли реплика (replica_may_lag).
+    Строки заводит миграция 0015; здесь недостающие создаются только для новых моделей
+    """
+    rows = DataVersion.objects.using(DEFAULT_DB_ALIAS).filter(label__in=labels).values_list('label', 'version', 'changed_at')
+    versions = {label: {'v': version, 't': changed_at.timestamp()} for label, version, changed_at in rows}
+    missing = set(labels) - set(versions)
+    if missing:  # Версии еще нет - заводим новую (параллельно ее мог завести другой процесс)
+        DataVersion.objects.bulk_create(_new_versions(missing, timezone.now()), ignore_conflicts=True)
+        return get_versions(labels)
+    return versions
+
+
+def bump_versions(labels):
+    """Данные моделей изменились: новые версии для всех процессов (одним INSERT ... ON CONFLICT)"""
+    DataVersion.objects.bulk_create(
+        _new_versions(labels, timezone.now()),
+        update_conflicts=True, unique_fields=['label'], update_fields=['version', 'changed_at'],
+    )
+
+
+def schedule_version_bump(*labels):
+    """
+    Меняем версии после коммита транзакции (или сразу, если ее нет): иначе параллельный
+    запрос успел бы закэшировать старые данные под новой версией, а строки версий были бы
+    заблокированы до конца транзакции. Все изменения транзакции записываются одним запросом.
+    """
+    pending = commit_batch('versions', set, bump_versions)
+    if pending is None:
+        bump_versions(set(labels))
+    else:
+        pending.update(labels)
+
+
+def settled_last_modified(changed_at):
+    """
+    Last-Modified для версии, измененной в момент changed_at, или None. В заголовке нет долей
+    секунды, поэтому пока идет та же секунда, данные могут измениться еще раз с тем же
+    Last-Modified - такой ответ отдается только с ETag, и If-Modified-Since по нему не проверяется
+    """
+    last_modified = int(changed_at)
+    return last_modified if last_modified < int(time.time()) else None
+
+
+# Миксин для ViewSet: ответ 304 на повторное чтение без изменений
+class ConditionalGetMixin:
+    """
+    ETag и Last-Modified для list и retrieve строятся по версиям моделей из
+    conditional_models (версии меняются сигналами при сохранении и удалении и хранятся
+    в таблице DataVersion - одни для всех воркеров), пользователю и URL. Если клиент
+    прислал совпадающий If-None-Match или If-Modified-Since, возвращаем 304 без запросов
+    данных и сериализации.
+
+    Версии общие для модели, а не для владельца: задачу видят владелец проекта, исполнитель
+    и создатель, ответ содержит имена пользователей, теги и справочники, а смена владельца
+    проекта меняет видимость всех его задач. Версия на пользователя потребовала бы при каждой
+    записи искать всех затронутых пользователей (прежних и новых) и писать по строке на каждого.
+    Поэтому любое изменение модели сбрасывает ETag у всех - лишний запрос данных, но не
+    устаревший ответ.
+    """
+    conditional_models = ()  # Модели, от которых зависит ответ: ('tasks.Task', 'tasks.Project', ...)
+    conditional_actions = ('list', 'retrieve')
+
+    def get_conditional_validators(self, request):
+        """ETag и время последнего изменения (unix, с долями секунды) - один запрос к таблице версий"""
+        versions = get_versions(self.conditional_models)
+        parts = [
+            str(request.user.pk),
+            request.get_full_path(),
+            request.META.get('HTTP_ACCEPT', ''),  # JSON и HTML-версия DRF - разные представления
+        ] + [f'{label}={versions[label]["v"]}' for label in sorted(versions)]
+        etag = quote_etag(hashlib.md5('|'.join(parts).encode()).hexdigest())
+        changed_at = max((version['t'] for version in versions.values()), default=0)
+        return etag, changed_at
+
+    def conditional_response(self, request, render):
+        if request.method not in CONDITIONAL_METHODS or self.action not in self.conditional_actions:
+            return render()
+        etag, changed_at = self.get_conditional_validators(request)
+        response = self._not_modified(request, etag, changed_at)
+        if response is None:  # Данные изменились (или клиент пришел впервые)
+            response = render()
+        return self._add_validators(response, etag, changed_at)
+
+    async def aconditional_response(self, request, render):
+        """conditional_response() для асинхронных действий (render - функция, возвращающая корутину)"""
+        if request.method not in CONDITIONAL_METHODS or self.action not in self.conditional_actions:
+            return await render()
+        etag, changed_at = await run_db(self.get_conditional_validators, request)
+        response = self._not_modified(request, etag, changed_at)
+        if response is None:
+            response = await render()
+        return self._add_validators(response, etag, changed_at)
+
+    @staticmethod
+    def _not_modified(request, etag, changed_at):
+        # Сначала If-None-Match (слабое сравнение ETag); If-Modified-Since проверяется, только если
+        # If-None-Match нет, и только для версий, измененных не в текущую секунду
+        response = get_conditional_response(request, etag=etag, last_modified=settled_last_modified(changed_at))
+        cache_event('conditional', response is not None)
+        return response
+
+    @staticmethod
+    def _add_validators(response, etag, changed_at):
+        if response.status_code in (200, 304):
+            if response.status_code == 304 or not replica_may_lag(changed_at):
+                response['ETag'] = etag
+                last_modified = settled_last_modified(changed_at)
+                if last_modified is not None:
+                    response['Last-Modified'] = http_date(last_modified)
+            patch_cache_control(response, private=True, no_cache=True)  # Браузер кэширует, но всегда переспрашивает
+            patch_vary_headers(response, ('Accept', 'Cookie', 'Authorization'))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs)
+        )
@@ -0,0 +1,67 @@
+import threading  # Для хранения отложенных пересчетов в рамках потока
+from contextlib import contextmanager  # Для контекстного менеджера deferred_counters
+
+from django.db import transaction  # Для отложенного пересчета после коммита
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Value  # Для подзапросов в UPDATE
+from django.db.models.functions import Coalesce  # Чтобы пустой подзапрос давал 0
+from django.utils import timezone  # Для работы с датами и временем
+
+from .conditional import schedule_version_bump
+from .models import Project, Task, STATUS_COMPLETED, PROJECT_COUNTER_FIELDS
+from .push import record_project_changes  # Новые счетчики - событие для страницы проектов
+from .reference import reference_data
+
+_state = threading.local()  # Набор проектов, ожидающих пересчета внутри deferred_counters()
+
+
+def _count_subquery(condition=None):
+    """Коррелированный подзапрос: количество задач проекта (с условием или без)"""
+    tasks = Task.objects.filter(project=OuterRef('pk'))
+    if condition is not None:
+        tasks = tasks.filter(condition)
+    counted = tasks.order_by().values('project').annotate(count=Count('id')).values('count')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), Value(0))
+
+
+def refresh_project_counters(project_ids):
+    """Пересчитываем счетчики задач для переданных проектов одним UPDATE"""
+    project_ids = {project_id for project_id in project_ids if project_id is not None}
+    if not project_ids:
+        return 0
+    now = timezone.now()
+    completed = Q(status_id__in=reference_data.status_ids(STATUS_COMPLETED))
+    updated = Project.objects.filter(pk__in=project_ids).update(
+        tasks_total=_count_subquery(),
+        tasks_open=_count_subquery(~completed),
+        tasks_completed=_count_subquery(completed),
+        tasks_overdue=_count_subquery(~completed & Q(due_date__lt=now)),
+        counters_refreshed_at=now,
+    )
+    schedule_version_bump(Project._meta.label)  # UPDATE не отправляет post_save
+    record_project_changes(project_ids, PROJECT_COUNTER_FIELDS)
+    return updated
+
+
+def schedule_counters_refresh(project_ids):
+    """Пересчитываем счетчики после коммита текущей транзакции (или сразу, если ее нет)"""
+    pending = getattr(_state, 'pending', None)
+    if pending is not None:  # Внутри deferred_counters() только запоминаем проекты
+        pending.update(project_ids)
+        return
+    project_ids = set(project_ids)
+    transaction.on_commit(lambda: refresh_project_counters(project_ids))
+
+
+@contextmanager
+def deferred_counters():
+    """Массовые операции: счетчики пересчитываются один раз на выходе из блока, а не на каждую задачу"""
+    if getattr(_state, 'pending', None) is not None:  # Вложенный блок - пересчитает внешний
+        yield
+        return
+    _state.pending = set()
+    try:
+        yield
+    finally:
+        project_ids, _state.pending = _state.pending, None
+        if project_ids:
+            schedule_counters_refresh(project_ids)
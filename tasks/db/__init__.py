@@ -0,0 +1,4 @@
+"""
+Бэкенд БД PostgreSQL с пулом подключений (ENGINE 'tasks.db', см. DATABASES в настройках).
+Статистика пулов процесса - pool_stats(), в Prometheus - метрики todo_db_pool_*.
+"""
@@ -0,0 +1,105 @@
+import logging  # Ошибки подогрева пула при запуске
+import os  # Пулы не переходят в процессы после fork
+import threading  # Пул создается один раз на процесс
+
+from django.db import connections  # Все базы из настроек (подогрев и статистика пулов)
+from django.db.backends.postgresql import base, creation
+
+from .pool import ConnectionPool
+
+logger = logging.getLogger('tasks.db')
+
+NO_DB_ALIAS = '__no_db__'  # Служебное подключение Django к базе postgres (создание тестовой базы) - без пула
+POOL_DEFAULTS = {'MIN_SIZE': 2, 'MAX_SIZE': 10, 'TIMEOUT': 10, 'MAX_IDLE': 300, 'MAX_LIFETIME': 3600, 'CHECK_AFTER': 30}
+
+_pools = {}  # (alias, имя базы) -> ConnectionPool
+_pools_pid = os.getpid()
+_pools_lock = threading.Lock()
+
+
+def _pool(alias, settings_dict, connect):
+    global _pools_pid
+    with _pools_lock:
+        if _pools_pid != os.getpid():  # Подключения родителя после fork принадлежат ему: в воркере пул новый
+            _pools.clear()
+            _pools_pid = os.getpid()
+        key = (alias, settings_dict['NAME'])
+        if key not in _pools:
+            options = {**POOL_DEFAULTS, **settings_dict.get('POOL', {})}
+            _pools[key] = ConnectionPool(
+                alias, connect, min_size=options['MIN_SIZE'], max_size=options['MAX_SIZE'],
+                timeout=options['TIMEOUT'], max_idle=options['MAX_IDLE'],
+                max_lifetime=options['MAX_LIFETIME'], check_after=options['CHECK_AFTER'],
+            )
+        return _pools[key]
+
+
+def fill_pools():
+    """
+    Открываем MIN_SIZE подключений каждой базы с пулом (gunicorn post_fork, lifespan ASGI).
+    Недоступная база не мешает запуску: подключения откроются при первых запросах
+    """
+    for alias in connections:
+        wrapper = connections[alias]
+        if isinstance(wrapper, DatabaseWrapper):
+            try:
+                wrapper.get_pool().fill()
+            except base.Database.Error as exc:
+                logger.warning('Пул подключений %s не заполнен: %s', alias, exc)
+
+
+def close_pools(name=None):
+    """Закрываем пулы (всех баз или базы с именем name): перед fork, при остановке, перед удалением тестовой базы"""
+    with _pools_lock:
+        closing = [key for key in _pools if name is None or key[1] == name]
+        pools = [_pools.pop(key) for key in closing] if _pools_pid == os.getpid() else []
+    for pool in pools:
+        pool.close()
+
+
+def pool_stats():
+    """Состояние пулов процесса: {alias: ConnectionPool.stats()}"""
+    with _pools_lock:
+        pools = list(_pools.values()) if _pools_pid == os.getpid() else []
+    return {pool.alias: pool.stats() for pool in pools}
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_pools(test_database_name)  # Свободные подключения пула не дали бы удалить базу
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+# PostgreSQL с пулом подключений процесса: ENGINE 'tasks.db', параметры - в DATABASES[...]['POOL']
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    connect() берет подключение из пула, close() возвращает его обратно, поэтому с CONN_MAX_AGE=0
+    подключение выдается на время запроса (и задания пула потоков БД под ASGI), а не на жизнь потока.
+    Пул общий для всех потоков процесса: подключений не больше MAX_SIZE при любом числе потоков.
+    """
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pool = None  # Пул, из которого взято текущее подключение
+
+    def get_pool(self):
+        return _pool(self.alias, self.settings_dict, lambda: super(DatabaseWrapper, self).get_new_connection(
+            self.get_connection_params()
+        ))
+
+    def get_new_connection(self, conn_params):
+        if self.alias == NO_DB_ALIAS:
+            return super().get_new_connection(conn_params)
+        pool = self.get_pool()
+        conn = pool.getconn()
+        self._pool = pool
+        return conn
+
+    def _close(self):
+        pool, self._pool = self._pool, None
+        if pool is None or self.connection is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            # Внутри atomic() Django считает подключение закрытым, но не отпускает его - закрываем по-настоящему
+            pool.putconn(self.connection, close=self.in_atomic_block)
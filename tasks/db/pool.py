@@ -0,0 +1,221 @@
+import threading  # Подключения выдаются потокам воркера (gthread, пул потоков БД под ASGI)
+import time  # Ожидание, возраст и простой подключений
+from collections import deque  # Свободные подключения: выдается последнее возвращенное
+
+from psycopg2 import Error, OperationalError  # Ошибки драйвера Django сам превращает в django.db.utils
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
+
+from ..metrics import db_pool_event, db_pool_state  # Размер пула, ожидание подключения и события в метриках
+
+
+# Пул подключений PostgreSQL одного процесса
+class ConnectionPool:
+    """
+    Не больше max_size подключений; когда все заняты, поток ждет свободное до timeout секунд.
+    Первые min_size подключений не закрываются по простою, лишние закрываются после max_idle
+    секунд простоя, любое - после max_lifetime секунд жизни. Подключение, простоявшее
+    дольше check_after секунд, перед выдачей проверяется запросом SELECT 1.
+    """
+
+    def __init__(self, alias, connect, min_size=2, max_size=10, timeout=10, max_idle=300, max_lifetime=3600, check_after=30):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError(f'Пул {alias}: нужно 0 <= MIN_SIZE <= MAX_SIZE, MAX_SIZE >= 1')
+        self.alias = alias
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.check_after = check_after
+        self._connect = connect  # Новое подключение драйвера (get_new_connection бэкенда)
+        self._condition = threading.Condition()
+        self._idle = deque()  # (подключение, когда возвращено)
+        self._created = {}  # Подключение -> когда открыто
+        self._size = 0  # Открытые и открывающиеся подключения
+        self._waiting = 0
+        self._closed = False
+        self._counters = dict.fromkeys(('checkouts', 'created', 'closed', 'timeouts', 'failed_checks'), 0)
+
+    def getconn(self):
+        """Свободное подключение, новое (если пул не полон) или OperationalError по истечении timeout"""
+        started = time.monotonic()
+        while True:
+            conn, returned_at = self._acquire(started)
+            if conn is None:  # Место в пуле занято за нами - открываем подключение вне блокировки
+                return self._open()
+            if self._usable(conn, returned_at):
+                return conn
+            self._discard(conn)
+
+    def putconn(self, conn, close=False):
+        """Возврат подключения: незавершенная транзакция откатывается, сломанное подключение закрывается"""
+        if not close:
+            close = self._closed or conn.closed or self._expired(conn, time.monotonic())
+        if not close:
+            status = conn.info.transaction_status
+            if status == TRANSACTION_STATUS_UNKNOWN:  # Соединение с сервером потеряно
+                close = True
+            elif status != TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except Error:
+                    close = True
+        if close:
+            self._discard(conn)
+            return
+        now = time.monotonic()
+        with self._condition:
+            self._idle.append((conn, now))
+            stale = []
+            while len(self._idle) > self.min_size and now - self._idle[0][1] > self.max_idle:  # Давно не нужные
+                stale.append(self._idle.popleft()[0])
+            self._forget(stale)
+            self._condition.notify()
+            state = self._state()
+        self._close_all(stale)
+        db_pool_state(self.alias, *state)
+
+    def fill(self):
+        """Открываем подключения до min_size (при запуске воркера, чтобы первые запросы не ждали подключения)"""
+        opened = []
+        while True:
+            with self._condition:
+                if self._closed or self._size >= self.min_size:
+                    break
+                self._size += 1
+            try:
+                conn = self._new_connection()
+            except Exception:
+                self._release_slot()
+                raise
+            opened.append(conn)
+        now = time.monotonic()
+        with self._condition:
+            self._idle.extendleft((conn, now) for conn in opened)
+            self._condition.notify(len(opened))
+            state = self._state()
+        db_pool_state(self.alias, *state)
+        return len(opened)
+
+    def close(self):
+        """Закрываем свободные подключения; выданные закроются при возврате"""
+        with self._condition:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._forget(idle)
+            self._condition.notify_all()
+            state = self._state()
+        self._close_all(idle)
+        db_pool_state(self.alias, *state)
+
+    def stats(self):
+        """Состояние пула для мониторинга: размеры, ожидающие потоки и счетчики событий"""
+        with self._condition:
+            idle, busy = self._state()
+            return {
+                'min_size': self.min_size, 'max_size': self.max_size,
+                'size': self._size, 'idle': idle, 'busy': busy, 'waiting': self._waiting,
+                **self._counters,
+            }
+
+    def _acquire(self, started):
+        deadline = started + self.timeout
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise OperationalError(f'Пул подключений {self.alias} закрыт')
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn = returned_at = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters['timeouts'] += 1
+                    db_pool_event(self.alias, 'timeout')
+                    raise OperationalError(
+                        f'Пул подключений {self.alias}: все подключения ({self.max_size}) заняты дольше {self.timeout} с'
+                    )
+                self._waiting += 1
+                try:
+                    self._condition.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self._counters['checkouts'] += 1
+            state = self._state()
+        db_pool_state(self.alias, *state, wait=time.monotonic() - started)
+        return conn, returned_at
+
+    def _open(self):
+        try:
+            conn = self._new_connection()
+        except Exception:
+            self._release_slot()
+            raise
+        db_pool_state(self.alias, *self._locked_state())
+        return conn
+
+    def _new_connection(self):
+        conn = self._connect()
+        with self._condition:
+            self._created[conn] = time.monotonic()
+            self._counters['created'] += 1
+        db_pool_event(self.alias, 'created')
+        return conn
+
+    def _usable(self, conn, returned_at):
+        now = time.monotonic()
+        if conn.closed or self._expired(conn, now):
+            return False
+        if self.check_after is not None and now - returned_at >= self.check_after:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+            except Error:
+                with self._condition:
+                    self._counters['failed_checks'] += 1
+                db_pool_event(self.alias, 'failed_check')
+                return False
+        return True
+
+    def _expired(self, conn, now):
+        created = self._created.get(conn)
+        return self.max_lifetime is not None and created is not None and now - created > self.max_lifetime
+
+    def _discard(self, conn):
+        with self._condition:
+            self._forget([conn])
+            self._condition.notify()
+            state = self._state()
+        self._close_all([conn])
+        db_pool_state(self.alias, *state)
+
+    def _release_slot(self):
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    def _forget(self, conns):
+        for conn in conns:
+            self._created.pop(conn, None)
+            self._size -= 1
+            self._counters['closed'] += 1
+
+    def _close_all(self, conns):
+        for conn in conns:
+            try:
+                conn.close()
+            except Error:
+                pass
+            db_pool_event(self.alias, 'closed')
+
+    def _state(self):
+        """(свободные, выданные) - вызывается под блокировкой"""
+        return len(self._idle), self._size - len(self._idle)
+
+    def _locked_state(self):
+        with self._condition:
+            return self._state()
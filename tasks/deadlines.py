@@ -0,0 +1,182 @@
+import threading  # Для хранения отложенных пересчетов в рамках потока
+from collections import namedtuple  # Событие перехода срока
+from contextlib import contextmanager  # Для контекстного менеджера deferred_deadlines
+from datetime import datetime, time, timedelta  # Границы корзин
+
+from django.db import transaction  # Пересчет после коммита и атомарная запись пачки
+from django.dispatch import Signal  # События переходов для напоминаний и уведомлений
+from django.utils import timezone  # Для работы с датами и временем
+
+from .models import DeadlineEntry, Task, TaskDeadline, STATUS_COMPLETED, URGENT_PRIORITY_LEVEL
+from .reference import reference_data  # Завершенные статусы и срочные приоритеты без запросов к БД
+
+SYNC_BATCH_SIZE = 2000  # Задач на один пересчет (один SELECT и по одному INSERT на таблицу)
+SCHEDULER_BATCH_SIZE = 1000  # Сроков на одну транзакцию планировщика
+SOON_PERIOD = timedelta(days=7)  # Срок ближе недели - корзина due_soon
+
+# Переход задачи между корзинами: old_bucket/new_bucket - значения TaskDeadline.BUCKET_*,
+# None - задачи не было в очереди (нет срока, завершена) или она из нее ушла.
+# user_ids - кому напоминать: владелец проекта, исполнитель и создатель.
+DeadlineTransition = namedtuple('DeadlineTransition', 'task_id due_date old_bucket new_bucket user_ids')
+
+# Отправляется после коммита, одна отправка на пачку: deadline_transitions.send(sender=TaskDeadline, transitions=[...])
+deadline_transitions = Signal()
+
+_state = threading.local()  # Задачи и проекты, ожидающие пересчета внутри deferred_deadlines()
+
+
+def deadline_bucket(due_date, now):
+    """
+    Корзина срока на момент now и время следующего перехода (None - переходов больше не будет).
+    due_tomorrow - срок до конца завтрашнего дня по местному времени, due_soon - в ближайшие 7 дней.
+    """
+    if due_date <= now:
+        return TaskDeadline.BUCKET_OVERDUE, None
+    day_before = timezone.localtime(due_date).date() - timedelta(days=1)
+    tomorrow_from = timezone.make_aware(datetime.combine(day_before, time.min))  # С этого момента срок "завтра"
+    if now >= tomorrow_from:
+        return TaskDeadline.BUCKET_DUE_TOMORROW, due_date
+    soon_from = due_date - SOON_PERIOD
+    if now >= soon_from:
+        return TaskDeadline.BUCKET_DUE_SOON, tomorrow_from
+    return TaskDeadline.BUCKET_LATER, soon_from
+
+
+def _send_transitions(transitions):
+    if transitions:
+        transaction.on_commit(lambda: deadline_transitions.send(sender=TaskDeadline, transitions=transitions))
+
+
+def sync_deadlines(task_ids=(), project_ids=(), events=True):
+    """
+    Пересчитываем строки очереди сроков и сроки пользователей для задач (и всех задач проектов).
+    Удаленные задачи просто пропадают. events=False - без событий переходов (первичное заполнение).
+    """
+    task_ids = {task_id for task_id in task_ids if task_id is not None}
+    project_ids = {project_id for project_id in project_ids if project_id is not None}
+    if project_ids:
+        task_ids.update(Task.objects.filter(project_id__in=project_ids).values_list('pk', flat=True))
+    task_ids = sorted(task_ids)
+    for start in range(0, len(task_ids), SYNC_BATCH_SIZE):
+        _sync_batch(task_ids[start:start + SYNC_BATCH_SIZE], events)
+    return len(task_ids)
+
+
+def _sync_batch(task_ids, events):
+    now = timezone.now()
+    completed = set(reference_data.status_ids(STATUS_COMPLETED))
+    urgent = set(reference_data.priority_ids(min_level=URGENT_PRIORITY_LEVEL))
+    rows = Task.objects.filter(pk__in=task_ids).order_by().values_list(
+        'pk', 'due_date', 'status_id', 'priority_id', 'project__owner_id', 'assigned_to_id', 'created_by_id',
+    )
+    entries, deadlines, users = [], [], {}
+    for task_id, due_date, status_id, priority_id, *user_ids in rows:
+        is_open = status_id not in completed
+        is_urgent = is_open and priority_id in urgent
+        users[task_id] = sorted({user_id for user_id in user_ids if user_id is not None})
+        if due_date is not None or is_urgent:
+            entries.extend(
+                DeadlineEntry(user_id=user_id, task_id=task_id, due_date=due_date, is_open=is_open, is_urgent=is_urgent)
+                for user_id in users[task_id]
+            )
+        if due_date is not None and is_open:
+            bucket, next_transition_at = deadline_bucket(due_date, now)
+            deadlines.append(TaskDeadline(
+                task_id=task_id, due_date=due_date, bucket=bucket, next_transition_at=next_transition_at, changed_at=now,
+            ))
+
+    with transaction.atomic():
+        old = {
+            task_id: (bucket, changed_at) for task_id, bucket, changed_at in
+            TaskDeadline.objects.select_for_update().filter(task_id__in=task_ids).values_list('task_id', 'bucket', 'changed_at')
+        }
+        for deadline in deadlines:
+            if deadline.task_id in old and old[deadline.task_id][0] == deadline.bucket:
+                deadline.changed_at = old[deadline.task_id][1]  # Корзина не изменилась
+        DeadlineEntry.objects.filter(task_id__in=task_ids).delete()
+        DeadlineEntry.objects.bulk_create(entries, ignore_conflicts=True)  # Параллельный пересчет той же задачи
+        TaskDeadline.objects.filter(task_id__in=set(old) - {deadline.task_id for deadline in deadlines}).delete()
+        TaskDeadline.objects.bulk_create(
+            deadlines, update_conflicts=True, unique_fields=['task'],
+            update_fields=['due_date', 'bucket', 'next_transition_at', 'changed_at'],
+        )
+        if events:
+            old_buckets = {task_id: bucket or None for task_id, (bucket, _) in old.items()}
+            new = {deadline.task_id: deadline for deadline in deadlines}
+            _send_transitions([
+                DeadlineTransition(
+                    task_id, getattr(new.get(task_id), 'due_date', None), old_buckets.get(task_id),
+                    getattr(new.get(task_id), 'bucket', None), users.get(task_id, []),
+                )
+                for task_id in sorted(set(old) | set(new))
+                if old.get(task_id, (None,))[0] != ''  # Строка из миграции: прежняя корзина неизвестна
+                and old_buckets.get(task_id) != getattr(new.get(task_id), 'bucket', None)
+            ])
+
+
+def delete_deadlines(task_ids):
+    """Перед удалением задач мимо ORM (_raw_delete): каскад Django их строки сроков не удалит"""
+    DeadlineEntry.objects.filter(task_id__in=task_ids).delete()
+    TaskDeadline.objects.filter(task_id__in=task_ids).delete()
+
+
+def advance_deadlines(now=None, limit=SCHEDULER_BATCH_SIZE):
+    """
+    Планировщик: переводим в следующую корзину сроки, время перехода которых наступило
+    (индекс по next_transition_at). Параллельные запуски берут разные строки. Возвращает число строк.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        deadlines = list(
+            TaskDeadline.objects.select_for_update(skip_locked=True)
+            .filter(next_transition_at__lte=now).order_by('next_transition_at')[:limit]
+        )
+        moved = []
+        for deadline in deadlines:
+            old_bucket = deadline.bucket
+            deadline.bucket, deadline.next_transition_at = deadline_bucket(deadline.due_date, now)
+            if deadline.bucket != old_bucket:
+                deadline.changed_at = now
+                if old_bucket:  # Пустая корзина - строка из миграции, рассчитывается впервые
+                    moved.append((deadline, old_bucket))
+        TaskDeadline.objects.bulk_create(  # INSERT ... ON CONFLICT вместо bulk_update с CASE на каждую строку
+            deadlines, update_conflicts=True, unique_fields=['task'],
+            update_fields=['bucket', 'next_transition_at', 'changed_at'],
+        )
+
+        users = {}
+        for user_id, task_id in DeadlineEntry.objects.filter(
+            task_id__in=[deadline.task_id for deadline, _ in moved]
+        ).order_by('user_id').values_list('user_id', 'task_id'):
+            users.setdefault(task_id, []).append(user_id)
+        _send_transitions([
+            DeadlineTransition(deadline.task_id, deadline.due_date, old_bucket, deadline.bucket, users.get(deadline.task_id, []))
+            for deadline, old_bucket in moved
+        ])
+    return len(deadlines)
+
+
+def schedule_deadline_sync(task_ids=(), project_ids=()):
+    """Пересчитываем сроки после коммита текущей транзакции (или сразу, если ее нет)"""
+    pending = getattr(_state, 'pending', None)
+    if pending is not None:  # Внутри deferred_deadlines() только запоминаем задачи и проекты
+        pending[0].update(task_ids)
+        pending[1].update(project_ids)
+        return
+    task_ids, project_ids = set(task_ids), set(project_ids)
+    if task_ids or project_ids:
+        transaction.on_commit(lambda: sync_deadlines(task_ids, project_ids))
+
+
+@contextmanager
+def deferred_deadlines():
+    """Массовые операции: сроки пересчитываются один раз на выходе из блока, а не на каждую задачу"""
+    if getattr(_state, 'pending', None) is not None:  # Вложенный блок - пересчитает внешний
+        yield
+        return
+    _state.pending = (set(), set())
+    try:
+        yield
+    finally:
+        (task_ids, project_ids), _state.pending = _state.pending, None
+        schedule_deadline_sync(task_ids, project_ids)
@@ -0,0 +1,85 @@
+import csv  # Запись CSV построчно
+from itertools import islice  # Нарезка потока строк на пачки
+
+import orjson  # Быстрое кодирование строк NDJSON
+from rest_framework.utils.encoders import JSONEncoder  # Кодирование нестандартных типов как в DRF
+
+from .history import history_diffs  # Изменения полей между соседними записями истории
+from .models import Task
+from .renderers import ORJSON_OPTIONS
+
+EXPORT_CHUNK_SIZE = 2000  # Строк на одну выборку из серверного курсора (и на один запрос тегов и истории)
+EXPORT_CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',  # Одна задача - одна строка JSON
+    'csv': 'text/csv; charset=utf-8',
+}
+# Поля CSV по умолчанию (без ?fields=): плоские колонки без дублирования id и вложенных объектов
+CSV_DEFAULT_FIELDS = (
+    'id', 'title', 'description', 'project', 'project_name', 'priority_name', 'status_name',
+    'assigned_to_username', 'due_date', 'tags_details', 'created_at', 'updated_at', 'created_by_username',
+)
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _history_by_task(task_ids):
+    """Изменения задач пачки (новые сверху): {task_id: [...]} за несколько запросов на всю пачку"""
+    records = list(
+        Task.history.filter(id__in=task_ids).select_related('history_user').order_by('id', '-history_date', '-history_id')
+    )
+    history = {}
+    for record, item in zip(records, history_diffs(records)):
+        history.setdefault(record.id, []).append(item)
+    return history
+
+
+def iter_task_rows(rows, queryset, with_history=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Задачи в формате TaskRows (как в API) пачками: строки читаются серверным курсором
+    (iterator), теги и история запрашиваются на пачку, в памяти - не больше одной пачки.
+    """
+    values = rows.values(queryset).iterator(chunk_size=chunk_size)
+    for chunk in _chunks(values, chunk_size):
+        items = rows.render(chunk)
+        if with_history:
+            history = _history_by_task([item['id'] for item in items])
+            for item in items:
+                item['history'] = history.get(item['id'], [])
+        yield from items
+
+
+def ndjson_lines(items):
+    """Строки NDJSON (байты) в том же кодировании, что и JSON-ответы API"""
+    default = JSONEncoder().default
+    for item in items:
+        yield orjson.dumps(item, default=default, option=ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE)
+
+
+class _Echo:
+    """Псевдофайл для csv.writer: write() возвращает строку, а не пишет ее"""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    """Вложенные значения - в одну ячейку: справочники и теги по названию, списки через '; '"""
+    if value is None:
+        return ''
+    if isinstance(value, dict):
+        return value.get('name', value.get('id', ''))
+    if isinstance(value, list):
+        return '; '.join(str(_csv_value(item)) for item in value)
+    return value
+
+
+def csv_lines(items, fields):
+    """Строки CSV: заголовок и по строке на задачу (отсутствующие поля - пустые ячейки)"""
+    writer = csv.writer(_Echo())
+    yield '\ufeff' + writer.writerow(fields)  # BOM: Excel открывает UTF-8 с кириллицей без искажений
+    for item in items:
+        yield writer.writerow([_csv_value(item.get(name)) for name in fields])
@@ -0,0 +1,88 @@
+from rest_framework.exceptions import ValidationError  # Ошибка 400 для неизвестных полей
+from rest_framework.permissions import SAFE_METHODS  # Выборочные поля - только для чтения
+
+FIELDSET_PARAMS = ('fields', 'omit', 'expand')  # ?fields=id,title  ?omit=description  ?expand=tags
+
+
+def _split(value):
+    return [part.strip() for part in value.split(',') if part.strip()] if value else []
+
+
+# Миксин для ViewSet: выборочные поля в ответе и в запросе к базе данных
+class SparseFieldsetMixin:
+    """
+    ?fields= оставляет в ответе только перечисленные поля, ?omit= убирает поля,
+    ?expand= добавляет к ?fields= связанные данные (например, expand=tags).
+    По выбранным полям сокращается и SQL: лишние JOIN (select_related), prefetch_related
+    и колонки (только нужные через only(), description не читается, если не запрошено).
+    Без параметров ответ прежний. Сериализатор должен поддерживать аргумент fields.
+    Если действие выводит упрощенный сериализатор (список), при ?fields= get_serializer_class()
+    должен возвращать полный (см. fields_requested()): выбирать можно любые поля ресурса.
+    """
+    fieldset_actions = ('list', 'retrieve')  # Для каких действий работают параметры
+    fieldset_expansions = {}  # ?expand=<имя> -> поля сериализатора
+    fieldset_columns = {}  # Поле сериализатора -> колонки модели (по умолчанию одноименная колонка)
+    fieldset_select_related = {}  # Поле сериализатора -> связь для select_related
+    fieldset_prefetch_related = {}  # Поле сериализатора -> связь для prefetch_related
+
+    def fields_requested(self):
+        """Запрошены конкретные поля (?fields=) - ответ строится по полному сериализатору"""
+        return (
+            self.request.method in SAFE_METHODS and self.action in self.fieldset_actions
+            and bool(_split(self.request.query_params.get('fields')))
+        )
+
+    def get_fieldset(self):
+        """Выбранные поля в порядке сериализатора или None (все поля)"""
+        if not hasattr(self, '_fieldset'):
+            self._fieldset = self._resolve_fieldset()
+        return self._fieldset
+
+    def _resolve_fieldset(self):
+        if self.request.method not in SAFE_METHODS or self.action not in self.fieldset_actions:
+            return None
+        fields, omit, expand = (_split(self.request.query_params.get(name)) for name in FIELDSET_PARAMS)
+        if not (fields or omit or expand):
+            return None
+
+        available = list(self.get_serializer_class().Meta.fields)
+        errors = {}
+        for param, names in (('fields', fields), ('omit', omit)):
+            unknown = [name for name in names if name not in available]
+            if unknown:
+                errors[param] = f'Неизвестные поля: {", ".join(unknown)}'
+        unknown = [name for name in expand if name not in self.fieldset_expansions and name not in available]
+        if unknown:
+            errors['expand'] = f'Неизвестные связи: {", ".join(unknown)}'
+        if errors:
+            raise ValidationError(errors)
+
+        selected = set(fields or available)
+        if fields:  # Без ?fields= и так выводятся все поля
+            for name in expand:
+                selected.update(self.fieldset_expansions.get(name, (name,)))
+        selected.difference_update(omit)
+        return [name for name in available if name in selected]
+
+    def apply_fieldset(self, queryset, select_related=(), prefetch_related=(), columns=()):
+        """JOIN, prefetch и колонки только для выбранных полей (columns - колонки, нужные помимо полей)"""
+        fieldset = self.get_fieldset()
+        if fieldset is None:
+            queryset = queryset.select_related(*select_related).prefetch_related(*prefetch_related)
+            if self.request.method in SAFE_METHODS:  # tsvector (заполняется триггером) в ответ не попадает
+                queryset = queryset.defer('search_vector')
+            return queryset
+        related = {self.fieldset_select_related[name] for name in fieldset if name in self.fieldset_select_related}
+        prefetch = [
+            lookup for lookup in prefetch_related
+            if any(self.fieldset_prefetch_related.get(name) == getattr(lookup, 'prefetch_to', lookup) for name in fieldset)
+        ]
+        columns = set(columns) | {column for name in fieldset for column in self.fieldset_columns.get(name, (name,))}
+        columns.discard('id')  # Первичный ключ выбирается всегда
+        return queryset.select_related(*sorted(related)).prefetch_related(*prefetch).only('id', *sorted(columns))
+
+    def get_serializer(self, *args, **kwargs):
+        fieldset = self.get_fieldset()
+        if fieldset is not None:
+            kwargs.setdefault('fields', fieldset)
+        return super().get_serializer(*args, **kwargs)
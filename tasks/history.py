@@ -0,0 +1,441 @@
+from contextlib import contextmanager  # Для контекстного менеджера deferred_history
+
+from asgiref.local import Local  # Хранилище, отдельное для каждого потока и asyncio-задачи
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async  # Middleware под ASGI
+from django.apps import apps  # Модель очереди берем лениво (этот модуль импортируется из models.py)
+from django.conf import settings  # Для проверки DEFERRED_HISTORY и SIMPLE_HISTORY_ENABLED
+from django.core.serializers.json import DjangoJSONEncoder  # Для сериализации записей в очередь
+from django.db import DEFAULT_DB_ALIAS, router, transaction  # Транзакции и соединения
+from django.db.models import OuterRef, Q, Subquery  # Поиск предыдущих записей истории одним запросом
+from django.db.models.fields.files import FieldFile  # Файлы в истории показываем по имени
+from django.utils import timezone  # Для работы с датами и временем
+from simple_history.models import HistoricalRecords  # Стандартная история изменений
+from simple_history import utils as history_utils  # Имена полей промежуточных таблиц m2m
+from simple_history.signals import (  # Сигналы simple_history отправляем так же, как при обычной записи
+    pre_create_historical_record, post_create_historical_record,
+    pre_create_historical_m2m_records, post_create_historical_m2m_records,
+)
+
+import datetime  # Для точной сериализации дат в очередь
+import json  # Записи очереди хранятся в JSON
+
+from .transactions import commit_pending  # Записи из откатившихся savepoint не пишутся
+
+_local = Local()  # Текущий буфер истории (если включен отложенный режим)
+
+
+# DjangoJSONEncoder обрезает время до миллисекунд, а история должна совпадать до микросекунд
+class HistoryJSONEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+# Буфер исторических записей, собранных за транзакцию
+class HistoryBuffer:
+    def __init__(self, using, queue=False):
+        self.using = using
+        self.queue = queue  # True - записи уходят в очередь HistoryQueueItem, а не сразу в таблицы истории
+        self.entries = []  # (историческая запись, исходный объект, снимки m2m, маркер on_commit)
+
+    def add(self, history_instance, instance, m2m_rows=()):
+        def marker():  # Пустой колбэк: Django удаляет его при откате savepoint, в котором был save()
+            pass
+
+        transaction.on_commit(marker, using=self.using)
+        self.entries.append((history_instance, instance, m2m_rows, marker))
+
+    def _alive_entries(self):
+        """Записи, чьи изменения не откатились вместе с вложенным savepoint"""
+        return [entry[:3] for entry in self.entries if commit_pending(entry[3], self.using)]
+
+    def flush(self):
+        """Пишем всю накопленную историю: по одному INSERT на модель, внутри той же транзакции"""
+        entries = self._alive_entries()
+        self.entries = []
+        by_model = {}
+        for record, instance, m2m_rows in entries:
+            by_model.setdefault(type(record), []).append((record, instance, m2m_rows))
+
+        for history_model, model_entries in by_model.items():
+            if self.queue:
+                enqueue_history(history_model, model_entries, self.using)
+                continue
+            history_model.objects.using(self.using).bulk_create([record for record, _, _ in model_entries])
+            self._flush_m2m(model_entries)
+            for record, instance, _ in model_entries:
+                post_create_historical_record.send(
+                    sender=history_model,
+                    instance=instance,
+                    history_instance=record,
+                    history_date=record.history_date,
+                    history_user=record.history_user,
+                    history_change_reason=record.history_change_reason,
+                    using=self.using,
+                )
+
+    def _flush_m2m(self, model_entries):
+        """Снимки m2m (теги задачи) - тоже одним INSERT на модель, после получения history_id"""
+        by_model = {}
+        for _, _, m2m_rows in model_entries:
+            for _, m2m_history_model, rows in m2m_rows:
+                by_model.setdefault(m2m_history_model, []).extend(rows)
+        for m2m_history_model, rows in by_model.items():
+            for row in rows:
+                row.history_id = row.history.pk  # Запись истории получила pk только при bulk_create
+            m2m_history_model.objects.using(self.using).bulk_create(rows)
+        for record, instance, m2m_rows in model_entries:
+            for field, m2m_history_model, rows in m2m_rows:
+                post_create_historical_m2m_records.send(
+                    sender=m2m_history_model,
+                    created_rows=rows,
+                    history_instance=record,
+                    instance=instance,
+                    field=field,
+                )
+
+
+def current_buffer():
+    return getattr(_local, 'buffer', None)
+
+
+@contextmanager
+def deferred_history(using=DEFAULT_DB_ALIAS, queue=False):
+    """
+    История изменений внутри блока копится в памяти и записывается одним bulk_create
+    на модель перед коммитом той же транзакции: при откате или падении процесса
+    пропадают и данные, и история - расхождений не бывает.
+    queue=True - записи откладываются в очередь (для больших импортов), ее разбирает
+    команда process_history_queue.
+    """
+    if current_buffer() is not None:  # Вложенный блок пишет в буфер внешнего
+        yield current_buffer()
+        return
+    buffer = HistoryBuffer(using, queue=queue)
+    _local.buffer = buffer
+    try:
+        with transaction.atomic(using=using):
+            yield buffer
+            buffer.flush()  # До коммита - история фиксируется вместе с данными
+    finally:
+        _local.buffer = None
+
+
+# HistoricalRecords, который умеет откладывать запись истории в буфер
+class DeferredHistoricalRecords(HistoricalRecords):
+    def create_historical_record(self, instance, history_type, using=None):
+        buffer = current_buffer()
+        using = using if self.use_base_model_db else None
+        if buffer is None or (using or DEFAULT_DB_ALIAS) != buffer.using:
+            return super().create_historical_record(instance, history_type, using=using)
+
+        # Та же запись, что строит simple_history, только без save() - значения берутся в момент изменения
+        history_date = getattr(instance, '_history_date', timezone.now())
+        history_user = self.get_history_user(instance)
+        history_change_reason = self.get_change_reason_for_object(instance, history_type, using)
+        manager = getattr(instance, self.manager_name)
+
+        attrs = {field.attname: getattr(instance, field.attname) for field in self.fields_included(instance)}
+        if getattr(manager.model, 'history_relation', None) is not None:
+            attrs['history_relation'] = instance
+
+        history_instance = manager.model(
+            history_date=history_date,
+            history_type=history_type,
+            history_user=history_user,
+            history_change_reason=history_change_reason,
+            **attrs,
+        )
+        pre_create_historical_record.send(
+            sender=manager.model,
+            instance=instance,
+            history_date=history_date,
+            history_user=history_user,
+            history_change_reason=history_change_reason,
+            history_instance=history_instance,
+            using=using,
+        )
+        buffer.add(history_instance, instance, self._m2m_snapshot(history_instance, instance))
+
+    def _m2m_snapshot(self, history_instance, instance):
+        """Состояние m2m на момент изменения (сами строки вставляются при сбросе буфера)"""
+        snapshot = []
+        for field in history_instance._history_m2m_fields:
+            m2m_history_model = self.m2m_models[field]
+            through_model = getattr(instance, field.name).through
+            through_field_name = history_utils.get_m2m_field_name(field)
+            attnames = [through_field.attname for through_field in through_model._meta.fields]
+            rows = [
+                m2m_history_model(history=history_instance, **row)
+                for row in through_model.objects.filter(**{through_field_name: instance}).values(*attnames)
+            ]
+            pre_create_historical_m2m_records.send(
+                sender=m2m_history_model,
+                rows=rows,
+                history_instance=history_instance,
+                instance=instance,
+                field=field,
+            )
+            snapshot.append((field, m2m_history_model, rows))
+        return snapshot
+
+
+def bulk_history(objects, history_type, user):
+    """
+    История для пачки объектов после bulk_create/update()/удаления: записи и снимки m2m
+    собираются без запросов на каждый объект (снимки m2m - один запрос на поле) и пишутся
+    через буфер deferred_history - одним INSERT на модель или в очередь, если буфер открыт с queue=True.
+    """
+    if not objects or not getattr(settings, 'SIMPLE_HISTORY_ENABLED', True):
+        return
+    model = type(objects[0])
+    history_model = model.history.model
+    history_user = user if user is not None and user.is_authenticated else None
+    now = timezone.now()
+    snapshots = {}
+    for field in history_model._history_m2m_fields:
+        through_model = getattr(model, field.name).through
+        source = through_model._meta.get_field(history_utils.get_m2m_field_name(field)).attname  # task_id
+        attnames = [through_field.attname for through_field in through_model._meta.fields]
+        rows = through_model.objects.filter(**{f'{source}__in': [obj.pk for obj in objects]}).values(*attnames)
+        snapshots[field] = {}
+        for row in rows:
+            snapshots[field].setdefault(row[source], []).append(row)
+
+    with deferred_history() as buffer:
+        for obj in objects:
+            record = history_model(
+                history_date=now,
+                history_user=history_user,
+                history_type=history_type,  # +, ~, -
+                **{field.attname: getattr(obj, field.attname) for field in history_model.tracked_fields}
+            )
+            m2m_rows = []
+            for field, by_object in snapshots.items():
+                m2m_history_model = getattr(history_model, field.name).model
+                m2m_rows.append((field, m2m_history_model, [
+                    m2m_history_model(history=record, **row) for row in by_object.get(obj.pk, [])
+                ]))
+            buffer.add(record, obj, m2m_rows)
+
+
+M2M_PAYLOAD_KEY = '_m2m'  # Ключ со снимками m2m в записи очереди
+
+
+def _row_values(model, obj, skip=()):
+    """Значения полей строки для JSON (FieldFile -> имя файла)"""
+    return {
+        field.attname: field.get_prep_value(getattr(obj, field.attname))
+        for field in model._meta.concrete_fields
+        if not field.primary_key and field.attname not in skip
+    }
+
+
+def enqueue_history(history_model, entries, using=DEFAULT_DB_ALIAS):
+    """Кладем пачку исторических записей (вместе со снимками m2m) в очередь одной строкой"""
+    HistoryQueueItem = apps.get_model('tasks', 'HistoryQueueItem')
+    payload = []
+    for record, _, m2m_rows in entries:
+        row = _row_values(history_model, record)
+        if m2m_rows:
+            row[M2M_PAYLOAD_KEY] = {
+                m2m_history_model._meta.label: [_row_values(m2m_history_model, item, skip=('history_id',)) for item in rows]
+                for _, m2m_history_model, rows in m2m_rows
+            }
+        payload.append(row)
+    HistoryQueueItem.objects.using(using).create(
+        model=history_model._meta.label,
+        payload=json.loads(json.dumps(payload, cls=HistoryJSONEncoder)),
+        size=len(entries),
+    )
+
+
+def _from_payload(model, row, **extra):
+    fields = {field.attname: field for field in model._meta.concrete_fields}
+    return model(**{name: fields[name].to_python(value) for name, value in row.items()}, **extra)
+
+
+def process_history_queue(limit=100, using=None):
+    """Переносим записи из очереди в таблицы истории. Возвращает количество записей истории"""
+    HistoryQueueItem = apps.get_model('tasks', 'HistoryQueueItem')
+    using = using or router.db_for_write(HistoryQueueItem)
+    written = 0
+    with transaction.atomic(using=using):
+        items = list(
+            HistoryQueueItem.objects.using(using).select_for_update(skip_locked=True).order_by('pk')[:limit]
+        )
+        for item in items:
+            history_model = apps.get_model(item.model)
+            m2m_payloads = [row.pop(M2M_PAYLOAD_KEY, {}) for row in item.payload]
+            records = history_model.objects.using(using).bulk_create(
+                [_from_payload(history_model, row) for row in item.payload]
+            )
+            m2m_by_model = {}
+            for record, m2m_payload in zip(records, m2m_payloads):
+                for label, rows in m2m_payload.items():
+                    m2m_history_model = apps.get_model(label)
+                    m2m_by_model.setdefault(m2m_history_model, []).extend(
+                        _from_payload(m2m_history_model, row, history_id=record.pk) for row in rows
+                    )
+            for m2m_history_model, rows in m2m_by_model.items():
+                m2m_history_model.objects.using(using).bulk_create(rows)
+            written += len(records)
+        HistoryQueueItem.objects.using(using).filter(pk__in=[item.pk for item in items]).delete()
+    return written
+
+
+HISTORY_DIFF_EXCLUDED = ('id', 'created_at', 'updated_at')  # Служебные поля не показываем в изменениях
+
+
+def _previous_records(model, records):
+    """Предыдущие записи истории (того же объекта) для страницы - одним запросом"""
+    previous = model.objects.filter(
+        Q(history_date__lt=OuterRef('history_date'))
+        | Q(history_date=OuterRef('history_date'), history_id__lt=OuterRef('history_id')),
+        id=OuterRef('id'),
+    ).order_by('-history_date', '-history_id').values('history_id')[:1]
+    previous_ids = model.objects.filter(
+        history_id__in=[record.history_id for record in records]
+    ).annotate(previous_id=Subquery(previous)).values('previous_id')
+    return list(model.objects.filter(history_id__in=previous_ids))
+
+
+def _m2m_snapshots(model, records):
+    """Наборы связанных id (например, тегов) в каждой записи: {поле: {history_id: set(id)}}"""
+    snapshots = {}
+    for field in model._history_m2m_fields:
+        m2m_history_model = getattr(model, field.name).model
+        target = history_utils.get_m2m_reverse_field_name(field) + '_id'
+        rows = m2m_history_model.objects.filter(
+            history_id__in=[record.history_id for record in records]
+        ).values_list('history_id', target)
+        snapshot = snapshots[field] = {record.history_id: set() for record in records}
+        for history_id, target_id in rows:
+            snapshot[history_id].add(target_id)
+    return snapshots
+
+
+def _names(related_model, ids):
+    """Названия связанных объектов: справочники - из кэша, остальное - одним запросом на модель"""
+    from .reference import reference_data  # reference.py импортирует модели
+
+    ids = {pk for pk in ids if pk is not None}
+    if not ids:
+        return {}
+    lookup = {'Priority': reference_data.priority, 'Status': reference_data.status}.get(related_model.__name__)
+    if lookup is not None and related_model._meta.app_label == 'tasks':
+        return {pk: lookup(pk)['name'] for pk in ids if lookup(pk) is not None}
+    objects = related_model._default_manager.in_bulk(ids)
+    return {pk: getattr(obj, 'name', None) or str(obj) for pk, obj in objects.items()}  # Теги и проекты - по названию
+
+
+def _plain(value):
+    return (value.name or None) if isinstance(value, FieldFile) else value
+
+
+def history_diffs(records):
+    """
+    Изменения между соседними записями истории: для каждой записи только поля,
+    которые отличаются от предыдущей записи того же объекта (для создания - все заполненные).
+    Число запросов не зависит от количества записей.
+    """
+    records = list(records)
+    if not records:
+        return []
+    model = type(records[0])
+    previous_records = _previous_records(model, records)
+    m2m_snapshots = _m2m_snapshots(model, records + previous_records)
+
+    # Предыдущая запись: ближайшая более ранняя запись того же объекта среди страницы и найденных
+    timeline = {}
+    for record in sorted({r.history_id: r for r in records + previous_records}.values(),
+                         key=lambda r: (r.history_date, r.history_id)):
+        timeline.setdefault(record.id, []).append(record)
+    previous_of = {}
+    for object_records in timeline.values():
+        for older, newer in zip([None] + object_records, object_records):
+            previous_of[newer.history_id] = older
+
+    fields = [field for field in model.tracked_fields if field.attname not in HISTORY_DIFF_EXCLUDED]
+    raw = []
+    related_ids = {}
+    for record in records:
+        previous = previous_of[record.history_id]
+        changes = []
+        if record.history_type != '-':  # Удаление - последнее состояние уже есть в предыдущей записи
+            for field in fields:
+                new = _plain(getattr(record, field.attname))
+                old = _plain(getattr(previous, field.attname)) if previous is not None else None
+                if new == old or (previous is None and new == ''):  # Пустая строка (например, без изображения) при создании
+                    continue
+                changes.append((field, old, new))
+                if field.is_relation:
+                    related_ids.setdefault(field.related_model, set()).update((old, new))
+            for field, snapshot in m2m_snapshots.items():
+                new = snapshot[record.history_id]
+                old = snapshot[previous.history_id] if previous is not None else set()
+                if new != old:
+                    changes.append((field, old, new))
+                    related_ids.setdefault(field.related_model, set()).update(old | new)
+        raw.append((record, changes))
+
+    names = {related_model: _names(related_model, ids) for related_model, ids in related_ids.items()}
+
+    def related(field, pk):
+        return None if pk is None else {'id': pk, 'name': names[field.related_model].get(pk)}
+
+    result = []
+    for record, changes in raw:
+        items = []
+        for field, old, new in changes:
+            item = {'field': field.name, 'label': str(field.verbose_name)}
+            if field.many_to_many:
+                item['added'] = [related(field, pk) for pk in sorted(new - old)]
+                item['removed'] = [related(field, pk) for pk in sorted(old - new)]
+            elif field.is_relation:
+                item['old'], item['new'] = related(field, old), related(field, new)
+            else:
+                item['old'], item['new'] = old, new
+            items.append(item)
+        result.append({
+            'id': record.history_id,
+            'history_date': record.history_date,
+            'history_user': record.history_user.username if record.history_user else None,
+            'history_type': record.history_type,  # +, ~, -
+            'change_type_display': record.get_history_type_display(),  # Created, Changed, Deleted
+            'history_change_reason': record.history_change_reason,
+            'changes': items,
+        })
+    return result
+
+
+# Middleware: отложенная история для изменяющих запросов (включается настройкой DEFERRED_HISTORY)
+class DeferredHistoryMiddleware:
+    unsafe_methods = ('POST', 'PUT', 'PATCH', 'DELETE')
+    sync_capable = True
+    async_capable = True  # Под ASGI читающие запросы остаются асинхронными
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not getattr(settings, 'DEFERRED_HISTORY', False) or request.method not in self.unsafe_methods:
+            return self.get_response(request)
+        with deferred_history():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'DEFERRED_HISTORY', False) or request.method not in self.unsafe_methods:
+            return await self.get_response(request)
+        # Транзакция буфера открывается на подключении потока: синхронный view выполнится в этом же потоке
+        return await sync_to_async(self._deferred)(request)
+
+    def _deferred(self, request):
+        with deferred_history():
+            return async_to_sync(self.get_response)(request)
@@ -0,0 +1,255 @@
+import io  # Варианты кодируются в память, затем сохраняются в хранилище
+import logging  # Изображения, которые не удалось обработать
+import posixpath  # Имена файлов в хранилище - всегда через /
+import time  # Возраст файлов при сборке мусора
+
+from django.conf import settings  # MEDIA_GC_GRACE
+from django.core.files.base import ContentFile, File
+from django.db import transaction  # Варианты и событие о них - одной транзакцией
+from PIL import Image, ImageOps
+
+from .conditional import schedule_version_bump  # ETag ответов API с изображением
+from .models import IMAGE_PENDING, Project, Task
+from .push import record_changes  # Открытые страницы получат ссылки на уменьшенные копии
+from .storage import CONTENT_DIR, is_blob  # Файлы хранилища по хэшу содержимого
+
+logger = logging.getLogger('tasks.images')
+
+IMAGE_MODELS = (Project, Task)
+VARIANTS = {'thumb': 200, 'medium': 1024}  # Вариант -> наибольшая сторона в пикселях (меньшие изображения не увеличиваются)
+FORMATS = {  # Расширение -> параметры Pillow
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},  # Для клиентов без WebP
+}
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+THUMB = ('thumb', 'webp')  # Вариант для image_thumb в API и превью в админке
+IMAGE_ERRORS = (OSError, SyntaxError, ValueError, Image.DecompressionBombError)  # Битый, неизвестный или слишком большой файл
+
+
+def variant_name(source, variant, ext):
+    """Имя файла варианта рядом с оригиналом: tasks_images/photo.jpg -> tasks_images/photo.thumb.webp"""
+    root, _ = posixpath.splitext(source)
+    return f'{root}.{variant}.{EXTENSIONS[ext]}'
+
+
+def variant_files(variants):
+    """Имена всех файлов вариантов из значения image_variants"""
+    return [
+        name for variant in VARIANTS if isinstance(variants.get(variant), dict)
+        for name in (variants[variant].get(ext) for ext in FORMATS) if name
+    ]
+
+
+def ready_variants(variants, source):
+    """Варианты готовы и сделаны из текущего файла (иначе - пустой словарь)"""
+    if not variants or not source or variants.get('source') != source or 'error' in variants:
+        return {}
+    return {variant: variants[variant] for variant in VARIANTS if variant in variants}
+
+
+def variant_urls(storage, variants, source, request=None):
+    """
+    image_variants для API: {'thumb': {'width', 'height', 'webp', 'jpeg'}, ...} с абсолютными URL,
+    как у ImageField в DRF. Пока копии не готовы - пустой словарь
+    """
+    def url(name):
+        url = storage.url(name)
+        return request.build_absolute_uri(url) if request is not None else url
+
+    return {
+        variant: {'width': data['width'], 'height': data['height'], **{ext: url(data[ext]) for ext in FORMATS}}
+        for variant, data in ready_variants(variants, source).items()
+    }
+
+
+def thumb_url(storage, variants, source, request=None):
+    """URL уменьшенной копии в WebP или None, если ее еще нет"""
+    variant, ext = THUMB
+    name = ready_variants(variants, source).get(variant, {}).get(ext)
+    if name is None:
+        return None
+    url = storage.url(name)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def _prepare(image):
+    """Поворот по EXIF и перевод в RGB/RGBA (CMYK, палитры, 16-битные изображения)"""
+    image = ImageOps.exif_transpose(image)
+    icc_profile = image.info.get('icc_profile')
+    if image.mode == 'CMYK':  # Профиль CMYK к результату в RGB не подходит
+        icc_profile = None
+    has_alpha = image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+    return image, icc_profile
+
+
+def _encode(image, ext, icc_profile):
+    """Байты варианта: из метаданных остается только цветовой профиль (EXIF с геометкой и XMP не сохраняются)"""
+    if ext == 'jpeg' and image.mode == 'RGBA':  # JPEG без прозрачности - на белом фоне
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    options = dict(FORMATS[ext])
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    buffer = io.BytesIO()
+    image.save(buffer, **options)
+    return buffer.getvalue()
+
+
+def build_variants(field_file):
+    """
+    Уменьшенные копии файла ImageField в WebP и JPEG. В хранилище по хэшу содержимого копии -
+    такие же общие файлы, как оригиналы; в обычном хранилище они лежат рядом с оригиналом под
+    постоянными именами (variant_name), и повторная обработка перезаписывает файлы
+    """
+    storage, source = field_file.storage, field_file.name
+    with storage.open(source, 'rb') as file:
+        image = Image.open(file)
+        image.draft('RGB', (max(VARIANTS.values()),) * 2)  # JPEG декодируется сразу в уменьшенном масштабе
+        image, icc_profile = _prepare(image)
+    variants = {'source': source}
+    for variant, size in sorted(VARIANTS.items(), key=lambda item: -item[1]):  # От большего к меньшему
+        image.thumbnail((size, size), Image.LANCZOS)  # Меньше size изображение не увеличивается
+        data = {'width': image.width, 'height': image.height}
+        for ext in FORMATS:
+            name = variant_name(source, variant, ext)
+            if not getattr(storage, 'content_addressed', False):  # В хранилище по хэшу имя задаст содержимое
+                storage.delete(name)  # Иначе хранилище сохранит файл под другим именем
+            data[ext] = storage.save(name, ContentFile(_encode(image, ext, icc_profile)))
+        variants[variant] = data
+    return variants
+
+
+def referenced(names):
+    """
+    Какие из файлов еще нужны проектам или задачам. Счетчик ссылок на файл не хранится
+    отдельно, а считается по частичным индексам *_image_idx - он не расходится с данными
+    при массовых операциях, удалении каскадом и загрузке мимо ORM
+    """
+    names = list(names)
+    found = set()
+    for model in IMAGE_MODELS:
+        found.update(model.objects.filter(image__in=names).values_list('image', flat=True).distinct())
+    return found
+
+
+def release_images(storage, images):
+    """
+    Изображения заменены или объекты удалены: images - пары (файл, image_variants). После коммита
+    в хранилище по хэшу удаляются оригиналы, на которые больше никто не ссылается (уменьшенные
+    копии бывают общими у разных оригиналов - их удаляет collect_media). В обычном хранилище
+    удаляются только копии: оригиналы не удалялись и раньше
+    """
+    content_addressed = getattr(storage, 'content_addressed', False)
+    if content_addressed:
+        names = {source for source, _ in images if is_blob(source)}
+    else:
+        names = {name for _, variants in images if variants for name in variant_files(variants)}
+    if not names:
+        return
+
+    def delete():
+        for name in names - referenced(names) if content_addressed else names:
+            if content_addressed and not storage.is_stale(name):
+                continue  # Тот же файл только что загружен снова - ссылка на него появится после коммита
+            try:
+                storage.delete(name)
+            except OSError:
+                logger.warning('Не удалось удалить файл %s', name)
+    transaction.on_commit(delete)
+
+
+def shared_variants(source):
+    """Готовые копии того же файла у другого объекта (одинаковые загрузки хранятся одним файлом)"""
+    for model in IMAGE_MODELS:
+        variants = model.objects.filter(image=source, image_variants__source=source).exclude(
+            image_variants__has_key='error'
+        ).values_list('image_variants', flat=True).first()
+        if variants:
+            return variants
+    return None
+
+
+def collect_garbage(storage, grace=None, dry_run=False):
+    """
+    Удаляем файлы хранилища по хэшу, на которые не ссылается ни одно изображение и ни одна
+    уменьшенная копия и которые не трогали дольше grace секунд. Возвращает (файлов, байт)
+    """
+    used = set()
+    for model in IMAGE_MODELS:
+        rows = model.objects.filter(image__gt='').values_list('image', 'image_variants').iterator(chunk_size=2000)
+        for source, variants in rows:
+            used.add(source)
+            used.update(variant_files(variants or {}))
+    grace = getattr(settings, 'MEDIA_GC_GRACE', 600) if grace is None else grace
+    now = time.time()
+    count = size = 0
+    for name, mtime, file_size in storage.blobs():
+        if name in used or now - mtime <= grace:
+            continue
+        if not dry_run:
+            try:
+                storage.delete(name)
+            except OSError:
+                logger.warning('Не удалось удалить файл %s', name)
+                continue
+        count += 1
+        size += file_size
+    return count, size
+
+
+def adopt_legacy(storage, model):
+    """
+    Изображения, загруженные до хранилища по хэшу, переносим в него: одинаковые файлы
+    становятся одним, копии делаются заново. Возвращает (перенесено, не найдено)
+    """
+    moved, missing, old_names = 0, 0, set()
+    rows = model.objects.filter(image__gt='').exclude(image__startswith=f'{CONTENT_DIR}/').values_list('pk', 'image', 'image_variants')
+    for pk, name, variants in rows.iterator(chunk_size=500):
+        try:
+            with storage.open(name, 'rb') as file:
+                blob = storage.save(name, File(file))
+        except OSError:
+            missing += 1
+            continue
+        if model.objects.filter(pk=pk, image=name).update(image=blob, image_variants={}):  # Копии сделает process_image_variants
+            moved += 1
+            old_names.add(name)
+            old_names.update(variant_files(variants or {}))
+    for name in old_names - referenced(old_names):
+        storage.delete(name)
+    if moved:
+        schedule_version_bump(model._meta.label)
+    return moved, missing
+
+
+def pending(model):
+    """Объекты с изображением, для которого еще нет вариантов (частичный индекс *_image_pending_idx)"""
+    return model.objects.filter(IMAGE_PENDING).order_by('id')
+
+
+def process_next(model):
+    """
+    Обрабатываем следующий объект очереди или возвращаем None. Pillow работает вне транзакции:
+    строка не блокируется, и сохранение объекта пользователем не ждет обработки. Варианты
+    записываются, только если изображение за это время не заменили и копий еще нет; иначе
+    сделанные файлы остаются без ссылок (их удалит collect_media), а объект обработается заново.
+    Параллельные обработчики изредка делают копии одного файла дважды - записываются одни
+    """
+    obj = pending(model).first()
+    if obj is None:
+        return None
+    source = obj.image.name
+    try:
+        variants = shared_variants(source) or build_variants(obj.image)
+    except IMAGE_ERRORS as exc:  # Повторять бесполезно - запоминаем ошибку, оригинал остается как есть
+        logger.warning('%s #%s: не удалось обработать %s: %s', model._meta.verbose_name, obj.pk, source, exc)
+        variants = {'source': source, 'error': str(exc) or exc.__class__.__name__}
+    obj.image_variants = variants
+    with transaction.atomic():
+        # Без save(): история и updated_at не меняются
+        if model.objects.filter(IMAGE_PENDING, pk=obj.pk, image=source).update(image_variants=variants):
+            schedule_version_bump(model._meta.label)
+            record_changes([obj], 'updated', fields=['image_thumb', 'image_variants'])
+    return obj
@@ -0,0 +1,459 @@
+import csv  # Потоковое чтение CSV
+import datetime  # Ячейки XLSX с датами приходят объектами datetime
+import re  # Разбор списка тегов
+from itertools import islice  # Нарезка строк файла на пачки
+from pathlib import Path  # Расширение файла определяет формат
+
+from django.contrib.auth.models import User  # Модель пользователя
+from django.db import IntegrityError, transaction  # Захват задания из очереди и теги, созданные параллельно
+from django.db.models import Q  # Поиск пользователей по имени или id
+from django.utils import timezone  # Для работы с датами и временем
+from django.utils.dateparse import parse_datetime  # Даты в ISO 8601
+from import_export.formats import base_formats  # Те же форматы файлов, что в импорте админки
+
+from .conditional import schedule_version_bump  # Новые ETag после импорта
+from .counters import schedule_counters_refresh  # Пересчет счетчиков проектов
+from .deadlines import schedule_deadline_sync  # Таблицы сроков задач
+from .push import record_changes  # События для открытых страниц
+from .history import bulk_history, deferred_history, process_history_queue  # История пачкой через очередь
+from .models import ImportJob, Project, Tag, Task
+from .reference import reference_data  # Приоритеты и статусы без запросов к БД
+
+IMPORT_CHUNK_SIZE = 1000  # Строк файла на одну транзакцию
+MAX_STORED_ERRORS = 100  # Сколько ошибок строк сохраняем в задании (остальные только считаем)
+NO_DUE_DATE = 'Без срока'  # Так TaskResource выгружает задачи без срока
+DATE_FORMATS = ('%d-%m-%Y %H:%M', '%d.%m.%Y %H:%M', '%d.%m.%Y', '%d-%m-%Y')  # Формат выгрузки TaskResource и привычные варианты
+TaskTag = Task.tags.through  # Промежуточная таблица задача-тег
+
+
+class ImportFailed(Exception):
+    """Файл нельзя импортировать целиком (неизвестный формат)"""
+
+
+def read_rows(path):
+    """(количество строк, итератор словарей по строкам): CSV читается потоково, остальные форматы - через tablib"""
+    path = Path(path)
+    extension = path.suffix.lower().lstrip('.')
+    if extension == 'csv':
+        with open(path, newline='', encoding='utf-8-sig') as file:
+            total = max(sum(1 for _ in csv.reader(file)) - 1, 0)  # Без заголовка
+
+        def rows():
+            with open(path, newline='', encoding='utf-8-sig') as file:
+                yield from csv.DictReader(file)
+        return total, rows()
+
+    formats = {file_format().get_extension(): file_format() for file_format in base_formats.DEFAULT_FORMATS}
+    file_format = formats.get(extension)
+    if file_format is None or not file_format.is_available() or not file_format.can_import():
+        raise ImportFailed(f'Формат файла не поддерживается: {path.name}')
+    if file_format.is_binary():
+        with open(path, 'rb') as file:
+            dataset = file_format.create_dataset(file.read())
+    else:
+        with open(path, encoding='utf-8-sig') as file:
+            dataset = file_format.create_dataset(file.read())
+    return len(dataset), iter(dataset.dict)
+
+
+def _text(value):
+    """Значение ячейки: строка без пробелов по краям (числа из XLSX - без .0), пустое -> None"""
+    if value is None or isinstance(value, datetime.datetime):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    value = str(value).strip()
+    return value or None
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_date(value):
+    """Срок задачи из ячейки: ISO 8601, формат выгрузки TaskResource или объект datetime"""
+    if value is None or value == NO_DUE_DATE:
+        return None
+    parsed = value if isinstance(value, datetime.datetime) else parse_datetime(value)
+    for date_format in DATE_FORMATS:
+        if parsed is not None:
+            break
+        try:
+            parsed = datetime.datetime.strptime(value, date_format)
+        except ValueError:
+            pass
+    if parsed is None:
+        raise ValueError(value)
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+def _users(values):
+    """Пользователи по имени (или id) одним запросом: {значение ячейки: id}"""
+    values = {value for value in values if value}
+    if not values:
+        return {}
+    ids = {_int(value) for value in values} - {None}
+    found = {}
+    for pk, username in User.objects.filter(Q(username__in=values) | Q(pk__in=ids)).values_list('pk', 'username'):
+        found[username] = pk
+        found.setdefault(str(pk), pk)  # Имя пользователя важнее совпадения с чужим id
+    return found
+
+
+# Базовый класс массового импорта: пачки строк, поиск связей на всю пачку, bulk_create/bulk_update
+class BulkImporter:
+    """
+    Строки файла обрабатываются пачками по chunk_size, каждая пачка - в своей транзакции:
+    связанные объекты ищутся одним запросом на модель, объекты пишутся bulk_create/bulk_update,
+    история - пачкой через очередь (process_history_queue). Ошибочные строки пропускаются
+    и попадают в errors с номером строки файла; progress(importer) вызывается после каждой пачки.
+    """
+    model = None
+    columns = {}  # Поле импорта -> заголовки колонок файла (подходит первый найденный)
+
+    def __init__(self, user=None, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+        self.user = user  # От чьего имени импорт: история, created_by, владелец новых проектов и тегов
+        self.chunk_size = max(chunk_size, 1)
+        self.progress = progress
+        self.processed = self.created = self.updated = self.error_count = 0
+        self.errors = []
+
+    def run(self, rows):
+        numbered = enumerate(rows, start=2)  # Номер строки в файле (первая - заголовок)
+        while chunk := list(islice(numbered, self.chunk_size)):
+            with deferred_history(queue=True):  # Одна транзакция на пачку, история уходит в очередь одной строкой
+                self.import_chunk([(line, self.parse(row)) for line, row in chunk])
+            self.processed += len(chunk)
+            if self.progress is not None:
+                self.progress(self)
+        return self
+
+    def parse(self, row):
+        """Значения известных колонок строки (колонки, которых нет в файле, не попадают в результат)"""
+        values = {}
+        for name, headers in self.columns.items():
+            for header in headers:
+                if header in row:
+                    values[name] = _text(row[header])
+                    break
+        return values
+
+    def add_error(self, line, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_STORED_ERRORS:
+            self.errors.append({'row': line, 'errors': errors})
+
+    def save(self, created, updated, update_fields, save_related=None):
+        """
+        bulk_create новых и bulk_update измененных объектов, история - одной пачкой на тип изменения.
+        save_related() сохраняет m2m до записи истории, чтобы они попали в ее снимок.
+        """
+        self.model.objects.bulk_create(created)
+        if updated:
+            now = timezone.now()
+            for obj in updated:
+                obj.updated_at = now  # bulk_update не заполняет auto_now
+            self.model.objects.bulk_update(updated, sorted(set(update_fields) | {'updated_at'}))
+        if save_related is not None:
+            save_related()
+        bulk_history(created, '+', self.user)
+        bulk_history(updated, '~', self.user)
+        record_changes(created, 'created')
+        record_changes(updated, 'updated')
+        self.created += len(created)
+        self.updated += len(updated)
+
+    def import_chunk(self, rows):
+        raise NotImplementedError
+
+
+# Импорт проектов (колонки ProjectResource: id, name, description, owner__username)
+class ProjectImporter(BulkImporter):
+    model = Project
+    columns = {
+        'id': ('id',),
+        'name': ('name',),
+        'description': ('description',),
+        'owner': ('owner__username', 'owner_username', 'owner'),
+    }
+
+    def import_chunk(self, rows):
+        existing = Project.objects.in_bulk({_int(values.get('id')) for _, values in rows} - {None})
+        owners = _users(values.get('owner') for _, values in rows)
+        created, updated, update_fields = [], [], set()
+        for line, values in rows:
+            project = existing.get(_int(values.get('id')))
+            fields, errors = {}, {}
+            if 'name' in values or project is None:
+                if not values.get('name'):
+                    errors['name'] = 'Обязательное поле'
+                fields['name'] = values.get('name')
+            if 'description' in values:
+                fields['description'] = values['description']
+            if values.get('owner'):
+                fields['owner_id'] = owners.get(values['owner'])
+                if fields['owner_id'] is None:
+                    errors['owner'] = 'Пользователь не найден'
+            elif project is None:
+                if self.user is None:
+                    errors['owner'] = 'Обязательное поле'
+                fields['owner_id'] = getattr(self.user, 'pk', None)
+            if errors:
+                self.add_error(line, errors)
+                continue
+            if project is None:
+                created.append(Project(**fields))
+            else:
+                for name, value in fields.items():
+                    setattr(project, name, value)
+                update_fields.update(fields)
+                updated.append(project)
+        self.save(created, updated, update_fields)
+        if 'owner_id' in update_fields:  # Задачи проектов с новым владельцем видит другой пользователь
+            schedule_deadline_sync(project_ids={project.pk for project in updated})
+        schedule_version_bump(Project._meta.label)  # Сигналы post_save при массовых операциях не отправляются
+
+
+# Импорт задач (колонки TaskResource и API: title, project__name, priority__name, status, assigned_to__username, ...)
+class TaskImporter(BulkImporter):
+    model = Task
+    columns = {
+        'id': ('id',),
+        'title': ('title',),
+        'description': ('description',),
+        'project': ('project', 'project_id'),  # id проекта
+        'project_name': ('project__name', 'project_name'),  # или название
+        'priority': ('priority__name', 'priority_name', 'priority'),  # Название или id
+        'status': ('status__name', 'status_name', 'status'),
+        'assigned_to': ('assigned_to__username', 'assigned_to_username', 'assigned_to'),
+        'due_date': ('due_date',),
+        'tags': ('tags', 'tags_details'),  # Названия тегов через запятую или ';'
+    }
+
+    def import_chunk(self, rows):
+        existing = Task.objects.in_bulk({_int(values.get('id')) for _, values in rows} - {None})
+        projects = self._projects(rows)
+        users = _users(values.get('assigned_to') for _, values in rows)
+        tags = self._tags(rows)
+        references = reference_data.snapshot()
+        priorities = self._reference_lookup(references['priorities'])
+        statuses = self._reference_lookup(references['statuses'])
+
+        parsed = []  # (строка, задача или None, поля, названия тегов или None)
+        for line, values in rows:
+            task = existing.get(_int(values.get('id')))
+            fields, errors = {}, {}
+            if 'title' in values or task is None:
+                if not values.get('title'):
+                    errors['title'] = 'Обязательное поле'
+                fields['title'] = values.get('title')
+            if 'description' in values:
+                fields['description'] = values['description']
+            if values.get('project') or values.get('project_name'):
+                fields['project_id'], error = projects(values)
+                if error:
+                    errors['project'] = error
+            elif task is None:
+                errors['project'] = 'Обязательное поле'
+            for name, lookup in (('priority', priorities), ('status', statuses)):
+                if name in values:
+                    fields[f'{name}_id'] = lookup(values[name])
+                    if values[name] and fields[f'{name}_id'] is None:
+                        errors[name] = 'Не найден в справочнике'
+            if 'assigned_to' in values:
+                fields['assigned_to_id'] = users.get(values['assigned_to']) if values['assigned_to'] else None
+                if values['assigned_to'] and fields['assigned_to_id'] is None:
+                    errors['assigned_to'] = 'Пользователь не найден'
+            if 'due_date' in values:
+                try:
+                    fields['due_date'] = _parse_date(values['due_date'])
+                except ValueError:
+                    errors['due_date'] = 'Неверный формат даты'
+            tag_names = None
+            if 'tags' in values:
+                tag_names = set(filter(None, (name.strip() for name in re.split(r'[;,]', values['tags'] or ''))))
+                if tag_names and self.user is None:
+                    errors['tags'] = 'Теги импортируются только от имени пользователя'
+            if errors:
+                self.add_error(line, errors)
+                continue
+            parsed.append((line, task, fields, tag_names))
+
+        parsed = self._check_unique_titles(parsed)
+        tag_ids = tags({name for _, _, _, names in parsed if names for name in names})
+
+        created, updated, update_fields, project_ids = [], [], set(), set()
+        task_tags = []  # (задача, id тегов)
+        for _, task, fields, tag_names in parsed:
+            if task is None:
+                task = Task(created_by=self.user, **fields)
+                created.append(task)
+            else:
+                project_ids.add(task.project_id)  # Задача могла уйти в другой проект - пересчитываем оба
+                for name, value in fields.items():
+                    setattr(task, name, value)
+                update_fields.update(fields)
+                updated.append(task)
+            if tag_names is not None:
+                task_tags.append((task, {tag_ids[name] for name in tag_names}))
+
+        self.save(created, updated, update_fields, save_related=lambda: self._set_tags(task_tags))
+        schedule_counters_refresh(project_ids | {task.project_id for task in created + updated})
+        schedule_deadline_sync({task.pk for task in created + updated})
+        schedule_version_bump(Task._meta.label)  # Сигналы post_save и m2m_changed при массовых операциях не отправляются
+
+    def _projects(self, rows):
+        """Функция поиска проекта строки (по id или по названию) - проекты всей пачки одним запросом"""
+        ids = {_int(values.get('project')) for _, values in rows} - {None}
+        names = {values['project_name'] for _, values in rows if values.get('project_name')}
+        by_id, by_name = set(), {}
+        for pk, name, owner_id in Project.objects.filter(Q(pk__in=ids) | Q(name__in=names)).values_list('pk', 'name', 'owner_id'):
+            by_id.add(pk)
+            by_name.setdefault(name, []).append((pk, owner_id))
+        user_id = getattr(self.user, 'pk', None)
+
+        def lookup(values):
+            if values.get('project'):
+                pk = _int(values['project'])
+                return (pk, None) if pk in by_id else (None, 'Проект не найден')
+            found = by_name.get(values['project_name'], [])
+            own = [pk for pk, owner_id in found if owner_id == user_id]
+            if len(found) == 1 or len(own) == 1:  # Одноименные проекты разных владельцев - берем свой
+                return (found[0][0] if len(found) == 1 else own[0]), None
+            return None, 'Проект не найден' if not found else 'Несколько проектов с таким названием - укажите id'
+        return lookup
+
+    @staticmethod
+    def _reference_lookup(items):
+        """Поиск в справочнике по id или названию (TaskResource выгружает статус с эмодзи: '✅ Завершена')"""
+        by_name = {item['name']: pk for pk, item in items.items()}
+
+        def lookup(value):
+            if not value:
+                return None
+            if value in by_name:
+                return by_name[value]
+            if _int(value) in items:
+                return _int(value)
+            return by_name.get(value.split(' ', 1)[-1])
+        return lookup
+
+    def _tags(self, rows):
+        """Функция, создающая недостающие теги пользователя (обычно одним INSERT) и возвращающая {название: id}"""
+        def load(names):
+            if not names:
+                return {}
+            found = dict(Tag.objects.filter(user=self.user, name__in=names).values_list('name', 'pk'))
+            missing = names - set(found)
+            if missing:
+                try:
+                    with transaction.atomic():
+                        Tag.objects.bulk_create([Tag(name=name, user=self.user) for name in missing])
+                    inserted = True
+                except IntegrityError:  # Часть тегов только что создал параллельный импорт - создаем по одному
+                    inserted = False
+                    for name in missing:
+                        tag = Tag(name=name, user=self.user)
+                        tag._history_user = self.user  # save() сам запишет историю и версию созданного тега
+                        try:
+                            with transaction.atomic():
+                                tag.save()
+                        except IntegrityError:
+                            pass  # Чужой тег - истории от этого импорта у него нет
+                new_tags = list(Tag.objects.filter(user=self.user, name__in=missing))
+                if inserted:
+                    bulk_history(new_tags, '+', self.user)
+                    schedule_version_bump(Tag._meta.label)
+                found.update((tag.name, tag.pk) for tag in new_tags)
+            return found
+        return load
+
+    def _check_unique_titles(self, parsed):
+        """Название задачи уникально в проекте: одна проверка на пачку (и дубликаты внутри пачки)"""
+        def pair(task, fields):
+            return (
+                fields.get('project_id', getattr(task, 'project_id', None)),
+                fields.get('title', getattr(task, 'title', None)),
+            )
+
+        pairs = {pair(task, fields) for _, task, fields, _ in parsed}
+        taken = {
+            (project_id, title): pk for pk, project_id, title in Task.objects.filter(
+                project_id__in={project_id for project_id, _ in pairs},
+                title__in={title for _, title in pairs},
+            ).values_list('pk', 'project_id', 'title')
+        } if pairs else {}
+        result = []
+        for line, task, fields, tag_names in parsed:
+            key = pair(task, fields)
+            owner = taken.get(key)
+            if owner is not None and (task is None or owner != task.pk):
+                self.add_error(line, {'title': 'Задача с таким названием уже существует в данном проекте'})
+                continue
+            taken[key] = task.pk if task is not None else 0  # 0 - новая задача из этой пачки
+            result.append((line, task, fields, tag_names))
+        return result
+
+    @staticmethod
+    def _set_tags(task_tags):
+        """Наборы тегов задач: лишние связи удаляются одним DELETE, недостающие добавляются одним INSERT"""
+        if not task_tags:
+            return
+        wanted = {task.pk: tag_ids for task, tag_ids in task_tags}
+        current = TaskTag.objects.filter(task_id__in=wanted).values_list('pk', 'task_id', 'tag_id')
+        TaskTag.objects.filter(pk__in=[pk for pk, task_id, tag_id in current if tag_id not in wanted[task_id]]).delete()
+        TaskTag.objects.bulk_create(
+            [TaskTag(task_id=task_id, tag_id=tag_id) for task_id, tag_ids in wanted.items() for tag_id in tag_ids],
+            ignore_conflicts=True,  # Связь уже есть
+        )
+
+
+IMPORTERS = {'tasks': TaskImporter, 'projects': ProjectImporter}
+
+
+def run_import_job(job, chunk_size=IMPORT_CHUNK_SIZE):
+    """Выполняем задание импорта: прогресс сохраняется после каждой пачки, история разбирается в конце"""
+    jobs = ImportJob.objects.filter(pk=job.pk)
+
+    def progress(importer):
+        jobs.update(
+            processed_rows=importer.processed,
+            created_count=importer.created,
+            updated_count=importer.updated,
+            error_count=importer.error_count,
+            errors=importer.errors,
+        )
+
+    jobs.update(status=ImportJob.STATUS_RUNNING, started_at=timezone.now())
+    try:
+        total, rows = read_rows(job.file.path)
+        jobs.update(total_rows=total)
+        IMPORTERS[job.model](user=job.created_by, chunk_size=chunk_size, progress=progress).run(rows)
+        while process_history_queue():  # История импорта сразу попадает в таблицы истории
+            pass
+    except Exception as error:  # Пачки до ошибки уже сохранены - прогресс в задании это показывает
+        jobs.update(
+            status=ImportJob.STATUS_FAILED,
+            finished_at=timezone.now(),
+            errors=list(ImportJob.objects.get(pk=job.pk).errors) + [{'row': None, 'errors': {'file': str(error)}}],
+        )
+    else:
+        jobs.update(status=ImportJob.STATUS_DONE, finished_at=timezone.now())
+    job.refresh_from_db()
+    return job
+
+
+def claim_import_job():
+    """Следующее задание из очереди (параллельные обработчики берут разные задания)"""
+    with transaction.atomic():
+        job = ImportJob.objects.select_for_update(skip_locked=True).filter(
+            status=ImportJob.STATUS_PENDING
+        ).order_by('created_at').first()
+        if job is not None:
+            job.status = ImportJob.STATUS_RUNNING
+            job.started_at = timezone.now()
+            job.save(update_fields=['status', 'started_at'])
+    return job
@@ -0,0 +1,309 @@
+import json  # Тела запросов и файл базовых замеров
+import statistics  # Медиана числа SQL-запросов
+import threading  # Параллельные клиенты
+import time  # Для замера времени
+import uuid  # Уникальные названия задач, создаваемых при замере
+from pathlib import Path  # Путь к файлу базовых замеров
+
+from django.conf import settings  # ALLOWED_HOSTS и имя cookie сессии
+from django.contrib.auth.models import User  # Модель пользователя
+from django.core.management.base import BaseCommand, CommandError  # Базовый класс для management команд
+from django.db import connection  # Счетчик запросов в потоке клиента
+from django.test import Client  # Запросы через WSGI-обработчик Django в том же процессе
+from tasks.models import Status, Task  # Модели для подготовки параметров запросов
+from tasks.synthetic import SyntheticDataGenerator  # Генерация набора данных для замеров
+
+BASELINE_PATH = Path(__file__).resolve().parents[2] / 'benchmark_baseline.json'  # tasks/benchmark_baseline.json
+BENCH_PREFIX = 'bench'  # Префикс пользователей набора данных для замеров
+BENCH_TITLE_PREFIX = 'bench-'  # Задачи, созданные при замере (удаляются в конце)
+MIN_REGRESSION_MS = 5  # Рост p95 меньше этого значения считается шумом
+
+
+def _percentile(values, percent):
+    """Процентиль по отсортированному списку (ближайший ранг)"""
+    index = min(len(values) - 1, max(0, -(-len(values) * percent // 100) - 1))
+    return values[int(index)]
+
+
+class _QueryCounter:
+    """Обертка execute_wrapper: считает SQL-запросы текущего подключения"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный замер API: параллельные запросы ко всем маршрутам задач и проектов, p50/p95/p99, '
+        'пропускная способность и число SQL-запросов; сравнение с базовыми замерами (регрессия - ошибка)'
+    )  # Описание команды
+
+    def add_arguments(self, parser):  # Добавляем аргументы команды
+        parser.add_argument('--requests', type=int, default=60, help='Запросов на каждый маршрут (по умолчанию 60)')
+        parser.add_argument('--concurrency', type=int, default=4, help='Параллельных клиентов (по умолчанию 4)')
+        parser.add_argument(
+            '--user',
+            help=f'От чьего имени идут запросы (по умолчанию {BENCH_PREFIX}_0000000 из сгенерированного набора)',
+        )
+        parser.add_argument(
+            '--generate',
+            action='store_true',
+            help=f'Сгенерировать набор данных ({BENCH_PREFIX}_*, seed 42), если его еще нет',
+        )
+        parser.add_argument('--users', type=int, default=200, help='Пользователей в наборе (по умолчанию 200)')
+        parser.add_argument('--projects-per-user', type=int, default=5, help='Проектов на пользователя (по умолчанию 5)')
+        parser.add_argument('--tasks-per-project', type=int, default=100, help='Задач в проекте (по умолчанию 100)')
+        parser.add_argument(
+            '--only',
+            action='append',
+            default=[],
+            help='Замерить только маршруты, имя которых начинается с этой строки (можно указать несколько раз)',
+        )
+        parser.add_argument(
+            '--exclude',
+            action='append',
+            default=[],
+            help='Пропустить маршруты, имя которых начинается с этой строки (можно указать несколько раз)',
+        )
+        parser.add_argument('--baseline', default=str(BASELINE_PATH), help='Файл базовых замеров (JSON)')
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.25,
+            help='Допустимый рост p95 относительно базовых замеров (по умолчанию 0.25, то есть 25%%)',
+        )
+        parser.add_argument(
+            '--write-baseline',
+            action='store_true',
+            help='Записать результаты как новые базовые замеры вместо сравнения',
+        )
+
+    def handle(self, *args, **options):  # Основная логика команды
+        """Выполнение команды"""
+        if options['generate'] and not User.objects.filter(username=f'{BENCH_PREFIX}_0000000').exists():
+            self.stdout.write('Генерация набора данных для замеров...')
+            SyntheticDataGenerator(
+                users=options['users'],
+                projects_per_user=options['projects_per_user'],
+                tasks_per_project=options['tasks_per_project'],
+                tags=10,
+                history_depth=3,
+                seed=42,
+                prefix=BENCH_PREFIX,
+                log=self.stdout.write,
+            ).run()
+
+        username = options['user'] or f'{BENCH_PREFIX}_0000000'
+        try:
+            self.user = User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(f'Пользователь "{username}" не найден (запустите с --generate или укажите --user)')
+
+        endpoints = [
+            endpoint for endpoint in self._endpoints()
+            if (not options['only'] or endpoint[0].startswith(tuple(options['only'])))
+            and not (options['exclude'] and endpoint[0].startswith(tuple(options['exclude'])))
+        ]
+        if not endpoints:
+            raise CommandError('Нет маршрутов для замера')
+
+        meta = {
+            'tasks': Task.objects.count(),
+            'visible_tasks': Task.objects.visible_to(self.user).count(),
+            'requests': max(options['requests'], 1),
+            'concurrency': max(options['concurrency'], 1),
+            'excluded': options['exclude'],  # Пропущенные маршруты: в базовых замерах их нет
+        }
+        self.stdout.write(
+            f'Задач в базе: {meta["tasks"]}, видно пользователю {username}: {meta["visible_tasks"]}; '
+            f'запросов на маршрут: {meta["requests"]}, параллельно: {meta["concurrency"]}\n'
+        )
+        if settings.DEBUG:  # Django запоминает каждый SQL-запрос - время заметно завышено
+            self.stdout.write(self.style.WARNING('DEBUG=True: замеры не сравнимы с рабочим режимом\n'))
+        results = {}
+        try:
+            for name, method, make_request, on_response in endpoints:
+                results[name] = self._measure(method, make_request, on_response, meta['requests'], meta['concurrency'])
+                self._print_result(name, results[name])
+        finally:
+            Task.objects.filter(title__startswith=BENCH_TITLE_PREFIX).delete()  # Задачи, созданные замером
+
+        path = Path(options['baseline'])
+        if options['write_baseline']:
+            path.write_text(json.dumps({'meta': meta, 'endpoints': results}, ensure_ascii=False, indent=2) + '\n')
+            self.stdout.write(self.style.SUCCESS(f'\n✓ Базовые замеры записаны в {path}'))
+            return
+        if not path.exists():
+            self.stdout.write(self.style.WARNING(f'\nФайл базовых замеров {path} не найден, сравнение пропущено'))
+            return
+        self._compare(json.loads(path.read_text()), meta, results, options['threshold'])
+
+    def _endpoints(self):
+        """(имя, метод, номер запроса -> (путь, тело), обработчик ответа) для маршрутов задач и проектов"""
+        task = Task.objects.filter(project__owner=self.user).order_by('-id').first()
+        if task is None:
+            raise CommandError('У пользователя нет задач в собственных проектах')
+        project_id = task.project_id
+        status_ids = list(Status.objects.values_list('pk', flat=True))
+        created_ids = []  # Задачи, созданные tasks-create (их удаляет tasks-delete)
+        lock = threading.Lock()
+
+        def get(path):
+            return lambda number: (path, None)
+
+        def create(number):
+            return '/api/tasks/', {'title': f'{BENCH_TITLE_PREFIX}{uuid.uuid4().hex}', 'project': project_id}
+
+        def created(response):
+            if response.status_code == 201:
+                with lock:
+                    created_ids.append(json.loads(response.content)['id'])
+
+        def delete(number):
+            with lock:
+                task_id = created_ids.pop() if created_ids else 0
+            return f'/api/tasks/{task_id}/', None
+
+        def change_status(number):
+            return f'/api/tasks/{task.pk}/change_status/', {'status_id': status_ids[number % len(status_ids)]}
+
+        return [
+            ('tasks-list', 'GET', get('/api/tasks/'), None),
+            ('tasks-list-cursor', 'GET', get('/api/tasks/?pagination=cursor'), None),
+            ('tasks-list-fields', 'GET', get('/api/tasks/?fields=id,title,status_name,due_date'), None),
+            ('tasks-filter-status', 'GET', get(f'/api/tasks/?status={status_ids[0]}'), None),
+            ('tasks-filter-project', 'GET', get(f'/api/tasks/?project={project_id}'), None),
+            ('tasks-order-due-date', 'GET', get('/api/tasks/?ordering=due_date'), None),
+            ('tasks-search', 'GET', get('/api/tasks/?search=отчет'), None),
+            ('tasks-retrieve', 'GET', get(f'/api/tasks/{task.pk}/'), None),
+            ('tasks-history', 'GET', get(f'/api/tasks/{task.pk}/history/'), None),
+            ('tasks-upcoming-week', 'GET', get('/api/tasks/upcoming_week/'), None),
+            ('tasks-overdue', 'GET', get('/api/tasks/overdue/'), None),
+            ('tasks-urgent-or-tomorrow', 'GET', get('/api/tasks/urgent_or_tomorrow/'), None),
+            ('tasks-others-in-progress', 'GET', get('/api/tasks/others_in_progress_or_cancelled/'), None),
+            ('tasks-stats', 'GET', get('/api/tasks/stats/'), None),
+            ('tasks-export', 'GET', get('/api/tasks/export/'), None),
+            ('projects-list', 'GET', get('/api/projects/'), None),
+            ('projects-search', 'GET', get('/api/projects/?search=ремонт'), None),
+            ('projects-my', 'GET', get('/api/projects/my_projects/'), None),
+            ('projects-retrieve', 'GET', get(f'/api/projects/{project_id}/'), None),
+            ('projects-tasks', 'GET', get(f'/api/projects/{project_id}/tasks/'), None),
+            ('projects-history', 'GET', get(f'/api/projects/{project_id}/history/'), None),
+            ('tasks-create', 'POST', create, created),
+            ('tasks-update', 'PATCH', lambda number: (f'/api/tasks/{task.pk}/', {'description': f'Замер {number}'}), None),
+            ('tasks-change-status', 'POST', change_status, None),
+            ('tasks-delete', 'DELETE', delete, None),  # Удаляет задачи, созданные tasks-create
+        ]
+
+    def _client(self, session_key):
+        host = next((host for host in settings.ALLOWED_HOSTS if host != '*' and not host.startswith('.')), 'localhost')
+        client = Client(HTTP_HOST=host, raise_request_exception=False)  # Ошибка 500 - это результат замера
+        client.cookies[settings.SESSION_COOKIE_NAME] = session_key  # Одна сессия на всех клиентов
+        return client
+
+    def _measure(self, method, make_request, on_response, requests, concurrency):
+        """
+        Запросы идут через WSGI-обработчик Django из нескольких потоков, у каждого потока
+        свой клиент и свое подключение к БД. Время - до последнего байта ответа.
+        """
+        login = Client()
+        login.force_login(self.user)
+        session_key = login.cookies[settings.SESSION_COOKIE_NAME].value
+        numbers = iter(range(requests))
+        lock = threading.Lock()
+        timings, queries, errors = [], [], []
+
+        def worker():
+            client = self._client(session_key)
+            counter = _QueryCounter()
+            try:
+                with connection.execute_wrapper(counter):
+                    while True:
+                        with lock:
+                            number = next(numbers, None)
+                        if number is None:
+                            return
+                        path, data = make_request(number)
+                        body = json.dumps(data) if data is not None else ''
+                        counter.count = 0
+                        started = time.perf_counter()
+                        response = client.generic(method, path, body, content_type='application/json', secure=True)  # Без редиректа на HTTPS
+                        if response.streaming:
+                            b''.join(response.streaming_content)
+                        elapsed = (time.perf_counter() - started) * 1000
+                        with lock:
+                            timings.append(elapsed)
+                            queries.append(counter.count)
+                            if response.status_code >= 300:  # Редирект - тоже не тот ответ, который замеряем
+                                errors.append(response.status_code)
+                        if on_response is not None:
+                            on_response(response)
+            finally:
+                connection.close()  # Подключение потока больше не нужно
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+
+        if not timings:
+            raise CommandError('Ни один запрос не выполнен (см. ошибки выше)')
+        timings.sort()
+        return {
+            'p50': round(_percentile(timings, 50), 1),
+            'p95': round(_percentile(timings, 95), 1),
+            'p99': round(_percentile(timings, 99), 1),
+            'rps': round(len(timings) / wall, 1),
+            'queries': round(statistics.median(queries)),
+            'errors': len(errors),
+        }
+
+    def _print_result(self, name, result):
+        line = (
+            f'{name:<28} p50 {result["p50"]:8.1f} мс  p95 {result["p95"]:8.1f} мс  p99 {result["p99"]:8.1f} мс  '
+            f'{result["rps"]:7.1f} запр/с  SQL {result["queries"]:3d}'
+        )
+        if result['errors']:
+            line += self.style.ERROR(f'  ошибок: {result["errors"]}')
+        self.stdout.write(line)
+
+    def _compare(self, baseline, meta, results, threshold):
+        """Регрессия: p95 вырос больше порога (и больше MIN_REGRESSION_MS), стало больше SQL-запросов или ошибок"""
+        base_meta = baseline.get('meta', {})
+        changed = [key for key in ('tasks', 'requests', 'concurrency') if base_meta.get(key) != meta[key]]
+        if changed:
+            self.stdout.write(self.style.WARNING(
+                f'\nУсловия отличаются от базовых замеров ({", ".join(changed)}) - сравнение может быть неточным'
+            ))
+
+        self.stdout.write(self.style.SUCCESS(f'\n=== Сравнение с базовыми замерами (порог p95: +{threshold:.0%}) ==='))
+        regressions = []
+        for name, result in results.items():
+            base = baseline.get('endpoints', {}).get(name)
+            if base is None:
+                self.stdout.write(f'{name:<28} нет базового замера')
+                continue
+            problems = []
+            if result['p95'] > base['p95'] * (1 + threshold) and result['p95'] - base['p95'] >= MIN_REGRESSION_MS:
+                problems.append(f'p95 {base["p95"]} -> {result["p95"]} мс')
+            if result['queries'] > base['queries']:
+                problems.append(f'SQL {base["queries"]} -> {result["queries"]}')
+            if result['errors'] > base.get('errors', 0):
+                problems.append(f'ошибок {base.get("errors", 0)} -> {result["errors"]}')
+            change = (result['p95'] - base['p95']) / base['p95'] if base['p95'] else 0
+            if problems:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(f'{name:<28} РЕГРЕССИЯ: {", ".join(problems)}'))
+            else:
+                self.stdout.write(f'{name:<28} ok (p95 {change:+.0%}, SQL {result["queries"]})')
+
+        if regressions:
+            raise CommandError(f'Регрессия производительности: {", ".join(regressions)}')
+        self.stdout.write(self.style.SUCCESS('\n✓ Регрессий нет'))
@@ -0,0 +1,64 @@
+import json  # Стандартный JSON для сравнения
+import time  # Для замера времени
+
+from django.core.management.base import BaseCommand, CommandError  # Базовый класс для management команд
+from rest_framework.renderers import JSONRenderer  # Стандартный JSON-рендерер DRF
+from tasks.models import Task  # Модель задачи
+from tasks.renderers import FastJSONRenderer  # JSON через orjson
+from tasks.rows import TaskRows  # Быстрая сериализация из values()
+from tasks.serializers import TaskListSerializer, TaskSerializer  # Текущие сериализаторы
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает стоимость сериализации задачи: сериализаторы DRF против values() + orjson'  # Описание команды
+
+    def add_arguments(self, parser):  # Добавляем аргументы команды
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=500,
+            help='Сколько задач сериализовать за один проход (по умолчанию 500)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Сколько раз повторять каждый замер (по умолчанию 5)',
+        )
+
+    def handle(self, *args, **options):  # Основная логика команды
+        """Выполнение команды"""
+        queryset = Task.objects.select_related('project', 'assigned_to', 'created_by').prefetch_related('tags')
+        queryset = queryset.order_by('-created_at', '-id')[:max(options['rows'], 1)]
+        rows_count = queryset.count()
+        if not rows_count:
+            raise CommandError('В базе нет задач (заполните ее командой fill_test_data)')
+
+        self.stdout.write(f'Задач в одном проходе: {rows_count}')
+        for serializer_class in (TaskListSerializer, TaskSerializer):
+            def drf():
+                return serializer_class(queryset.all(), many=True).data  # Без запроса: URL изображений относительные
+
+            def fast():
+                rows = TaskRows(serializer_class)
+                return rows.render(rows.values(queryset.all()))
+
+            drf_data, fast_data = drf(), fast()
+            same = json.dumps(drf_data) == json.dumps(fast_data)
+
+            self.stdout.write(self.style.SUCCESS(f'\n=== {serializer_class.__name__} ==='))
+            self.stdout.write(f'JSON совпадает: {"да" if same else "НЕТ"}')
+            self._report('Сериализатор DRF (выборка + serializer.data)', drf, rows_count, options['repeat'])
+            self._report('values() + TaskRows', fast, rows_count, options['repeat'])
+            self._report('JSONRenderer', lambda: JSONRenderer().render(drf_data), rows_count, options['repeat'])
+            self._report('FastJSONRenderer (orjson)', lambda: FastJSONRenderer().render(fast_data), rows_count, options['repeat'])
+
+    def _report(self, name, func, rows_count, repeat):
+        """Медиана времени на одну строку в микросекундах"""
+        timings = []
+        for _ in range(max(repeat, 1)):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1_000_000 / rows_count)
+        timings.sort()
+        self.stdout.write(f'  {name}: медиана {timings[len(timings) // 2]:.1f} мкс/строка, минимум {timings[0]:.1f}')
@@ -0,0 +1,286 @@
+import asyncio  # Клиенты нагрузки - корутины с постоянными соединениями
+import os  # Окружение и /proc для замера памяти
+import signal  # Остановка сервера
+import subprocess  # Запуск gunicorn
+import sys  # Интерпретатор для запуска gunicorn
+import tempfile  # Журнал сервера на время замера
+import threading  # Замер памяти во время нагрузки
+import time  # Для замера времени
+from pathlib import Path  # Каталог проекта с gunicorn_config.py
+
+from django.conf import settings  # ALLOWED_HOSTS и имя cookie сессии
+from django.contrib.auth.models import User  # Модель пользователя
+from django.core.management.base import BaseCommand, CommandError  # Базовый класс для management команд
+from django.test import Client  # Вход пользователя (ключ сессии для запросов)
+from tasks.models import Task  # Задача и проект для маршрутов
+
+from .benchmark_api import BENCH_PREFIX, _percentile  # Набор данных и процентили - как у benchmark_api
+
+BASE_DIR = Path(__file__).resolve().parents[3]  # Каталог с manage.py и gunicorn_config.py
+PROFILES = {  # Профиль gunicorn_config.py -> приложение
+    'sync': 'todo_project.wsgi:application',
+    'asgi': 'todo_project.asgi:application',
+}
+START_TIMEOUT = 60  # Секунд на запуск сервера
+
+
+def _memory_kb(pid):
+    """PSS процесса (общие после fork страницы делятся между процессами), если ядро не дает - RSS"""
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as file:
+            for line in file:
+                if line.startswith('Pss:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    try:
+        with open(f'/proc/{pid}/status') as file:
+            for line in file:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _tree_memory_kb(root_pid):
+    """Память арбитра gunicorn и всех его воркеров"""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as file:
+                ppid = int(file.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    total, stack = 0, [root_pid]
+    while stack:
+        pid = stack.pop()
+        total += _memory_kb(pid)
+        stack.extend(children.get(pid, ()))
+    return total
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнение профилей gunicorn_config.py: sync (WSGI, gthread) и asgi (uvicorn-воркеры, асинхронные действия) '
+        'при одинаковом числе процессов - запросов в секунду, задержки и запросов в секунду на ГБ памяти'
+    )  # Описание команды
+
+    def add_arguments(self, parser):  # Добавляем аргументы команды
+        parser.add_argument(
+            '--profiles', default='sync,asgi', help='Профили через запятую (по умолчанию sync,asgi)',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=2,
+            help='Процессов-воркеров у каждого профиля (по умолчанию 2): память сравнивается при равном числе процессов',
+        )
+        parser.add_argument('--concurrency', type=int, default=64, help='Одновременных клиентов (по умолчанию 64)')
+        parser.add_argument('--duration', type=float, default=15, help='Секунд нагрузки на профиль (по умолчанию 15)')
+        parser.add_argument('--warmup', type=float, default=3, help='Секунд прогрева без замера (по умолчанию 3)')
+        parser.add_argument('--port', type=int, default=8400, help='Порт сервера на 127.0.0.1 (по умолчанию 8400)')
+        parser.add_argument(
+            '--user',
+            help=f'От чьего имени идут запросы (по умолчанию {BENCH_PREFIX}_0000000, см. benchmark_api --generate)',
+        )
+
+    def handle(self, *args, **options):  # Основная логика команды
+        """Выполнение команды"""
+        profiles = [profile.strip() for profile in options['profiles'].split(',') if profile.strip()]
+        unknown = [profile for profile in profiles if profile not in PROFILES]
+        if unknown or not profiles:
+            raise CommandError(f'Профили: {", ".join(PROFILES)}')
+        username = options['user'] or f'{BENCH_PREFIX}_0000000'
+        try:
+            user = User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(f'Пользователь "{username}" не найден (benchmark_api --generate или --user)')
+        task = Task.objects.filter(project__owner=user).order_by('-id').first()
+        if task is None:
+            raise CommandError('У пользователя нет задач в собственных проектах')
+
+        client = Client()
+        client.force_login(user)
+        self.session_key = client.cookies[settings.SESSION_COOKIE_NAME].value
+        self.host = next((host for host in settings.ALLOWED_HOSTS if host != '*' and not host.startswith('.')), 'localhost')
+        self.paths = [  # Читающие маршруты, у которых есть асинхронные версии
+            '/api/tasks/',
+            f'/api/tasks/?project={task.project_id}',
+            f'/api/tasks/{task.pk}/',
+            '/api/tasks/upcoming_week/',
+            '/api/tasks/overdue/',
+            '/api/tasks/urgent_or_tomorrow/',
+            f'/api/projects/{task.project_id}/tasks/',
+        ]
+
+        self.stdout.write(
+            f'Воркеров: {options["workers"]}, клиентов: {options["concurrency"]}, '
+            f'нагрузка: {options["duration"]:g} с на профиль, маршрутов: {len(self.paths)}'
+        )
+        if settings.DEBUG:  # Django запоминает каждый SQL-запрос - и время, и память завышены
+            self.stdout.write(self.style.WARNING('DEBUG=True: замеры не сравнимы с рабочим режимом'))
+        self.stdout.write('Клиенты нагрузки работают на этой же машине и делят с сервером процессор\n')
+
+        results = {}
+        for profile in profiles:
+            results[profile] = self._run_profile(profile, options)
+            self._print_result(profile, results[profile])
+
+        if 'sync' in results and 'asgi' in results:
+            sync, asgi = results['sync'], results['asgi']
+            self.stdout.write(self.style.SUCCESS(
+                f'\nasgi / sync: запросов в секунду x{asgi["rps"] / max(sync["rps"], 0.1):.2f}, '
+                f'на ГБ памяти x{asgi["rps_per_gb"] / max(sync["rps_per_gb"], 0.1):.2f}, '
+                f'p95 {sync["p95"]} -> {asgi["p95"]} мс'
+            ))
+
+    def _run_profile(self, profile, options):
+        env = dict(os.environ, GUNICORN_PROFILE=profile)
+        env.pop('GUNICORN_WORKERS', None)
+        if profile == 'asgi':
+            env.setdefault('ASYNC_VIEWS', 'True')  # Профиль asgi сравнивается вместе с асинхронными действиями
+        command = [
+            sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_config.py', PROFILES[profile],
+            '--bind', f'127.0.0.1:{options["port"]}', '--workers', str(max(options['workers'], 1)),
+            '--access-logfile', os.devnull,  # Строка журнала на каждый запрос исказила бы замер
+        ]
+        log = tempfile.TemporaryFile()  # Не PIPE: заполненный канал остановил бы сервер
+        server = subprocess.Popen(command, cwd=BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+        try:
+            self._wait_ready(server, log, options['port'])
+            if options['warmup'] > 0:
+                asyncio.run(self._load(options['port'], options['concurrency'], options['warmup']))
+
+            peak = [0]
+            done = threading.Event()
+
+            def sample():
+                while not done.wait(0.5):
+                    peak[0] = max(peak[0], _tree_memory_kb(server.pid))
+
+            sampler = threading.Thread(target=sample, daemon=True)
+            sampler.start()
+            timings, errors, wall = asyncio.run(self._load(options['port'], options['concurrency'], options['duration']))
+            done.set()
+            sampler.join()
+            peak[0] = max(peak[0], _tree_memory_kb(server.pid))
+        finally:
+            server.send_signal(signal.SIGTERM)
+            try:
+                server.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+                server.wait()
+            log.close()
+
+        if not timings:
+            raise CommandError(f'{profile}: ни один запрос не выполнен')
+        timings.sort()
+        rps = len(timings) / wall
+        memory_mb = peak[0] / 1024
+        return {
+            'rps': round(rps, 1),
+            'p50': round(_percentile(timings, 50), 1),
+            'p95': round(_percentile(timings, 95), 1),
+            'p99': round(_percentile(timings, 99), 1),
+            'errors': errors,
+            'memory_mb': round(memory_mb, 1),
+            'rps_per_gb': round(rps / (memory_mb / 1024), 1) if memory_mb else 0,
+        }
+
+    def _wait_ready(self, server, log, port):
+        started = time.monotonic()
+        while time.monotonic() - started < START_TIMEOUT:
+            if server.poll() is not None:
+                log.seek(0)
+                raise CommandError(f'Сервер завершился при запуске:\n{log.read().decode(errors="replace")[-2000:]}')
+            try:
+                status, _ = asyncio.run(self._request_once(port, self.paths[0]))
+            except OSError:
+                time.sleep(0.3)
+                continue
+            if status != 200:
+                raise CommandError(f'Сервер ответил {status} на {self.paths[0]} (DEBUG=False требует HTTPS - см. SECURE_SSL_REDIRECT)')
+            return
+        raise CommandError(f'Сервер не запустился за {START_TIMEOUT} с')
+
+    async def _request_once(self, port, path):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            return await self._request(reader, writer, path)
+        finally:
+            writer.close()
+
+    async def _request(self, reader, writer, path):
+        """GET по HTTP/1.1 с постоянным соединением: (статус, нужно ли переподключиться)"""
+        writer.write(
+            f'GET {path} HTTP/1.1\r\nHost: {self.host}\r\nAccept: application/json\r\n'
+            f'Cookie: {settings.SESSION_COOKIE_NAME}={self.session_key}\r\n\r\n'.encode()
+        )
+        await writer.drain()
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError('Сервер закрыл соединение')
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip().lower()
+        if headers.get('transfer-encoding') == 'chunked':
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                await reader.readexactly(size + 2)  # Данные и \r\n
+                if size == 0:
+                    break
+        else:
+            await reader.readexactly(int(headers.get('content-length', 0)))
+        return status, headers.get('connection') == 'close'
+
+    async def _load(self, port, concurrency, duration):
+        """Клиенты по кругу запрашивают маршруты до истечения duration: (задержки в мс, ошибки, время)"""
+        timings, errors = [], [0]
+        deadline = time.perf_counter() + duration
+
+        async def client(number):
+            connection = None
+            index = number
+            while time.perf_counter() < deadline:
+                path = self.paths[index % len(self.paths)]
+                index += 1
+                started = time.perf_counter()
+                try:
+                    if connection is None:
+                        connection = await asyncio.open_connection('127.0.0.1', port)
+                    status, close = await self._request(*connection, path)
+                except (OSError, asyncio.IncompleteReadError, ValueError):
+                    errors[0] += 1
+                    if connection is not None:
+                        connection[1].close()
+                    connection = None
+                    continue
+                timings.append((time.perf_counter() - started) * 1000)
+                if status != 200:
+                    errors[0] += 1
+                if close:
+                    connection[1].close()
+                    connection = None
+            if connection is not None:
+                connection[1].close()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client(number) for number in range(max(concurrency, 1))))
+        return timings, errors[0], time.perf_counter() - started
+
+    def _print_result(self, profile, result):
+        line = (
+            f'{profile:<6} {result["rps"]:8.1f} запр/с  p50 {result["p50"]:8.1f} мс  p95 {result["p95"]:8.1f} мс  '
+            f'p99 {result["p99"]:8.1f} мс  память {result["memory_mb"]:7.1f} МБ  {result["rps_per_gb"]:8.1f} запр/с на ГБ'
+        )
+        if result['errors']:
+            line += self.style.ERROR(f'  ошибок: {result["errors"]}')
+        self.stdout.write(line)
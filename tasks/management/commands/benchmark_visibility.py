@@ -0,0 +1,64 @@
+import time  # Для замера времени выполнения запросов
+
+from django.contrib.auth.models import User  # Модель пользователя
+from django.core.management.base import BaseCommand, CommandError  # Базовый класс для management команд
+from django.db import connection  # Для определения типа базы данных
+from django.db.models import Q  # Для старого варианта фильтра с OR
+from tasks.models import Task  # Модель задачи
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает план и время старого (OR + JOIN) и нового (UNION) фильтра видимости задач'  # Описание команды
+
+    def add_arguments(self, parser):  # Добавляем аргументы команды
+        parser.add_argument('username', help='Пользователь, для которого строится список задач')
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Сколько раз выполнять каждый запрос для замера времени (по умолчанию 5)',
+        )
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Выполнить EXPLAIN ANALYZE (только PostgreSQL)',
+        )
+
+    def handle(self, *args, **options):  # Основная логика команды
+        """Выполнение команды"""
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'Пользователь "{options["username"]}" не найден')
+
+        variants = {
+            'OR + JOIN (до)': Task.objects.filter(
+                Q(project__owner=user) | Q(assigned_to=user) | Q(created_by=user)
+            ),
+            'UNION (после)': Task.objects.visible_to(user),
+        }
+
+        explain_options = {}
+        if connection.vendor == 'postgresql':
+            explain_options = {'analyze': options['analyze'], 'buffers': options['analyze']}
+
+        self.stdout.write(f'Всего задач в базе: {Task.objects.count()}')
+        for name, queryset in variants.items():
+            page = queryset.order_by('-created_at', '-id')[:10]  # Первая страница списка задач
+
+            timings = []
+            for _ in range(max(options['repeat'], 1)):
+                started = time.perf_counter()
+                count = queryset.count()
+                list(page)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+
+            self.stdout.write(self.style.SUCCESS(f'\n=== {name} ==='))
+            self.stdout.write(f'Видимых задач: {count}')
+            self.stdout.write(
+                f'COUNT + первая страница: медиана {timings[len(timings) // 2]:.1f} мс, '
+                f'минимум {timings[0]:.1f} мс'
+            )
+            self.stdout.write('План запроса первой страницы:')
+            self.stdout.write(page.explain(**explain_options))
@@ -0,0 +1,60 @@
+from django.contrib.auth.models import User  # Модель пользователя
+from django.core.management.base import BaseCommand, CommandError  # Базовый класс для management команд
+from tasks.history import process_history_queue  # Перенос истории из очереди в таблицы истории
+from tasks.imports import IMPORT_CHUNK_SIZE, IMPORTERS, ImportFailed, read_rows  # Массовый импорт пачками
+
+
+class Command(BaseCommand):
+    help = 'Массовый импорт задач или проектов из файла (CSV, JSON, XLSX...) пачками, вне админки'  # Описание команды
+
+    def add_arguments(self, parser):  # Добавляем аргументы команды
+        parser.add_argument('file', help='Путь к файлу (колонки - как в экспорте админки или /api/tasks/export/)')
+        parser.add_argument(
+            '--model',
+            choices=sorted(IMPORTERS),
+            default='tasks',
+            help='Что импортируем (по умолчанию tasks)',
+        )
+        parser.add_argument(
+            '--user',
+            help='Имя пользователя, от которого идет импорт (автор задач, владелец новых проектов и тегов)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=IMPORT_CHUNK_SIZE,
+            help=f'Сколько строк обрабатывать за одну транзакцию (по умолчанию {IMPORT_CHUNK_SIZE})',
+        )
+
+    def handle(self, *args, **options):  # Основная логика команды
+        """Выполнение команды"""
+        user = None
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f'Пользователь {options["user"]} не найден')
+        try:
+            total, rows = read_rows(options['file'])
+        except (ImportFailed, OSError) as error:
+            raise CommandError(str(error))
+
+        def progress(importer):
+            self.stdout.write(
+                f'  ✓ Обработано {importer.processed} из {total}: создано {importer.created}, '
+                f'обновлено {importer.updated}, с ошибками {importer.error_count}'
+            )
+
+        importer = IMPORTERS[options['model']](user=user, chunk_size=options['chunk_size'], progress=progress)
+        importer.run(rows)
+        written = 0
+        while count := process_history_queue():  # История импорта сразу попадает в таблицы истории
+            written += count
+
+        for error in importer.errors:
+            self.stdout.write(self.style.WARNING(f'  Строка {error["row"]}: {error["errors"]}'))
+        if importer.error_count > len(importer.errors):
+            self.stdout.write(self.style.WARNING(f'  ... и еще {importer.error_count - len(importer.errors)} строк с ошибками'))
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✓ Импорт завершен: создано {importer.created}, обновлено {importer.updated}, '
+            f'пропущено {importer.error_count}, записей истории {written}'
+        ))
@@ -0,0 +1,41 @@
+from django.conf import settings  # MEDIA_GC_GRACE по умолчанию
+from django.core.management.base import BaseCommand, CommandError  # Базовый класс для management команд
+from tasks.images import IMAGE_MODELS, adopt_legacy, collect_garbage  # Файлы изображений проектов и задач
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет из хранилища по хэшу содержимого файлы, на которые не ссылается ни один проект '
+        'и ни одна задача (в том числе уменьшенные копии), и переносит в него старые загрузки'
+    )  # Описание команды
+
+    def add_arguments(self, parser):  # Добавляем аргументы команды
+        parser.add_argument(
+            '--grace',
+            type=float,
+            default=None,
+            help='Не трогать файлы моложе N секунд: их может сохранять еще не закоммиченная транзакция '
+                 f'(по умолчанию MEDIA_GC_GRACE = {getattr(settings, "MEDIA_GC_GRACE", 600)})',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать, ничего не удаляя')
+        parser.add_argument(
+            '--adopt',
+            action='store_true',
+            help='Сначала перенести изображения, загруженные под исходными именами, в хранилище по хэшу '
+                 '(одинаковые станут одним файлом; уменьшенные копии затем сделает process_image_variants)',
+        )
+
+    def handle(self, *args, **options):  # Основная логика команды
+        """Выполнение команды"""
+        storage = IMAGE_MODELS[0]._meta.get_field('image').storage
+        if not getattr(storage, 'content_addressed', False):
+            raise CommandError('Поля image используют обычное хранилище - собирать нечего')
+
+        if options['adopt'] and not options['dry_run']:
+            for model in IMAGE_MODELS:
+                moved, missing = adopt_legacy(storage, model)
+                self.stdout.write(f'  → {model._meta.verbose_name_plural}: перенесено {moved}, файлов нет на диске {missing}')
+
+        count, size = collect_garbage(storage, grace=options['grace'], dry_run=options['dry_run'])
+        verb = 'Можно удалить' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(f'\n✓ {verb} неиспользуемых файлов: {count} ({size / 1024 / 1024:.1f} МБ)'))
@@ -4,6 +4,22 @@ from tasks.models import Priority, Status, Tag, Project, Task  # Наши мод
 from django.utils import timezone  # Для работы с датами
 from datetime import timedelta  # Для работы с временными интервалами
 
+# Справочники (используются также командой generate_load_data)
+PRIORITIES_DATA = [  # Данные для приоритетов
+    {'name': 'Очень низкий', 'level': 1},
+    {'name': 'Низкий', 'level': 2},
+    {'name': 'Средний', 'level': 3},
+    {'name': 'Высокий', 'level': 4},
+    {'name': 'Критический', 'level': 5},
+]
+STATUSES_DATA = [
+    {'name': 'Новая', 'color': '#6c757d'},  # Серый
+    {'name': 'В работе', 'color': '#007bff'},  # Синий
+    {'name': 'На проверке', 'color': '#ffc107'},  # Желтый
+    {'name': 'Завершена', 'color': '#28a745'},  # Зеленый
+    {'name': 'Отменена', 'color': '#dc3545'},  # Красный
+]
+
 
 class Command(BaseCommand):
     help = 'Заполняет базу данных тестовыми данными (приоритеты, статусы, проекты, задачи)'  # Описание команды
@@ -30,16 +46,8 @@ class Command(BaseCommand):
 
         # Создаем приоритеты
         self.stdout.write('Создание приоритетов...')
-        priorities_data = [  # Данные для приоритетов
-            {'name': 'Очень низкий', 'level': 1},
-            {'name': 'Низкий', 'level': 2},
-            {'name': 'Средний', 'level': 3},
-            {'name': 'Высокий', 'level': 4},
-            {'name': 'Критический', 'level': 5},
-        ]
-
         priorities = {}  # Словарь для хранения созданных приоритетов
-        for data in priorities_data:
+        for data in PRIORITIES_DATA:
             priority, created = Priority.objects.get_or_create(**data)  # Создаем или получаем существующий
             priorities[data['level']] = priority  # Сохраняем в словарь
             if created:
@@ -47,16 +55,8 @@ class Command(BaseCommand):
 
         # Создаем статусы
         self.stdout.write('Создание статусов...')
-        statuses_data = [
-            {'name': 'Новая', 'color': '#6c757d'},  # Серый
-            {'name': 'В работе', 'color': '#007bff'},  # Синий
-            {'name': 'На проверке', 'color': '#ffc107'},  # Желтый
-            {'name': 'Завершена', 'color': '#28a745'},  # Зеленый
-            {'name': 'Отменена', 'color': '#dc3545'},  # Красный
-        ]
-
         statuses = {}
-        for data in statuses_data:
+        for data in STATUSES_DATA:
             status, created = Status.objects.get_or_create(**data)
             statuses[data['name']] = status
             if created:
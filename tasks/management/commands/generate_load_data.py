@@ -0,0 +1,84 @@
+from django.contrib.auth.models import User  # Модель пользователя
+from django.core.management import call_command  # Справочники создает fill_test_data
+from django.core.management.base import BaseCommand, CommandError  # Базовый класс для management команд
+from tasks.models import Priority, Status  # Справочники приоритетов и статусов
+from tasks.synthetic import LOAD_BATCH_SIZE, SyntheticDataGenerator  # Генератор данных для нагрузочных тестов
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует большой объем данных для нагрузочного тестирования (пользователи, проекты, задачи, '
+        'теги, история) с неравномерными распределениями; строки загружаются пачками через COPY'
+    )  # Описание команды
+
+    def add_arguments(self, parser):  # Добавляем аргументы команды
+        parser.add_argument('--users', type=int, default=100, help='Сколько пользователей создать (по умолчанию 100)')
+        parser.add_argument(
+            '--projects-per-user',
+            type=int,
+            default=5,
+            help='Сколько проектов у каждого пользователя (по умолчанию 5)',
+        )
+        parser.add_argument(
+            '--tasks-per-project',
+            type=int,
+            default=100,
+            help='Среднее число задач в проекте, размеры проектов неравномерные (по умолчанию 100)',
+        )
+        parser.add_argument('--tags', type=int, default=10, help='Сколько тегов у каждого пользователя (по умолчанию 10)')
+        parser.add_argument(
+            '--history-depth',
+            type=int,
+            default=1,
+            help='Сколько записей истории у каждой задачи, 0 - без истории (по умолчанию 1)',
+        )
+        parser.add_argument('--seed', type=int, default=42, help='Начальное значение генератора случайных чисел (по умолчанию 42)')
+        parser.add_argument(
+            '--prefix',
+            default='load',
+            help='Префикс имен пользователей: <prefix>_0000001 (по умолчанию load)',
+        )
+        parser.add_argument('--password', default='password123', help='Пароль всех созданных пользователей')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=LOAD_BATCH_SIZE,
+            help=f'Сколько задач загружать за одну транзакцию (по умолчанию {LOAD_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--defer-indexes',
+            action='store_true',
+            help='Снять индексы задач на время загрузки и построить заново в конце (для больших объемов)',
+        )
+
+    def handle(self, *args, **options):  # Основная логика команды
+        """Выполнение команды"""
+        counts = [options[name] for name in ('users', 'projects_per_user', 'tasks_per_project', 'tags', 'history_depth')]
+        if options['users'] < 1 or min(counts) < 0:
+            raise CommandError('Количества должны быть неотрицательными, пользователей - хотя бы один')
+        if User.objects.filter(username__startswith=f'{options["prefix"]}_').exists():
+            raise CommandError(f'Пользователи с префиксом "{options["prefix"]}" уже есть, укажите другой --prefix')
+        if not (Priority.objects.exists() and Status.objects.exists()):  # Справочники - как в fill_test_data
+            call_command('fill_test_data', stdout=self.stdout)
+
+        expected = options['users'] * options['projects_per_user'] * options['tasks_per_project']
+        self.stdout.write(f'Генерация данных (seed={options["seed"]}), ожидается около {expected} задач...')
+        result = SyntheticDataGenerator(
+            users=options['users'],
+            projects_per_user=options['projects_per_user'],
+            tasks_per_project=options['tasks_per_project'],
+            tags=options['tags'],
+            history_depth=options['history_depth'],
+            seed=options['seed'],
+            prefix=options['prefix'],
+            password=options['password'],
+            batch_size=options['batch_size'],
+            defer_indexes=options['defer_indexes'],
+            log=self.stdout.write,
+        ).run()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✓ Создано за {result["seconds"]} с: пользователей {result["users"]}, тегов {result["tags"]}, '
+            f'проектов {result["projects"]}, задач {result["tasks"]}, тегов задач {result["task_tags"]}, '
+            f'записей истории задач {result["history"]}'
+        ))
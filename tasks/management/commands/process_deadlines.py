@@ -0,0 +1,53 @@
+import time  # Пауза между проверками очереди в режиме --watch
+
+from django.core.management.base import BaseCommand  # Базовый класс для management команд
+from tasks.deadlines import SCHEDULER_BATCH_SIZE, advance_deadlines, sync_deadlines  # Планировщик сроков задач
+from tasks.models import Task  # Для полного пересчета
+
+
+class Command(BaseCommand):
+    help = (
+        'Планировщик сроков: переводит задачи в корзины "на неделе", "сегодня или завтра", "просрочена" '
+        'по мере наступления сроков и отправляет события переходов (deadline_transitions)'
+    )  # Описание команды
+
+    def add_arguments(self, parser):  # Добавляем аргументы команды
+        parser.add_argument(
+            '--watch',
+            type=float,
+            default=0,
+            help='Не завершаться, а проверять очередь каждые N секунд (по умолчанию - обработать наступившие сроки и выйти)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=SCHEDULER_BATCH_SIZE,
+            help=f'Сколько сроков обрабатывать за одну транзакцию (по умолчанию {SCHEDULER_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Сначала заново рассчитать сроки всех задач (без событий переходов)',
+        )
+
+    def handle(self, *args, **options):  # Основная логика команды
+        """Выполнение команды"""
+        if options['rebuild']:
+            synced = sync_deadlines(Task.objects.values_list('pk', flat=True), events=False)
+            self.stdout.write(f'  ✓ Сроки рассчитаны для {synced} задач')
+
+        batch_size = max(options['batch_size'], 1)
+        while True:
+            moved = 0
+            while True:  # Параллельные планировщики берут разные строки
+                count = advance_deadlines(limit=batch_size)
+                moved += count
+                if count < batch_size:
+                    break
+            if moved:
+                self.stdout.write(f'  ✓ Обработано сроков: {moved}')
+            if not options['watch']:
+                break
+            time.sleep(options['watch'])
+
+        self.stdout.write(self.style.SUCCESS('\n✓ Наступившие сроки обработаны'))
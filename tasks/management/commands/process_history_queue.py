@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand  # Базовый класс для management команд
+from tasks.history import process_history_queue  # Перенос истории из очереди в таблицы истории
+
+
+class Command(BaseCommand):
+    help = 'Записывает отложенную историю изменений из очереди в таблицы истории'  # Описание команды
+
+    def add_arguments(self, parser):  # Добавляем аргументы команды
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Сколько пачек из очереди обрабатывать за одну транзакцию (по умолчанию 100)',
+        )
+
+    def handle(self, *args, **options):  # Основная логика команды
+        """Выполнение команды"""
+        batch_size = max(options['batch_size'], 1)
+        written = 0
+        while True:  # Очередь разбирается транзакциями, параллельные запуски берут разные пачки
+            count = process_history_queue(limit=batch_size)
+            if not count:
+                break
+            written += count
+            self.stdout.write(f'  ✓ Записано исторических записей: {written}')
+
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Очередь истории разобрана, записей: {written}'))
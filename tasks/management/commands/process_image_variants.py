@@ -0,0 +1,53 @@
+import time  # Пауза между проверками очереди в режиме --watch
+
+from django.core.management.base import BaseCommand  # Базовый класс для management команд
+from tasks.images import IMAGE_MODELS, VARIANTS, pending, process_next  # Уменьшенные копии изображений
+
+
+class Command(BaseCommand):
+    help = (
+        'Делает уменьшенные копии (WebP и JPEG) загруженных изображений проектов и задач '
+        '(вне запросов веб-сервера; пока копий нет, API отдает оригинал)'
+    )  # Описание команды
+
+    def add_arguments(self, parser):  # Добавляем аргументы команды
+        parser.add_argument(
+            '--watch',
+            type=float,
+            default=0,
+            help='Не завершаться, а проверять очередь каждые N секунд (по умолчанию - разобрать очередь и выйти)',
+        )
+        parser.add_argument(
+            '--redo',
+            action='store_true',
+            help='Сделать копии всех изображений заново (после изменения размеров или качества в tasks/images.py)',
+        )
+
+    def handle(self, *args, **options):  # Основная логика команды
+        """Выполнение команды"""
+        if options['redo']:
+            for model in IMAGE_MODELS:
+                count = model.objects.exclude(image_variants={}).update(image_variants={})
+                self.stdout.write(f'  → {model._meta.verbose_name_plural}: в очередь поставлено {count}')
+        processed = 0
+        while True:
+            obj = None
+            for model in IMAGE_MODELS:
+                obj = process_next(model)
+                if obj is not None:
+                    break
+            if obj is None:
+                if not options['watch']:
+                    break
+                time.sleep(options['watch'])
+                continue
+            processed += 1
+            variants = obj.image_variants
+            if 'error' in variants:
+                self.stdout.write(self.style.ERROR(f'  ✗ {obj._meta.verbose_name} #{obj.pk}: {variants["error"]}'))
+            elif options['verbosity'] > 1:
+                sizes = ', '.join(f'{name} {variants[name]["width"]}x{variants[name]["height"]}' for name in VARIANTS)
+                self.stdout.write(f'  ✓ {obj._meta.verbose_name} #{obj.pk}: {sizes}')
+
+        left = sum(pending(model).count() for model in IMAGE_MODELS)  # Загруженные во время обработки
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Обработано изображений: {processed}, в очереди осталось: {left}'))
@@ -0,0 +1,41 @@
+import time  # Пауза между проверками очереди в режиме --watch
+
+from django.core.management.base import BaseCommand  # Базовый класс для management команд
+from tasks.imports import IMPORT_CHUNK_SIZE, claim_import_job, run_import_job  # Задания импорта из админки
+
+
+class Command(BaseCommand):
+    help = 'Выполняет задания массового импорта, созданные в админке (вне запросов веб-сервера)'  # Описание команды
+
+    def add_arguments(self, parser):  # Добавляем аргументы команды
+        parser.add_argument(
+            '--watch',
+            type=float,
+            default=0,
+            help='Не завершаться, а проверять очередь каждые N секунд (по умолчанию - разобрать очередь и выйти)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=IMPORT_CHUNK_SIZE,
+            help=f'Сколько строк обрабатывать за одну транзакцию (по умолчанию {IMPORT_CHUNK_SIZE})',
+        )
+
+    def handle(self, *args, **options):  # Основная логика команды
+        """Выполнение команды"""
+        while True:
+            job = claim_import_job()  # Параллельные обработчики берут разные задания
+            if job is None:
+                if not options['watch']:
+                    break
+                time.sleep(options['watch'])
+                continue
+            self.stdout.write(f'  → Задание #{job.pk}: {job}')
+            job = run_import_job(job, chunk_size=options['chunk_size'])
+            style = self.style.SUCCESS if job.status == job.STATUS_DONE else self.style.ERROR
+            self.stdout.write(style(
+                f'  ✓ #{job.pk} {job.get_status_display()}: обработано {job.processed_rows} из {job.total_rows}, '
+                f'создано {job.created_count}, обновлено {job.updated_count}, с ошибками {job.error_count}'
+            ))
+
+        self.stdout.write(self.style.SUCCESS('\n✓ Очередь заданий импорта разобрана'))
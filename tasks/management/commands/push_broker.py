@@ -0,0 +1,29 @@
+import asyncio  # Посредник работает в цикле событий
+
+from django.conf import settings  # Путь к сокету из PUSH_BROKER
+from django.core.management.base import BaseCommand, CommandError  # Базовый класс для management команд
+from tasks.push import run_hub  # Посредник событий об изменениях
+
+
+class Command(BaseCommand):
+    help = (
+        'Посредник событий об изменениях: принимает их от всех воркеров через локальный сокет '
+        'и рассылает процессам ASGI, которые обслуживают /api/events/ (PUSH_BROKER=unix:/путь)'
+    )  # Описание команды
+
+    def add_arguments(self, parser):  # Добавляем аргументы команды
+        parser.add_argument('--socket', help='Путь к сокету (по умолчанию - из PUSH_BROKER)')
+
+    def handle(self, *args, **options):  # Основная логика команды
+        """Выполнение команды"""
+        path = options['socket']
+        if not path:
+            setting = settings.PUSH_BROKER
+            if not setting.startswith('unix:'):
+                raise CommandError('Укажите --socket или PUSH_BROKER=unix:/путь/к/сокету')
+            path = setting[len('unix:'):]
+        self.stdout.write(f'Посредник событий слушает {path}')
+        try:
+            asyncio.run(run_hub(path))
+        except KeyboardInterrupt:
+            pass
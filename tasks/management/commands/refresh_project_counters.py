@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand  # Базовый класс для management команд
+from tasks.counters import refresh_project_counters  # Пересчет счетчиков одним UPDATE
+from tasks.models import Project  # Модель проекта
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики задач во всех проектах (исправляет рассинхронизацию)'  # Описание команды
+
+    def add_arguments(self, parser):  # Добавляем аргументы команды
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько проектов пересчитывать за один запрос (по умолчанию 500)',
+        )
+        parser.add_argument(
+            '--project',
+            type=int,
+            action='append',
+            dest='projects',
+            help='ID проекта для пересчета (можно указать несколько раз)',
+        )
+
+    def handle(self, *args, **options):  # Основная логика команды
+        """Выполнение команды"""
+        batch_size = max(options['batch_size'], 1)
+        projects = Project.objects.order_by('pk')
+        if options['projects']:
+            projects = projects.filter(pk__in=options['projects'])
+
+        refreshed = 0
+        last_pk = 0
+        while True:  # Идем по первичному ключу пачками, без OFFSET
+            batch = list(projects.filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                break
+            refreshed += refresh_project_counters(batch)
+            last_pk = batch[-1]
+            self.stdout.write(f'  ✓ Пересчитано проектов: {refreshed}')
+
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Счетчики пересчитаны для {refreshed} проектов'))
@@ -0,0 +1,263 @@
+import contextvars  # Замеры текущего запроса (и в потоках gthread, и в async-коде)
+import logging  # Журнал медленных запросов
+import os  # Каталог метрик воркеров gunicorn
+import threading  # Запросы одного HTTP-запроса могут выполняться параллельно в разных потоках
+import time  # Для замера времени
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction  # Асинхронный режим middleware (ASGI)
+from django.conf import settings  # Токен /metrics и порог медленных запросов
+from django.db.backends.signals import connection_created  # Обертка SQL ставится на каждое новое подключение
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare  # Сравнение токена без утечки по времени
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess  # Сбор метрик всех воркеров gunicorn
+
+logger = logging.getLogger('tasks.slow_requests')
+
+METRICS_PATH = '/metrics'  # Сам /metrics не замеряется
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)  # N+1 виден как сдвиг в правые корзины
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+ROUTE_LABELS = ('route', 'action')  # Имя маршрута (task-list, task-overdue) и действие ViewSet, а не URL
+
+REQUESTS = Counter('todo_http_requests', 'Запросы по маршрутам и кодам ответа', ROUTE_LABELS + ('method', 'status'))
+LATENCY = Histogram(
+    'todo_http_request_duration_seconds', 'Время ответа (для потоковых ответов - до последнего байта)',
+    ROUTE_LABELS + ('method',), buckets=LATENCY_BUCKETS,
+)
+DB_QUERIES = Histogram('todo_db_queries_per_request', 'SQL-запросов на один запрос', ROUTE_LABELS, buckets=QUERY_BUCKETS)
+DB_TIME = Histogram('todo_db_time_seconds', 'Суммарное время SQL на один запрос', ROUTE_LABELS, buckets=LATENCY_BUCKETS)
+STAGE_TIME = Histogram(
+    'todo_request_stage_seconds', 'Время этапов запроса (serializer - сериализация, render - кодирование JSON)',
+    ROUTE_LABELS + ('stage',), buckets=LATENCY_BUCKETS,
+)
+RESPONSE_SIZE = Histogram('todo_http_response_size_bytes', 'Размер тела ответа', ROUTE_LABELS, buckets=SIZE_BUCKETS)
+CACHE_REQUESTS = Counter('todo_cache_requests', 'Обращения к кэшам: доля попаданий = hit / (hit + miss)', ('cache', 'result'))
+DB_POOL_CONNECTIONS = Gauge(  # livesum: сумма по живым воркерам gunicorn
+    'todo_db_pool_connections', 'Подключения пула БД: idle - свободные, busy - выданные потокам',
+    ('alias', 'state'), multiprocess_mode='livesum',
+)
+DB_POOL_WAIT = Histogram('todo_db_pool_wait_seconds', 'Ожидание подключения из пула БД', ('alias',), buckets=LATENCY_BUCKETS)
+DB_READS = Counter(
+    'todo_db_reads', 'Куда направлены читающие запросы API: replica, pinned - недавно писал, no_replica - реплики отстают',
+    ('target',),
+)
+DB_REPLICA_LAG = Gauge('todo_db_replica_lag_seconds', 'Отставание реплики при последней проверке', ('alias',), multiprocess_mode='livemax')
+DB_POOL_EVENTS = Counter(
+    'todo_db_pool_events', 'События пула БД: created/closed - подключения, timeout - не дождались, failed_check - SELECT 1',
+    ('alias', 'event'),
+)
+
+_current = contextvars.ContextVar('tasks_request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Замеры одного запроса: SQL (количество, время, текст для журнала медленных запросов) и этапы"""
+
+    def __init__(self, sql_limit):
+        self.route = 'unresolved'  # Маршрут не найден (404) или ответ дан до выбора view
+        self.action = ''
+        self.queries = 0
+        self.db_time = 0.0
+        self.sql = []  # (время, SQL) первых sql_limit запросов
+        self.sql_limit = sql_limit
+        self.stages = {}
+        self._running = set()
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        """Обертка connection.execute_wrapper"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.queries += 1
+                self.db_time += elapsed
+                if len(self.sql) < self.sql_limit:
+                    self.sql.append((elapsed, sql))
+
+    @contextmanager
+    def active(self):
+        """
+        SQL и этапы (timed) внутри блока относятся к этому запросу - в том числе в потоках,
+        куда контекст переходит через sync_to_async (ASGI, tasks/asgi.py)
+        """
+        token = _current.set(self)
+        try:
+            yield
+        finally:
+            _current.reset(token)
+
+
+def _record_query(execute, sql, params, many, context):
+    """Обертка SQL каждого подключения: запрос засчитывается HTTP-запросу из текущего контекста"""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_wrapper(sender, connection, **kwargs):
+    """
+    Подключения к БД у каждого потока свои, поэтому обертка ставится при подключении,
+    а не на время запроса. В начало списка: execute_wrapper() других блоков снимает последнюю
+    """
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _record_query)
+
+
+@contextmanager
+def timed(stage):
+    """Время этапа текущего запроса; вложенные замеры того же этапа не суммируются повторно"""
+    metrics = _current.get()
+    if metrics is None or stage in metrics._running:
+        yield
+        return
+    metrics._running.add(stage)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics._running.discard(stage)
+        metrics.stages[stage] = metrics.stages.get(stage, 0) + time.perf_counter() - started
+
+
+def cache_event(cache, hit):
+    """Попадание или промах кэша (conditional - ответы 304, stats - статистика, reference - справочники)"""
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def db_pool_state(alias, idle, busy, wait=None):
+    """Размер пула подключений (tasks/db) и, при выдаче подключения, время ожидания"""
+    DB_POOL_CONNECTIONS.labels(alias, 'idle').set(idle)
+    DB_POOL_CONNECTIONS.labels(alias, 'busy').set(busy)
+    if wait is not None:
+        DB_POOL_WAIT.labels(alias).observe(wait)
+
+
+def db_pool_event(alias, event):
+    DB_POOL_EVENTS.labels(alias, event).inc()
+
+
+def db_read_event(target):
+    """Выбор базы для чтения (tasks/replicas.py)"""
+    DB_READS.labels(target).inc()
+
+
+def db_replica_lag(alias, lag):
+    DB_REPLICA_LAG.labels(alias).set(lag)
+
+
+# Middleware: метрики по маршрутам и журнал медленных запросов
+class MetricsMiddleware:
+    """
+    Для каждого запроса считает время ответа, число и время SQL-запросов, этапы (timed),
+    размер ответа и пишет их в метрики Prometheus с метками route/action. Запросы дольше
+    SLOW_REQUEST_MS пишутся в журнал tasks.slow_requests вместе с выполненным SQL.
+    """
+    sync_capable = True
+    async_capable = True  # Под ASGI не переводит цепочку middleware в синхронный режим
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_seconds = getattr(settings, 'SLOW_REQUEST_MS', 500) / 1000
+        self.sql_limit = getattr(settings, 'SLOW_REQUEST_SQL_LIMIT', 50)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if request.path_info == METRICS_PATH:
+            return self.get_response(request)
+        metrics = RequestMetrics(self.sql_limit)
+        request.metrics = metrics
+        with metrics.active():
+            response = self.get_response(request)
+        return self._process_response(request, response, metrics)
+
+    async def __acall__(self, request):
+        if request.path_info == METRICS_PATH:
+            return await self.get_response(request)
+        metrics = RequestMetrics(self.sql_limit)
+        request.metrics = metrics
+        with metrics.active():
+            response = await self.get_response(request)
+        return self._process_response(request, response, metrics)
+
+    def _process_response(self, request, response, metrics):
+        if response.streaming:  # Выгрузка: данные читаются и SQL выполняется уже при отправке
+            response.streaming_content = self._stream(request, response, metrics, response.streaming_content)
+        else:
+            self._finish(request, response, metrics, len(response.content))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = getattr(request, 'metrics', None)
+        if metrics is None:
+            return None
+        match = request.resolver_match
+        metrics.route = match.view_name or match.route
+        actions = getattr(view_func, 'actions', None)  # ViewSet: {'get': 'list', 'post': 'create'}
+        if actions:
+            metrics.action = actions.get(request.method.lower(), '')
+        return None
+
+    def _stream(self, request, response, metrics, content):
+        content = iter(content)
+        size = 0
+        try:
+            while True:
+                with metrics.active():  # Контекст не держим между yield - генератор могут продолжить в другом потоке
+                    chunk = next(content, None)
+                if chunk is None:
+                    return
+                size += len(chunk)
+                yield chunk
+        finally:
+            self._finish(request, response, metrics, size)
+
+    def _finish(self, request, response, metrics, size):
+        duration = time.perf_counter() - metrics.started
+        labels = (metrics.route, metrics.action)
+        REQUESTS.labels(*labels, request.method, str(response.status_code)).inc()
+        LATENCY.labels(*labels, request.method).observe(duration)
+        DB_QUERIES.labels(*labels).observe(metrics.queries)
+        DB_TIME.labels(*labels).observe(metrics.db_time)
+        for stage, seconds in metrics.stages.items():
+            STAGE_TIME.labels(*labels, stage).observe(seconds)
+        RESPONSE_SIZE.labels(*labels).observe(size)
+        if duration >= self.slow_seconds:
+            sql = '\n'.join(f'  {elapsed * 1000:8.1f} мс  {statement}' for elapsed, statement in metrics.sql)
+            logger.warning(
+                'Медленный запрос %s %s (%s %s): %.0f мс, статус %s, SQL: %d за %.0f мс%s\n%s',
+                request.method, request.get_full_path(), metrics.route, metrics.action, duration * 1000,
+                response.status_code, metrics.queries, metrics.db_time * 1000,
+                f' (показаны первые {self.sql_limit})' if metrics.queries > len(metrics.sql) else '', sql,
+            )
+
+
+def metrics_view(request):
+    """
+    GET /metrics - метрики в текстовом формате Prometheus. Доступ по заголовку
+    Authorization: Bearer <METRICS_TOKEN> или для сотрудников (is_staff).
+    При запуске через gunicorn суммируются значения всех воркеров (PROMETHEUS_MULTIPROC_DIR).
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    authorized = bool(token) and constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}')
+    if not (authorized or (request.user.is_authenticated and request.user.is_staff)):
+        response = HttpResponse('Нужен токен метрик или вход сотрудника', status=401, content_type='text/plain; charset=utf-8')
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+    registry = REGISTRY
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.27 on 2026-10-18 02:24
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def fill_counters(apps, schema_editor):
+    """Заполняем счетчики для уже существующих проектов"""
+    Project = apps.get_model('tasks', 'Project')
+    Task = apps.get_model('tasks', 'Task')
+
+    def count(condition=Q()):
+        tasks = Task.objects.filter(condition, project=OuterRef('pk'))
+        counted = tasks.order_by().values('project').annotate(count=Count('id')).values('count')
+        return Coalesce(Subquery(counted, output_field=IntegerField()), Value(0))
+
+    now = timezone.now()
+    completed = Q(status__name='Завершена')
+    Project.objects.update(
+        tasks_total=count(),
+        tasks_open=count(~completed),
+        tasks_completed=count(completed),
+        tasks_overdue=count(~completed & Q(due_date__lt=now)),
+        counters_refreshed_at=now,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0003_historicalpriority_color_priority_color'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='counters_refreshed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Счетчики пересчитаны'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='tasks_completed',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Завершенных задач'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='tasks_open',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Открытых задач'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='tasks_overdue',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Просроченных задач'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='tasks_total',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Всего задач'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
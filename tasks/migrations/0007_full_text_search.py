@@ -0,0 +1,94 @@
+# Generated by Django 4.2.27 on 2026-10-18 02:29
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+def search_vector_sql(table, title_column):
+    """Триггер, который пересчитывает tsvector при изменении названия или описания"""
+    vector = ' || '.join(
+        f"setweight(to_tsvector('pg_catalog.{config}', coalesce({{row}}{column}, '')), '{weight}')"
+        for column, weight in ((title_column, 'A'), ('description', 'B'))
+        for config in ('russian', 'simple')
+    )
+    forward = f"""
+        CREATE FUNCTION {table}_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {vector.format(row='NEW.')};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql;
+
+        CREATE TRIGGER {table}_search_vector_trigger
+            BEFORE INSERT OR UPDATE OF {title_column}, description, search_vector ON {table}
+            FOR EACH ROW EXECUTE FUNCTION {table}_search_vector_update();
+
+        UPDATE {table} SET search_vector = NULL;  -- Заполняется триггером
+    """
+    reverse = f"""
+        DROP TRIGGER IF EXISTS {table}_search_vector_trigger ON {table};
+        DROP FUNCTION IF EXISTS {table}_search_vector_update();
+    """
+    return migrations.RunSQL(forward, reverse)
+
+
+class PostgreSQLOnly(migrations.SeparateDatabaseAndState):
+    """
+    Операции только для PostgreSQL (расширение, GIN индексы, триггеры на plpgsql): на других
+    базах (например, SQLite) меняется лишь состояние моделей, а поиск по tsvector и триграммам
+    на них не работает
+    """
+
+    def __init__(self, *operations):
+        super().__init__(database_operations=list(operations), state_operations=list(operations))
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0006_task_visibility_indexes'),
+    ]
+
+    operations = [
+        PostgreSQLOnly(TrigramExtension()),
+        migrations.AddField(
+            model_name='project',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        PostgreSQLOnly(
+            migrations.AddIndex(
+                model_name='project',
+                index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='project_search_vector_idx'),
+            ),
+            migrations.AddIndex(
+                model_name='project',
+                index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='project_name_trgm_idx', opclasses=['gin_trgm_ops']),
+            ),
+            migrations.AddIndex(
+                model_name='task',
+                index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='task_search_vector_idx'),
+            ),
+            migrations.AddIndex(
+                model_name='task',
+                index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='task_title_trgm_idx', opclasses=['gin_trgm_ops']),
+            ),
+            search_vector_sql('tasks_task', 'title'),
+            search_vector_sql('tasks_project', 'name'),
+        ),
+    ]
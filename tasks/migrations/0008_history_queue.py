@@ -0,0 +1,27 @@
+# Generated by Django 4.2.27 on 2026-10-18 02:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0007_full_text_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoryQueueItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100, verbose_name='Модель истории')),
+                ('payload', models.JSONField(verbose_name='Записи')),
+                ('size', models.PositiveIntegerField(verbose_name='Количество записей')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата постановки в очередь')),
+            ],
+            options={
+                'verbose_name': 'Пачка истории в очереди',
+                'verbose_name_plural': 'Очередь истории',
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.27 on 2026-10-18 02:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+import simple_history.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0008_history_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoricalTask_tags',
+            fields=[
+                ('id', models.BigIntegerField(auto_created=True, blank=True, db_index=True, verbose_name='ID')),
+                ('m2m_history_id', models.AutoField(primary_key=True, serialize=False)),
+                ('history', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, to='tasks.historicaltask')),
+                ('tag', models.ForeignKey(blank=True, db_constraint=False, db_tablespace='', null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='tasks.tag')),
+                ('task', models.ForeignKey(blank=True, db_constraint=False, db_tablespace='', null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='tasks.task')),
+            ],
+            options={
+                'verbose_name': 'HistoricalTask_tags',
+            },
+            bases=(simple_history.models.HistoricalChanges, models.Model),
+        ),
+        # Старые записи истории не знали о тегах: считаем, что теги в них совпадают с текущими,
+        # чтобы первое сравнение после миграции не показывало ложное добавление всех тегов
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO tasks_historicaltask_tags (id, task_id, tag_id, history_id)
+                SELECT tt.id, tt.task_id, tt.tag_id, h.history_id
+                FROM tasks_historicaltask h
+                JOIN tasks_task_tags tt ON tt.task_id = h.id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        # Лента истории задачи и проекта: сортировка по дате и поиск предыдущей записи по индексу
+        migrations.RunSQL(
+            sql='CREATE INDEX historicaltask_id_date_idx ON tasks_historicaltask (id, history_date, history_id)',
+            reverse_sql='DROP INDEX historicaltask_id_date_idx',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX historicaltask_project_date_idx ON tasks_historicaltask (project_id, history_date, history_id)',
+            reverse_sql='DROP INDEX historicaltask_project_date_idx',
+        ),
+    ]
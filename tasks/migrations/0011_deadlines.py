@@ -0,0 +1,99 @@
+# Generated by Django 4.2.27 on 2026-10-18 03:18
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+FILL_SQL = """
+    CREATE TEMPORARY TABLE deadline_fill ON COMMIT DROP AS
+    SELECT task.id, task.due_date, task.project_id, task.assigned_to_id, task.created_by_id,
+           COALESCE(status.name <> %(completed)s, TRUE) AS is_open,
+           COALESCE(status.name <> %(completed)s, TRUE) AND COALESCE(priority.level >= %(urgent)s, FALSE) AS is_urgent
+    FROM tasks_task task
+    LEFT JOIN tasks_status status ON status.id = task.status_id
+    LEFT JOIN tasks_priority priority ON priority.id = task.priority_id;
+
+    INSERT INTO tasks_deadlineentry (user_id, task_id, due_date, is_open, is_urgent)
+    SELECT DISTINCT users.user_id, task.id, task.due_date, task.is_open, task.is_urgent
+    FROM deadline_fill task
+    JOIN tasks_project project ON project.id = task.project_id
+    CROSS JOIN LATERAL (VALUES (project.owner_id), (task.assigned_to_id), (task.created_by_id)) AS users (user_id)
+    WHERE users.user_id IS NOT NULL AND (task.due_date IS NOT NULL OR task.is_urgent);
+
+    -- Пустая корзина: ее рассчитает первый запуск process_deadlines (без событий переходов)
+    INSERT INTO tasks_taskdeadline (task_id, due_date, bucket, next_transition_at, changed_at)
+    SELECT id, due_date, '', now(), now() FROM deadline_fill WHERE due_date IS NOT NULL AND is_open;
+"""
+
+
+def fill_deadlines(apps, schema_editor):
+    """Заполняем таблицы сроков для уже существующих задач"""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(FILL_SQL, {'completed': 'Завершена', 'urgent': 4})
+        return
+    # Другие базы (например, SQLite) - то же самое через ORM
+    Task = apps.get_model('tasks', 'Task')
+    TaskDeadline = apps.get_model('tasks', 'TaskDeadline')
+    DeadlineEntry = apps.get_model('tasks', 'DeadlineEntry')
+    now = timezone.now()
+    entries, deadlines = [], []
+    for task in Task.objects.select_related('project', 'status', 'priority').iterator():
+        is_open = task.status is None or task.status.name != 'Завершена'
+        is_urgent = is_open and task.priority is not None and task.priority.level >= 4
+        if task.due_date is not None or is_urgent:
+            users = {task.project.owner_id, task.assigned_to_id, task.created_by_id} - {None}
+            entries.extend(
+                DeadlineEntry(user_id=user_id, task_id=task.id, due_date=task.due_date, is_open=is_open, is_urgent=is_urgent)
+                for user_id in users
+            )
+        if task.due_date is not None and is_open:
+            deadlines.append(TaskDeadline(task_id=task.id, due_date=task.due_date, bucket='', next_transition_at=now, changed_at=now))
+    DeadlineEntry.objects.bulk_create(entries, batch_size=500)
+    TaskDeadline.objects.bulk_create(deadlines, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tasks', '0010_import_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskDeadline',
+            fields=[
+                ('task', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='deadline', serialize=False, to='tasks.task', verbose_name='Задача')),
+                ('due_date', models.DateTimeField(verbose_name='Срок выполнения')),
+                ('bucket', models.CharField(blank=True, choices=[('later', 'Больше недели'), ('due_soon', 'На этой неделе'), ('due_tomorrow', 'Сегодня или завтра'), ('overdue', 'Просрочена')], max_length=20, verbose_name='Корзина')),
+                ('next_transition_at', models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Следующий переход')),
+                ('changed_at', models.DateTimeField(verbose_name='Корзина изменена')),
+            ],
+            options={
+                'verbose_name': 'Срок задачи',
+                'verbose_name_plural': 'Сроки задач',
+            },
+        ),
+        migrations.CreateModel(
+            name='DeadlineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('due_date', models.DateTimeField(blank=True, null=True, verbose_name='Срок выполнения')),
+                ('is_open', models.BooleanField(verbose_name='Не завершена')),
+                ('is_urgent', models.BooleanField(verbose_name='Срочная')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tasks.task', verbose_name='Задача')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Срок задачи пользователя',
+                'verbose_name_plural': 'Сроки задач пользователей',
+                'indexes': [models.Index(fields=['user', 'due_date'], name='deadline_entry_due_idx'), models.Index(condition=models.Q(('is_open', True)), fields=['user', 'due_date'], name='deadline_entry_open_due_idx'), models.Index(condition=models.Q(('is_urgent', True)), fields=['user'], name='deadline_entry_urgent_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='deadlineentry',
+            constraint=models.UniqueConstraint(fields=('user', 'task'), name='deadline_entry_user_task_uniq'),
+        ),
+        migrations.RunPython(fill_deadlines, migrations.RunPython.noop),
+    ]
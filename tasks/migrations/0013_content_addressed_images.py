@@ -0,0 +1,32 @@
+# Generated by Django 4.2.27 on 2026-10-18 04:08
+
+from django.db import migrations, models
+import tasks.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0012_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='project',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=tasks.storage.image_storage, upload_to='projects/', verbose_name='Изображение'),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=tasks.storage.image_storage, upload_to='tasks_images/', verbose_name='Изображение'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(condition=models.Q(('image__gt', '')), fields=['image'], name='project_image_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('image__gt', '')), fields=['image'], name='task_image_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+import uuid
+
+from django.db import migrations
+from django.utils import timezone
+
+# Модели из conditional_models всех ViewSet: строки версий заводятся заранее, чтобы первый GET
+# после развертывания не писал в БД (get_versions заводит недостающие строки только на всякий случай)
+LABELS = ('auth.User', 'tasks.Priority', 'tasks.Project', 'tasks.Status', 'tasks.Tag', 'tasks.Task')
+
+
+def seed_versions(apps, schema_editor):
+    DataVersion = apps.get_model('tasks', 'DataVersion')
+    now = timezone.now()
+    DataVersion.objects.using(schema_editor.connection.alias).bulk_create(
+        [DataVersion(label=label, version=uuid.uuid4().hex, changed_at=now) for label in LABELS],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0014_data_versions'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_versions, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,20 @@
-from django.db import models  # Импортируем модели Django
+from django.db import DatabaseError, connections, models, router, transaction  # Импортируем модели Django
 from django.contrib.auth.models import User  # Встроенная модель пользователя Django
-from simple_history.models import HistoricalRecords  # Для отслеживания истории изменений
+from django.contrib.postgres.indexes import GinIndex  # GIN индексы для полнотекстового и триграммного поиска
+from django.contrib.postgres.search import SearchVectorField  # Колонка tsvector
+from .history import DeferredHistoricalRecords  # История изменений (с возможностью отложенной пакетной записи)
+from .storage import image_storage  # Изображения хранятся по хэшу содержимого, одинаковые - один раз
+
+# Названия статусов и уровни приоритета, на которые опирается бизнес-логика
+STATUS_COMPLETED = 'Завершена'
+STATUS_IN_PROGRESS = 'В работе'
+STATUS_CANCELLED = 'Отменена'
+URGENT_PRIORITY_LEVEL = 4  # Приоритет от этого уровня считается срочным
+
+# Счетчики задач проекта (обновляются автоматически, см. tasks/counters.py)
+PROJECT_COUNTER_FIELDS = ('tasks_total', 'tasks_open', 'tasks_completed', 'tasks_overdue', 'counters_refreshed_at')
+# Изображение загружено, а уменьшенные копии еще не сделаны (см. tasks/images.py)
+IMAGE_PENDING = models.Q(image_variants={}, image__gt='')
 
 
 # Модель: Приоритет задачи (справочник)
@@ -9,7 +23,7 @@ class Priority(models.Model):
     level = models.IntegerField(unique=True, verbose_name='Уровень')  # Числовой уровень приоритета (1-5)
     color = models.CharField(max_length=7, default='#6c757d', verbose_name='Цвет')  # Цвет в формате HEX для визуализации
 
-    history = HistoricalRecords()  # Отслеживание истории изменений
+    history = DeferredHistoricalRecords()  # Отслеживание истории изменений
 
     class Meta:
         verbose_name = 'Приоритет'  # Название модели в единственном числе
@@ -25,7 +39,7 @@ class Status(models.Model):
     name = models.CharField(max_length=50, unique=True, verbose_name='Название')  # Название статуса (например, "Новая", "В работе", "Завершена")
     color = models.CharField(max_length=7, default='#808080', verbose_name='Цвет')  # Цвет в формате HEX для визуализации
 
-    history = HistoricalRecords()  # Отслеживание истории изменений
+    history = DeferredHistoricalRecords()  # Отслеживание истории изменений
 
     class Meta:
         verbose_name = 'Статус'  # Название модели в единственном числе
@@ -42,7 +56,7 @@ class Tag(models.Model):
     color = models.CharField(max_length=7, default='#007bff', verbose_name='Цвет')  # Цвет тега в формате HEX
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='Пользователь')  # К какому пользователю относится тег
 
-    history = HistoricalRecords()  # Отслеживание истории изменений
+    history = DeferredHistoricalRecords()  # Отслеживание истории изменений
 
     class Meta:
         verbose_name = 'Тег'  # Название модели в единственном числе
@@ -59,20 +73,92 @@ class Project(models.Model):
     name = models.CharField(max_length=200, verbose_name='Название')  # Название проекта
     description = models.TextField(blank=True, null=True, verbose_name='Описание')  # Описание проекта (необязательное)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='owned_projects', verbose_name='Владелец')  # Владелец проекта
-    image = models.ImageField(upload_to='projects/', null=True, blank=True, verbose_name='Изображение')  # Изображение проекта
+    image = models.ImageField(upload_to='projects/', storage=image_storage, null=True, blank=True, verbose_name='Изображение')  # Изображение проекта
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name='Варианты изображения')  # Уменьшенные копии (tasks/images.py)
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')  # Автоматически заполняется при создании
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата изменения')  # Автоматически обновляется при изменении
 
-    history = HistoricalRecords()  # Отслеживание истории изменений
+    # Денормализованные счетчики задач (чтобы не делать COUNT для каждого проекта)
+    tasks_total = models.PositiveIntegerField(default=0, editable=False, verbose_name='Всего задач')
+    tasks_open = models.PositiveIntegerField(default=0, editable=False, verbose_name='Открытых задач')
+    tasks_completed = models.PositiveIntegerField(default=0, editable=False, verbose_name='Завершенных задач')
+    tasks_overdue = models.PositiveIntegerField(default=0, editable=False, verbose_name='Просроченных задач')  # На момент последнего пересчета
+    counters_refreshed_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name='Счетчики пересчитаны')
+
+    search_vector = SearchVectorField(null=True, editable=False)  # Заполняется триггером в БД (название + описание)
+
+    history = DeferredHistoricalRecords(excluded_fields=PROJECT_COUNTER_FIELDS + ('search_vector', 'image_variants'))  # Служебные поля в историю не попадают
 
     class Meta:
         verbose_name = 'Проект'  # Название модели в единственном числе
         verbose_name_plural = 'Проекты'  # Название модели во множественном числе
         ordering = ['-created_at']  # Сортировка по дате создания (новые первые)
+        indexes = [  # Индексы для keyset-пагинации списка проектов владельца
+            models.Index(fields=['owner', 'created_at', 'id'], name='project_owner_created_idx'),
+            models.Index(fields=['owner', 'updated_at', 'id'], name='project_owner_updated_idx'),
+            GinIndex(fields=['search_vector'], name='project_search_vector_idx'),  # Полнотекстовый поиск
+            GinIndex(fields=['name'], name='project_name_trgm_idx', opclasses=['gin_trgm_ops']),  # Нечеткий поиск
+            models.Index(fields=['id'], condition=IMAGE_PENDING, name='project_image_pending_idx'),  # Очередь process_image_variants
+            models.Index(fields=['image'], condition=models.Q(image__gt=''), name='project_image_idx'),  # Ссылки на файл (tasks/images.py)
+        ]
 
     def __str__(self):
         return self.name  # Строковое представление объекта
 
+    def save(self, *args, **kwargs):
+        """
+        Не перезаписываем счетчики устаревшими значениями при обычном сохранении проекта. Отложенные
+        поля (.only() / ?fields=) не сохраняются, как и в Model.save(); если строки в базе уже нет,
+        проект создается заново, как при обычном сохранении
+        """
+        if self._state.adding or kwargs.get('update_fields') is not None or kwargs.get('force_insert') or kwargs.get('force_update'):
+            return super().save(*args, **kwargs)
+        for name in ('update_fields', 'force_insert', 'force_update'):  # Явные значения по умолчанию
+            kwargs.pop(name, None)
+        deferred = self.get_deferred_fields()
+        update_fields = [
+            field.name for field in self._meta.concrete_fields
+            if not field.primary_key and field.name not in PROJECT_COUNTER_FIELDS and field.attname not in deferred
+        ]
+        try:
+            super().save(*args, **kwargs, update_fields=update_fields)
+        except DatabaseError as exc:
+            if type(exc) is not DatabaseError:  # Ошибки SQL - подклассы DatabaseError
+                raise
+            # "Save with update_fields did not affect any rows": UPDATE выполнился, транзакция цела,
+            # а строки уже нет - сохраняем заново, как обычный save(), который сделал бы INSERT
+            using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+            if connections[using].in_atomic_block:
+                transaction.set_rollback(False, using=using)  # save() пометил транзакцию из-за исключения
+            super().save(*args, **kwargs, force_insert=True)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Запоминаем исходного владельца (от него зависит, кто видит задачи проекта) и прочитанные значения"""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_owner_id = instance.__dict__.get('owner_id')
+        instance._loaded_values = dict(zip(field_names, values))  # Для событий об изменениях (tasks/push.py)
+        return instance
+
+
+# QuerySet для задач с общими фильтрами
+class TaskQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """Задачи, которые видит пользователь: в его проектах, назначенные ему или созданные им"""
+        return self.filter(pk__in=self.visible_ids(user))
+
+    @staticmethod
+    def visible_ids(user):
+        """
+        ID видимых задач как UNION трех подзапросов, каждый из которых идет по своему индексу.
+        Раньше использовался OR с JOIN на проект, из-за которого PostgreSQL читал всю таблицу.
+        """
+        owned_projects = Project.objects.filter(owner=user).order_by().values('pk')
+        in_owned_projects = Task.objects.filter(project__in=owned_projects).order_by().values('pk')
+        assigned = Task.objects.filter(assigned_to=user).order_by().values('pk')
+        created = Task.objects.filter(created_by=user).order_by().values('pk')
+        return in_owned_projects.union(assigned, created)
+
 
 # Модель: Задача
 class Task(models.Model):
@@ -83,19 +169,162 @@ class Task(models.Model):
     status = models.ForeignKey(Status, on_delete=models.SET_NULL, null=True, verbose_name='Статус')  # Статус задачи
     assigned_to = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='assigned_tasks', verbose_name='Назначена')  # Кому назначена задача (необязательно)
     due_date = models.DateTimeField(null=True, blank=True, verbose_name='Срок выполнения')  # Дата и время дедлайна (необязательно)
-    image = models.ImageField(upload_to='tasks_images/', null=True, blank=True, verbose_name='Изображение')  # Прикрепленное изображение (необязательно)
+    image = models.ImageField(upload_to='tasks_images/', storage=image_storage, null=True, blank=True, verbose_name='Изображение')  # Прикрепленное изображение (необязательно)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name='Варианты изображения')  # Уменьшенные копии (tasks/images.py)
     tags = models.ManyToManyField(Tag, blank=True, related_name='tasks', verbose_name='Теги')  # Связь многие-ко-многим с тегами
 
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')  # Когда задача была создана
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата изменения')  # Когда задача была изменена
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='created_tasks', verbose_name='Создал')  # Кто создал задачу
 
-    history = HistoricalRecords()  # Отслеживание истории изменений
+    search_vector = SearchVectorField(null=True, editable=False)  # Заполняется триггером в БД (название + описание)
+
+    history = DeferredHistoricalRecords(excluded_fields=['search_vector', 'image_variants'], m2m_fields=[tags])  # История изменений (включая набор тегов)
+
+    objects = TaskQuerySet.as_manager()  # Менеджер с дополнительными фильтрами (visible_to)
 
     class Meta:
         verbose_name = 'Задача'  # Название модели в единственном числе
         verbose_name_plural = 'Задачи'  # Название модели во множественном числе
         ordering = ['-created_at']  # Сортировка по дате создания (новые первые)
+        indexes = [  # Индексы для keyset-пагинации: (поле сортировки, id)
+            models.Index(fields=['created_at', 'id'], name='task_created_id_idx'),
+            models.Index(fields=['due_date', 'id'], name='task_due_date_id_idx'),
+            models.Index(fields=['priority', 'id'], name='task_priority_id_idx'),
+            # Индексы для подзапросов видимости (TaskQuerySet.visible_ids), позволяют читать только индекс
+            models.Index(fields=['project', 'id'], name='task_project_id_idx'),
+            models.Index(fields=['assigned_to', 'id'], name='task_assigned_to_id_idx'),
+            models.Index(fields=['created_by', 'id'], name='task_created_by_id_idx'),
+            GinIndex(fields=['search_vector'], name='task_search_vector_idx'),  # Полнотекстовый поиск
+            GinIndex(fields=['title'], name='task_title_trgm_idx', opclasses=['gin_trgm_ops']),  # Нечеткий поиск
+            models.Index(fields=['id'], condition=IMAGE_PENDING, name='task_image_pending_idx'),  # Очередь process_image_variants
+            models.Index(fields=['image'], condition=models.Q(image__gt=''), name='task_image_idx'),  # Ссылки на файл (tasks/images.py)
+        ]
 
     def __str__(self):
         return self.title  # Строковое представление объекта
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Запоминаем исходный проект, чтобы при переносе задачи пересчитать оба проекта, и прочитанные значения"""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_project_id = instance.__dict__.get('project_id')
+        instance._loaded_values = dict(zip(field_names, values))  # Для событий об изменениях (tasks/push.py)
+        return instance
+
+
+# Модель: Очередь отложенной истории изменений (для больших импортов)
+class HistoryQueueItem(models.Model):
+    model = models.CharField(max_length=100, verbose_name='Модель истории')  # Например, tasks.HistoricalTask
+    payload = models.JSONField(verbose_name='Записи')  # Список значений полей исторических записей
+    size = models.PositiveIntegerField(verbose_name='Количество записей')  # Сколько записей в пачке
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата постановки в очередь')
+
+    class Meta:
+        verbose_name = 'Пачка истории в очереди'  # Название модели в единственном числе
+        verbose_name_plural = 'Очередь истории'  # Название модели во множественном числе
+
+    def __str__(self):
+        return f'{self.model}: {self.size}'  # Строковое представление объекта
+
+
+# Модель: Задание массового импорта (выполняется вне запроса, см. tasks/imports.py)
+class ImportJob(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'В очереди'),
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_DONE, 'Завершен'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+    MODEL_CHOICES = [('tasks', 'Задачи'), ('projects', 'Проекты')]
+
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES, verbose_name='Что импортируем')
+    file = models.FileField(upload_to='imports/', verbose_name='Файл')  # CSV, XLSX, JSON - как в импорте админки
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name='Состояние')
+    total_rows = models.PositiveIntegerField(default=0, verbose_name='Строк в файле')
+    processed_rows = models.PositiveIntegerField(default=0, verbose_name='Обработано строк')
+    created_count = models.PositiveIntegerField(default=0, verbose_name='Создано')
+    updated_count = models.PositiveIntegerField(default=0, verbose_name='Обновлено')
+    error_count = models.PositiveIntegerField(default=0, verbose_name='Строк с ошибками')
+    errors = models.JSONField(default=list, blank=True, verbose_name='Ошибки')  # Первые ошибки строк: [{'row': 5, 'errors': {...}}]
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='Кто запустил')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Начало')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Окончание')
+
+    class Meta:
+        verbose_name = 'Задание импорта'  # Название модели в единственном числе
+        verbose_name_plural = 'Задания импорта'  # Название модели во множественном числе
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.get_model_display()}: {self.file.name}'  # Строковое представление объекта
+
+
+# Модель: Срок задачи в очереди планировщика сроков (см. tasks/deadlines.py)
+class TaskDeadline(models.Model):
+    BUCKET_LATER = 'later'
+    BUCKET_DUE_SOON = 'due_soon'
+    BUCKET_DUE_TOMORROW = 'due_tomorrow'
+    BUCKET_OVERDUE = 'overdue'
+    BUCKET_CHOICES = [
+        (BUCKET_LATER, 'Больше недели'),
+        (BUCKET_DUE_SOON, 'На этой неделе'),
+        (BUCKET_DUE_TOMORROW, 'Сегодня или завтра'),
+        (BUCKET_OVERDUE, 'Просрочена'),
+    ]
+
+    task = models.OneToOneField(Task, on_delete=models.CASCADE, primary_key=True, related_name='deadline', verbose_name='Задача')
+    due_date = models.DateTimeField(verbose_name='Срок выполнения')  # Копия срока задачи
+    bucket = models.CharField(max_length=20, choices=BUCKET_CHOICES, blank=True, verbose_name='Корзина')  # Пусто - еще не рассчитана
+    next_transition_at = models.DateTimeField(null=True, blank=True, db_index=True, verbose_name='Следующий переход')  # Когда задача перейдет в следующую корзину
+    changed_at = models.DateTimeField(verbose_name='Корзина изменена')
+
+    class Meta:
+        verbose_name = 'Срок задачи'  # Название модели в единственном числе
+        verbose_name_plural = 'Сроки задач'  # Название модели во множественном числе
+
+    def __str__(self):
+        return f'{self.task_id}: {self.get_bucket_display()}'  # Строковое представление объекта
+
+
+# Модель: Срок задачи для каждого пользователя, который ее видит (индекс для overdue, upcoming_week, urgent_or_tomorrow)
+class DeadlineEntry(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', verbose_name='Пользователь')  # Владелец проекта, исполнитель или создатель
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='+', verbose_name='Задача')
+    due_date = models.DateTimeField(null=True, blank=True, verbose_name='Срок выполнения')
+    is_open = models.BooleanField(verbose_name='Не завершена')
+    is_urgent = models.BooleanField(verbose_name='Срочная')  # Не завершена и приоритет от URGENT_PRIORITY_LEVEL
+
+    class Meta:
+        verbose_name = 'Срок задачи пользователя'  # Название модели в единственном числе
+        verbose_name_plural = 'Сроки задач пользователей'  # Название модели во множественном числе
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'task'], name='deadline_entry_user_task_uniq'),
+        ]
+        indexes = [  # Строки есть только у задач со сроком или срочных
+            models.Index(fields=['user', 'due_date'], name='deadline_entry_due_idx'),
+            models.Index(fields=['user', 'due_date'], name='deadline_entry_open_due_idx', condition=models.Q(is_open=True)),
+            models.Index(fields=['user'], name='deadline_entry_urgent_idx', condition=models.Q(is_urgent=True)),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.task_id}'  # Строковое представление объекта
+
+
+# Модель: Версия данных модели для ETag и Last-Modified ответов API (см. tasks/conditional.py)
+class DataVersion(models.Model):
+    label = models.CharField(max_length=100, primary_key=True, verbose_name='Модель')  # Например, tasks.Task
+    version = models.CharField(max_length=32, verbose_name='Версия')  # Меняется после каждого коммита с изменениями модели
+    changed_at = models.DateTimeField(verbose_name='Дата изменения')
+
+    class Meta:
+        verbose_name = 'Версия данных'  # Название модели в единственном числе
+        verbose_name_plural = 'Версии данных'  # Название модели во множественном числе
+
+    def __str__(self):
+        return f'{self.label}: {self.version}'  # Строковое представление объекта
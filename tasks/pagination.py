@@ -0,0 +1,271 @@
+import base64  # Для кодирования курсора в строку
+import json  # Курсор хранится как JSON
+
+from django.core.paginator import Paginator  # Пагинатор Django (админка)
+from django.db import connections  # Оценки количества строк из статистики PostgreSQL
+from django.db.models import F, Q  # Для сортировки и условий "после курсора"
+from django.utils.functional import cached_property  # Количество считается один раз на страницу
+from django.utils.dateparse import parse_datetime  # Для восстановления дат из курсора
+from rest_framework.exceptions import NotFound  # Ошибка при неверном курсоре
+from rest_framework.pagination import BasePagination  # Базовый класс пагинации DRF
+from rest_framework.response import Response  # Для возврата JSON ответов
+from rest_framework.settings import api_settings  # Настройки REST_FRAMEWORK (PAGE_SIZE)
+from rest_framework.utils.urls import remove_query_param, replace_query_param  # Для построения ссылок
+
+
+ESTIMATED_COUNT_THRESHOLD = 50000  # Начиная с какого количества строк админка показывает оценку вместо COUNT(*)
+
+
+# Пагинатор админки: для больших таблиц количество берется из оценки планировщика PostgreSQL
+class EstimatedCountPaginator(Paginator):
+    """
+    COUNT(*) по большой таблице читает ее целиком. Если по оценке PostgreSQL строк больше
+    ESTIMATED_COUNT_THRESHOLD, показываем оценку (pg_class.reltuples для всей таблицы,
+    EXPLAIN для списка с фильтрами); точный COUNT(*) - только для небольших выборок.
+    """
+    estimate_threshold = ESTIMATED_COUNT_THRESHOLD
+
+    @cached_property
+    def count(self):
+        estimate = self.estimated_count()
+        if estimate is None or estimate < self.estimate_threshold:
+            return super().count
+        return estimate
+
+    def estimated_count(self):
+        """Оценка количества строк без чтения таблицы (None - оценить нельзя)"""
+        queryset = self.object_list
+        if not hasattr(queryset, 'query') or connections[queryset.db].vendor != 'postgresql':
+            return None
+        with connections[queryset.db].cursor() as cursor:
+            if not queryset.query.where:  # Вся таблица - статистика, которую обновляет autovacuum
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+                return row[0] if row and row[0] >= 0 else None  # -1: таблицу еще не анализировали
+            sql, params = queryset.order_by().query.sql_with_params()
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        return int(plan[0]['Plan']['Plan Rows'])
+
+
+# Keyset-пагинация (по курсору): без COUNT(*) и OFFSET
+class KeysetPagination(BasePagination):
+    """
+    Следующая страница начинается сразу после последней записи текущей:
+    WHERE (поле, id) > (значение, id) ORDER BY поле, id LIMIT N.
+    Курсор непрозрачный (base64 от JSON) и хранит сортировку, поэтому ссылки стабильны.
+    """
+    cursor_query_param = 'cursor'  # ?cursor=...
+    ordering_query_param = 'ordering'  # ?ordering=-due_date
+    page_size_query_param = 'page_size'  # ?page_size=50
+    page_size = api_settings.PAGE_SIZE  # Размер страницы по умолчанию
+    max_page_size = 100  # Жесткое ограничение размера страницы
+    invalid_cursor_message = 'Неверный курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        orderings = view.get_keyset_orderings()  # Разрешенные сортировки, первая - по умолчанию
+        self.unique_field = view.get_keyset_unique_field()  # Уникальное поле для разрешения равных значений
+
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            if cursor['o'] not in orderings:
+                raise NotFound(self.invalid_cursor_message)
+            self.ordering = cursor['o']  # Сортировка берется из курсора, а не из параметров
+        else:
+            ordering = request.query_params.get(self.ordering_query_param)
+            self.ordering = ordering if ordering in orderings else orderings[0]
+
+        field = self.ordering.lstrip('-')
+        backwards = bool(cursor and cursor['r'])  # Запрошена предыдущая страница
+        descending = self.ordering.startswith('-') != backwards  # Направление обхода в SQL
+        nulls_last = not backwards  # NULL всегда в конце списка (при обходе назад - в начале)
+
+        if cursor is not None:
+            queryset = queryset.filter(self._after_cursor(field, cursor['v'], cursor['i'], descending, nulls_last))
+
+        order = [
+            self._order_expression(field, descending, nulls_last, self._nullable(queryset.model, field)),
+            self._order_expression(self.unique_field, descending, nulls_last, False),
+        ]
+        rows = list(queryset.order_by(*order)[:self.page_size + 1])  # Одна лишняя строка - признак следующей страницы
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if backwards:
+            rows.reverse()
+            self.has_next, self.has_previous = cursor is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        """Размер страницы из ?page_size= с ограничением сверху"""
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.page[-1], backwards=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self._link(self.page[0], backwards=True)
+
+    def _link(self, row, backwards):
+        cursor = {
+            'o': self.ordering,
+            'v': self._encode_value(self._get_value(row, self.ordering.lstrip('-'))),
+            'i': self._get_value(row, self.unique_field),
+            'r': backwards,
+        }
+        url = remove_query_param(self.base_url, self.ordering_query_param)  # Сортировка уже в курсоре
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(cursor))
+
+    def encode_cursor(self, cursor):
+        data = json.dumps(cursor, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            data = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+            cursor = json.loads(data)
+            cursor['v'] = self._decode_value(cursor['v'])
+            return {'o': str(cursor['o']), 'v': cursor['v'], 'i': cursor['i'], 'r': bool(cursor['r'])}
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def _encode_value(value):
+        """Даты сохраняем с пометкой типа, чтобы восстановить их при разборе курсора"""
+        if hasattr(value, 'isoformat'):
+            return {'dt': value.isoformat()}
+        return value
+
+    @staticmethod
+    def _decode_value(value):
+        if isinstance(value, dict):
+            parsed = parse_datetime(value['dt'])
+            if parsed is None:
+                raise ValueError('Неверная дата в курсоре')
+            return parsed
+        return value
+
+    @staticmethod
+    def _get_value(row, path):
+        """Значение поля строки по пути вида priority__level"""
+        if isinstance(row, dict) and path in row:  # Строка из values()
+            return row[path]
+        value = row
+        for part in path.split('__'):
+            if value is None:
+                return None
+            value = value[part] if isinstance(value, dict) else getattr(value, part)
+        return value
+
+    @staticmethod
+    def _nullable(model, path):
+        """Может ли значение по пути вида priority__level быть NULL"""
+        nullable = False
+        for part in path.split('__'):
+            model_field = model._meta.get_field(part)
+            nullable = nullable or model_field.null
+            model = model_field.related_model
+        return nullable
+
+    @staticmethod
+    def _order_expression(field, descending, nulls_last, nullable):
+        expression = F(field)
+        if not nullable:  # Без NULLS FIRST/LAST: такую сортировку PostgreSQL берет из обычного индекса
+            return expression.desc() if descending else expression.asc()
+        if descending:
+            return expression.desc(nulls_last=True) if nulls_last else expression.desc(nulls_first=True)
+        return expression.asc(nulls_last=True) if nulls_last else expression.asc(nulls_first=True)
+
+    def _after_cursor(self, field, value, unique_value, descending, nulls_last):
+        """Условие "строка идет после курсора" в порядке обхода"""
+        lookup = 'lt' if descending else 'gt'
+        after_unique = Q(**{f'{self.unique_field}__{lookup}': unique_value})
+        if value is None:  # Курсор стоит в группе строк с NULL
+            condition = Q(**{f'{field}__isnull': True}) & after_unique
+            if not nulls_last:  # NULL идут первыми - дальше все непустые значения
+                condition |= Q(**{f'{field}__isnull': False})
+            return condition
+        condition = Q(**{f'{field}__{lookup}': value}) | (Q(**{field: value}) & after_unique)
+        if nulls_last:  # NULL идут в конце - они тоже после курсора
+            condition |= Q(**{f'{field}__isnull': True})
+        return condition
+
+
+# Миксин для ViewSet: включает keyset-пагинацию по запросу клиента
+class KeysetPaginationMixin:
+    """
+    Пагинация по номерам страниц остается по умолчанию, а keyset-режим включается
+    параметром ?pagination=cursor (или наличием ?cursor=).
+    """
+    keyset_pagination_class = KeysetPagination
+    keyset_orderings = ('-created_at', 'created_at')  # Разрешенные сортировки (первая - по умолчанию)
+    keyset_unique_field = 'id'  # Уникальное поле для сортировки строк с одинаковым значением
+    history_actions = ()  # Ленты истории (simple_history): всегда листаются курсором по дате изменения
+    history_keyset_orderings = ('-history_date', 'history_date')
+
+    def keyset_requested(self):
+        if self.action in self.history_actions:
+            return True
+        params = self.request.query_params
+        return params.get('pagination') == 'cursor' or KeysetPagination.cursor_query_param in params
+
+    def get_keyset_orderings(self):
+        if self.action in self.history_actions:
+            return self.history_keyset_orderings
+        return self.keyset_orderings
+
+    def get_keyset_columns(self):
+        """Поля, значения которых курсор берет из строк страницы (нужны в выборке)"""
+        if not self.keyset_requested():
+            return ()
+        return tuple(sorted({ordering.lstrip('-') for ordering in self.get_keyset_orderings()}))
+
+    def get_keyset_unique_field(self):
+        if self.action in self.history_actions:
+            return 'history_id'
+        return self.keyset_unique_field
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and self.keyset_requested():
+            self._paginator = self.keyset_pagination_class()
+        return super().paginator
@@ -0,0 +1,496 @@
+import asyncio  # Поток событий и посредник работают в цикле событий ASGI
+import json  # События передаются строками JSON
+import logging  # Ошибки доставки событий
+import os  # Файл сокета посредника
+import socket  # Отправка событий посреднику из синхронного кода
+import threading  # Изменения копятся в рамках транзакции потока
+import uuid  # Эпоха нумерации событий
+from collections import deque  # Последние события для переподключившихся клиентов
+from importlib import import_module  # Движок сессий из настроек
+from types import SimpleNamespace
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async  # Сессия и пользователь читаются из БД синхронно
+from django.conf import settings  # PUSH_BROKER, ALLOWED_HOSTS, настройки сессий
+from django.contrib import auth  # Пользователь по сессии
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.db.models.fields.files import FieldFile  # Значения полей-файлов после сохранения
+from django.http import HttpResponse
+from django.http.cookie import parse_cookie
+from django.http.request import split_domain_port, validate_host
+from django.utils import timezone  # Для работы с датами и временем
+
+from .models import Project, Task
+from .transactions import commit_batch  # События отправляются только после коммита, одной пачкой на транзакцию
+
+logger = logging.getLogger('tasks.push')
+
+PUSH_PATH = '/api/events/'  # Поток событий (Server-Sent Events), обслуживается EventStreamApp мимо Django
+HISTORY_SIZE = 1000  # Последних событий для повторной отправки после переподключения (Last-Event-ID)
+QUEUE_LIMIT = 500  # Пачек в очереди медленного клиента; при переполнении он получает reset
+MAX_EVENTS = 500  # Больше изменений в одной транзакции - вместо них одно событие reset на модель
+KEEPALIVE_SECONDS = 15  # Комментарий в поток, чтобы прокси не закрывали соединение
+RETRY_MS = 3000  # Через сколько браузер переподключается
+LINE_LIMIT = 16 * 1024 * 1024  # Максимальная строка (пачка событий) в протоколе посредника
+IGNORED_FIELDS = {'updated_at', 'search_vector'}  # Служебные поля не считаются изменениями
+
+
+# --- Сбор изменений ---
+
+def loaded_values(instance):
+    """Значения полей на момент чтения из БД (Task.from_db, Project.from_db)"""
+    return getattr(instance, '_loaded_values', None) or {}
+
+
+def _stored(value):
+    """Значение, как его прочитал бы from_db: у файлов - имя, а не FieldFile"""
+    return value.name if isinstance(value, FieldFile) else value
+
+
+def _event(instance, op, fields=None, update_fields=None):
+    """Событие об изменении объекта; получатели (владельцы проектов) определяются при отправке"""
+    loaded = loaded_values(instance)
+    if op == 'updated' and fields is None:
+        fields = update_fields
+        if loaded:  # Изменившиеся поля - по сравнению с прочитанными значениями
+            fields = [
+                field.name for field in instance._meta.concrete_fields
+                if field.attname in loaded and field.name not in IGNORED_FIELDS
+                and (update_fields is None or field.name in update_fields)
+                and loaded[field.attname] != getattr(instance, field.attname)
+            ]
+            if not fields:  # Сохранение без изменений
+                return None
+    version = None if op == 'deleted' else getattr(instance, 'updated_at', None)
+    if isinstance(instance, Task):
+        users = {instance.assigned_to_id, instance.created_by_id, loaded.get('assigned_to_id'), loaded.get('created_by_id')}
+        projects = {instance.project_id, loaded.get('project_id')}
+    else:
+        users, projects = {instance.owner_id, loaded.get('owner_id')}, set()
+    instance._loaded_values = {field.attname: _stored(getattr(instance, field.attname)) for field in instance._meta.concrete_fields}
+    return {
+        'model': instance._meta.model_name,
+        'op': op,  # created, updated, deleted
+        'id': instance.pk,
+        'fields': sorted(set(fields or ()) - IGNORED_FIELDS),  # Пусто - изменились все поля (или неизвестно какие)
+        'version': (version or timezone.now()).isoformat(),
+        'users': users - {None},
+        'projects': projects - {None},
+    }
+
+
+def record_changes(instances, op, fields=None, update_fields=None):
+    """
+    Объекты созданы, изменены или удалены: клиенты получат события после коммита транзакции.
+    fields - изменившиеся поля, если они известны заранее, update_fields - поля, которые сохранялись.
+    """
+    events = [event for event in (_event(instance, op, fields, update_fields) for instance in instances) if event is not None]
+    owners = {instance.pk: instance.owner_id for instance in instances if op == 'deleted' and isinstance(instance, Project)}
+    if events:
+        _record(events, owners)
+
+
+def record_project_changes(project_ids, fields):
+    """Изменились поля проектов, обновленные мимо save() (счетчики задач)"""
+    now = timezone.now().isoformat()
+    _record([
+        {'model': 'project', 'op': 'updated', 'id': pk, 'fields': sorted(fields), 'version': now, 'users': set(), 'projects': {pk}}
+        for pk in project_ids
+    ])
+
+
+def _record(events, owners=None):
+    changes = commit_batch('push', lambda: {'events': [], 'owners': {}}, _flush)
+    if changes is None:  # Без транзакции - отправляем сразу
+        publish_changes(events, owners or {})
+        return
+    changes['events'].extend(events)
+    changes['owners'].update(owners or {})
+
+
+def _flush(changes):
+    publish_changes(changes['events'], changes['owners'])
+
+
+def _merge(events):
+    """Несколько изменений одного объекта за транзакцию - одно событие"""
+    merged = {}
+    for event in events:
+        key = (event['model'], event['id'])
+        previous = merged.get(key)
+        if previous is None:
+            merged[key] = event
+            continue
+        if event['op'] == 'deleted' and previous['op'] == 'created':  # Создан и удален в одной транзакции
+            del merged[key]
+            continue
+        op = 'deleted' if event['op'] == 'deleted' else previous['op']
+        fields = [] if not (previous['fields'] and event['fields']) else sorted(set(previous['fields']) | set(event['fields']))
+        merged[key] = dict(
+            event, op=op, fields=fields,
+            users=previous['users'] | event['users'], projects=previous['projects'] | event['projects'],
+        )
+    return list(merged.values())
+
+
+def publish_changes(events, owners):
+    """Определяем получателей (владелец проекта, исполнитель, создатель) и отправляем события брокеру"""
+    events = _merge(events)
+    project_ids = {project_id for event in events for project_id in event['projects']} - set(owners)
+    if project_ids:
+        owners = {**owners, **dict(Project.objects.filter(pk__in=project_ids).values_list('pk', 'owner_id'))}
+    published = []
+    for event in events:
+        users = event['users'] | {owners.get(project_id) for project_id in event['projects']}
+        published.append({
+            'model': event['model'], 'op': event['op'], 'id': event['id'], 'fields': event['fields'],
+            'version': event['version'], 'users': sorted(users - {None}),
+        })
+    if len(published) > MAX_EVENTS:  # Массовая операция: клиентам проще перечитать списки
+        resets = {}
+        for event in published:
+            resets.setdefault(event['model'], set()).update(event['users'])
+        now = timezone.now().isoformat()
+        published = [
+            {'model': model, 'op': 'reset', 'id': None, 'fields': [], 'version': now, 'users': sorted(users)}
+            for model, users in resets.items()
+        ]
+    if not published:
+        return
+    try:
+        get_broker().publish(published)
+    except Exception:  # Данные уже сохранены - ошибка доставки не должна ломать запрос
+        logger.exception('Не удалось отправить события об изменениях')
+
+
+# --- Брокеры ---
+
+class Subscription:
+    """Подписка одного клиента: очередь событий, которые видит пользователь"""
+
+    def __init__(self, broker, user_id, loop):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue()
+
+    def offer(self, epoch, events):
+        """Новые события (вызывается из любого потока)"""
+        visible = [event for event in events if self.user_id in event['users']]
+        if visible:
+            self.loop.call_soon_threadsafe(self._put, (epoch, visible))
+
+    def reset(self):
+        """Часть событий потеряна (например, при переподключении к посреднику)"""
+        self.loop.call_soon_threadsafe(self._put, None)
+
+    def _put(self, item):
+        if item is None or self.queue.qsize() >= QUEUE_LIMIT:  # Клиент не успевает читать - события ему уже не нужны
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            item = None
+        self.queue.put_nowait(item)
+
+    async def get(self):
+        """(эпоха, события) или None, если клиенту нужно перечитать данные"""
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """
+    Брокер в памяти процесса: события получают подписчики этого же процесса.
+    Подходит для одного процесса ASGI (в том числе для проверки и тестов).
+    """
+
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:12]  # Номера событий имеют смысл только внутри эпохи
+        self.seq = 0
+        self.history = deque(maxlen=HISTORY_SIZE)
+        self.subscribers = set()
+        self.lock = threading.Lock()
+
+    def publish(self, events):
+        """
+        Отправка событий (из любого потока). Номера назначаются, а события попадают в историю
+        и очереди подписчиков под одной блокировкой - иначе события двух потоков могли бы
+        дойти до клиента не по порядку номеров
+        """
+        with self.lock:
+            for event in events:
+                self.seq += 1
+                event['seq'] = self.seq
+            self._deliver(self.epoch, events)
+
+    def deliver(self, epoch, events):
+        """Раздаем пронумерованные события подписчикам процесса"""
+        with self.lock:
+            self._deliver(epoch, events)
+
+    def _deliver(self, epoch, events):
+        # Вызывается под self.lock: offer() только ставит события в очередь цикла событий и не блокируется
+        if epoch != self.epoch:  # Посредник перезапущен - старые номера недействительны
+            self.epoch = epoch
+            self.history.clear()
+        self.history.extend(events)
+        if events:
+            self.seq = events[-1]['seq']
+        for subscription in self.subscribers:
+            subscription.offer(epoch, events)
+
+    def subscribe(self, user_id, last_event_id=None):
+        """
+        Подписка (вызывается в цикле событий) и пропущенные после last_event_id события пользователя:
+        [] - пропущенных нет, None - их уже не восстановить (клиенту нужно перечитать данные)
+        """
+        subscription = Subscription(self, user_id, asyncio.get_running_loop())
+        with self.lock:
+            self.subscribers.add(subscription)
+            missed = self._missed(user_id, last_event_id)
+        return subscription, missed
+
+    def _missed(self, user_id, last_event_id):
+        if not last_event_id:
+            return []
+        epoch, _, seq = last_event_id.partition('-')
+        if epoch != self.epoch or not seq.isdigit() or int(seq) > self.seq:
+            return None
+        seq = int(seq)
+        if self.history and seq < self.history[0]['seq'] - 1:  # Часть событий уже вытеснена
+            return None
+        return [event for event in self.history if event['seq'] > seq and user_id in event['users']]
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscribers.discard(subscription)
+
+    def last_event_id(self):
+        return f'{self.epoch}-{self.seq}'
+
+
+class SocketBroker(LocalBroker):
+    """
+    Брокер через локальный сокет: все процессы (воркеры WSGI и ASGI) отправляют события
+    посреднику (команда push_broker), а он нумерует их и рассылает подписанным процессам ASGI.
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._socket = None
+        self._socket_lock = threading.Lock()
+        self._reader = None
+
+    def publish(self, events):
+        data = json.dumps({'events': events}, cls=DjangoJSONEncoder).encode() + b'\n'
+        with self._socket_lock:
+            for _ in range(2):  # Посредник мог перезапуститься - одна попытка переподключения
+                try:
+                    if self._socket is None:
+                        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                        self._socket.settimeout(1)
+                        self._socket.connect(self.path)
+                    self._socket.sendall(data)
+                    return
+                except OSError:
+                    if self._socket is not None:
+                        self._socket.close()
+                    self._socket = None
+        logger.warning('Посредник событий %s недоступен, не отправлено событий: %d', self.path, len(events))
+
+    def subscribe(self, user_id, last_event_id=None):
+        if self._reader is None or self._reader.done():  # Один читатель посредника на процесс
+            self._reader = asyncio.get_running_loop().create_task(self._read())
+        return super().subscribe(user_id, last_event_id)
+
+    async def _read(self):
+        connected = False
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path, limit=LINE_LIMIT)
+                writer.write(b'{"subscribe": true}\n')
+                await writer.drain()
+                if connected:  # Пока соединения не было, события могли потеряться
+                    self._reset_all()
+                connected = True
+                while line := await reader.readline():
+                    message = json.loads(line)
+                    self.deliver(message['epoch'], message['events'])
+            except (OSError, ValueError) as error:
+                logger.warning('Нет связи с посредником событий %s: %s', self.path, error)
+            await asyncio.sleep(1)
+
+    def _reset_all(self):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            subscription.reset()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Брокер процесса по настройке PUSH_BROKER: local (по умолчанию) или unix:/путь/к/сокету"""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            setting = getattr(settings, 'PUSH_BROKER', 'local') or 'local'
+            _broker = SocketBroker(setting[len('unix:'):]) if setting.startswith('unix:') else LocalBroker()
+        return _broker
+
+
+async def run_hub(path):
+    """Посредник для SocketBroker: принимает события от всех процессов и рассылает подписанным"""
+    epoch = uuid.uuid4().hex[:12]
+    seq = 0
+    subscribers = set()
+
+    async def handle(reader, writer):
+        nonlocal seq
+        try:
+            while line := await reader.readline():
+                message = json.loads(line)
+                if message.get('subscribe'):
+                    subscribers.add(writer)
+                    continue
+                events = message.get('events') or []
+                for event in events:
+                    seq += 1
+                    event['seq'] = seq
+                data = json.dumps({'epoch': epoch, 'events': events}).encode() + b'\n'
+                for subscriber in list(subscribers):
+                    if subscriber.transport.get_write_buffer_size() > LINE_LIMIT:  # Подписчик не читает - отключаем
+                        subscribers.discard(subscriber)
+                        subscriber.close()
+                        continue
+                    subscriber.write(data)
+        except (OSError, ValueError) as error:
+            logger.warning('Ошибка соединения с посредником: %s', error)
+        finally:
+            subscribers.discard(writer)
+            writer.close()
+
+    if os.path.exists(path):
+        os.unlink(path)
+    server = await asyncio.start_unix_server(handle, path, limit=LINE_LIMIT)
+    os.chmod(path, 0o660)  # Только процессы того же пользователя и группы
+    async with server:
+        await server.serve_forever()
+
+
+# --- Поток событий для браузера ---
+
+def _session_user_id(cookie_header):
+    """Пользователь по cookie сессии - так же, как в AuthenticationMiddleware"""
+    session_key = parse_cookie(cookie_header).get(settings.SESSION_COOKIE_NAME)
+    if not session_key:
+        return None
+    engine = import_module(settings.SESSION_ENGINE)
+    try:
+        user = auth.get_user(SimpleNamespace(session=engine.SessionStore(session_key)))
+    finally:
+        close_old_connections()  # Сигналов начала и конца запроса здесь нет
+    return user.pk if user.is_authenticated and user.is_active else None
+
+
+def _host_allowed(host):
+    allowed_hosts = settings.ALLOWED_HOSTS
+    if settings.DEBUG and not allowed_hosts:
+        allowed_hosts = ['.localhost', '127.0.0.1', '[::1]']
+    domain, _ = split_domain_port(host)
+    return bool(domain) and validate_host(domain, allowed_hosts)
+
+
+def _format(epoch, event):
+    data = {key: event[key] for key in ('op', 'id', 'fields', 'version')}
+    return f'id: {epoch}-{event["seq"]}\nevent: {event["model"]}\ndata: {json.dumps(data)}\n\n'
+
+
+class EventStreamApp:
+    """
+    ASGI-приложение GET /api/events/ - поток изменений задач и проектов (Server-Sent Events).
+    Каждый пользователь получает события только о задачах, которые видит (владелец проекта,
+    исполнитель, создатель), и о своих проектах:
+
+        event: task
+        data: {"op": "updated", "id": 5, "fields": ["status"], "version": "2026-10-18T10:00:00+00:00"}
+
+    op - created, updated, deleted или reset (изменений слишком много - перечитайте список).
+    Работает мимо Django-обработчика: он не замечает отключения клиента от бесконечного ответа.
+    """
+
+    async def __call__(self, scope, receive, send):
+        headers = {key.decode('latin-1').lower(): value.decode('latin-1') for key, value in scope['headers']}
+        if not _host_allowed(headers.get('host', '')):
+            return await self._plain(send, 400, 'Недопустимый заголовок Host')
+        if scope['method'] != 'GET':
+            return await self._plain(send, 405, 'Поддерживается только GET')
+        user_id = await sync_to_async(_session_user_id)(headers.get('cookie', ''))
+        if user_id is None:
+            return await self._plain(send, 401, 'Нужно войти в систему')
+
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        last_event_id = headers.get('last-event-id') or (query.get('last_event_id') or [''])[0]
+        broker = get_broker()
+        subscription, missed = broker.subscribe(user_id, last_event_id)
+        disconnected = asyncio.ensure_future(self._wait_disconnect(receive))
+        try:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),  # nginx не должен буферизовать поток
+            ]})
+            await self._body(send, f'retry: {RETRY_MS}\n\n')
+            if missed is None:
+                await self._body(send, self._reset(broker))
+            elif missed:
+                await self._body(send, ''.join(_format(broker.epoch, event) for event in missed))
+
+            while not disconnected.done():
+                getter = asyncio.ensure_future(subscription.get())
+                await asyncio.wait({getter, disconnected}, timeout=KEEPALIVE_SECONDS, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    if not disconnected.done():
+                        await self._body(send, ': keepalive\n\n')
+                    continue
+                item = getter.result()
+                if item is None:
+                    await self._body(send, self._reset(broker))
+                else:
+                    epoch, events = item
+                    await self._body(send, ''.join(_format(epoch, event) for event in events))
+        finally:
+            subscription.close()
+            disconnected.cancel()
+
+    @staticmethod
+    def _reset(broker):
+        return f'id: {broker.last_event_id()}\nevent: reset\ndata: {{}}\n\n'
+
+    @staticmethod
+    async def _wait_disconnect(receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    @staticmethod
+    async def _body(send, text):
+        await send({'type': 'http.response.body', 'body': text.encode(), 'more_body': True})
+
+    @staticmethod
+    async def _plain(send, status, text):
+        await send({'type': 'http.response.start', 'status': status, 'headers': [(b'content-type', b'text/plain; charset=utf-8')]})
+        await send({'type': 'http.response.body', 'body': text.encode()})
+
+
+def events_unavailable_view(request):
+    """GET /api/events/ при запуске через WSGI: потоку событий нужен ASGI-сервер"""
+    return HttpResponse(
+        'Поток событий доступен только при запуске через ASGI (todo_project.asgi:application)',
+        status=501, content_type='text/plain; charset=utf-8',
+    )
@@ -0,0 +1,96 @@
+import time  # Для ограничения частоты проверки версии
+
+from django.db import connection  # Снимок, прочитанный внутри транзакции, - временный
+
+from .conditional import get_versions  # Версии данных в таблице DataVersion - общие для всех воркеров
+from .metrics import cache_event  # Доля сверок без перечитывания справочников
+from .models import Priority, Status
+
+VERSION_LABELS = (Priority._meta.label, Status._meta.label)  # Версии меняет data_changed после коммита
+VERSION_CHECK_INTERVAL = 1  # Как часто (в секундах) сверять версию с таблицей версий
+MAX_AGE = 60  # Даже без смены версии перечитываем справочники не реже, чем раз в минуту
+
+
+# Кэш справочников Priority и Status в памяти процесса
+class ReferenceCache:
+    """
+    Справочники маленькие и меняются редко, поэтому каждый процесс держит их копию в памяти.
+    Версия - версии Priority и Status в таблице DataVersion (tasks/conditional.py): после коммита
+    изменения справочника все воркеры gunicorn перечитывают данные при следующей сверке версии
+    (см. VERSION_CHECK_INTERVAL), общий кэш для этого не нужен. Снимок, прочитанный внутри
+    транзакции, может содержать ее незакоммиченные строки, поэтому он не привязывается к версии
+    и перечитывается при следующей сверке.
+    """
+
+    def __init__(self):
+        self._snapshot = None  # Данные справочников: словари priorities, statuses, status_ids
+        self._version = None  # Версия, с которой загружен снимок
+        self._loaded_at = 0
+        self._checked_at = 0
+
+    def _current_version(self):
+        versions = get_versions(VERSION_LABELS)
+        return tuple(versions[label]['v'] for label in VERSION_LABELS)
+
+    def _load(self, version):
+        priorities = {
+            item['id']: item
+            for item in Priority.objects.order_by().values('id', 'name', 'level', 'color')
+        }
+        statuses = {
+            item['id']: item
+            for item in Status.objects.order_by().values('id', 'name', 'color')
+        }
+        status_ids = {item['name']: item['id'] for item in statuses.values()}
+        self._snapshot = {'priorities': priorities, 'statuses': statuses, 'status_ids': status_ids}
+        self._version = None if connection.in_atomic_block else version
+        self._loaded_at = self._checked_at = time.monotonic()
+        return self._snapshot
+
+    def snapshot(self):
+        """Актуальный снимок справочников (с периодической сверкой версии)"""
+        now = time.monotonic()
+        if self._snapshot is not None and now - self._checked_at < VERSION_CHECK_INTERVAL:
+            return self._snapshot
+        version = self._current_version()
+        stale = self._snapshot is None or version != self._version or now - self._loaded_at > MAX_AGE
+        cache_event('reference', not stale)  # Сверка версии: копия актуальна или перечитываем
+        if stale:
+            return self._load(version)
+        self._checked_at = now
+        return self._snapshot
+
+    def invalidate(self):
+        """Справочник изменился (вызывается после коммита): сброс локальной копии этого процесса"""
+        self._snapshot = None
+
+    def _lookup(self, section, key):
+        if key is None:
+            return None
+        item = self.snapshot()[section].get(key)
+        if item is None:  # Запись могла появиться в другом процессе - перечитываем один раз
+            item = self._load(self._current_version())[section].get(key)
+        return item
+
+    def priority(self, priority_id):
+        """Приоритет по id в виде словаря (как в PrioritySerializer)"""
+        return self._lookup('priorities', priority_id)
+
+    def status(self, status_id):
+        """Статус по id в виде словаря (как в StatusSerializer)"""
+        return self._lookup('statuses', status_id)
+
+    def priority_ids(self, level=None, min_level=None):
+        """ID приоритетов с указанным уровнем (или не ниже min_level)"""
+        return [
+            item['id'] for item in self.snapshot()['priorities'].values()
+            if (level is None or item['level'] == level) and (min_level is None or item['level'] >= min_level)
+        ]
+
+    def status_ids(self, *names):
+        """ID статусов по названиям (несуществующие названия пропускаются)"""
+        status_ids = self.snapshot()['status_ids']
+        return [status_ids[name] for name in names if name in status_ids]
+
+
+reference_data = ReferenceCache()  # Один экземпляр на процесс
@@ -0,0 +1,21 @@
+import orjson  # Быстрый JSON-кодировщик (C-расширение)
+from rest_framework.renderers import JSONRenderer  # Стандартный JSON-рендерер DRF
+from rest_framework.utils.encoders import JSONEncoder  # Кодирование нестандартных типов как в DRF
+
+from .metrics import timed  # Время кодирования JSON в метриках запроса
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME  # Ключи-числа и даты - как в DRF
+
+
+# JSON-рендерер на orjson: тот же результат, что у JSONRenderer в компактном режиме, но в несколько раз быстрее
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)  # Отступы и ASCII - стандартным кодировщиком
+        # Даты, Decimal, ленивые строки и т.п. кодируются так же, как в DRF
+        with timed('render'):
+            ret = orjson.dumps(data, default=JSONEncoder().default, option=ORJSON_OPTIONS)
+        # Как и DRF, экранируем U+2028 и U+2029, чтобы ответ оставался корректным JavaScript
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
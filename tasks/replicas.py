@@ -0,0 +1,190 @@
+import contextvars  # База для чтения текущего запроса (и в потоках gthread, и в async-коде)
+import logging  # Недоступные реплики
+import random  # Нагрузка делится между репликами
+import threading  # Проверку отставания выполняет один поток процесса
+import time  # Интервал проверок и окно после записи
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings  # DATABASE_REPLICAS и параметры окна после записи
+from django.core.cache import cache  # Окно после записи для клиентов без cookie (Basic-аутентификация)
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from rest_framework.permissions import SAFE_METHODS
+
+from .metrics import db_read_event, db_replica_lag  # Куда ушли чтения и отставание реплик в метриках
+
+logger = logging.getLogger('tasks.replicas')
+
+PIN_COOKIE = 'db_primary_until'  # До какого времени (unix) запросы браузера читают основную базу
+PIN_KEY_PREFIX = 'tasks:primary:'  # То же для пользователя в общем кэше: tasks:primary:<id>
+# Отставание реплики PostgreSQL в секундах; все полученное уже применено - отставания нет
+LAG_SQL = {
+    'postgresql': (
+        'SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+        'ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END'
+    ),
+}
+
+_read_alias = contextvars.ContextVar('tasks_read_alias', default=None)  # Реплика текущего запроса (None - основная)
+
+
+def replicas_enabled():
+    return bool(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+# Роутер: чтения из ReplicaReadMixin - на реплику, все остальное - на основную базу
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:  # Внутри транзакции видны ее изменения
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # На репликах те же данные, что в основной базе
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS  # Реплики получают схему репликацией
+
+
+class ReplicaSet:
+    """
+    Реплики, отстающие не больше REPLICA_MAX_LAG секунд. Отставание проверяется не чаще
+    раза в REPLICA_CHECK_INTERVAL секунд одним потоком процесса, остальные потоки в это время
+    пользуются результатом прошлой проверки. Недоступная реплика считается отстающей.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._healthy = []
+        self._checked_at = None
+
+    def choose(self):
+        """Реплика для чтения или None - читаем основную базу"""
+        now = time.monotonic()
+        interval = getattr(settings, 'REPLICA_CHECK_INTERVAL', 2)
+        if (self._checked_at is None or now - self._checked_at >= interval) and self._lock.acquire(blocking=False):
+            try:
+                self._healthy = self.check()
+                self._checked_at = time.monotonic()
+            finally:
+                self._lock.release()
+        healthy = self._healthy
+        return random.choice(healthy) if healthy else None
+
+    def check(self):
+        max_lag = getattr(settings, 'REPLICA_MAX_LAG', 2)
+        healthy = []
+        for alias in settings.DATABASE_REPLICAS:
+            lag = self.lag(alias)
+            db_replica_lag(alias, lag)
+            if lag <= max_lag:
+                healthy.append(alias)
+        return healthy
+
+    @staticmethod
+    def lag(alias):
+        """Отставание реплики в секундах (бесконечность - реплика недоступна)"""
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(LAG_SQL.get(connection.vendor, 'SELECT 0'))  # SQLite и т.п. - только доступность
+                return float(cursor.fetchone()[0])
+        except DatabaseError as exc:
+            logger.warning('Реплика %s недоступна: %s', alias, exc)
+            connection.close()
+            return float('inf')
+
+
+replica_set = ReplicaSet()
+
+
+def pin_to_primary(request, response):
+    """После записи пользователь REPLICA_PIN_SECONDS читает основную базу: реплика могла еще не получить изменения"""
+    seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+    response.set_cookie(
+        PIN_COOKIE, f'{time.time() + seconds:.3f}', max_age=seconds, httponly=True, samesite='Lax',
+        secure=settings.SESSION_COOKIE_SECURE,
+    )
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        cache.set(f'{PIN_KEY_PREFIX}{user.pk}', True, seconds)
+
+
+def pinned_to_primary(request):
+    try:
+        if float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time():
+            return True
+    except ValueError:
+        pass
+    return request.user.is_authenticated and cache.get(f'{PIN_KEY_PREFIX}{request.user.pk}') is not None
+
+
+def replica_may_lag(changed_at):
+    """
+    Данные текущего запроса читаются с реплики, а изменились позже, чем REPLICA_PIN_SECONDS назад:
+    реплика могла их еще не получить, и ETag новой версии закрепил бы у клиента старые данные
+    """
+    seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+    return _read_alias.get() is not None and time.time() - changed_at < seconds
+
+
+# Миксин для ViewSet: безопасные запросы читают реплику
+class ReplicaReadMixin:
+    """
+    GET, HEAD и OPTIONS после аутентификации переключаются на реплику (DATABASE_REPLICAS), если
+    пользователь недавно ничего не менял (PrimaryPinMiddleware) и есть реплика с допустимым
+    отставанием. Сессия и пользователь читаются еще из основной базы. Изменяющие запросы,
+    транзакции и потоковая выгрузка после ответа view идут в основную базу.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method not in SAFE_METHODS or not replicas_enabled():
+            return
+        if pinned_to_primary(request):
+            db_read_event('pinned')
+            return
+        alias = replica_set.choose()
+        db_read_event('replica' if alias else 'no_replica')
+        _read_alias.set(alias)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        _read_alias.set(None)  # Поток gthread обслужит следующий запрос с тем же контекстом
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+# Middleware: окно чтения основной базы после изменяющих запросов
+class PrimaryPinMiddleware:
+    """Успешный POST/PUT/PATCH/DELETE закрепляет пользователя за основной базой (pin_to_primary)"""
+    sync_capable = True
+    async_capable = True  # Под ASGI не переводит цепочку middleware в синхронный режим
+
+    def __init__(self, get_response):
+        if not replicas_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if self._wrote(request, response):
+            pin_to_primary(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self._wrote(request, response):
+            await sync_to_async(pin_to_primary)(request, response)  # Кэш может быть файловым или в БД
+        return response
+
+    @staticmethod
+    def _wrote(request, response):
+        return request.method not in SAFE_METHODS and response.status_code < 400
@@ -0,0 +1,204 @@
+from django.conf import settings  # Для проверки USE_TZ
+from django.utils import timezone  # Даты выводятся в текущем часовом поясе, как в DRF
+from rest_framework import ISO_8601  # Формат дат DRF по умолчанию
+from rest_framework.fields import DateTimeField  # Для нестандартного DATETIME_FORMAT
+from rest_framework.settings import api_settings  # Настройки REST_FRAMEWORK (DATETIME_FORMAT)
+
+from .images import thumb_url, variant_urls  # Ссылки на уменьшенные копии изображения
+from .models import Task
+from .metrics import timed  # Время сериализации в метриках запроса
+from .reference import reference_data  # Приоритеты и статусы из кэша справочников
+from .search import highlight_html  # Подсветка совпадений с экранированным текстом
+
+TaskTag = Task.tags.through  # Промежуточная таблица задача-тег
+SKIP = object()  # Поле не выводится (как SkipField в DRF, например assigned_to_username без исполнителя)
+TAG_FIELDS = ('tags', 'tags_list', 'tags_details')
+IMAGE_STORAGE = Task._meta.get_field('image').storage
+
+# Какие колонки values() нужны для каждого поля сериализатора
+COLUMNS = {
+    'id': ('id',),
+    'title': ('title',),
+    'description': ('description',),
+    'project': ('project_id',),
+    'project_name': ('project_id', 'project__name'),
+    'priority': ('priority_id',),
+    'priority_name': ('priority_id',),
+    'priority_details': ('priority_id',),
+    'status': ('status_id',),
+    'status_name': ('status_id',),
+    'status_details': ('status_id',),
+    'assigned_to': ('assigned_to_id',),
+    'assigned_to_username': ('assigned_to_id', 'assigned_to__username'),
+    'due_date': ('due_date',),
+    'image': ('image',),
+    'image_thumb': ('image', 'image_variants'),
+    'image_variants': ('image', 'image_variants'),
+    'tags': ('id',),
+    'tags_list': ('id',),
+    'tags_details': ('id',),
+    'created_at': ('created_at',),
+    'updated_at': ('updated_at',),
+    'created_by': ('created_by_id',),
+    'created_by_username': ('created_by_id', 'created_by__username'),
+}
+
+
+# Быстрая сериализация задач только для чтения: строки из values() вместо объектов моделей
+class TaskRows:
+    """
+    Дает тот же JSON, что TaskSerializer / TaskListSerializer (поля берутся из Meta.fields
+    сериализатора), но без создания объектов моделей и вложенных сериализаторов на каждую
+    строку: одна выборка values() с JOIN по проекту и пользователям, теги - одним запросом
+    на всю страницу, приоритеты и статусы - из кэша справочников.
+    """
+
+    def __init__(self, serializer_class, request=None, fields=None):
+        self.request = request
+        self.fields = list(serializer_class.Meta.fields) if fields is None else list(fields)  # fields - выборочные поля (?fields=)
+        unknown = [name for name in self.fields if name not in COLUMNS]
+        if unknown:
+            raise ValueError(f'Поля без быстрой сериализации: {unknown}')
+        self.with_tags = any(name in TAG_FIELDS for name in self.fields)
+        self._datetime = self._datetime_converter()
+        self._tags = {}
+
+    def values(self, queryset, extra=()):
+        """values() с нужными колонками (и аннотациями поиска, если был ?search=)"""
+        columns = dict.fromkeys(column for name in self.fields for column in COLUMNS[name])
+        search = [
+            name for name in queryset.query.annotations
+            if name == 'search_rank' or name.startswith('search_headline_')
+        ]
+        columns.update(dict.fromkeys(search))
+        columns.update(dict.fromkeys(extra))
+        return queryset.prefetch_related(None).values(*columns)
+
+    def render(self, rows, tags=None):
+        """Список словарей в том же виде, что serializer.data (tags - уже загруженные load_tags())"""
+        with timed('serializer'):
+            return self._render(list(rows), tags)
+
+    def _render(self, rows, tags):
+        if tags is None:
+            tags = self.load_tags([row['id'] for row in rows]) if self.with_tags and rows else {}
+        self._tags = tags
+        getters = [(name, getattr(self, f'_get_{name}', None) or self._plain(name)) for name in self.fields]
+        result = []
+        for row in rows:
+            item = {}
+            for name, getter in getters:
+                value = getter(row)
+                if value is not SKIP:
+                    item[name] = value
+            rank = row.get('search_rank')
+            if rank is not None:  # Как в SearchResultMixin
+                item['search_rank'] = rank
+                item['highlight'] = {
+                    key[len('search_headline_'):]: highlight_html(value)
+                    for key, value in row.items()
+                    if key.startswith('search_headline_')
+                }
+            result.append(item)
+        return result
+
+    def load_tags(self, task_ids):
+        """
+        Теги всех задач страницы одним запросом (в порядке Tag.Meta.ordering). task_ids - список
+        или подзапрос values('id'): тогда теги можно читать одновременно с самими задачами
+        """
+        tags = {}
+        rows = TaskTag.objects.filter(task_id__in=task_ids).order_by('tag__name', 'tag_id').values_list(
+            'task_id', 'tag_id', 'tag__name', 'tag__color', 'tag__user__username'
+        )
+        for task_id, tag_id, name, color, username in rows:
+            tags.setdefault(task_id, []).append({'id': tag_id, 'name': name, 'color': color, 'user_username': username})
+        return tags
+
+    @staticmethod
+    def _datetime_converter():
+        """Дата в ISO 8601 в текущем часовом поясе (как DateTimeField.to_representation)"""
+        if api_settings.DATETIME_FORMAT != ISO_8601:
+            return DateTimeField().to_representation
+        tz = timezone.get_current_timezone() if settings.USE_TZ else None
+
+        def convert(value):
+            if not value:
+                return None
+            if tz is not None:
+                value = value.astimezone(tz)
+            value = value.isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return convert
+
+    def _plain(self, name):
+        return lambda row: row[name]
+
+    def _get_project(self, row):
+        return row['project_id']
+
+    def _get_project_name(self, row):
+        return str(row['project__name'])
+
+    def _get_priority(self, row):
+        return row['priority_id']
+
+    def _get_priority_name(self, row):
+        priority = reference_data.priority(row['priority_id'])
+        return priority['name'] if priority else None
+
+    def _get_priority_details(self, row):
+        return reference_data.priority(row['priority_id'])
+
+    def _get_status(self, row):
+        return row['status_id']
+
+    def _get_status_name(self, row):
+        task_status = reference_data.status(row['status_id'])
+        return task_status['name'] if task_status else None
+
+    def _get_status_details(self, row):
+        return reference_data.status(row['status_id'])
+
+    def _get_assigned_to(self, row):
+        return row['assigned_to_id']
+
+    def _get_assigned_to_username(self, row):
+        return SKIP if row['assigned_to_id'] is None else row['assigned_to__username']
+
+    def _get_created_by(self, row):
+        return row['created_by_id']
+
+    def _get_created_by_username(self, row):
+        return SKIP if row['created_by_id'] is None else row['created_by__username']
+
+    def _get_due_date(self, row):
+        return self._datetime(row['due_date'])
+
+    def _get_created_at(self, row):
+        return self._datetime(row['created_at'])
+
+    def _get_updated_at(self, row):
+        return self._datetime(row['updated_at'])
+
+    def _get_image(self, row):
+        """Абсолютный URL файла, как ImageField в DRF"""
+        if not row['image']:
+            return None
+        url = IMAGE_STORAGE.url(row['image'])
+        return self.request.build_absolute_uri(url) if self.request is not None else url
+
+    def _get_image_thumb(self, row):
+        return thumb_url(IMAGE_STORAGE, row['image_variants'], row['image'], self.request)
+
+    def _get_image_variants(self, row):
+        return variant_urls(IMAGE_STORAGE, row['image_variants'], row['image'], self.request)
+
+    def _get_tags(self, row):
+        return [tag['id'] for tag in self._tags.get(row['id'], [])]
+
+    def _get_tags_list(self, row):
+        return self._tags.get(row['id'], [])
+
+    def _get_tags_details(self, row):
+        return self._tags.get(row['id'], [])
@@ -0,0 +1,91 @@
+import re  # Для разбора поисковой строки на слова
+
+from django.contrib.postgres.search import (  # Полнотекстовый и триграммный поиск PostgreSQL
+    SearchHeadline, SearchQuery, SearchRank, TrigramWordSimilarity,
+)
+from django.db.models import F, Q, Value  # Для условий и выражений в запросах
+from django.db import connections  # Полнотекстовый поиск есть только в PostgreSQL
+from django.db.models.functions import Greatest  # Лучшая из оценок релевантности
+from django.utils.html import escape  # Текст подсветки вводят пользователи
+from rest_framework.filters import SearchFilter  # Стандартный поиск DRF (ILIKE)
+
+SEARCH_CONFIGS = ('russian', 'simple')  # Русская морфология + точные слова (имена, коды, латиница)
+START_SEL, STOP_SEL = '\x02', '\x03'  # Границы совпадений от ts_headline: не HTML, текст экранирует highlight_html()
+HEADLINE_OPTIONS = {'start_sel': START_SEL, 'stop_sel': STOP_SEL}
+HEADLINE_SPLIT_RE = re.compile(f'([{START_SEL}{STOP_SEL}])')
+SNIPPET_OPTIONS = {'max_fragments': 2, 'max_words': 20, 'min_words': 5}  # Длинные поля показываем фрагментами
+
+
+def build_search_query(text):
+    """Поисковый запрос по префиксам слов (чтобы искать по мере ввода) для всех конфигураций"""
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    raw = ' & '.join(f'{word}:*' for word in words)  # Слова только из букв и цифр - спецсимволы tsquery не попадут
+    query = None
+    for config in SEARCH_CONFIGS:
+        config_query = SearchQuery(raw, config=config, search_type='raw')
+        query = config_query if query is None else query | config_query
+    return query
+
+
+def highlight_html(headline):
+    """
+    Подсветка из ts_headline в HTML: текст полей вводят пользователи, поэтому он экранируется,
+    и только совпадения оборачиваются в <mark> (теги всегда парные, даже если маркеры были в тексте)
+    """
+    if headline is None:
+        return None
+    result, opened = [], False
+    for part in HEADLINE_SPLIT_RE.split(headline):
+        if part == START_SEL:
+            if not opened:
+                result.append('<mark>')
+            opened = True
+        elif part == STOP_SEL:
+            if opened:
+                result.append('</mark>')
+            opened = False
+        else:
+            result.append(escape(part))
+    if opened:
+        result.append('</mark>')
+    return ''.join(result)
+
+
+# Фильтр для параметра ?search= на основе tsvector (GIN) с нечетким поиском по триграммам
+class FullTextSearchFilter(SearchFilter):
+    """
+    Используется во ViewSet, у которых задан search_vector_field. Поиск идет по
+    tsvector-колонке и по триграммам в search_trigram_fields (опечатки, части слов),
+    результаты сортируются по релевантности и получают подсветку совпадений.
+    Для остальных ViewSet и на других СУБД (SQLite в разработке) работает обычный SearchFilter.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        vector_field = getattr(view, 'search_vector_field', None)
+        if not vector_field or connections[queryset.db].vendor != 'postgresql':
+            return super().filter_queryset(request, queryset, view)
+
+        text = ' '.join(self.get_search_terms(request))
+        query = build_search_query(text)
+        if query is None:
+            return queryset
+
+        trigram_fields = getattr(view, 'search_trigram_fields', ())
+        condition = Q(**{vector_field: query})  # Совпадение по tsvector (GIN индекс)
+        for field in trigram_fields:  # Нечеткое совпадение (GIN индекс gin_trgm_ops)
+            condition |= Q(**{f'{field}__trigram_word_similar': text})
+
+        scores = [SearchRank(F(vector_field), query)]
+        scores += [TrigramWordSimilarity(Value(text), field) for field in trigram_fields]
+        rank = scores[0] if len(scores) == 1 else Greatest(*scores)
+
+        headlines = {}
+        for field in getattr(view, 'search_headline_fields', ()):
+            # Короткие поля (название) подсвечиваем целиком, длинные (описание) - фрагментами
+            options = {'highlight_all': True} if field in trigram_fields else SNIPPET_OPTIONS
+            headlines[f'search_headline_{field}'] = SearchHeadline(
+                field, query, config=SEARCH_CONFIGS[0], **HEADLINE_OPTIONS, **options
+            )
+        return queryset.filter(condition).annotate(search_rank=rank, **headlines).order_by('-search_rank', '-pk')
@@ -1,10 +1,87 @@
 from rest_framework import serializers  # Импортируем модуль сериализаторов
 from django.contrib.auth.models import User  # Модель пользователя
+from django.utils import timezone  # Для работы с датами
 from .models import Priority, Status, Tag, Project, Task  # Наши модели
+from .images import thumb_url, variant_urls  # Ссылки на уменьшенные копии изображений
+from .reference import reference_data  # Кэш справочников Priority и Status в памяти процесса
+from .search import highlight_html  # Подсветка совпадений с экранированным текстом
+from .metrics import timed  # Время сериализации в метриках запроса
+
+
+def validate_due_date_not_past(value):
+    """Проверяем, что дата окончания не раньше текущей даты"""
+    if value and value < timezone.now():  # Если дата в прошлом
+        raise serializers.ValidationError('Дата окончания не может быть в прошлом')
+    return value
+
+
+# Миксин: время сериализации попадает в метрики запроса (этап serializer, см. tasks/metrics.py)
+class TimedRepresentationMixin:
+    def to_representation(self, instance):
+        with timed('serializer'):
+            return super().to_representation(instance)
+
+
+# Миксин для результатов поиска (?search=): добавляет релевантность и подсветку совпадений
+class SearchResultMixin:
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        rank = getattr(instance, 'search_rank', None)
+        if rank is not None:  # Объект найден через FullTextSearchFilter
+            data['search_rank'] = rank
+            data['highlight'] = {
+                name[len('search_headline_'):]: highlight_html(value)
+                for name, value in vars(instance).items()
+                if name.startswith('search_headline_')
+            }
+        return data
+
+
+# Миксин: сериализатор выводит только переданные поля (?fields= / ?omit=, см. tasks/fieldsets.py)
+class SparseFieldsMixin:
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+# Миксин: приоритет и статус задачи берутся из кэша справочников, без JOIN и вложенных сериализаторов
+class TaskReferenceFieldsMixin(serializers.Serializer):
+    priority_name = serializers.SerializerMethodField()  # Название приоритета
+    priority_details = serializers.SerializerMethodField()  # Полная информация о приоритете (как в PrioritySerializer)
+    status_name = serializers.SerializerMethodField()  # Название статуса
+    status_details = serializers.SerializerMethodField()  # Полная информация о статусе (как в StatusSerializer)
+
+    def get_priority_name(self, obj):
+        priority = reference_data.priority(obj.priority_id)
+        return priority['name'] if priority else None
+
+    def get_priority_details(self, obj):
+        return reference_data.priority(obj.priority_id)
+
+    def get_status_name(self, obj):
+        status = reference_data.status(obj.status_id)
+        return status['name'] if status else None
+
+    def get_status_details(self, obj):
+        return reference_data.status(obj.status_id)
+
+
+# Миксин: ссылки на уменьшенные копии изображения (делает process_image_variants, см. tasks/images.py)
+class ImageVariantsMixin(serializers.Serializer):
+    image_thumb = serializers.SerializerMethodField()  # Превью в WebP (None - копии еще не готовы, есть только image)
+    image_variants = serializers.SerializerMethodField()  # Все размеры в WebP и JPEG с шириной и высотой
+
+    def get_image_thumb(self, obj):
+        return thumb_url(obj.image.storage, obj.image_variants, obj.image.name, self.context.get('request'))
+
+    def get_image_variants(self, obj):
+        return variant_urls(obj.image.storage, obj.image_variants, obj.image.name, self.context.get('request'))
 
 
 # Сериализатор для модели Priority (Приоритет)
-class PrioritySerializer(serializers.ModelSerializer):
+class PrioritySerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     class Meta:
         model = Priority  # Модель для сериализации
         fields = '__all__'  # Все поля модели
@@ -17,14 +94,14 @@ class PrioritySerializer(serializers.ModelSerializer):
 
 
 # Сериализатор для модели Status (Статус)
-class StatusSerializer(serializers.ModelSerializer):
+class StatusSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     class Meta:
         model = Status
         fields = '__all__'
 
 
 # Сериализатор для модели Tag (Тег)
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     user_username = serializers.CharField(source='user.username', read_only=True)  # Добавляем имя пользователя (только чтение)
 
     class Meta:
@@ -36,36 +113,32 @@ class TagSerializer(serializers.ModelSerializer):
 
 
 # Сериализатор для модели Project (Проект)
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSerializer(TimedRepresentationMixin, SparseFieldsMixin, SearchResultMixin, ImageVariantsMixin, serializers.ModelSerializer):
     owner_username = serializers.CharField(source='owner.username', read_only=True)  # Имя владельца
-    tasks_count = serializers.SerializerMethodField()  # Кастомное поле - количество задач
+    tasks_count = serializers.IntegerField(source='tasks_total', read_only=True)  # Количество задач (счетчик в проекте)
 
     class Meta:
         model = Project
-        fields = ['id', 'name', 'description', 'owner', 'owner_username', 'image', 'tasks_count', 'created_at', 'updated_at']
+        fields = [
+            'id', 'name', 'description', 'owner', 'owner_username', 'image', 'image_thumb', 'image_variants',
+            'tasks_count', 'tasks_open', 'tasks_completed', 'tasks_overdue', 'counters_refreshed_at',
+            'created_at', 'updated_at'
+        ]
         read_only_fields = ['created_at', 'updated_at']  # Эти поля только для чтения
 
-    def get_tasks_count(self, obj):  # Метод для получения количества задач
-        """Возвращает количество задач в проекте"""
-        return obj.tasks.count()
-
 
 # Упрощенный сериализатор для Project (для вложенных объектов)
-class ProjectListSerializer(serializers.ModelSerializer):
+class ProjectListSerializer(TimedRepresentationMixin, SparseFieldsMixin, SearchResultMixin, ImageVariantsMixin, serializers.ModelSerializer):
     owner_username = serializers.CharField(source='owner.username', read_only=True)
 
     class Meta:
         model = Project
-        fields = ['id', 'name', 'owner_username']
+        fields = ['id', 'name', 'owner_username', 'image_thumb']  # Для карточек списка - только превью
 
 
 # Сериализатор для модели Task (Задача)
-class TaskSerializer(serializers.ModelSerializer):
+class TaskSerializer(TimedRepresentationMixin, SparseFieldsMixin, SearchResultMixin, TaskReferenceFieldsMixin, ImageVariantsMixin, serializers.ModelSerializer):
     project_name = serializers.CharField(source='project.name', read_only=True)  # Название проекта
-    priority_name = serializers.CharField(source='priority.name', read_only=True)  # Название приоритета
-    priority_details = PrioritySerializer(source='priority', read_only=True)  # Полная информация о приоритете
-    status_name = serializers.CharField(source='status.name', read_only=True)  # Название статуса
-    status_details = StatusSerializer(source='status', read_only=True)  # Полная информация о статусе
     assigned_to_username = serializers.CharField(source='assigned_to.username', read_only=True)  # Имя ответственного
     created_by_username = serializers.CharField(source='created_by.username', read_only=True)  # Кто создал
     tags_list = TagSerializer(source='tags', many=True, read_only=True)  # Список тегов (вложенный сериализатор)
@@ -77,7 +150,7 @@ class TaskSerializer(serializers.ModelSerializer):
             'id', 'title', 'description', 'project', 'project_name',
             'priority', 'priority_name', 'priority_details',
             'status', 'status_name', 'status_details',
-            'assigned_to', 'assigned_to_username', 'due_date', 'image',
+            'assigned_to', 'assigned_to_username', 'due_date', 'image', 'image_thumb', 'image_variants',
             'tags', 'tags_list', 'tags_details', 'created_at', 'updated_at',
             'created_by', 'created_by_username'
         ]
@@ -85,10 +158,7 @@ class TaskSerializer(serializers.ModelSerializer):
 
     def validate_due_date(self, value):  # Кастомная валидация даты окончания
         """Проверяем, что дата окончания не раньше текущей даты"""
-        from django.utils import timezone  # Импортируем для работы с датами
-        if value and value < timezone.now():  # Если дата в прошлом
-            raise serializers.ValidationError('Дата окончания не может быть в прошлом')
-        return value
+        return validate_due_date_not_past(value)
 
     def validate(self, data):  # Общая валидация всех полей сразу
         """Проверяем уникальность названия задачи для пользователя"""
@@ -103,12 +173,8 @@ class TaskSerializer(serializers.ModelSerializer):
 
 
 # Упрощенный сериализатор для списка задач
-class TaskListSerializer(serializers.ModelSerializer):
+class TaskListSerializer(TimedRepresentationMixin, SparseFieldsMixin, SearchResultMixin, TaskReferenceFieldsMixin, serializers.ModelSerializer):
     project_name = serializers.CharField(source='project.name', read_only=True)
-    priority_name = serializers.CharField(source='priority.name', read_only=True)
-    priority_details = PrioritySerializer(source='priority', read_only=True)
-    status_name = serializers.CharField(source='status.name', read_only=True)
-    status_details = StatusSerializer(source='status', read_only=True)
     assigned_to_username = serializers.CharField(source='assigned_to.username', read_only=True)
     tags_details = TagSerializer(source='tags', many=True, read_only=True)
 
@@ -124,8 +190,43 @@ class TaskListSerializer(serializers.ModelSerializer):
         ]
 
 
+# Сериализатор одной задачи для массового создания (POST /api/tasks/bulk/)
+# Связанные объекты передаются как id и проверяются сразу для всей пачки (см. tasks/bulk.py)
+class BulkTaskCreateSerializer(serializers.Serializer):
+    title = serializers.CharField(max_length=200)
+    description = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    project = serializers.IntegerField()
+    priority = serializers.IntegerField(required=False, allow_null=True)
+    status = serializers.IntegerField(required=False, allow_null=True)
+    assigned_to = serializers.IntegerField(required=False, allow_null=True)
+    due_date = serializers.DateTimeField(required=False, allow_null=True)
+    tags = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+    def validate_due_date(self, value):
+        return validate_due_date_not_past(value)
+
+
+# Изменения для массового обновления задач (PATCH /api/tasks/bulk/)
+class BulkTaskUpdateSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)  # Какие задачи меняем
+    status = serializers.IntegerField(required=False, allow_null=True)
+    priority = serializers.IntegerField(required=False, allow_null=True)
+    assigned_to = serializers.IntegerField(required=False, allow_null=True)
+    due_date = serializers.DateTimeField(required=False, allow_null=True)
+    tags_add = serializers.ListField(child=serializers.IntegerField(), required=False)  # Добавить теги
+    tags_remove = serializers.ListField(child=serializers.IntegerField(), required=False)  # Убрать теги
+
+    def validate_due_date(self, value):
+        return validate_due_date_not_past(value)
+
+
+# Список задач для массового удаления (DELETE /api/tasks/bulk/)
+class BulkTaskDeleteSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+
+
 # Сериализатор для User (для отображения в API)
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name']
@@ -0,0 +1,120 @@
+from django.contrib.auth.models import User  # Имена пользователей выводятся в задачах, проектах и тегах
+from django.db import transaction  # Кэш справочников сбрасывается после коммита
+from django.db.models.signals import pre_save, post_save, post_delete, pre_delete, m2m_changed  # Сигналы сохранения и удаления
+from django.dispatch import receiver  # Декоратор для подключения обработчиков
+
+from .conditional import schedule_version_bump
+from .counters import schedule_counters_refresh
+from .deadlines import schedule_deadline_sync
+from .images import release_images
+from .push import loaded_values, record_changes
+from .models import Priority, Status, Tag, Project, Task
+from .reference import reference_data
+
+
+@receiver(post_save, sender=Task)
+def task_saved(sender, instance, raw=False, **kwargs):
+    """После сохранения задачи пересчитываем счетчики ее проекта (и старого, если задачу перенесли)"""
+    if raw:  # При загрузке фикстур ничего не пересчитываем
+        return
+    project_ids = {instance.project_id, getattr(instance, '_loaded_project_id', None)}
+    instance._loaded_project_id = instance.project_id  # Следующее сохранение сравнивается уже с новым проектом
+    schedule_counters_refresh(project_ids)
+    schedule_deadline_sync({instance.pk})
+
+
+@receiver(post_delete, sender=Task)
+def task_deleted(sender, instance, **kwargs):
+    """После удаления задачи пересчитываем счетчики проекта"""
+    schedule_counters_refresh({instance.project_id})
+
+
+@receiver([post_save, post_delete], sender=Priority)
+@receiver([post_save, post_delete], sender=Status)
+def reference_changed(sender, **kwargs):
+    """
+    Справочник изменился - сбрасываем копию этого процесса сразу (перечитанная внутри транзакции
+    копия временная и не привязывается к версии) и еще раз после коммита. Остальные процессы
+    увидят новую версию, которую после коммита запишет data_changed
+    """
+    reference_data.invalidate()
+    transaction.on_commit(reference_data.invalidate)
+
+
+@receiver(post_save, sender=Project)
+def project_saved(sender, instance, created=False, raw=False, **kwargs):
+    """Сменился владелец проекта - сроки его задач видит другой пользователь"""
+    loaded_owner_id = getattr(instance, '_loaded_owner_id', None)
+    instance._loaded_owner_id = instance.owner_id
+    if not (raw or created) and loaded_owner_id != instance.owner_id:
+        schedule_deadline_sync(project_ids={instance.pk})
+
+
+@receiver(post_save, sender=Priority)
+@receiver(post_save, sender=Status)
+@receiver(pre_delete, sender=Priority)
+@receiver(pre_delete, sender=Status)
+def reference_deadlines_changed(sender, instance, created=False, raw=False, **kwargs):
+    """Изменился уровень приоритета или название статуса - задачи могли стать срочными или завершенными"""
+    if raw or created:
+        return
+    field = 'priority' if sender is Priority else 'status'
+    schedule_deadline_sync(Task.objects.filter(**{field: instance}).values_list('pk', flat=True))
+
+
+@receiver([post_save, post_delete], sender=Priority)
+@receiver([post_save, post_delete], sender=Status)
+@receiver([post_save, post_delete], sender=Tag)
+@receiver([post_save, post_delete], sender=Project)
+@receiver([post_save, post_delete], sender=Task)
+@receiver([post_save, post_delete], sender=User)
+def data_changed(sender, update_fields=None, raw=False, **kwargs):
+    """Данные изменились - ETag ответов API, которые от них зависят, станут другими"""
+    if raw:
+        return
+    if sender is User and update_fields is not None and set(update_fields) <= {'last_login'}:
+        return  # Вход пользователя не меняет ни одного ответа API
+    schedule_version_bump(sender._meta.label)
+
+
+@receiver(m2m_changed, sender=Task.tags.through)
+def task_tags_changed(sender, instance, action, reverse=False, pk_set=None, **kwargs):
+    """Теги задачи изменились (сама задача при этом не сохраняется)"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        schedule_version_bump(Task._meta.label)
+        tasks = Task.objects.filter(pk__in=pk_set or ()) if reverse else [instance]  # tag.tasks.add(...) - задачи в pk_set
+        record_changes(tasks, 'updated', fields=['tags'])
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=Task)
+def push_saved(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    """Событие для открытых страниц пользователей, которые видят объект (tasks/push.py)"""
+    if not raw:
+        record_changes([instance], 'created' if created else 'updated', update_fields=update_fields)
+
+
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=Task)
+def push_deleted(sender, instance, **kwargs):
+    record_changes([instance], 'deleted')
+
+
+@receiver(pre_save, sender=Project)
+@receiver(pre_save, sender=Task)
+def image_replaced(sender, instance, raw=False, **kwargs):
+    """Изображение заменено или убрано - старый файл освобождается (release_images), копии сделает process_image_variants"""
+    if raw or instance._state.adding:
+        return
+    loaded = loaded_values(instance)
+    if 'image' not in loaded or loaded['image'] == instance.image.name:
+        return
+    instance.image_variants = {}
+    release_images(instance.image.storage, [(loaded['image'], loaded.get('image_variants'))])
+
+
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=Task)
+def image_deleted(sender, instance, **kwargs):
+    """Объект удален - файл изображения удаляется, если на него больше никто не ссылается"""
+    release_images(instance.image.storage, [(instance.image.name, instance.image_variants)])
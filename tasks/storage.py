@@ -0,0 +1,182 @@
+import hashlib  # Имя файла - SHA-256 содержимого
+import os  # Атомарная замена, время изменения и обход каталогов
+import posixpath  # Имена файлов в хранилище - всегда через /
+import re
+import tempfile  # Файл пишется рядом с итоговым и переименовывается целиком
+import time  # Отметка использования файла
+
+from django.conf import settings  # MEDIA_ROOT и MEDIA_GC_GRACE
+from django.core.files.move import file_move_safe  # Временный файл загрузки переносится без чтения
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+from django.http import Http404  # Файлы не из хранилища по хэшу не отдаются
+from django.views.static import serve  # Отдача файла с Last-Modified и If-Modified-Since
+
+CONTENT_DIR = 'content'  # Файлы по хэшу: content/ab/cd/<sha256>.<расширение>
+TEMP_DIR = posixpath.join(CONTENT_DIR, '.tmp')  # Недописанные файлы (удаляет collect_media)
+CHUNK_SIZE = 256 * 1024
+BLOB_RE = re.compile(rf'^{CONTENT_DIR}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/[0-9a-f]{{64}}(\.[a-z0-9]{{1,8}})?$')
+IMMUTABLE = 'public, max-age=31536000, immutable'  # Содержимое файла по хэшу не меняется никогда
+
+
+def is_blob(name):
+    """Файл хранилища по хэшу содержимого (а не загруженный раньше под исходным именем)"""
+    return bool(name) and BLOB_RE.match(name) is not None
+
+
+def _extension(name):
+    ext = posixpath.splitext(name)[1].lower()
+    return ext if re.fullmatch(r'\.[a-z0-9]{1,8}', ext) else ''
+
+
+# Хранилище изображений: одинаковые файлы хранятся один раз
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Файл сохраняется под именем из SHA-256 содержимого, поэтому один и тот же скриншот у сотни
+    задач занимает место один раз, а его URL можно кэшировать навсегда. Содержимое пишется
+    частями во временный файл рядом с итоговым (хэш считается по ходу записи) и переименовывается
+    целиком. Если хэш уже посчитан при загрузке (обработчики ContentHash*UploadHandler), уже сохраненный файл
+    не пишется заново. Файл общий, поэтому delete() напрямую не вызывается: неиспользуемые файлы
+    удаляют release_images() и collect_media (tasks/images.py).
+    """
+    content_addressed = True
+
+    def get_available_name(self, name, max_length=None):
+        return name  # Имя все равно заменит хэш содержимого - проверять существование незачем
+
+    def _save(self, name, content):
+        ext = _extension(name)
+        digest = getattr(content, 'content_hash', None)
+        if digest is not None:  # Хэш посчитан при загрузке
+            blob = self.blob_name(digest, ext)
+            if self.touch(blob):
+                return blob
+            if hasattr(content, 'temporary_file_path'):  # Большая загрузка уже на диске - переносим
+                temp = self._temp_path()
+                file_move_safe(content.temporary_file_path(), temp, allow_overwrite=True)
+                return self._commit(temp, blob)
+        temp, digest = self._write_temp(content)
+        blob = self.blob_name(digest, ext)
+        if self.touch(blob):
+            os.remove(temp)
+            return blob
+        return self._commit(temp, blob)
+
+    @staticmethod
+    def blob_name(digest, ext=''):
+        return f'{CONTENT_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{ext}'
+
+    def touch(self, name):
+        """
+        Файл уже есть - обновляем время изменения: collect_media и release_images не удаляют
+        файлы моложе MEDIA_GC_GRACE, пока сохраняющая их транзакция еще не закоммичена
+        """
+        try:
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _temp_path(self):
+        directory = self.path(TEMP_DIR)
+        os.makedirs(directory, exist_ok=True)
+        fd, path = tempfile.mkstemp(dir=directory)
+        os.close(fd)
+        return path
+
+    def _write_temp(self, content):
+        """Пишем содержимое частями во временный файл и по ходу считаем SHA-256"""
+        hasher = hashlib.sha256()
+        path = self._temp_path()
+        try:
+            with open(path, 'wb') as file:
+                for chunk in content.chunks(CHUNK_SIZE):
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    hasher.update(chunk)
+                    file.write(chunk)
+        except BaseException:
+            os.remove(path)
+            raise
+        return path, hasher.hexdigest()
+
+    def _commit(self, temp, name):
+        """Временный файл становится файлом name (одновременная запись того же содержимого безопасна)"""
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.chmod(temp, self.file_permissions_mode if self.file_permissions_mode is not None else 0o644)
+        os.replace(temp, path)
+        return name
+
+    def blobs(self):
+        """Файлы хранилища по хэшу и недописанные временные файлы: (имя, время изменения, размер)"""
+        root = self.path(CONTENT_DIR)
+        for directory, _, files in os.walk(root):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:  # Удален параллельно
+                    continue
+                name = os.path.relpath(path, self.location).replace(os.sep, '/')
+                yield name, stat.st_mtime, stat.st_size
+
+    def is_stale(self, name, grace=None):
+        """Файл не трогали дольше MEDIA_GC_GRACE секунд (его не сохраняет незакоммиченная транзакция)"""
+        grace = getattr(settings, 'MEDIA_GC_GRACE', 600) if grace is None else grace
+        try:
+            return time.time() - os.stat(self.path(name)).st_mtime > grace
+        except FileNotFoundError:
+            return False
+
+
+def image_storage():
+    """Хранилище полей image у Project и Task (вызывается при создании поля, в миграциях - ссылка на функцию)"""
+    return _image_storage
+
+
+_image_storage = ContentAddressedStorage()
+
+
+# Обработчики загрузки: SHA-256 считается, пока файл принимается от клиента
+class ContentHashMixin:
+    def new_file(self, *args, **kwargs):
+        self.hasher = hashlib.sha256()
+        super().new_file(*args, **kwargs)  # MemoryFileUploadHandler прерывает цепочку исключением
+
+    def receive_data_chunk(self, raw_data, start):
+        result = super().receive_data_chunk(raw_data, start)
+        if result is None:  # Данные остались у этого обработчика (дальше по цепочке не идут)
+            self.hasher.update(raw_data)
+        return result
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.content_hash = self.hasher.hexdigest()  # ContentAddressedStorage не будет читать файл повторно
+        return file
+
+
+class ContentHashMemoryFileUploadHandler(ContentHashMixin, MemoryFileUploadHandler):
+    pass
+
+
+class ContentHashTemporaryFileUploadHandler(ContentHashMixin, TemporaryFileUploadHandler):
+    pass
+
+
+def media_view(request, path):
+    """
+    Загруженные файлы (MEDIA_URL). Отдаются только файлы по хэшу - они кэшируются браузером и CDN
+    навсегда. Загруженные до хранилища по хэшу (до collect_media --adopt) - только в режиме
+    разработки, с проверкой по Last-Modified; недописанные файлы content/.tmp - никогда
+    """
+    path = posixpath.normpath(path).lstrip('/')  # Как в serve(): legacy/../content/.tmp - тоже content/.tmp
+    if not is_blob(path) and (not settings.DEBUG or path.startswith(f'{CONTENT_DIR}/')):
+        raise Http404
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if response.status_code == 200:
+        response['Cache-Control'] = IMMUTABLE if is_blob(path) else 'public, no-cache'
+    elif response.status_code == 304 and is_blob(path):
+        response['Cache-Control'] = IMMUTABLE
+    return response
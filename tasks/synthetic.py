@@ -0,0 +1,431 @@
+import io  # Буфер для COPY
+import json  # Колонки JSONField в COPY
+import math  # Параметры логнормального распределения
+import random  # Воспроизводимые (по seed) случайные данные
+import time  # Скорость загрузки в отчете
+from contextlib import contextmanager  # Транзакция на пачку
+from datetime import timedelta  # Для работы с временными интервалами
+
+from django.conf import settings  # Для проверки SIMPLE_HISTORY_ENABLED
+from django.contrib.auth.hashers import make_password  # Хэш пароля считается один раз на всех пользователей
+from django.contrib.auth.models import User  # Модель пользователя
+from django.db import connection, transaction  # COPY и транзакция на пачку
+from django.utils import timezone  # Для работы с датами и временем
+
+from .conditional import schedule_version_bump  # Строки вставлены мимо ORM - сбрасываем версии кэша
+from .counters import refresh_project_counters  # Пересчет счетчиков проектов одним UPDATE
+from .deadlines import sync_deadlines  # Таблицы сроков задач
+from .models import DeadlineEntry, Priority, Project, Status, Tag, Task, TaskDeadline, STATUS_CANCELLED, STATUS_COMPLETED
+
+LOAD_BATCH_SIZE = 20000  # Задач на одну пачку (одна транзакция, по одному COPY на таблицу)
+COUNTERS_BATCH_SIZE = 500  # Проектов на один UPDATE счетчиков
+
+# Доли значений: большая часть задач завершена или новая, критических мало
+STATUS_WEIGHTS = {'Новая': 25, 'В работе': 20, 'На проверке': 8, STATUS_COMPLETED: 40, STATUS_CANCELLED: 7}
+PRIORITY_WEIGHTS = {1: 10, 2: 25, 3: 35, 4: 20, 5: 10}  # По уровню приоритета
+STATUS_PATH = ('Новая', 'В работе', 'На проверке')  # Промежуточные статусы в истории задачи
+TAGS_PER_TASK_WEIGHTS = (35, 35, 20, 10)  # Доли задач с 0, 1, 2 и 3 тегами
+TEAM_SIZE = 4  # Сколько соседних пользователей (кроме владельца) могут работать в проекте
+TASK_SPREAD = 1.0  # Разброс размеров проектов (sigma логнормального распределения)
+
+TITLE_VERBS = ['Подготовить', 'Проверить', 'Исправить', 'Обновить', 'Согласовать', 'Описать', 'Настроить', 'Перенести']
+TITLE_NOUNS = ['отчет', 'договор', 'макет', 'сервер', 'документацию', 'бюджет', 'презентацию', 'релиз', 'тесты', 'план']
+PROJECT_NOUNS = ['Сайт', 'Ремонт', 'Отпуск', 'Запуск', 'Исследование', 'Переезд', 'Учеба', 'Маркетинг', 'Найм']
+TAG_NAMES = ['Работа', 'Личное', 'Срочно', 'Дом', 'Покупки', 'Здоровье', 'Идеи', 'Встречи', 'Финансы', 'Учеба']
+TAG_COLORS = ['#007bff', '#28a745', '#dc3545', '#ffc107', '#17a2b8', '#6f42c1', '#fd7e14', '#20c997']
+WORDS = ['нужно', 'срочно', 'клиент', 'сроки', 'данные', 'версия', 'проверка', 'задача', 'команда', 'итог', 'ошибка']
+
+
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def _copy_text(value):
+    return value.translate(_COPY_ESCAPES)
+
+
+def _copy_bool(value):
+    return 't' if value else 'f'
+
+
+def _copy_date(value):
+    return value.isoformat()
+
+
+def _copy_json(value):
+    return _copy_text(json.dumps(value))
+
+
+def _copy_converter(field):
+    """Функция перевода значения колонки в текстовый формат COPY (выбирается один раз на колонку)"""
+    internal_type = field.get_internal_type()
+    if internal_type == 'BooleanField':
+        convert = _copy_bool
+    elif internal_type in ('DateTimeField', 'DateField'):
+        convert = _copy_date
+    elif internal_type in ('CharField', 'TextField', 'FileField', 'ImageField', 'EmailField'):
+        convert = _copy_text
+    elif internal_type == 'JSONField':
+        convert = _copy_json
+    else:  # Числа и внешние ключи
+        convert = str
+
+    def convert_nullable(value):
+        return '\\N' if value is None else convert(value)
+    return convert_nullable
+
+
+class RowWriter:
+    """
+    Запись строк мимо ORM (без save(), сигналов и auto_now) через COPY FROM STDIN.
+    id выделяются заранее блоком из последовательности, чтобы сразу ссылаться на них
+    из тегов и истории.
+    """
+
+    @contextmanager
+    def batch(self):
+        """Транзакция на пачку; без ожидания записи WAL на диск (при сбое теряются только последние пачки)"""
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL synchronous_commit TO OFF')
+            yield
+
+    def reserve_ids(self, model, count):
+        """Первый id из блока в count подряд идущих id (последовательность сдвигается сразу на весь блок)"""
+        table, column = model._meta.db_table, model._meta.pk.column
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT setval(pg_get_serial_sequence(%s, %s), nextval(pg_get_serial_sequence(%s, %s)) + %s - 1) - %s + 1',
+                [table, column, table, column, count, count],
+            )
+            return cursor.fetchone()[0]
+
+    def write(self, model, rows):
+        """Вставка строк (словари attname -> значение, у всех строк одинаковые ключи)"""
+        if not rows:
+            return
+        fields = [field for field in model._meta.concrete_fields if field.attname in rows[0]]
+        converters = [(field.attname, _copy_converter(field)) for field in fields]
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write('\t'.join([convert(row[attname]) for attname, convert in converters]))
+            buffer.write('\n')
+        buffer.seek(0)
+        table = connection.ops.quote_name(model._meta.db_table)
+        columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(f'COPY {table} ({columns}) FROM STDIN', buffer)
+
+
+class SyntheticDataGenerator:
+    """
+    Генератор данных для нагрузочного тестирования: пользователи, теги, проекты, задачи,
+    теги задач и история. Распределения неравномерные, как в реальной базе: размеры проектов
+    логнормальные (несколько больших проектов и много маленьких), задачи назначаются в основном
+    владельцу и ближайшим коллегам, большая часть завершена, сроки сгущаются около текущей даты.
+    При одинаковом seed получаются одинаковые данные (относительно текущей даты).
+    """
+
+    def __init__(self, users, projects_per_user, tasks_per_project, tags, history_depth, seed=None,
+                 prefix='load', password='password123', batch_size=LOAD_BATCH_SIZE, defer_indexes=False, log=None):
+        self.users = users
+        self.projects_per_user = projects_per_user
+        self.tasks_per_project = tasks_per_project
+        self.tags = tags
+        # Записей истории на задачу (0 - без истории; у проектов и тегов - одна запись '+')
+        self.history_depth = history_depth if getattr(settings, 'SIMPLE_HISTORY_ENABLED', True) else 0
+        self.prefix = prefix
+        self.password = password
+        self.batch_size = max(batch_size, 1)
+        self.defer_indexes = defer_indexes
+        self.log = log or (lambda message: None)
+        self.rng = random.Random(seed)
+        self.writer = RowWriter()
+        self.now = timezone.now()
+        self.counts = dict.fromkeys(('users', 'tags', 'projects', 'tasks', 'task_tags', 'history'), 0)
+
+    # --- Распределения ---
+
+    def _weighted(self, weights, objects):
+        """Объекты справочника и их веса (справочники без веса получают вес 1)"""
+        return list(objects.values()), [weights.get(key, 1) for key in objects]
+
+    def _team(self, owner_index):
+        """Владелец и несколько соседних пользователей; чем дальше от владельца, тем реже назначение"""
+        size = self.rng.randint(0, min(TEAM_SIZE, len(self.user_ids) - 1))
+        team = [self.user_ids[(owner_index + offset) % len(self.user_ids)] for offset in range(size + 1)]
+        return team, [1 / (rank + 1) ** 1.5 for rank in range(len(team))]
+
+    def _project_size(self):
+        """Число задач проекта: логнормальное со средним tasks_per_project"""
+        if self.tasks_per_project <= 0:
+            return 0
+        mu = math.log(self.tasks_per_project) - TASK_SPREAD ** 2 / 2
+        return max(1, round(self.rng.lognormvariate(mu, TASK_SPREAD)))
+
+    def _created_at(self):
+        """Дата создания: чаще недавняя (экспоненциально, в среднем 3 месяца назад, не старше 2 лет)"""
+        age = min(self.rng.expovariate(1 / 90), 730)
+        return self.now - timedelta(days=age, seconds=self.rng.randrange(86400))
+
+    def _due_date(self, created_at, status_name):
+        """Срок: у 20% задач нет срока; у открытых задач часть сроков - в ближайшую неделю или просрочена"""
+        roll = self.rng.random()
+        if roll < 0.2:
+            return None
+        if status_name not in (STATUS_COMPLETED, STATUS_CANCELLED) and roll < 0.45:
+            return self.now + timedelta(hours=self.rng.uniform(-72, 7 * 24))  # Горящие сроки вокруг текущей даты
+        return created_at + timedelta(days=self.rng.gammavariate(2, 7), hours=self.rng.randrange(24))
+
+    def _sentence(self, words):
+        return ' '.join(self.rng.choices(WORDS, k=words)).capitalize() + '.'
+
+    # --- Загрузка ---
+
+    def run(self):
+        """Создает все данные; возвращает количества созданных строк и время загрузки в секундах"""
+        started = time.perf_counter()
+        self.statuses, self.status_weights = self._weighted(STATUS_WEIGHTS, {s.name: s for s in Status.objects.all()})
+        self.status_by_name = {status.name: status for status in self.statuses}
+        self.priorities, self.priority_weights = self._weighted(
+            PRIORITY_WEIGHTS, {p.level: p for p in Priority.objects.all()}
+        )
+        self._create_users()
+        self._create_tags()
+        projects = self._create_projects()
+        with self._deferred_indexes():
+            self._create_tasks(projects)
+        self._refresh_counters([project['id'] for project in projects])
+        self._sync_deadlines([project['id'] for project in projects])
+        schedule_version_bump(Tag._meta.label, Project._meta.label, Task._meta.label)
+        with connection.cursor() as cursor:  # Свежая статистика - иначе планы запросов будут для пустых таблиц
+            for model in (User, Tag, Project, Task, Task.tags.through, Task.history.model, TaskDeadline, DeadlineEntry):
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+        self.counts['seconds'] = round(time.perf_counter() - started, 1)
+        return self.counts
+
+    @contextmanager
+    def _deferred_indexes(self):
+        """
+        Индексы задач из Meta.indexes (включая GIN) снимаются на время загрузки и строятся
+        заново одним проходом по таблице - это быстрее, чем обновлять их на каждую строку
+        """
+        if not self.defer_indexes:
+            yield
+            return
+        with connection.cursor() as cursor:
+            existing = connection.introspection.get_constraints(cursor, Task._meta.db_table)
+        indexes = [index for index in Task._meta.indexes if index.name in existing]
+        with connection.schema_editor() as editor:
+            for index in indexes:
+                editor.remove_index(Task, index)
+        try:
+            yield
+        finally:
+            self.log(f'  … Строим индексы задач: {len(indexes)}')
+            with connection.schema_editor() as editor:
+                for index in indexes:
+                    editor.add_index(Task, index)
+
+    def _history_rows(self, model, rows, history_user_ids):
+        """Записи истории '+' для только что созданных объектов"""
+        if self.history_depth <= 0:
+            return []
+        first_id = self.writer.reserve_ids(model.history.model, len(rows))
+        history_ids = range(first_id, first_id + len(rows))
+        tracked = {field.attname for field in model.history.model._meta.concrete_fields}
+        return [
+            {
+                **{key: value for key, value in row.items() if key in tracked},
+                'history_id': history_id,
+                'history_date': row['created_at'] if 'created_at' in row else self.now,
+                'history_change_reason': None,
+                'history_type': '+',
+                'history_user_id': user_id,
+            }
+            for row, history_id, user_id in zip(rows, history_ids, history_user_ids)
+        ]
+
+    def _create_users(self):
+        first_id = self.writer.reserve_ids(User, self.users)
+        self.user_ids = list(range(first_id, first_id + self.users))
+        password = make_password(self.password)
+        rows = [
+            {
+                'id': user_id, 'password': password, 'last_login': None, 'is_superuser': False,
+                'username': f'{self.prefix}_{index:07d}', 'first_name': '', 'last_name': '',
+                'email': f'{self.prefix}_{index:07d}@example.com', 'is_staff': False, 'is_active': True,
+                'date_joined': self.now - timedelta(days=730),
+            }
+            for index, user_id in enumerate(self.user_ids)
+        ]
+        for start in range(0, len(rows), self.batch_size):
+            with self.writer.batch():
+                self.writer.write(User, rows[start:start + self.batch_size])
+        self.counts['users'] = len(rows)
+        self.log(f'  ✓ Пользователей: {len(rows)}')
+
+    def _create_tags(self):
+        self.tag_ids = {}  # Пользователь -> id его тегов (первые используются чаще)
+        total = self.users * self.tags
+        if not total:
+            return
+        next_id = self.writer.reserve_ids(Tag, total)
+        rows = []
+        for user_id in self.user_ids:
+            self.tag_ids[user_id] = list(range(next_id, next_id + self.tags))
+            for number, tag_id in enumerate(self.tag_ids[user_id]):
+                name = TAG_NAMES[number % len(TAG_NAMES)] + (f' {number // len(TAG_NAMES) + 1}' if number >= len(TAG_NAMES) else '')
+                rows.append({'id': tag_id, 'name': name, 'color': self.rng.choice(TAG_COLORS), 'user_id': user_id})
+            next_id += self.tags
+        history = self._history_rows(Tag, rows, [row['user_id'] for row in rows])
+        for start in range(0, total, self.batch_size):
+            with self.writer.batch():
+                self.writer.write(Tag, rows[start:start + self.batch_size])
+                self.writer.write(Tag.history.model, history[start:start + self.batch_size])
+        self.counts['tags'] = total
+        self.log(f'  ✓ Тегов: {total}')
+
+    def _create_projects(self):
+        total = self.users * self.projects_per_user
+        if not total:
+            return []
+        next_id = self.writer.reserve_ids(Project, total)
+        rows = []
+        for owner_index, owner_id in enumerate(self.user_ids):
+            for number in range(self.projects_per_user):
+                created_at = self._created_at() - timedelta(days=30)  # Проект старше своих первых задач
+                rows.append({
+                    'id': next_id, 'name': f'{self.rng.choice(PROJECT_NOUNS)} {number + 1}',
+                    'description': self._sentence(8) if self.rng.random() < 0.5 else None,
+                    'owner_id': owner_id, 'image': '', 'image_variants': {}, 'created_at': created_at, 'updated_at': created_at,
+                    'tasks_total': 0, 'tasks_open': 0, 'tasks_completed': 0, 'tasks_overdue': 0,
+                    'counters_refreshed_at': None, '_owner_index': owner_index,
+                })
+                next_id += 1
+        history = self._history_rows(Project, rows, [row['owner_id'] for row in rows])
+        for start in range(0, total, self.batch_size):
+            with self.writer.batch():
+                self.writer.write(Project, rows[start:start + self.batch_size])
+                self.writer.write(Project.history.model, history[start:start + self.batch_size])
+        self.counts['projects'] = total
+        self.log(f'  ✓ Проектов: {total}')
+        return rows
+
+    def _create_tasks(self, projects):
+        """Задачи пачками по batch_size: в памяти одновременно только одна пачка"""
+        batch = []
+        started = time.perf_counter()
+        for project in projects:
+            team, team_weights = self._team(project['_owner_index'])
+            for number in range(self._project_size()):
+                batch.append(self._task(project, number, team, team_weights))
+            if len(batch) >= self.batch_size:
+                self._write_tasks(batch)
+                batch = []
+                rate = self.counts['tasks'] / max(time.perf_counter() - started, 1e-6)
+                self.log(f'  ✓ Задач: {self.counts["tasks"]} ({rate:.0f} в секунду)')
+        if batch:
+            self._write_tasks(batch)
+        self.log(f'  ✓ Задач: {self.counts["tasks"]}, тегов задач: {self.counts["task_tags"]}, '
+                 f'записей истории: {self.counts["history"]}')
+
+    def _task(self, project, number, team, team_weights):
+        status = self.rng.choices(self.statuses, self.status_weights)[0] if self.statuses else None
+        created_at = max(self._created_at(), project['created_at'])
+        updated_at = created_at + (self.now - created_at) * self.rng.random() ** 3  # Чаще меняются вскоре после создания
+        owner_id = project['owner_id']
+        tags = self.tag_ids.get(owner_id, [])
+        tag_count = min(self.rng.choices(range(len(TAGS_PER_TASK_WEIGHTS)), TAGS_PER_TASK_WEIGHTS)[0], len(tags))
+        return {
+            'title': f'{self.rng.choice(TITLE_VERBS)} {self.rng.choice(TITLE_NOUNS)} #{number + 1}',  # Уникально в проекте
+            'description': self._sentence(self.rng.randint(5, 30)) if self.rng.random() < 0.6 else None,
+            'project_id': project['id'],
+            'priority_id': self.rng.choices(self.priorities, self.priority_weights)[0].pk if self.priorities else None,
+            'status_id': status.pk if status else None,
+            'assigned_to_id': self.rng.choices(team, team_weights)[0] if self.rng.random() < 0.8 else None,
+            'due_date': self._due_date(created_at, status.name if status else None),
+            'image': '',
+            'image_variants': {},
+            'created_at': created_at,
+            'updated_at': updated_at,
+            'created_by_id': owner_id if self.rng.random() < 0.7 else self.rng.choices(team, team_weights)[0],
+            # Теги: первые теги пользователя используются заметно чаще остальных
+            '_tags': sorted(set(self.rng.choices(tags, [1 / (rank + 1) for rank in range(len(tags))], k=tag_count))),
+        }
+
+    def _write_tasks(self, tasks):
+        first_id = self.writer.reserve_ids(Task, len(tasks))
+        task_tags = []
+        for task_id, task in enumerate(tasks, first_id):
+            task['id'] = task_id
+            task_tags.extend({'task_id': task_id, 'tag_id': tag_id} for tag_id in task['_tags'])
+        if task_tags:
+            first_tag_row_id = self.writer.reserve_ids(Task.tags.through, len(task_tags))
+            for row_id, row in enumerate(task_tags, first_tag_row_id):
+                row['id'] = row_id
+        history, history_tags = self._task_history(tasks, task_tags)
+        with self.writer.batch():
+            self.writer.write(Task, tasks)  # Служебные ключи (_tags) не являются колонками и не пишутся
+            self.writer.write(Task.tags.through, task_tags)
+            self.writer.write(Task.history.model, history)
+            self.writer.write(Task.history.model.tags.model, history_tags)
+        self.counts['tasks'] += len(tasks)
+        self.counts['task_tags'] += len(task_tags)
+        self.counts['history'] += len(history)
+
+    def _task_history(self, tasks, task_tags):
+        """
+        history_depth записей на задачу: '+' при создании, затем '~' с движением по статусам,
+        последняя запись совпадает с текущим состоянием. В каждой записи - снимок тегов.
+        """
+        if self.history_depth <= 0:
+            return [], []
+        history_model = Task.history.model
+        tracked = [field.attname for field in history_model.tracked_fields]
+        tags_by_task = {}
+        for row in task_tags:
+            tags_by_task.setdefault(row['task_id'], []).append(row)
+        next_id = self.writer.reserve_ids(history_model, len(tasks) * self.history_depth)
+        history, history_tags = [], []
+        status_names = {status.pk: status.name for status in self.statuses}
+        last = self.history_depth - 1
+        for task in tasks:
+            final = status_names.get(task['status_id'])
+            path = STATUS_PATH[:STATUS_PATH.index(final)] if final in STATUS_PATH else STATUS_PATH  # Статусы до текущего
+            for step in range(self.history_depth):
+                record = {attname: task[attname] for attname in tracked}
+                if step < last:  # Промежуточное состояние: статус еще не финальный или другой приоритет
+                    status = self.status_by_name.get(path[step]) if step < len(path) else None
+                    if status is not None:
+                        record['status_id'] = status.pk
+                    elif self.priorities:
+                        record['priority_id'] = self.rng.choices(self.priorities, self.priority_weights)[0].pk
+                    record['updated_at'] = task['created_at'] + (task['updated_at'] - task['created_at']) * step / last
+                record.update({
+                    'history_id': next_id,
+                    'history_date': task['created_at'] if step == 0 else record['updated_at'],
+                    'history_change_reason': None,
+                    'history_type': '+' if step == 0 else '~',
+                    'history_user_id': task['created_by_id'] if step == 0 else (task['assigned_to_id'] or task['created_by_id']),
+                })
+                history.append(record)
+                history_tags.extend({**row, 'history_id': next_id} for row in tags_by_task.get(task['id'], ()))
+                next_id += 1
+        if history_tags:
+            first_id = self.writer.reserve_ids(history_model.tags.model, len(history_tags))
+            for row_id, row in enumerate(history_tags, first_id):
+                row['m2m_history_id'] = row_id
+        return history, history_tags
+
+    def _refresh_counters(self, project_ids):
+        for start in range(0, len(project_ids), COUNTERS_BATCH_SIZE):
+            refresh_project_counters(project_ids[start:start + COUNTERS_BATCH_SIZE])
+        if project_ids:
+            self.log(f'  ✓ Счетчики пересчитаны для {len(project_ids)} проектов')
+
+    def _sync_deadlines(self, project_ids):
+        synced = 0
+        for start in range(0, len(project_ids), COUNTERS_BATCH_SIZE):  # Без событий: это не переходы сроков
+            synced += sync_deadlines(project_ids=project_ids[start:start + COUNTERS_BATCH_SIZE], events=False)
+        if synced:
+            self.log(f'  ✓ Сроки рассчитаны для {synced} задач')
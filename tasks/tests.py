@@ -1,2 +1,1947 @@
-# Здесь будут тесты для приложения tasks
-# from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from importlib import import_module
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+
+import psycopg2
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.models import Q
+from django.http import Http404
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, resolve
+from django.utils import timezone
+from PIL import Image
+from prometheus_client import REGISTRY
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INTRANS, TRANSACTION_STATUS_UNKNOWN
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from . import views
+from .asgi import async_read_urls, shutdown_db_executor
+from .bulk import MAX_BULK_ITEMS
+from .conditional import ConditionalGetMixin, get_versions
+from .counters import refresh_project_counters
+from .db.base import DatabaseWrapper as PooledDatabaseWrapper, pool_stats
+from .db.pool import ConnectionPool
+from .deadlines import (
+    SOON_PERIOD, DeadlineTransition, advance_deadlines, deadline_bucket, deadline_transitions, sync_deadlines,
+)
+from .export import CSV_DEFAULT_FIELDS
+from .history import deferred_history, process_history_queue
+from .images import FORMATS, build_variants, collect_garbage, process_next, variant_files
+from .imports import TaskImporter, run_import_job
+from .models import (
+    STATUS_COMPLETED, URGENT_PRIORITY_LEVEL, DataVersion, DeadlineEntry, HistoryQueueItem, ImportJob, Priority, Project,
+    Status, Tag, Task, TaskDeadline,
+)
+from .pagination import EstimatedCountPaginator, KeysetPagination
+from .push import HISTORY_SIZE, MAX_EVENTS, QUEUE_LIMIT, LocalBroker, _merge, publish_changes
+from .renderers import FastJSONRenderer
+from .reference import ReferenceCache, reference_data
+from .replicas import PIN_COOKIE, ReplicaRouter, ReplicaSet, _read_alias, replica_may_lag, replica_set
+from .rows import TaskRows
+from .search import STOP_SEL, START_SEL, highlight_html
+from .serializers import TaskListSerializer, TaskSerializer
+from .storage import IMMUTABLE, is_blob, media_view
+from .transactions import commit_batch
+from .urls import router
+from .views import STATS_VERSION_LABELS, TaskViewSet
+
+# Маршруты API с асинхронными действиями, как при ASYNC_VIEWS=True (AsyncReadTests)
+urlpatterns = [path('api/', include(async_read_urls(router.urls)))]
+
+
+# Общие данные для тестов API: пользователь, проект, справочники и задачи
+class TaskDataMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', password='secret')
+        cls.other = User.objects.create_user('other', password='secret')
+        cls.project = Project.objects.create(name='Проект', owner=cls.user)
+        cls.low = Priority.objects.create(name='Низкий', level=1)
+        cls.high = Priority.objects.create(name='Высокий', level=4)
+        cls.new = Status.objects.create(name='Новая')
+        cls.done = Status.objects.create(name='Завершена')
+        cls.tag = Tag.objects.create(name='Работа', user=cls.user)
+        now = timezone.now()
+        cls.tasks = []
+        for number in range(7):
+            task = Task.objects.create(
+                title=f'Задача {number}', description=f'Описание {number}', project=cls.project,
+                priority=(cls.low, cls.high, None)[number % 3], status=(cls.new, cls.done)[number % 2],
+                assigned_to=cls.other if number % 2 else None, created_by=cls.user,
+                due_date=now + timedelta(days=number) if number % 4 else None,  # Есть задачи без срока
+            )
+            if number % 2 == 0:
+                task.tags.add(cls.tag)
+            cls.tasks.append(task)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class TaskRowsTests(TaskDataMixin, TestCase):
+    """TaskRows дает побайтно тот же JSON, что сериализаторы DRF"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        blob = f'content/ab/cd/{"ab" * 32}.png'
+        variants = {'source': blob}
+        for variant, size in (('medium', 1024), ('thumb', 200)):
+            variants[variant] = {'width': size, 'height': size // 2, 'webp': f'content/ef/01/{variant}.webp', 'jpeg': f'content/ef/01/{variant}.jpg'}
+        Task.objects.filter(pk=cls.tasks[1].pk).update(image=blob, image_variants=variants)
+        Task.objects.filter(pk=cls.tasks[3].pk).update(image=blob, image_variants={'source': 'content/00/00/old.png'})  # Копии от старого файла
+        Task.objects.filter(pk=cls.tasks[5].pk).update(description='Строка\u2028другая "в кавычках" </script>')
+        second = Tag.objects.create(name='Архив', color='#ff0000', user=cls.other)
+        cls.tasks[0].tags.add(second)
+        cls.tasks[3].tags.add(second)
+
+    def setUp(self):
+        super().setUp()
+        self.request = Request(APIRequestFactory().get('/api/tasks/'))
+
+    def assertSameJSON(self, serializer_class, fields=None):
+        queryset = Task.objects.filter(project=self.project).order_by('id')
+        objects = queryset.select_related('project', 'assigned_to', 'created_by').prefetch_related('tags__user')
+        kwargs = {} if fields is None else {'fields': fields}
+        expected = serializer_class(objects, many=True, context={'request': self.request}, **kwargs).data
+        rows = TaskRows(serializer_class, self.request, fields=fields)
+        actual = rows.render(rows.values(queryset))
+        self.assertEqual(actual, expected)
+        for renderer in (JSONRenderer(), FastJSONRenderer()):
+            self.assertEqual(renderer.render(actual), renderer.render(expected))
+        return actual
+
+    def test_task_serializer(self):
+        data = self.assertSameJSON(TaskSerializer)
+        self.assertTrue(data[1]['image_thumb'].startswith('http://testserver/'))  # Набор задач проверяет и изображения
+        self.assertIsNone(data[3]['image_thumb'])
+        self.assertEqual([tag['name'] for tag in data[0]['tags_list']], ['Архив', 'Работа'])
+
+    def test_task_list_serializer(self):
+        self.assertSameJSON(TaskListSerializer)
+
+    def test_selected_fields(self):
+        self.assertSameJSON(TaskSerializer, fields=['id', 'status', 'assigned_to_username', 'due_date', 'image_thumb', 'tags_list'])
+
+
+class SearchTests(TaskDataMixin, TestCase):
+    def test_highlight_escapes_text(self):
+        headline = f'<img src=x onerror=alert(1)> {START_SEL}кот{STOP_SEL} & "пес"'
+        self.assertEqual(highlight_html(headline), '&lt;img src=x onerror=alert(1)&gt; <mark>кот</mark> &amp; &quot;пес&quot;')
+        self.assertEqual(highlight_html(f'{STOP_SEL}а{START_SEL}{START_SEL}б'), 'а<mark>б</mark>')  # Маркеры из текста - теги все равно парные
+        self.assertIsNone(highlight_html(None))
+
+    def test_serializers_escape_highlight(self):
+        headline = f'<script>x</script> {START_SEL}Задача{STOP_SEL}'
+        expected = {'title': '&lt;script&gt;x&lt;/script&gt; <mark>Задача</mark>'}
+        task = Task.objects.get(pk=self.tasks[0].pk)
+        task.search_rank, task.search_headline_title = 0.5, headline
+        self.assertEqual(TaskListSerializer(task).data['highlight'], expected)
+        rows = TaskRows(TaskListSerializer)
+        row = dict(rows.values(Task.objects.filter(pk=task.pk))[0], search_rank=0.5, search_headline_title=headline)
+        self.assertEqual(rows.render([row])[0]['highlight'], expected)
+
+    def test_fallback_without_postgres(self):
+        """На других СУБД ?search= работает как обычный SearchFilter (ILIKE по search_fields)"""
+        with mock.patch('tasks.search.connections', {DEFAULT_DB_ALIAS: SimpleNamespace(vendor='sqlite')}):
+            response = self.client.get('/api/tasks/', {'search': 'Задача 3'})
+        self.assertEqual(response.status_code, 200, response.content)
+        results = response.json()['results']
+        self.assertEqual([task['id'] for task in results], [self.tasks[3].pk])
+        self.assertNotIn('highlight', results[0])
+
+
+class SparseFieldsetTests(TaskDataMixin, TestCase):
+    def test_list_fields_from_full_serializer(self):
+        """В списке можно выбрать поля, которых нет в упрощенном TaskListSerializer (status, priority)"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/tasks/?fields=id,title,status,due_date')
+        self.assertEqual(response.status_code, 200, response.content)
+        task_queries = [query['sql'] for query in queries if 'FROM "tasks_task"' in query['sql'] and 'COUNT' not in query['sql']]
+        self.assertTrue(task_queries)
+        self.assertNotIn('"tasks_task"."description"', task_queries[-1])  # Выбираются только нужные колонки
+        results = response.json()['results']
+        self.assertEqual(len(results), len(self.tasks))
+        task = Task.objects.get(pk=results[0]['id'])
+        self.assertEqual(list(results[0]), ['id', 'title', 'status', 'due_date'])
+        self.assertEqual(results[0]['status'], task.status_id)
+
+    def test_list_without_fields_uses_list_serializer(self):
+        response = self.client.get('/api/tasks/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('status', response.json()['results'][0])
+        self.assertIn('status_name', response.json()['results'][0])
+
+    def test_unknown_field(self):
+        response = self.client.get('/api/tasks/?fields=id,secret')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fields', response.json())
+
+
+class KeysetPaginationTests(TaskDataMixin, TestCase):
+    orderings = ('-created_at', 'created_at', 'due_date', '-due_date', 'priority__level', '-priority__level')
+
+    def expected_ids(self, ordering):
+        """Порядок задач, как в SQL: NULL в конце, равные значения - по id в том же направлении"""
+        field = ordering.lstrip('-')
+        descending = ordering.startswith('-')
+        tasks = Task.objects.select_related('priority')
+        with_value = [task for task in tasks if KeysetPagination._get_value(task, field) is not None]
+        without_value = [task for task in tasks if KeysetPagination._get_value(task, field) is None]
+        with_value.sort(key=lambda task: (KeysetPagination._get_value(task, field), task.pk), reverse=descending)
+        without_value.sort(key=lambda task: task.pk, reverse=descending)
+        return [task.pk for task in with_value + without_value]
+
+    def walk(self, url, link):
+        """Страницы по ссылкам next или previous: список списков id"""
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.content)
+            data = response.json()
+            pages.append([item['id'] for item in data['results']])
+            url = data[link]
+        return pages
+
+    def test_orderings_forward_and_back(self):
+        for ordering in self.orderings:
+            with self.subTest(ordering=ordering):
+                first = f'/api/tasks/?pagination=cursor&page_size=2&ordering={ordering}'
+                pages = self.walk(first, 'next')
+                ids = [pk for page in pages for pk in page]
+                self.assertEqual(ids, self.expected_ids(ordering))  # Без дубликатов и пропусков
+                self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+
+                last = self.client.get(first)
+                for _ in pages[1:]:
+                    last = self.client.get(last.json()['next'])
+                self.assertIsNone(last.json()['next'])
+                back = self.walk(last.json()['previous'], 'previous')
+                self.assertEqual(back, pages[-2::-1])  # Назад - те же страницы в обратном порядке
+
+    def test_first_page_has_no_previous(self):
+        data = self.client.get('/api/tasks/?pagination=cursor&page_size=3').json()
+        self.assertIsNone(data['previous'])
+        self.assertNotIn('count', data)  # Без COUNT(*)
+
+    def test_cursor_round_trip(self):
+        paginator = KeysetPagination()
+        moment = timezone.now()
+        cursor = {'o': '-due_date', 'v': paginator._encode_value(moment), 'i': 42, 'r': True}
+        encoded = paginator.encode_cursor(cursor)
+        self.assertNotIn('=', encoded)
+        request = APIRequestFactory().get('/', {'cursor': encoded})
+        decoded = paginator.decode_cursor(Request(request))
+        self.assertEqual(decoded, {'o': '-due_date', 'v': moment, 'i': 42, 'r': True})
+
+    def test_invalid_cursor(self):
+        paginator = KeysetPagination()
+        foreign = paginator.encode_cursor({'o': 'title', 'v': 'x', 'i': 1, 'r': False})  # Сортировки нет в keyset_orderings
+        bad_date = paginator.encode_cursor({'o': 'due_date', 'v': {'dt': 'вчера'}, 'i': 1, 'r': False})
+        for cursor in ('not-a-cursor', 'e30', foreign, bad_date):
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/api/tasks/', {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+
+
+class CommitBatchTests(TestCase):
+    def batch(self, flushed):
+        return commit_batch('test', list, flushed.append)
+
+    def test_one_flush_per_transaction(self):
+        flushed = []
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.batch(flushed).append(1)
+            self.batch(flushed).append(2)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(flushed, [[1, 2]])
+
+    def test_rolled_back_batch_is_replaced(self):
+        flushed = []
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.batch(flushed).append('откат')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            self.batch(flushed).append('коммит')  # Пакет из откатившегося savepoint не используется
+        self.assertEqual(flushed, [['коммит']])
+
+    def test_outside_transaction(self):
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            self.assertIsNone(self.batch([]))
+
+
+class ReferenceCacheTests(TransactionTestCase):
+    """Кэш справочников: версия в таблице DataVersion, сброс только после коммита"""
+
+    def setUp(self):
+        self.priority = Priority.objects.create(name='Низкий', level=1)
+        reference_data.invalidate()
+        self.addCleanup(reference_data.invalidate)
+
+    def name(self, cache=reference_data):
+        cache._checked_at = 0  # Следующее обращение сверяет версию, не дожидаясь VERSION_CHECK_INTERVAL
+        priority = cache.priority(self.priority.pk)
+        return priority and priority['name']
+
+    def test_invalidated_after_commit(self):
+        self.assertEqual(self.name(), 'Низкий')
+        version = reference_data._version
+        with transaction.atomic():
+            self.priority.name = 'Обычный'
+            self.priority.save()
+            self.assertEqual(reference_data.priority(self.priority.pk)['name'], 'Обычный')
+            self.assertIsNone(reference_data._version)  # Внутри транзакции копия временная
+        self.assertEqual(self.name(), 'Обычный')
+        self.assertNotIn(reference_data._version, (None, version))  # После коммита - новая версия
+
+    def test_rollback_keeps_version(self):
+        self.assertEqual(self.name(), 'Низкий')
+        version = reference_data._version
+        try:
+            with transaction.atomic():
+                self.priority.name = 'Откатится'
+                self.priority.save()
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(self.name(), 'Низкий')
+        self.assertEqual(reference_data._version, version)
+
+    def test_other_process_sees_new_version(self):
+        other = ReferenceCache()  # Копия другого воркера: сигналы этого процесса ее не сбрасывают
+        self.assertEqual(self.name(other), 'Низкий')
+        self.priority.name = 'Обычный'
+        self.priority.save()
+        self.assertEqual(self.name(other), 'Обычный')
+
+    def test_snapshot_inside_transaction_is_provisional(self):
+        other = ReferenceCache()
+        try:
+            with transaction.atomic():
+                created = Priority.objects.create(name='Временный', level=2)
+                self.assertEqual(other.priority(created.pk)['name'], 'Временный')
+                self.assertIsNone(other._version)  # Незакоммиченные строки не привязываются к версии
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        other._checked_at = 0
+        self.assertIsNone(other.priority(created.pk))
+
+
+class DeferredHistoryTests(TaskDataMixin, TestCase):
+    def history_count(self):
+        return Task.history.count()
+
+    def test_history_written_once_before_commit(self):
+        before = self.history_count()
+        with CaptureQueriesContext(connection) as queries:
+            with deferred_history():
+                for task in self.tasks:
+                    task.title += ' (изменена)'
+                    task.save()
+                self.assertEqual(self.history_count(), before)  # Пока только в буфере
+        self.assertEqual(self.history_count(), before + len(self.tasks))
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "tasks_historicaltask"')]
+        self.assertEqual(len(inserts), 1)  # Одним INSERT на модель
+        record = Task.history.filter(id=self.tasks[0].pk).latest('history_date', 'history_id')
+        self.assertEqual(record.title, self.tasks[0].title)
+        self.assertEqual(record.history_type, '~')
+        self.assertEqual(set(record.tags.values_list('tag_id', flat=True)), {self.tag.pk})  # Снимок тегов
+
+    def test_savepoint_rollback_drops_history(self):
+        kept, rolled_back = self.tasks[0], self.tasks[1]
+        before = self.history_count()
+        with deferred_history():
+            kept.title = 'Сохранена'
+            kept.save()
+            try:
+                with transaction.atomic():
+                    rolled_back.title = 'Откатится'
+                    rolled_back.save()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(self.history_count(), before + 1)
+        self.assertTrue(Task.history.filter(id=kept.pk, title='Сохранена').exists())
+        self.assertFalse(Task.history.filter(title='Откатится').exists())
+
+    def test_error_in_block_writes_nothing(self):
+        before = self.history_count()
+        with self.assertRaises(RuntimeError):
+            with deferred_history():
+                self.tasks[0].title = 'Не сохранится'
+                self.tasks[0].save()
+                raise RuntimeError
+        self.assertEqual(self.history_count(), before)
+        self.assertFalse(Task.objects.filter(title='Не сохранится').exists())  # Откатились и данные
+
+    def test_queue(self):
+        before = self.history_count()
+        with deferred_history(queue=True):
+            self.tasks[0].title = 'Через очередь'
+            self.tasks[0].save()
+        self.assertEqual(self.history_count(), before)
+        self.assertEqual(HistoryQueueItem.objects.get().size, 1)
+
+        self.assertEqual(process_history_queue(), 1)
+        self.assertFalse(HistoryQueueItem.objects.exists())
+        record = Task.history.get(title='Через очередь')
+        self.assertEqual(set(record.tags.values_list('tag_id', flat=True)), {self.tag.pk})
+
+
+
+class HistoryDiffTests(TaskDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.task = Task.objects.create(title='Старое', project=self.project, priority=self.low, created_by=self.user)
+        self.task.title = 'Новое'
+        self.task.priority = self.high
+        self.task.save()
+        self.task.tags.add(self.tag)
+
+    def test_task_history(self):
+        response = self.client.get(f'/api/tasks/{self.task.pk}/history/')
+        self.assertEqual(response.status_code, 200)
+        tagged, changed, created = response.json()['results']  # Новые записи первыми
+
+        self.assertEqual(tagged['changes'], [
+            {'field': 'tags', 'label': 'Теги', 'added': [{'id': self.tag.pk, 'name': 'Работа'}], 'removed': []},
+        ])
+        self.assertEqual(changed['history_type'], '~')
+        self.assertEqual(changed['changes'], [
+            {'field': 'title', 'label': 'Название', 'old': 'Старое', 'new': 'Новое'},
+            {
+                'field': 'priority', 'label': 'Приоритет',
+                'old': {'id': self.low.pk, 'name': 'Низкий'}, 'new': {'id': self.high.pk, 'name': 'Высокий'},
+            },
+        ])
+        self.assertEqual(created['history_type'], '+')
+        self.assertEqual(  # При создании - только заполненные поля, без служебных
+            [item['field'] for item in created['changes']], ['title', 'project', 'priority', 'created_by']
+        )
+
+    def test_queries_do_not_depend_on_page_size(self):
+        for number in range(5):
+            self.task.title = f'Версия {number}'
+            self.task.save()
+        with CaptureQueriesContext(connection) as short:
+            self.client.get(f'/api/tasks/{self.task.pk}/history/?page_size=2')
+        with CaptureQueriesContext(connection) as long:
+            self.client.get(f'/api/tasks/{self.task.pk}/history/?page_size=4')  # Только изменения названия - те же связанные модели
+        self.assertEqual(len(short), len(long))
+
+    def test_project_feed(self):
+        response = self.client.get(f'/api/projects/{self.project.pk}/history/?page_size=3')
+        self.assertEqual(response.status_code, 200)
+        first = response.json()['results'][0]
+        self.assertEqual(first['task'], {'id': self.task.pk, 'title': 'Новое'})
+        self.assertEqual(first['changes'][0]['field'], 'tags')
+
+
+class OthersInProgressTests(TaskDataMixin, TestCase):
+    def test_visible_tasks_paginated(self):
+        in_progress = Status.objects.create(name='В работе')
+        foreign = Project.objects.create(name='Чужой', owner=self.other)
+        visible = [
+            Task.objects.create(title=f'Чужая {number}', project=self.project, status=in_progress, created_by=self.other)
+            for number in range(12)
+        ]
+        Task.objects.create(title='Не видна', project=foreign, status=in_progress, created_by=self.other)
+        Task.objects.create(title='Своя', project=self.project, status=in_progress, created_by=self.user)
+        data = self.client.get('/api/tasks/others_in_progress_or_cancelled/').json()
+        self.assertEqual(data['count'], len(visible))
+        self.assertEqual(len(data['results']), 10)  # PAGE_SIZE
+        rest = self.client.get(data['next']).json()['results']
+        self.assertCountEqual([task['id'] for task in data['results'] + rest], [task.pk for task in visible])
+        cursor = self.client.get('/api/tasks/others_in_progress_or_cancelled/?pagination=cursor&page_size=5').json()
+        self.assertEqual(len(cursor['results']), 5)
+        self.assertNotIn('count', cursor)
+
+
+class ProjectCounterTests(TaskDataMixin, TestCase):
+    """Счетчики задач проекта (tasks_total, tasks_open, ...) после каждой операции совпадают с данными"""
+
+    def setUp(self):
+        super().setUp()
+        refresh_project_counters([self.project.pk])
+        self.second = Project.objects.create(name='Второй', owner=self.user)
+
+    def assertCounters(self, *projects):
+        completed = Q(status=self.done)
+        for project in projects or (self.project, self.second):
+            tasks = Task.objects.filter(project=project)
+            expected = {
+                'tasks_total': tasks.count(),
+                'tasks_open': tasks.exclude(completed).count(),
+                'tasks_completed': tasks.filter(completed).count(),
+                'tasks_overdue': tasks.exclude(completed).filter(due_date__lt=timezone.now()).count(),
+            }
+            self.assertEqual(Project.objects.values(*expected).get(pk=project.pk), expected)
+
+    def request(self, method, url, data=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertLess(response.status_code, 300, response.content)
+        return response
+
+    def test_create_update_delete(self):
+        self.assertCounters()
+        task_id = self.request('post', '/api/tasks/', {'title': 'Новая', 'project': self.project.pk}).json()['id']
+        self.assertCounters()
+        self.request('patch', f'/api/tasks/{task_id}/', {'project': self.second.pk})  # Оба проекта
+        self.assertCounters()
+        self.request('post', f'/api/tasks/{task_id}/change_status/', {'status_id': self.done.pk})
+        self.assertEqual(Project.objects.get(pk=self.second.pk).tasks_completed, 1)
+        self.assertCounters()
+        self.request('delete', f'/api/tasks/{task_id}/')
+        self.assertCounters()
+
+    def test_bulk(self):
+        ids = self.request('post', '/api/tasks/bulk/', [
+            {'title': f'Пачка {number}', 'project': self.second.pk} for number in range(3)
+        ]).json()['ids']
+        self.assertCounters()
+        self.request('patch', '/api/tasks/bulk/', {'ids': ids[:2], 'status': self.done.pk})
+        self.assertCounters()
+        self.request('delete', '/api/tasks/bulk/', {'ids': ids + [self.tasks[0].pk]})
+        self.assertCounters()
+
+    def test_save_keeps_counters(self):
+        project = Project.objects.get(pk=self.project.pk)
+        refresh_project_counters([project.pk])
+        Task.objects.create(title='Мимо объекта', project=project)
+        refresh_project_counters([project.pk])
+        project.name = 'Переименован'
+        project.save()  # Загруженные раньше значения счетчиков не записываются
+        self.assertCounters(project)
+
+    def test_save_deferred_fields(self):
+        project = Project.objects.only('id', 'name').get(pk=self.project.pk)
+        project.name = 'Переименован'
+        with CaptureQueriesContext(connection) as queries:
+            project.save()
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "tasks_project"')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('"description"', updates[0])  # Отложенные поля не читаются и не записываются
+        self.assertFalse([query for query in queries if query['sql'].startswith('SELECT "tasks_project"."description"')])
+        self.assertEqual(Project.objects.get(pk=project.pk).description, self.project.description)
+
+    def test_save_deleted_row(self):
+        project = Project.objects.get(pk=self.second.pk)
+        Project.objects.filter(pk=project.pk).delete()
+        project.name = 'Восстановлен'
+        project.save()  # Как обычный save(): строки нет - INSERT
+        self.assertEqual(Project.objects.get(pk=project.pk).name, 'Восстановлен')
+
+    def test_refresh_command_bumps_version(self):
+        Project.objects.filter(pk=self.project.pk).update(tasks_total=999)  # Счетчики разошлись с данными
+        with mock.patch('tasks.counters.schedule_version_bump') as bump:
+            call_command('refresh_project_counters', stdout=io.StringIO())
+        self.assertCounters()
+        bump.assert_called_with(Project._meta.label)  # ETag проектов перестанет отдавать старые счетчики
+
+
+class DeadlineTests(TaskDataMixin, TestCase):
+    """Очередь сроков (TaskDeadline) и сроки пользователей (DeadlineEntry) следуют за задачами"""
+
+    def setUp(self):
+        super().setUp()
+        sync_deadlines([task.pk for task in self.tasks], events=False)  # Колбэки setUpTestData не выполнялись
+        self.third = User.objects.create_user('third', password='secret')
+        self.transitions = []
+        deadline_transitions.connect(self.on_transitions)
+        self.addCleanup(deadline_transitions.disconnect, self.on_transitions)
+
+    def on_transitions(self, sender, transitions, **kwargs):
+        self.transitions.extend(transitions)
+
+    def entries(self, task):
+        return dict(DeadlineEntry.objects.filter(task=task).values_list('user_id', 'is_open'))
+
+    def bucket(self, task):
+        return TaskDeadline.objects.filter(task=task).values_list('bucket', flat=True).first()
+
+    def test_deadline_bucket(self):
+        due_date = timezone.make_aware(datetime(2026, 3, 10, 15, 0))
+        tomorrow_from = timezone.make_aware(datetime(2026, 3, 9))  # Полночь накануне по местному времени
+        self.assertEqual(deadline_bucket(due_date, due_date - timedelta(days=30)), (TaskDeadline.BUCKET_LATER, due_date - SOON_PERIOD))
+        self.assertEqual(deadline_bucket(due_date, due_date - SOON_PERIOD), (TaskDeadline.BUCKET_DUE_SOON, tomorrow_from))
+        self.assertEqual(
+            deadline_bucket(due_date, tomorrow_from - timedelta(seconds=1)), (TaskDeadline.BUCKET_DUE_SOON, tomorrow_from),
+        )
+        self.assertEqual(deadline_bucket(due_date, tomorrow_from), (TaskDeadline.BUCKET_DUE_TOMORROW, due_date))
+        self.assertEqual(deadline_bucket(due_date, due_date), (TaskDeadline.BUCKET_OVERDUE, None))
+
+    def test_create_update_reassign_delete(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            task = Task.objects.create(
+                title='Со сроком', project=self.project, status=self.new, created_by=self.user,
+                assigned_to=self.other, due_date=timezone.now() + timedelta(days=3),
+            )
+        self.assertEqual(self.entries(task), {self.user.pk: True, self.other.pk: True})
+        self.assertEqual(self.bucket(task), TaskDeadline.BUCKET_DUE_SOON)
+
+        task.assigned_to = self.third  # Прежний исполнитель теряет строку, новый ее получает
+        with self.captureOnCommitCallbacks(execute=True):
+            task.save()
+        self.assertEqual(self.entries(task), {self.user.pk: True, self.third.pk: True})
+
+        project = Project.objects.get(pk=self.project.pk)
+        project.owner = self.other  # Смена владельца проекта пересчитывает все его задачи
+        with self.captureOnCommitCallbacks(execute=True):
+            project.save()
+        self.assertEqual(self.entries(task), {self.user.pk: True, self.other.pk: True, self.third.pk: True})
+        self.assertEqual(set(self.entries(self.tasks[2])), {self.user.pk, self.other.pk})
+
+        task.status = self.done  # Завершенная задача уходит из очереди, строки остаются закрытыми
+        with self.captureOnCommitCallbacks(execute=True):
+            task.save()
+        self.assertEqual(set(self.entries(task).values()), {False})
+        self.assertIsNone(self.bucket(task))
+
+        task.due_date = None  # Без срока и без срочности строк нет
+        with self.captureOnCommitCallbacks(execute=True):
+            task.save()
+        self.assertEqual(self.entries(task), {})
+
+        task.due_date, task.status = timezone.now() + timedelta(days=30), self.new
+        with self.captureOnCommitCallbacks(execute=True):
+            task.save()
+        self.assertEqual(self.bucket(task), TaskDeadline.BUCKET_LATER)
+        task_id = task.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            task.delete()
+        self.assertFalse(DeadlineEntry.objects.filter(task_id=task_id).exists())
+        self.assertFalse(TaskDeadline.objects.filter(task_id=task_id).exists())
+
+    def test_urgent_without_due_date(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            task = Task.objects.create(title='Срочная', project=self.project, priority=self.high, status=self.new, created_by=self.other)
+        self.assertEqual(set(self.entries(task)), {self.user.pk, self.other.pk})
+        self.assertTrue(DeadlineEntry.objects.filter(task=task, is_urgent=True, due_date=None).exists())
+        self.assertIsNone(self.bucket(task))  # В очереди переходов только задачи со сроком
+
+    def test_due_date_change_sends_transition(self):
+        task = self.tasks[2]  # Открытая, срок через два дня
+        self.assertEqual(self.bucket(task), TaskDeadline.BUCKET_DUE_SOON)
+        task.due_date = timezone.now() - timedelta(hours=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            task.save()
+        self.assertEqual(self.bucket(task), TaskDeadline.BUCKET_OVERDUE)
+        self.assertEqual(self.transitions, [DeadlineTransition(
+            task.pk, task.due_date, TaskDeadline.BUCKET_DUE_SOON, TaskDeadline.BUCKET_OVERDUE, [self.user.pk],
+        )])
+
+    def test_advance_crosses_buckets(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            task = Task.objects.create(
+                title='Через неделю', project=self.project, status=self.new, created_by=self.user,
+                assigned_to=self.other, due_date=timezone.now() + timedelta(days=10),
+            )
+        deadline = TaskDeadline.objects.get(task=task)
+        self.assertEqual(deadline.bucket, TaskDeadline.BUCKET_LATER)
+        self.transitions.clear()
+
+        for expected in (TaskDeadline.BUCKET_DUE_SOON, TaskDeadline.BUCKET_DUE_TOMORROW, TaskDeadline.BUCKET_OVERDUE):
+            previous, moment = deadline.bucket, deadline.next_transition_at
+            with self.captureOnCommitCallbacks(execute=True):
+                advance_deadlines(now=moment - timedelta(seconds=1))
+            self.assertEqual(TaskDeadline.objects.get(task=task).bucket, previous)  # Раньше времени перехода нет
+            with self.captureOnCommitCallbacks(execute=True):
+                advance_deadlines(now=moment)
+            deadline = TaskDeadline.objects.get(task=task)
+            self.assertEqual(deadline.bucket, expected)
+            self.assertEqual(deadline.changed_at, moment)
+            self.assertIn(
+                DeadlineTransition(task.pk, task.due_date, previous, expected, [self.user.pk, self.other.pk]),
+                self.transitions,
+            )
+        self.assertIsNone(deadline.next_transition_at)  # Просроченная задача из планировщика уходит
+
+    def test_matches_date_range_queries(self):
+        """Действия по таблице сроков дают те же задачи, что прежние запросы по датам к видимым задачам"""
+        now = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            for number, (due_date, status, priority) in enumerate((
+                (now - timedelta(days=2), self.new, None),  # Просрочена
+                (now - timedelta(days=2), self.done, self.high),  # Просрочена, но завершена
+                (None, self.new, self.high),  # Срочная без срока
+                (now + timedelta(days=1), self.done, None),  # Завтра, завершена
+            )):
+                Task.objects.create(
+                    title=f'Граница {number}', project=self.project, due_date=due_date, status=status,
+                    priority=priority, assigned_to=self.other, created_by=self.other if number % 2 else self.user,
+                )
+            Task.objects.create(title='Чужая', project=Project.objects.create(name='Чужой', owner=self.third),
+                                due_date=now - timedelta(days=1), priority=self.high, created_by=self.third)
+
+        tomorrow = timezone.now() + timedelta(days=1)
+        old_queries = {
+            'upcoming_week': Q(due_date__gte=now) & Q(due_date__lte=now + timedelta(days=7)),
+            'overdue': Q(due_date__lt=now) & ~Q(status__name='Завершена'),
+            'urgent_or_tomorrow': (Q(priority__level__gte=4) & ~Q(status__name='Завершена')) | Q(due_date__range=[
+                tomorrow.replace(hour=0, minute=0, second=0), tomorrow.replace(hour=23, minute=59, second=59),
+            ]),
+        }
+        for user in (self.user, self.other, self.third):
+            self.client.force_authenticate(user)
+            for action, condition in old_queries.items():
+                with self.subTest(user=user.username, action=action):
+                    data = self.client.get(f'/api/tasks/{action}/').json()
+                    tasks = data['tasks'] if action == 'overdue' else data
+                    expected = Task.objects.visible_to(user).filter(condition).values_list('pk', flat=True)
+                    self.assertEqual(sorted(task['id'] for task in tasks), sorted(expected))
+                    if action == 'overdue':
+                        self.assertEqual(data['count'], len(expected))
+
+
+class PushTests(TaskDataMixin, TestCase):
+    """События об изменениях: получатели, объединение за транзакцию и повторная отправка по Last-Event-ID"""
+
+    def setUp(self):
+        super().setUp()
+        self.third = User.objects.create_user('third', password='secret')
+        self.broker = LocalBroker()
+        for patcher in (
+            mock.patch('tasks.push._broker', self.broker),
+            mock.patch('tasks.transactions._local.batches', {}, create=True),  # Пакеты setUpTestData не коммитятся
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def published(self, model='task'):
+        return [
+            {key: event[key] for key in ('model', 'op', 'id', 'fields', 'users')}
+            for event in self.broker.history if event['model'] == model
+        ]
+
+    @staticmethod
+    def event(op, pk, users=(), projects=(), fields=(), model='task'):
+        return {'model': model, 'op': op, 'id': pk, 'fields': list(fields), 'version': '', 'users': set(users), 'projects': set(projects)}
+
+    def test_task_users_before_and_after(self):
+        task = Task.objects.get(pk=self.tasks[1].pk)  # Исполнитель - other
+        task.assigned_to = self.third
+        with self.captureOnCommitCallbacks(execute=True):
+            task.save()
+        self.assertEqual(self.published(), [{
+            'model': 'task', 'op': 'updated', 'id': task.pk, 'fields': ['assigned_to'],
+            'users': sorted([self.user.pk, self.other.pk, self.third.pk]),  # Прежний исполнитель узнает, что задачу забрали
+        }])
+
+    def test_project_owner_change(self):
+        project = Project.objects.get(pk=self.project.pk)
+        project.owner = self.other
+        with self.captureOnCommitCallbacks(execute=True):
+            project.save()
+        self.assertEqual(self.published('project'), [{
+            'model': 'project', 'op': 'updated', 'id': project.pk, 'fields': ['owner'], 'users': sorted([self.user.pk, self.other.pk]),
+        }])
+
+    def test_new_owner_receives_task_events(self):
+        Project.objects.filter(pk=self.project.pk).update(owner=self.third)  # Получатели - по владельцу на момент отправки
+        task = Task.objects.get(pk=self.tasks[0].pk)
+        task.title = 'Новое название'
+        with self.captureOnCommitCallbacks(execute=True):
+            task.save()
+        self.assertEqual(self.published()[0]['users'], sorted([self.user.pk, self.third.pk]))
+
+    def test_one_event_per_transaction(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            task = Task.objects.create(title='Временная', project=self.project, created_by=self.user)
+            task.title = 'Переименована'
+            task.save()
+            task.delete()  # Создана и удалена в одной транзакции - клиентам сообщать не о чем
+            kept = Task.objects.get(pk=self.tasks[0].pk)
+            kept.title = 'Первое'
+            kept.save()
+            kept.status = self.done
+            kept.save()
+        self.assertEqual(self.published(), [{
+            'model': 'task', 'op': 'updated', 'id': kept.pk, 'fields': ['status', 'title'], 'users': [self.user.pk],
+        }])
+
+    def test_rolled_back_changes_not_published(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                Task.objects.create(title='Откат', project=self.project, created_by=self.user)
+                raise RuntimeError
+        self.assertEqual(self.published(), [])
+
+    def test_merge(self):
+        merged = _merge([
+            self.event('created', 1, users={1}),
+            self.event('updated', 1, users={2}, fields=['title']),
+            self.event('updated', 2, users={1}, fields=['title']),
+            self.event('updated', 2, users={3}, projects={7}, fields=['status']),
+            self.event('updated', 3, users={1}, fields=['title']),
+            self.event('updated', 3, users={1}),  # Изменились неизвестно какие поля
+            self.event('updated', 4, users={1}, fields=['title']),
+            self.event('deleted', 4, users={1}),
+            self.event('created', 5, users={1}),
+            self.event('deleted', 5, users={1}),
+        ])
+        self.assertEqual([(event['op'], event['id'], event['fields'], event['users'], event['projects']) for event in merged], [
+            ('created', 1, [], {1, 2}, set()),  # Новый объект клиент читает целиком
+            ('updated', 2, ['status', 'title'], {1, 3}, {7}),
+            ('updated', 3, [], {1}, set()),
+            ('deleted', 4, [], {1}, set()),
+        ])
+
+    def test_publish_owners_and_reset(self):
+        publish_changes([self.event('updated', 10, users={self.other.pk}, projects={self.project.pk})], {})
+        publish_changes([self.event('deleted', 20, model='project', projects={20})], {20: self.third.pk})  # Проекта уже нет в БД
+        self.assertEqual(self.published()[0]['users'], sorted([self.user.pk, self.other.pk]))  # Владелец проекта из БД
+        self.assertEqual(self.published('project')[0]['users'], [self.third.pk])
+
+        self.broker.history.clear()
+        publish_changes([self.event('updated', pk, users={pk % 2 + 1}) for pk in range(MAX_EVENTS + 1)], {})
+        self.assertEqual(self.published(), [{'model': 'task', 'op': 'reset', 'id': None, 'fields': [], 'users': [1, 2]}])
+
+    def test_replay_after_reconnect(self):
+        self.broker.publish([{'model': 'task', 'op': 'updated', 'id': pk, 'users': [self.user.pk] if pk % 2 else [self.other.pk]}
+                             for pk in range(1, 6)])
+
+        async def missed(user_id, last_event_id):
+            subscription, events = self.broker.subscribe(user_id, last_event_id)
+            subscription.close()
+            return events if events is None else [event['id'] for event in events]
+
+        epoch = self.broker.epoch
+        self.assertEqual(async_to_sync(missed)(self.user.pk, f'{epoch}-1'), [3, 5])  # Только события пользователя
+        self.assertEqual(async_to_sync(missed)(self.other.pk, f'{epoch}-1'), [2, 4])
+        self.assertEqual(async_to_sync(missed)(self.user.pk, f'{epoch}-5'), [])
+        self.assertEqual(async_to_sync(missed)(self.user.pk, ''), [])  # Первое подключение
+        self.assertIsNone(async_to_sync(missed)(self.user.pk, 'другая-1'))  # Брокер перезапущен
+        self.assertIsNone(async_to_sync(missed)(self.user.pk, f'{epoch}-99'))
+
+        self.broker.publish([{'model': 'task', 'op': 'updated', 'id': pk, 'users': [self.user.pk]} for pk in range(HISTORY_SIZE)])
+        self.assertIsNone(async_to_sync(missed)(self.user.pk, f'{epoch}-1'))  # Пропущенные события уже вытеснены
+
+        self.broker.deliver('новая', [{'model': 'task', 'op': 'updated', 'id': 1, 'users': [self.user.pk], 'seq': 1}])
+        self.assertIsNone(async_to_sync(missed)(self.user.pk, f'{epoch}-5'))  # Новая эпоха посредника
+
+    def test_subscription_reset_on_overflow(self):
+        async def run():
+            subscription, _ = self.broker.subscribe(self.user.pk)
+            self.broker.publish([{'model': 'task', 'op': 'updated', 'id': 1, 'users': [self.other.pk]}])  # Чужое событие
+            self.broker.publish([{'model': 'task', 'op': 'updated', 'id': 2, 'users': [self.user.pk]}])
+            await asyncio.sleep(0)
+            first = await subscription.get()
+            for pk in range(QUEUE_LIMIT + 1):  # Клиент не читает очередь
+                self.broker.publish([{'model': 'task', 'op': 'updated', 'id': pk, 'users': [self.user.pk]}])
+            await asyncio.sleep(0)
+            overflow = await subscription.get()
+            subscription.reset()  # Переподключение к посреднику
+            await asyncio.sleep(0)
+            gap = await subscription.get()
+            subscription.close()
+            return first, overflow, gap, subscription.queue.qsize()
+
+        (epoch, events), overflow, gap, left = async_to_sync(run)()
+        self.assertEqual((epoch, [event['id'] for event in events]), (self.broker.epoch, [2]))
+        self.assertIsNone(overflow)
+        self.assertIsNone(gap)
+        self.assertEqual(left, 0)
+        self.assertEqual(self.broker.subscribers, set())
+
+
+class ConditionalGetTests(TaskDataMixin, TestCase):
+    """Ответ 304 на повторный GET, пока данные не изменились"""
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('tasks.transactions._local.batches', {}, create=True)  # Пакеты setUpTestData не коммитятся
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        get_versions(TaskViewSet.conditional_models)  # Строки версий (TransactionTestCase мог очистить таблицу)
+
+    def get(self, url='/api/tasks/', **headers):
+        return self.client.get(url, **headers)
+
+    def test_if_none_match(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        with self.assertNumQueries(1):  # Только версии - без данных и COUNT(*)
+            response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.get(f'/api/tasks/{self.tasks[0].pk}/', HTTP_IF_NONE_MATCH=etag).status_code, 200)  # Другой URL
+
+        self.client.force_authenticate(self.other)  # ETag свой у каждого пользователя
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_if_modified_since(self):
+        DataVersion.objects.update(changed_at=timezone.now() - timedelta(minutes=5))
+        response = self.get()
+        last_modified = response['Last-Modified']
+        self.assertEqual(self.get(HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        DataVersion.objects.update(changed_at=timezone.now() + timedelta(seconds=5))  # Секунда изменения еще не закончилась
+        response = self.get(HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)  # Секунда не закончилась - только ETag
+
+    def test_write_changes_etag(self):
+        etag = self.get()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/tasks/{self.tasks[0].pk}/', {'title': 'Изменена'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_related_model_changes_etag(self):
+        etag = self.get()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Status.objects.filter(pk=self.new.pk).get().save()  # Справочник выводится в задачах
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_rollback_keeps_etag(self):
+        etag = self.get()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                Task.objects.filter(pk=self.tasks[0].pk).get().save()
+                raise RuntimeError
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_get_does_not_write(self):
+        self.get()
+        with CaptureQueriesContext(connection) as queries:
+            self.get()
+        self.assertFalse([query for query in queries if not query['sql'].lstrip().upper().startswith('SELECT')])
+
+    def test_versions_seeded(self):
+        seeded = import_module('tasks.migrations.0015_seed_data_versions').LABELS
+        for viewset in vars(views).values():
+            if isinstance(viewset, type) and issubclass(viewset, ConditionalGetMixin):
+                self.assertLessEqual(set(viewset.conditional_models), set(seeded), viewset.__name__)
+
+
+class AsyncReadTests(TaskDataMixin, TransactionTestCase):
+    """
+    Асинхронные действия (ASYNC_VIEWS=True) отвечают так же, как синхронные. TransactionTestCase:
+    запросы идут из потоков пула БД (tasks/asgi.py) со своими подключениями
+    """
+
+    def setUp(self):
+        type(self).setUpTestData()
+        super().setUp()
+        Task.objects.bulk_create(
+            Task(title=f'Еще {number}', project=self.project, created_by=self.user, status=self.new) for number in range(15)
+        )
+        sync_deadlines(Task.objects.values_list('pk', flat=True), events=False)
+        self.async_client.force_login(self.user)
+        self.addCleanup(shutdown_db_executor)  # Подключения потоков пула не переживают очистку базы
+
+    def assertSameResponse(self, url, status_code=200, headers=None):
+        expected = self.client.get(url, headers=headers)
+
+        async def aget():
+            return await self.async_client.get(url, headers=headers)
+
+        with override_settings(ROOT_URLCONF=__name__):  # Маршруты с асинхронными view
+            response = async_to_sync(aget)()
+        self.assertEqual(response.status_code, status_code, url)
+        self.assertEqual(expected.status_code, status_code, url)
+        self.assertEqual(response.content, expected.content, url)
+        return response
+
+    def test_routes_are_async(self):
+        match = resolve('/api/tasks/', urlconf=__name__)
+        self.assertTrue(iscoroutinefunction(match.func))
+        self.assertFalse(iscoroutinefunction(resolve('/api/tasks/').func))
+
+    def test_list(self):
+        for query in ('', '?page=2', '?status=' + str(self.new.pk), '?ordering=-due_date', '?fields=id,title', '?page=last'):
+            self.assertSameResponse(f'/api/tasks/{query}')
+        self.assertSameResponse('/api/tasks/?page=99', 404)  # Неверная страница
+        self.assertSameResponse('/api/tasks/?page=0', 404)
+        self.assertSameResponse('/api/tasks/?page=abc', 404)
+
+    def test_retrieve(self):
+        self.assertSameResponse(f'/api/tasks/{self.tasks[1].pk}/')
+        self.assertSameResponse(f'/api/tasks/{self.tasks[0].pk}/?fields=id,tags')
+        self.assertSameResponse('/api/tasks/0/', 404)
+        self.assertSameResponse('/api/tasks/abc/', 404)
+        hidden = Task.objects.create(title='Чужая', project=Project.objects.create(name='Чужой', owner=self.other))
+        self.assertSameResponse(f'/api/tasks/{hidden.pk}/', 404)
+
+    def test_deadline_actions(self):
+        Task.objects.filter(pk=self.tasks[2].pk).update(due_date=timezone.now() - timedelta(days=1))
+        sync_deadlines([self.tasks[2].pk], events=False)
+        for action in ('upcoming_week', 'overdue', 'urgent_or_tomorrow'):
+            response = self.assertSameResponse(f'/api/tasks/{action}/')
+            self.assertTrue(response.json(), action)
+
+    def test_project_tasks(self):
+        self.assertSameResponse(f'/api/projects/{self.project.pk}/tasks/')
+        self.assertSameResponse('/api/projects/0/tasks/', 404)
+        self.assertSameResponse('/api/projects/abc/tasks/', 404)
+        other = Project.objects.create(name='Чужой', owner=self.other)
+        self.assertSameResponse(f'/api/projects/{other.pk}/tasks/', 404)
+
+    def test_not_modified(self):
+        etag = self.client.get('/api/tasks/')['ETag']
+        self.assertSameResponse('/api/tasks/', 304, headers={'If-None-Match': etag})
+
+
+class StatsTests(TaskDataMixin, TestCase):
+    """Статистика главной страницы: один запрос, область видимости списка задач, кэш по версиям данных"""
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('tasks.transactions._local.batches', {}, create=True)  # Пакеты setUpTestData не коммитятся
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+        get_versions(STATS_VERSION_LABELS)
+        reference_data.status_ids(STATUS_COMPLETED)  # Справочники загружены заранее
+
+    def stats(self):
+        response = self.client.get('/api/tasks/stats/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_values(self):
+        visible = Task.objects.visible_to(self.other)
+        open_tasks = visible.exclude(status=self.done)
+        self.client.force_authenticate(self.other)
+        data = self.stats()
+        self.assertEqual(
+            {key: data[key] for key in ('projects', 'total', 'completed', 'overdue', 'urgent')},
+            {
+                'projects': 0,
+                'total': visible.count(),
+                'completed': visible.filter(status=self.done).count(),
+                'overdue': open_tasks.filter(due_date__lt=timezone.now()).count(),
+                'urgent': open_tasks.filter(priority__level__gte=URGENT_PRIORITY_LEVEL).count(),
+            },
+        )
+        self.assertEqual(sum(item['count'] for item in data['by_status']), visible.count())
+
+        self.client.force_authenticate(self.user)
+        self.assertEqual((self.stats()['projects'], self.stats()['total']), (1, len(self.tasks)))
+
+    def test_one_query(self):
+        with self.assertNumQueries(2):  # Версии данных и сама статистика
+            self.stats()
+        with self.assertNumQueries(1):  # Из кэша - только версии
+            self.stats()
+
+    def test_projects_without_tasks(self):
+        third = User.objects.create_user('third', password='secret')
+        Project.objects.create(name='Пустой', owner=third)
+        self.client.force_authenticate(third)
+        data = self.stats()
+        self.assertEqual((data['projects'], data['total'], data['by_status']), (1, 0, []))
+
+    def test_anonymous(self):
+        self.client.force_authenticate(None)
+        with self.assertNumQueries(0):
+            data = self.stats()
+        self.assertEqual((data['projects'], data['total'], data['by_status']), (0, 0, []))
+
+    def test_cache_follows_versions(self):
+        total = self.stats()['total']
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(title='Новая', project=self.project, created_by=self.user)
+        self.assertEqual(self.stats()['total'], total + 1)  # Не дожидаясь STATS_CACHE_TIMEOUT
+        Task.objects.filter(pk=self.tasks[0].pk).delete()  # Без коммита версия не меняется - ответ из кэша
+        self.assertEqual(self.stats()['total'], total + 1)
+
+
+class ExportTests(TaskDataMixin, TestCase):
+    """Потоковая выгрузка задач в NDJSON и CSV"""
+
+    def export(self, query, status_code=200):
+        response = self.client.get(f'/api/tasks/export/?{query}')
+        self.assertEqual(response.status_code, status_code, query)
+        if status_code != 200:
+            return response.json()
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def ndjson(self, query=''):
+        return [json.loads(line) for line in self.export(f'file_format=ndjson&{query}').splitlines()]
+
+    def csv_rows(self, query=''):
+        text = self.export(f'file_format=csv&{query}')
+        self.assertTrue(text.startswith('\ufeff'))  # BOM для Excel
+        return list(csv.reader(io.StringIO(text[1:])))
+
+    def test_ndjson(self):
+        response = self.client.get('/api/tasks/export/?file_format=ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertIn('attachment; filename="tasks-', response['Content-Disposition'])
+        items = self.ndjson()
+        self.assertEqual(sorted(item['id'] for item in items), sorted(task.pk for task in self.tasks))
+        for item in items:  # Тот же JSON, что у карточки задачи
+            self.assertEqual(item, self.client.get(f'/api/tasks/{item["id"]}/').json())
+
+    def test_ndjson_fields_and_history(self):
+        items = self.ndjson('fields=id,title')
+        self.assertEqual({tuple(sorted(item)) for item in items}, {('id', 'title')})
+
+        task = Task.objects.get(pk=self.tasks[0].pk)
+        task.title = 'Переименована'
+        task.save()
+        items = {item['id']: item for item in self.ndjson('fields=id&history=1')}
+        self.assertEqual(set(items[task.pk]), {'id', 'history'})
+        self.assertEqual([change['field'] for change in items[task.pk]['history'][0]['changes']], ['title'])  # Новые сверху
+
+    def test_csv(self):
+        rows = self.csv_rows()
+        self.assertEqual(tuple(rows[0]), CSV_DEFAULT_FIELDS)
+        self.assertEqual(len(rows), len(self.tasks) + 1)
+        by_id = {int(row[0]): dict(zip(rows[0], row)) for row in rows[1:]}
+        first = by_id[self.tasks[0].pk]
+        self.assertEqual((first['title'], first['project_name'], first['tags_details']), ('Задача 0', 'Проект', 'Работа'))
+        self.assertEqual(first['due_date'], '')  # Пустые значения - пустые ячейки
+
+        rows = self.csv_rows('fields=id,title,status')
+        self.assertEqual(rows[0], ['id', 'title', 'status'])
+        self.assertEqual({row[2] for row in rows[1:]}, {str(self.new.pk), str(self.done.pk)})
+
+    def test_invalid_requests(self):
+        self.assertIn('error', self.export('file_format=csv&history=1', 400))  # История - только в NDJSON
+        self.assertIn('error', self.export('file_format=xml', 400))
+
+    def test_filters_and_visibility(self):
+        items = self.ndjson(f'status={self.done.pk}&fields=id,status')
+        self.assertEqual(sorted(item['id'] for item in items), sorted(task.pk for task in self.tasks if task.status_id == self.done.pk))
+        items = self.ndjson(f'assigned_to={self.other.pk}&ordering=-due_date&fields=id')
+        self.assertEqual(
+            [item['id'] for item in items],
+            list(Task.objects.filter(assigned_to=self.other).order_by('-due_date').values_list('id', flat=True)),
+        )
+
+        third = User.objects.create_user('third', password='secret')
+        self.client.force_authenticate(third)
+        self.assertEqual(self.ndjson(), [])
+        self.assertEqual(len(self.csv_rows()), 1)  # Только заголовок
+
+
+class ImportTests(TaskDataMixin, TestCase):
+    """Массовый импорт задач пачками (tasks/imports.py)"""
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('tasks.transactions._local.batches', {}, create=True)  # Пакеты setUpTestData не коммитятся
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+
+    def run_import(self, rows, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):  # Колбэки пачек кладут историю в очередь
+            importer = TaskImporter(user=self.user, **kwargs).run(rows)
+        while process_history_queue():
+            pass
+        return importer
+
+    def test_create_and_update(self):
+        importer = self.run_import([
+            {'title': 'Новая', 'project_name': 'Проект', 'status': 'Завершена', 'priority': 'Высокий',
+             'assigned_to': 'other', 'due_date': '2030-01-02T10:00:00+00:00', 'tags': 'Работа; Дом'},
+            {'id': str(self.tasks[0].pk), 'title': 'Переименована', 'tags': ''},
+        ])
+        self.assertEqual((importer.created, importer.updated, importer.errors), (1, 1, []))
+        task = Task.objects.get(title='Новая')
+        self.assertEqual((task.project, task.status, task.priority), (self.project, self.done, self.high))
+        self.assertEqual((task.assigned_to, task.created_by), (self.other, self.user))
+        self.assertEqual(task.due_date, datetime(2030, 1, 2, 10, tzinfo=timezone.utc))
+        self.assertEqual(sorted(task.tags.values_list('name', flat=True)), ['Дом', 'Работа'])
+        self.tasks[0].refresh_from_db()
+        self.assertEqual(self.tasks[0].title, 'Переименована')
+        self.assertFalse(self.tasks[0].tags.exists())
+        self.assertEqual(task.history.get().history_type, '+')
+        self.assertEqual(self.tasks[0].history.latest().history_type, '~')
+
+    def test_unique_titles(self):
+        importer = self.run_import([
+            {'title': 'Задача 1', 'project_name': 'Проект'},  # Уже есть в проекте
+            {'title': 'Дубль', 'project_name': 'Проект'},
+            {'title': 'Дубль', 'project_name': 'Проект'},  # Повтор внутри файла
+            {'id': str(self.tasks[2].pk), 'title': 'Задача 2', 'description': 'Свое название не мешает'},
+        ])
+        message = {'title': 'Задача с таким названием уже существует в данном проекте'}
+        self.assertEqual(importer.errors, [{'row': 2, 'errors': message}, {'row': 4, 'errors': message}])
+        self.assertEqual((importer.created, importer.updated), (1, 1))
+        self.assertEqual(Task.objects.filter(title='Дубль').count(), 1)
+        self.tasks[2].refresh_from_db()
+        self.assertEqual(self.tasks[2].description, 'Свое название не мешает')
+
+    def test_project_names(self):
+        third = User.objects.create_user('third')
+        Project.objects.create(name='Общий', owner=self.other)
+        Project.objects.create(name='Общий', owner=third)
+        importer = self.run_import([{'title': 'Куда?', 'project_name': 'Общий'}, {'title': 'Никуда', 'project_name': 'Нет такого'}])
+        self.assertEqual(importer.errors, [
+            {'row': 2, 'errors': {'project': 'Несколько проектов с таким названием - укажите id'}},
+            {'row': 3, 'errors': {'project': 'Проект не найден'}},
+        ])
+        own = Project.objects.create(name='Общий', owner=self.user)
+        importer = self.run_import([{'title': 'Куда?', 'project_name': 'Общий'}])  # Среди одноименных есть свой
+        self.assertEqual(importer.errors, [])
+        self.assertEqual(Task.objects.get(title='Куда?').project, own)
+
+    def test_new_tags(self):
+        existing_history = self.tag.history.count()
+        self.run_import([{'title': 'С тегами', 'project_name': 'Проект', 'tags': 'Работа, Новый'}])
+        tag = Tag.objects.get(name='Новый', user=self.user)
+        self.assertEqual(list(tag.history.values_list('history_type', 'history_user')), [('+', self.user.pk)])
+        self.assertEqual(self.tag.history.count(), existing_history)  # Существующий тег не трогаем
+
+    def test_tag_created_concurrently(self):
+        Tag.objects.bulk_create([Tag(name='Параллельный', user=self.user)])  # Без истории, как у чужого импорта
+        real_filter = Tag.objects.filter
+        calls = []
+
+        def stale_filter(*args, **kwargs):  # Первый поиск не видит тег, созданный параллельно
+            calls.append(kwargs)
+            return Tag.objects.none() if len(calls) == 1 else real_filter(*args, **kwargs)
+
+        with mock.patch.object(Tag.objects, 'filter', stale_filter):
+            importer = self.run_import([{'title': 'Гонка', 'project_name': 'Проект', 'tags': 'Параллельный, Свой'}])
+        self.assertEqual(importer.errors, [])
+        self.assertEqual(sorted(Task.objects.get(title='Гонка').tags.values_list('name', flat=True)), ['Параллельный', 'Свой'])
+        self.assertFalse(Tag.objects.get(name='Параллельный').history.exists())
+        own = Tag.objects.get(name='Свой')
+        self.assertEqual(list(own.history.values_list('history_type', 'history_user')), [('+', self.user.pk)])
+
+    def test_progress(self):
+        processed = []
+        rows = [{'title': f'Импорт {number}', 'project_name': 'Проект'} for number in range(5)]
+        importer = self.run_import(rows, chunk_size=2, progress=lambda importer: processed.append(importer.processed))
+        self.assertEqual(processed, [2, 4, 5])
+        self.assertEqual(importer.created, 5)
+
+    def import_job(self, count):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = self.settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        content = io.StringIO()
+        writer = csv.writer(content)
+        writer.writerow(['title', 'project__name'])
+        writer.writerows([f'Импорт {number}', 'Проект'] for number in range(count))
+        return ImportJob.objects.create(
+            model='tasks', file=ContentFile(content.getvalue().encode(), name='tasks.csv'), created_by=self.user,
+        )
+
+    def test_job(self):
+        job = run_import_job(self.import_job(3), chunk_size=2)
+        self.assertEqual(job.status, ImportJob.STATUS_DONE)
+        self.assertEqual((job.total_rows, job.processed_rows, job.created_count, job.error_count), (3, 3, 3, 0))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_failed_chunk_keeps_earlier_chunks(self):
+        job = self.import_job(4)
+        real_import_chunk = TaskImporter.import_chunk
+        calls = []
+
+        def import_chunk(importer, rows):
+            calls.append(rows)
+            real_import_chunk(importer, rows)
+            if len(calls) == 2:
+                raise RuntimeError('Сбой базы')  # Пачка уже записана, но ее транзакция откатывается
+
+        with mock.patch.object(TaskImporter, 'import_chunk', import_chunk):
+            job = run_import_job(job, chunk_size=2)
+        self.assertEqual(job.status, ImportJob.STATUS_FAILED)
+        self.assertEqual((job.processed_rows, job.created_count), (2, 2))
+        self.assertEqual(job.errors[-1], {'row': None, 'errors': {'file': 'Сбой базы'}})
+        self.assertEqual(
+            sorted(Task.objects.filter(title__startswith='Импорт').values_list('title', flat=True)), ['Импорт 0', 'Импорт 1'],
+        )
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')  # Без манифеста collectstatic
+class AdminChangelistTests(TaskDataMixin, TestCase):
+    """Списки админки: число запросов не растет со строками, фильтры с автодополнением, оценка количества"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.admin = User.objects.create_superuser('admin', password='secret')
+        cls.second = Project.objects.create(name='Второй', owner=cls.other)
+        Tag.objects.create(name='Чужой', user=cls.other)
+        Task.objects.create(title='Во втором', project=cls.second, created_by=cls.other)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.admin)
+        cache.clear()
+
+    def changelist(self, model, query=''):
+        response = self.client.get(f'/admin/tasks/{model}/{query}')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def count_queries(self, model):
+        self.changelist(model)  # Кэш справочников и сессия
+        with CaptureQueriesContext(connection) as queries:
+            self.changelist(model)
+        return len(queries)
+
+    def test_query_count_does_not_grow(self):
+        for model in ('task', 'project', 'tag'):
+            with self.subTest(model=model):
+                before = self.count_queries(model)
+                users = [User.objects.create_user(f'{model}-{number}') for number in range(5)]
+                for number, user in enumerate(users):
+                    project = Project.objects.create(name=f'{model} {number}', owner=user)
+                    Tag.objects.create(name=f'{model} {number}', user=user)
+                    Task.objects.create(
+                        title=f'{model} {number}', project=project, assigned_to=user, created_by=user,
+                        priority=self.high, status=self.done,
+                    )
+                self.assertEqual(self.count_queries(model), before)
+
+    def test_autocomplete_filter(self):
+        for model, query, expected in (
+            ('task', f'?project__id__exact={self.second.pk}', ['Во втором']),
+            ('project', f'?owner__id__exact={self.other.pk}', ['Второй']),
+            ('tag', f'?user__id__exact={self.other.pk}', ['Чужой']),
+        ):
+            with self.subTest(model=model):
+                response = self.changelist(model, query)
+                objects = response.context['cl'].result_list
+                self.assertEqual([getattr(obj, 'title', None) or obj.name for obj in objects], expected)
+                self.assertContains(response, 'data-filter-param="%s"' % query[1:].split('=')[0])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Оценка количества строк есть только в PostgreSQL')
+    def test_estimated_count(self):
+        queryset = Task.objects.filter(project=self.project)
+        paginator = EstimatedCountPaginator(queryset, 5)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(paginator.count, 7)  # Небольшая выборка - точный COUNT(*)
+        self.assertIn('COUNT(', queries[-1]['sql'])
+
+        paginator = EstimatedCountPaginator(queryset, 5)
+        paginator.estimate_threshold = 0
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(paginator.count, paginator.estimated_count())
+        self.assertTrue(queries[0]['sql'].startswith('EXPLAIN'))
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries))
+
+
+class VisibleToTests(TaskDataMixin, TestCase):
+    """visible_to (UNION трех подзапросов) видит те же задачи, что прежний OR с JOIN на проект"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.creator = User.objects.create_user('creator')  # Только создал задачу в чужом проекте
+        cls.assignee = User.objects.create_user('assignee')  # Только исполнитель в чужом проекте
+        cls.nobody = User.objects.create_user('nobody')
+        other_project = Project.objects.create(name='Чужой', owner=cls.other)
+        Task.objects.create(title='Созданная', project=cls.project, created_by=cls.creator)
+        Task.objects.create(title='Назначенная', project=other_project, assigned_to=cls.assignee, created_by=cls.other)
+        Task.objects.create(title='Своя', project=other_project, assigned_to=cls.user, created_by=cls.user)  # Два условия сразу - задача одна
+
+    def test_same_as_or_filter(self):
+        for user in (self.user, self.other, self.creator, self.assignee, self.nobody):
+            with self.subTest(user=user.username):
+                expected = Task.objects.filter(
+                    Q(project__owner=user) | Q(assigned_to=user) | Q(created_by=user)
+                ).values_list('pk', flat=True)
+                visible = Task.objects.visible_to(user)
+                self.assertEqual(sorted(visible.values_list('pk', flat=True)), sorted(set(expected)))
+                self.assertEqual(visible.count(), len(set(expected)))  # Без дублей от нескольких условий
+        self.assertFalse(Task.objects.visible_to(self.nobody).exists())
+
+    def test_combines_with_filters(self):
+        visible = Task.objects.visible_to(self.other).filter(status=self.done).order_by('title')
+        expected = Task.objects.filter(
+            Q(project__owner=self.other) | Q(assigned_to=self.other) | Q(created_by=self.other), status=self.done,
+        ).order_by('title')
+        self.assertEqual(list(visible), list(expected))
+
+
+class MetricsTests(TaskDataMixin, TestCase):
+    """Метрики по маршрутам (tasks/metrics.py) и доступ к /metrics"""
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    @override_settings(METRICS_TOKEN='metrics-token')
+    def test_access(self):
+        client = APIClient()
+        for headers, status in (
+            ({}, 401),
+            ({'HTTP_AUTHORIZATION': 'Bearer wrong'}, 401),
+            ({'HTTP_AUTHORIZATION': 'metrics-token'}, 401),  # Только схема Bearer
+            ({'HTTP_AUTHORIZATION': 'Bearer metrics-token'}, 200),
+        ):
+            with self.subTest(headers=headers):
+                response = client.get('/metrics', **headers)
+                self.assertEqual(response.status_code, status)
+        self.assertEqual(client.get('/metrics')['WWW-Authenticate'], 'Bearer')
+
+        client.force_login(self.user)  # Не сотрудник
+        self.assertEqual(client.get('/metrics').status_code, 401)
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        response = client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'todo_http_requests_total', response.content)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_empty_token_disabled(self):
+        self.assertEqual(APIClient().get('/metrics', HTTP_AUTHORIZATION='Bearer ').status_code, 401)
+
+    @override_settings(SECURE_SSL_REDIRECT=True)
+    def test_https_redirect(self):
+        response = APIClient().get('/metrics', HTTP_AUTHORIZATION='Bearer metrics-token')
+        self.assertEqual(response.status_code, 301)  # Токен не принимается по HTTP
+        self.assertTrue(response['Location'].startswith('https://'))
+
+    def test_route_labels(self):
+        routes = (
+            ('/api/tasks/', 'task-list', 'list', 200),
+            ('/api/tasks/overdue/', 'task-overdue', 'overdue', 200),
+            (f'/api/tasks/{self.tasks[0].pk}/', 'task-detail', 'retrieve', 200),
+            ('/api/missing/', 'unresolved', '', 404),
+        )
+        for url, route, action, status in routes:
+            with self.subTest(url=url):
+                labels = {'route': route, 'action': action}
+                requests = self.sample('todo_http_requests_total', method='GET', status=str(status), **labels)
+                queries = self.sample('todo_db_queries_per_request_count', **labels)
+                self.assertEqual(self.client.get(url).status_code, status)
+                self.assertEqual(self.sample('todo_http_requests_total', method='GET', status=str(status), **labels), requests + 1)
+                self.assertEqual(self.sample('todo_db_queries_per_request_count', **labels), queries + 1)
+
+        labels = {'route': 'task-detail', 'action': 'retrieve', 'method': 'GET', 'status': '200'}
+        before = self.sample('todo_http_requests_total', **labels)
+        self.client.get(f'/api/tasks/{self.tasks[1].pk}/')  # Другой id - тот же ряд метрик
+        self.assertEqual(self.sample('todo_http_requests_total', **labels), before + 1)
+
+    @override_settings(METRICS_TOKEN='metrics-token')
+    def test_metrics_not_measured(self):
+        before = self.sample('todo_http_requests_total', route='metrics', action='', method='GET', status='200')
+        APIClient().get('/metrics', HTTP_AUTHORIZATION='Bearer metrics-token')
+        self.assertEqual(self.sample('todo_http_requests_total', route='metrics', action='', method='GET', status='200'), before)
+
+
+class BulkTaskTests(TaskDataMixin, TestCase):
+    url = '/api/tasks/bulk/'
+
+    def setUp(self):
+        super().setUp()
+        foreign_project = Project.objects.create(name='Чужой проект', owner=self.other)
+        self.hidden = Task.objects.create(title='Чужая задача', project=foreign_project, created_by=self.other)
+
+    def test_create(self):
+        items = [
+            {'title': 'Первая', 'project': self.project.pk, 'priority': self.high.pk, 'tags': [self.tag.pk]},
+            {'title': 'Вторая', 'project': self.project.pk, 'status': self.new.pk},
+        ]
+        response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['created'], 2)
+        first = Task.objects.get(pk=response.json()['ids'][0])
+        self.assertEqual((first.title, first.created_by, first.priority), ('Первая', self.user, self.high))
+        self.assertEqual(list(first.tags.all()), [self.tag])
+        self.assertEqual(Task.history.filter(id__in=response.json()['ids'], history_type='+').count(), 2)
+
+    def test_create_partial_failure(self):
+        """Ошибки возвращаются по номерам элементов, и не создается ни одна задача"""
+        items = [
+            {'title': 'Нормальная', 'project': self.project.pk},
+            {'title': 'Без проекта', 'project': 999999},
+            {'title': self.tasks[0].title, 'project': self.project.pk},  # Название уже занято
+            {'title': 'Нормальная', 'project': self.project.pk},  # Дубликат внутри пачки
+            {'project': self.project.pk, 'priority': 999999},
+        ]
+        count = Task.objects.count()
+        response = self.client.post(self.url, {'tasks': items}, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = {error['index']: error['errors'] for error in response.json()['errors']}
+        self.assertEqual(sorted(errors), [1, 2, 3, 4])
+        self.assertIn('project', errors[1])
+        self.assertIn('title', errors[2])
+        self.assertIn('title', errors[3])
+        self.assertEqual(set(errors[4]), {'title'})  # Связи проверяются только у элементов без ошибок полей
+        self.assertEqual(Task.objects.count(), count)
+
+    def test_update(self):
+        ids = [self.tasks[0].pk, self.tasks[1].pk]
+        history = Task.history.filter(id__in=ids).count()
+        response = self.client.patch(self.url, {'ids': ids, 'status': self.done.pk, 'tags_add': [self.tag.pk]}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        for task in Task.objects.filter(pk__in=ids):
+            self.assertEqual(task.status, self.done)
+            self.assertEqual(list(task.tags.all()), [self.tag])
+        self.assertEqual(Task.history.filter(id__in=ids).count(), history + 2)  # По записи на задачу
+
+    def test_update_invisible_task(self):
+        """Чужая задача - как несуществующая; видимые задачи из той же пачки не меняются"""
+        ids = [self.tasks[0].pk, self.hidden.pk]
+        response = self.client.patch(self.url, {'ids': ids, 'title': 'Взлом'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'errors': [{'id': self.hidden.pk, 'errors': {'id': 'Задача не найдена'}}]})
+        self.assertFalse(Task.objects.filter(title='Взлом').exists())
+
+    def test_delete(self):
+        ids = [task.pk for task in self.tasks[:3]]
+        response = self.client.delete(self.url, {'ids': ids + [self.hidden.pk]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Task.objects.filter(pk__in=ids).count(), 3)
+
+        response = self.client.delete(self.url, {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertFalse(Task.objects.filter(pk__in=ids).exists())
+        self.assertTrue(Task.objects.filter(pk=self.hidden.pk).exists())
+        self.assertEqual(Task.history.filter(id__in=ids, history_type='-').count(), 3)
+
+    def test_size_limit(self):
+        response = self.client.post(self.url, [], format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(self.url, [{'title': str(n), 'project': self.project.pk} for n in range(MAX_BULK_ITEMS + 1)], format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+# Подключение драйвера для проверки пула без сервера PostgreSQL
+class FakeConnection:
+    def __init__(self, fail_check=False):
+        self.closed = 0
+        self.fail_check = fail_check
+        self.rolled_back = False
+        self.info = SimpleNamespace(transaction_status=TRANSACTION_STATUS_IDLE)
+
+    def cursor(self):
+        connection = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc_info):
+                return False
+
+            def execute(self, sql):
+                if connection.fail_check:
+                    raise psycopg2.OperationalError('server closed the connection')
+        return Cursor()
+
+    def rollback(self):
+        self.rolled_back = True
+        self.info.transaction_status = TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def make_pool(self, **options):
+        self.opened = []
+
+        def connect():
+            self.opened.append(FakeConnection())
+            return self.opened[-1]
+        options = {'min_size': 0, 'max_size': 2, 'timeout': 0.05, 'check_after': None, **options}
+        return ConnectionPool('test', connect, **options)
+
+    def test_reuses_returned_connection(self):
+        pool = self.make_pool()
+        conn = pool.getconn()
+        pool.putconn(conn)
+        self.assertIs(pool.getconn(), conn)
+        self.assertEqual(len(self.opened), 1)
+
+    def test_timeout_when_exhausted(self):
+        pool = self.make_pool(max_size=1)
+        pool.getconn()
+        with self.assertRaises(psycopg2.OperationalError):
+            pool.getconn()
+        self.assertEqual(pool.stats()['timeouts'], 1)
+        self.assertEqual(len(self.opened), 1)  # Больше max_size не открывается
+
+    def test_waiting_thread_gets_returned_connection(self):
+        pool = self.make_pool(max_size=1, timeout=5)
+        conn = pool.getconn()
+        received = []
+        waiter = threading.Thread(target=lambda: received.append(pool.getconn()))
+        waiter.start()
+        time.sleep(0.05)
+        pool.putconn(conn)
+        waiter.join(5)
+        self.assertEqual(received, [conn])
+
+    def test_open_transaction_rolled_back(self):
+        pool = self.make_pool()
+        conn = pool.getconn()
+        conn.info.transaction_status = TRANSACTION_STATUS_INTRANS
+        pool.putconn(conn)
+        self.assertTrue(conn.rolled_back)
+        self.assertIs(pool.getconn(), conn)
+
+    def test_broken_connection_discarded(self):
+        pool = self.make_pool()
+        conn = pool.getconn()
+        conn.info.transaction_status = TRANSACTION_STATUS_UNKNOWN
+        pool.putconn(conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.stats()['size'], 0)
+        self.assertIsNot(pool.getconn(), conn)
+
+    def test_failed_check_replaced(self):
+        pool = self.make_pool(check_after=0)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        conn.fail_check = True
+        fresh = pool.getconn()
+        self.assertIsNot(fresh, conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.stats()['failed_checks'], 1)
+
+    def test_max_lifetime(self):
+        pool = self.make_pool(max_lifetime=0)
+        conn = pool.getconn()
+        time.sleep(0.01)
+        pool.putconn(conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.stats()['size'], 0)
+
+    def test_fill_and_idle_trim(self):
+        pool = self.make_pool(min_size=1, max_size=3, max_idle=0)
+        self.assertEqual(pool.fill(), 1)
+        first, second = pool.getconn(), pool.getconn()
+        pool.putconn(first)
+        time.sleep(0.01)
+        pool.putconn(second)  # Лишнее сверх min_size закрывается по простою
+        stats = pool.stats()
+        self.assertEqual((stats['size'], stats['idle']), (1, 1))
+        self.assertTrue(first.closed)
+
+    def test_closed_pool(self):
+        pool = self.make_pool()
+        conn = pool.getconn()
+        pool.close()
+        with self.assertRaises(psycopg2.OperationalError):
+            pool.getconn()
+        pool.putconn(conn)
+        self.assertTrue(conn.closed)
+
+
+@skipUnless(isinstance(connections[DEFAULT_DB_ALIAS], PooledDatabaseWrapper), 'База без пула подключений (ENGINE не tasks.db)')
+class PooledBackendTests(TransactionTestCase):
+    def test_connection_returned_to_pool(self):
+        connection.ensure_connection()
+        pool = connection.get_pool()
+        checkouts = pool.stats()['checkouts']
+        connection.close()  # Подключение возвращается в пул, а не закрывается
+        busy = pool.stats()['busy']
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        self.assertEqual(pool.stats()['checkouts'], checkouts + 1)
+        self.assertEqual(pool.stats()['busy'], busy + 1)
+        self.assertIn(connection.alias, pool_stats())
+
+
+class ReplicaRouterTests(TransactionTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.addCleanup(_read_alias.set, None)
+
+    def test_reads_follow_request_alias(self):
+        self.assertEqual(self.router.db_for_read(Task), DEFAULT_DB_ALIAS)
+        _read_alias.set('replica_1')
+        self.assertEqual(self.router.db_for_read(Task), 'replica_1')
+        self.assertEqual(self.router.db_for_write(Task), DEFAULT_DB_ALIAS)
+        with transaction.atomic():  # В транзакции видны ее собственные изменения
+            self.assertEqual(self.router.db_for_read(Task), DEFAULT_DB_ALIAS)
+
+    def test_migrations_only_on_primary(self):
+        self.assertTrue(self.router.allow_migrate(DEFAULT_DB_ALIAS, 'tasks'))
+        self.assertFalse(self.router.allow_migrate('replica_1', 'tasks'))
+
+    def test_replica_set_skips_lagging(self):
+        replicas = ReplicaSet()
+        lags = {'replica_1': 0.5, 'replica_2': 10, 'replica_3': float('inf')}
+        with self.settings(DATABASE_REPLICAS=list(lags), REPLICA_MAX_LAG=2), \
+                mock.patch.object(ReplicaSet, 'lag', side_effect=lags.get):
+            self.assertEqual(replicas.choose(), 'replica_1')
+        with self.settings(DATABASE_REPLICAS=['replica_2']), mock.patch.object(ReplicaSet, 'lag', return_value=10):
+            self.assertEqual(ReplicaSet().choose(), None)  # Все отстают - читаем основную базу
+
+    def test_primary_has_no_lag(self):
+        self.assertEqual(ReplicaSet.lag(DEFAULT_DB_ALIAS), 0)
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class ReplicaPinTests(TaskDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(_read_alias.set, None)
+        self.choose = mock.patch.object(replica_set, 'choose', return_value='replica_1').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def read_alias(self, user, cookies=None):
+        """База, которую ReplicaReadMixin выбрал бы для GET /api/tasks/"""
+        request = APIRequestFactory().get('/api/tasks/')
+        request.COOKIES.update(cookies or {})
+        force_authenticate(request, user)
+        view = TaskViewSet(action='list', action_map={'get': 'list'}, args=(), kwargs={}, format_kwarg=None, headers={})
+        view.request = view.initialize_request(request)
+        view.initial(view.request)
+        alias = _read_alias.get()
+        _read_alias.set(None)
+        return alias
+
+    def test_reads_go_to_replica(self):
+        self.assertEqual(self.read_alias(self.user), 'replica_1')
+
+    def test_write_pins_user_to_primary(self):
+        response = self.client.post(f'/api/tasks/{self.tasks[0].pk}/change_status/', {'status_id': self.done.pk})
+        self.assertEqual(response.status_code, 200)
+        cookie = response.cookies[PIN_COOKIE]
+        self.assertTrue(cookie['httponly'])
+        self.assertGreater(float(cookie.value), time.time())
+        self.assertIsNone(self.read_alias(self.user, {PIN_COOKIE: cookie.value}))
+        self.assertIsNone(self.read_alias(self.user))  # Клиент без cookie - по ключу в кэше
+        self.assertEqual(self.read_alias(self.other), 'replica_1')  # Другие пользователи читают реплику
+
+    def test_failed_write_does_not_pin(self):
+        response = self.client.post(f'/api/tasks/{self.tasks[0].pk}/change_status/', {})
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(self.read_alias(self.user), 'replica_1')
+
+    def test_expired_pin(self):
+        self.assertEqual(self.read_alias(self.user, {PIN_COOKIE: str(time.time() - 1)}), 'replica_1')
+        self.assertEqual(self.read_alias(self.user, {PIN_COOKIE: 'мусор'}), 'replica_1')
+
+    def test_fresh_version_on_replica_gets_no_etag(self):
+        _read_alias.set('replica_1')
+        self.assertTrue(replica_may_lag(time.time()))
+        self.assertFalse(replica_may_lag(time.time() - 60))
+        _read_alias.set(None)
+        self.assertFalse(replica_may_lag(time.time()))  # Основная база не отстает
+
+
+def png(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), color).save(buffer, 'PNG')
+    return ContentFile(buffer.getvalue(), name='picture.png')
+
+
+class ImageVariantTests(TaskDataMixin, TestCase):
+    """Уменьшенные копии изображений (tasks/images.py)"""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = self.settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.storage = Task._meta.get_field('image').storage
+
+    def upload(self, task, image, fmt, **options):
+        buffer = io.BytesIO()
+        image.save(buffer, fmt, **options)
+        task.image.save(f'upload.{fmt.lower()}', ContentFile(buffer.getvalue()))
+        return task
+
+    def open_variant(self, variants, variant, ext):
+        with self.storage.open(variants[variant][ext], 'rb') as file:
+            image = Image.open(file)
+            image.load()
+        return image
+
+    def test_metadata_stripped(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: повернуть на 90°
+        exif[0x010F] = 'Camera'
+        exif[0x8825] = {1: 'N', 2: (55.0, 45.0, 0.0)}  # GPSInfo
+        task = self.upload(self.tasks[0], Image.new('RGB', (40, 20), 'red'), 'JPEG', exif=exif)
+        with self.storage.open(task.image.name, 'rb') as file:
+            self.assertTrue(Image.open(file).getexif().get_ifd(0x8825))  # Геометка в оригинале есть
+
+        variants = build_variants(task.image)
+        self.assertEqual(variants['source'], task.image.name)
+        for ext in FORMATS:
+            image = self.open_variant(variants, 'thumb', ext)
+            self.assertEqual(image.size, (20, 40))  # Поворот применен к пикселям
+            self.assertEqual(dict(image.getexif()), {})
+            self.assertNotIn('exif', image.info)
+            self.assertNotIn('xmp', image.info)
+        self.assertEqual((variants['thumb']['width'], variants['thumb']['height']), (20, 40))
+
+    def test_sizes(self):
+        task = self.upload(self.tasks[0], Image.new('RGB', (2000, 500), 'blue'), 'PNG')
+        variants = build_variants(task.image)
+        self.assertEqual((variants['medium']['width'], variants['medium']['height']), (1024, 256))
+        self.assertEqual((variants['thumb']['width'], variants['thumb']['height']), (200, 50))
+        self.assertTrue(all(is_blob(name) for name in variant_files(variants)))
+
+    def test_transparency(self):
+        task = self.upload(self.tasks[0], Image.new('RGBA', (10, 10), (255, 0, 0, 0)), 'PNG')  # Полностью прозрачное
+        variants = build_variants(task.image)
+        jpeg = self.open_variant(variants, 'thumb', 'jpeg')
+        self.assertEqual(jpeg.mode, 'RGB')
+        self.assertTrue(all(channel >= 250 for channel in jpeg.getpixel((5, 5))))  # Белый фон, а не черный
+        self.assertEqual(self.open_variant(variants, 'thumb', 'webp').mode, 'RGBA')
+
+    def test_process_next(self):
+        task = self.upload(self.tasks[0], Image.new('RGB', (300, 300), 'green'), 'PNG')
+        Task.objects.filter(pk=task.pk).update(image_variants={})  # В очереди
+        obj = process_next(Task)
+        self.assertEqual(obj.pk, task.pk)
+        stored = Task.objects.get(pk=task.pk).image_variants
+        self.assertEqual(stored, obj.image_variants)
+        self.assertEqual(stored['source'], task.image.name)
+        self.assertIsNone(process_next(Task))  # Очередь пуста
+
+    def test_shared_variants_reused(self):
+        first = self.upload(self.tasks[0], Image.new('RGB', (300, 300), 'green'), 'PNG')
+        second = self.upload(self.tasks[1], Image.new('RGB', (300, 300), 'green'), 'PNG')  # Тот же файл
+        Task.objects.filter(pk__in=[first.pk, second.pk]).update(image_variants={})
+        process_next(Task)
+        with mock.patch('tasks.images.build_variants') as build:
+            process_next(Task)
+        build.assert_not_called()
+        first_variants, second_variants = (Task.objects.get(pk=pk).image_variants for pk in (first.pk, second.pk))
+        self.assertEqual(first_variants, second_variants)
+
+    def test_error_recorded(self):
+        task = self.tasks[0]
+        task.image.save('broken.png', ContentFile(b'not an image'))
+        Task.objects.filter(pk=task.pk).update(image_variants={})
+        with self.assertLogs('tasks.images', 'WARNING'):
+            process_next(Task)
+        variants = Task.objects.get(pk=task.pk).image_variants
+        self.assertEqual(variants['source'], task.image.name)
+        self.assertIn('error', variants)
+        self.assertIsNone(process_next(Task))  # Ошибочный файл не обрабатывается повторно
+
+    def test_replaced_during_processing(self):
+        task = self.upload(self.tasks[0], Image.new('RGB', (300, 300), 'green'), 'PNG')
+        replacement = self.storage.save('new.png', png('blue'))
+        Task.objects.filter(pk=task.pk).update(image_variants={})
+
+        def replace(field_file):
+            variants = build_variants(field_file)
+            Task.objects.filter(pk=task.pk).update(image=replacement)  # Пользователь загрузил другое изображение
+            return variants
+
+        with mock.patch('tasks.images.build_variants', side_effect=replace):
+            process_next(Task)
+        self.assertEqual(Task.objects.get(pk=task.pk).image_variants, {})  # Копии старого файла не записаны
+        self.assertEqual(process_next(Task).image_variants['source'], replacement)
+
+
+class ContentAddressedStorageTests(TaskDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = self.settings(MEDIA_ROOT=media_root, MEDIA_GC_GRACE=600)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.storage = Task._meta.get_field('image').storage
+
+    def age(self, name, seconds=3600):
+        """Файл не трогали seconds секунд (старше MEDIA_GC_GRACE)"""
+        past = time.time() - seconds
+        os.utime(self.storage.path(name), (past, past))
+
+    def test_same_content_stored_once(self):
+        first, second = self.tasks[0], self.tasks[1]
+        first.image.save('a.png', png('red'))
+        second.image.save('b.png', png('red'))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(is_blob(first.image.name))
+        self.assertTrue(first.image.name.endswith('.png'))
+        self.tasks[2].image.save('a.png', png('blue'))
+        self.assertNotEqual(self.tasks[2].image.name, first.image.name)
+
+    def test_collect_garbage(self):
+        self.tasks[0].image.save('used.png', png('red'))
+        used = self.tasks[0].image.name
+        variant = self.storage.save('thumb.webp', ContentFile(b'variant'))
+        Task.objects.filter(pk=self.tasks[0].pk).update(image_variants={
+            'source': used, 'thumb': {'width': 8, 'height': 8, 'webp': variant, 'jpeg': variant},
+        })
+        orphan = self.storage.save('orphan.png', png('green'))
+        young = self.storage.save('young.png', png('blue'))  # Может сохранять незакоммиченная транзакция
+        for name in (used, variant, orphan):
+            self.age(name)
+
+        self.assertEqual(collect_garbage(self.storage, dry_run=True)[0], 1)
+        self.assertTrue(self.storage.exists(orphan))
+
+        count, size = collect_garbage(self.storage)
+        self.assertEqual(count, 1)
+        self.assertGreater(size, 0)
+        self.assertFalse(self.storage.exists(orphan))
+        for name in (used, variant, young):
+            self.assertTrue(self.storage.exists(name), name)
+
+    def test_released_when_last_reference_removed(self):
+        first, second = self.tasks[0], self.tasks[1]
+        first.image.save('a.png', png('red'))
+        second.image.save('b.png', png('red'))
+        name = first.image.name
+        self.age(name)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(self.storage.exists(name))  # Файл еще нужен второй задаче
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.image = None
+            second.save()
+        self.assertFalse(self.storage.exists(name))
+
+    def media(self, path):
+        return media_view(APIRequestFactory().get(f'{settings.MEDIA_URL}{path}'), path)
+
+    def test_media_cache_headers(self):
+        self.tasks[0].image.save('a.png', png('red'))
+        response = self.media(self.tasks[0].image.name)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], IMMUTABLE)
+
+    def test_media_serves_only_blobs(self):
+        temp, legacy = 'content/.tmp/partial', 'tasks_images/old.png'
+        for name in (temp, legacy):  # Мимо хранилища: оно сохранило бы файлы под хэшем
+            path = os.path.join(settings.MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(b'...')
+        for path in (temp, f'tasks_images/../{temp}', legacy):
+            with self.subTest(path=path), self.assertRaises(Http404):
+                self.media(path)
+        with self.settings(DEBUG=True):  # В режиме разработки старые загрузки отдаются, недописанные - нет
+            self.assertEqual(self.media(legacy)['Cache-Control'], 'public, no-cache')
+            with self.assertRaises(Http404):
+                self.media(temp)
@@ -0,0 +1,40 @@
+from asgiref.local import Local  # Отдельно для каждого потока и asyncio-задачи (как соединения с БД)
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+_local = Local()  # Пакеты изменений открытых транзакций: (база, ключ) -> (пакет, колбэк)
+
+
+def commit_pending(func, using=DEFAULT_DB_ALIAS):
+    """
+    Колбэк, переданный в transaction.on_commit, еще ждет коммита. Django отбрасывает колбэки
+    при откате транзакции или savepoint, в котором они зарегистрированы, а публичного способа
+    это узнать нет - это единственное место, где читается внутренний список run_on_commit
+    """
+    return any(entry[1] is func for entry in connections[using].run_on_commit)
+
+
+def commit_batch(key, factory, flush, using=DEFAULT_DB_ALIAS):
+    """
+    Пакет изменений текущей транзакции: factory() создает его при первом изменении, после коммита
+    flush(пакет) вызывается один раз. Вне транзакции возвращает None - изменения обрабатываются
+    сразу. Пакет из откатившейся транзакции (или savepoint) не используется - заводится новый
+    """
+    if not connections[using].in_atomic_block:
+        return None
+    batches = getattr(_local, 'batches', None)
+    if batches is None:
+        batches = _local.batches = {}
+    entry = batches.get((using, key))
+    if entry is not None and commit_pending(entry[1], using):
+        return entry[0]
+
+    batch = factory()
+
+    def callback():
+        if batches.get((using, key)) is entry:
+            del batches[(using, key)]
+        flush(batch)
+
+    entry = batches[(using, key)] = (batch, callback)
+    transaction.on_commit(callback, using=using)
+    return batch
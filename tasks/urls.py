@@ -1,6 +1,9 @@
+from django.conf import settings  # ASYNC_VIEWS
 from django.urls import path, include  # Для создания URL путей
 from rest_framework.routers import DefaultRouter  # Автоматический роутинг для ViewSets
 from . import views  # Импортируем наши views
+from .asgi import async_read_urls  # Асинхронные читающие действия под ASGI
+from .push import events_unavailable_view  # Поток событий (при запуске через ASGI его обслуживает todo_project/asgi.py)
 
 # Создаем роутер для автоматической генерации URLs
 router = DefaultRouter()  # DefaultRouter автоматически создает пути для ViewSets
@@ -14,7 +17,12 @@ router.register(r'projects', views.ProjectViewSet, basename='project')  # /api/p
 router.register(r'tasks', views.TaskViewSet, basename='task')  # /api/tasks/
 router.register(r'users', views.UserViewSet, basename='user')  # /api/users/
 
+router_urls = router.urls
+if settings.ASYNC_VIEWS:  # Под ASGI: alist, aretrieve, aoverdue... вместо синхронных действий (те же пути и имена)
+    router_urls = async_read_urls(router_urls)
+
 # URL patterns для приложения tasks
 urlpatterns = [
-    path('', include(router.urls)),  # Подключаем все URLs из роутера
+    path('events/', events_unavailable_view, name='events'),  # /api/events/ под WSGI - ответ 501
+    path('', include(router_urls)),  # Подключаем все URLs из роутера
 ]
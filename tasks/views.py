@@ -1,5 +1,8 @@
 from django.shortcuts import render
-from django.db.models import Q  # Для сложных запросов с OR, AND, NOT
+from django.http import Http404, StreamingHttpResponse  # Потоковый ответ для выгрузки
+from django.db.models import Q, Count, Prefetch, Subquery  # Для сложных запросов с OR, AND, NOT и агрегации
+from django.db.models.functions import Coalesce  # Нет проектов - 0, а не NULL
+from django.core.cache import cache  # Кэш Django (для статистики)
 from django.utils import timezone  # Для работы с датами и временем
 from django.contrib.auth.models import User  # Модель пользователя
 from rest_framework import viewsets, status  # Базовые классы для API и статусы ответов
@@ -7,7 +10,19 @@ from rest_framework.decorators import action  # Декоратор для доп
 from rest_framework.response import Response  # Для возврата JSON ответов
 from datetime import timedelta  # Для работы с временными интервалами
 
-from .models import Priority, Status, Tag, Project, Task  # Наши модели
+from .models import Priority, Status, Tag, Project, Task, DeadlineEntry  # Наши модели
+from .models import STATUS_COMPLETED, STATUS_IN_PROGRESS, STATUS_CANCELLED, URGENT_PRIORITY_LEVEL  # Константы статусов и приоритетов
+from .bulk import BulkError, bulk_create_tasks, bulk_update_tasks, bulk_delete_tasks  # Массовые операции с задачами
+from .reference import reference_data  # Кэш справочников: названия статусов и уровни приоритетов -> id
+from .pagination import KeysetPaginationMixin  # Keyset-пагинация по запросу клиента
+from .fieldsets import SparseFieldsetMixin  # Выборочные поля (?fields=, ?omit=, ?expand=)
+from .conditional import ConditionalGetMixin, get_versions  # Ответ 304 на повторное чтение без изменений
+from .rows import COLUMNS, TaskRows  # Быстрая сериализация задач из values()
+from .export import EXPORT_CONTENT_TYPES, CSV_DEFAULT_FIELDS, iter_task_rows, ndjson_lines, csv_lines  # Потоковая выгрузка
+from .history import history_diffs  # Изменения полей между соседними записями истории
+from .metrics import cache_event  # Попадания в кэш статистики
+from .asgi import AsyncReadMixin, gather_db, run_db  # Асинхронные читающие действия (ASGI, ASYNC_VIEWS)
+from .replicas import ReplicaReadMixin, replica_may_lag  # Безопасные запросы читают реплику (DATABASE_REPLICA_URLS)
 from .serializers import (  # Наши сериализаторы
     PrioritySerializer, StatusSerializer, TagSerializer,
     ProjectSerializer, ProjectListSerializer,
@@ -32,8 +47,9 @@ def tasks_view(request):
 
 
 # ViewSet для Priority (Приоритет)
-class PriorityViewSet(viewsets.ModelViewSet):
+class PriorityViewSet(ReplicaReadMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Priority.objects.all()  # Все приоритеты
+    conditional_models = ('tasks.Priority',)  # ETag меняется только при изменении приоритетов
     serializer_class = PrioritySerializer  # Сериализатор для приоритетов
     filterset_fields = ['level']  # Фильтрация по уровню (DjangoFilterBackend)
     search_fields = ['name']  # Поиск по названию
@@ -41,16 +57,18 @@ class PriorityViewSet(viewsets.ModelViewSet):
 
 
 # ViewSet для Status (Статус)
-class StatusViewSet(viewsets.ModelViewSet):
+class StatusViewSet(ReplicaReadMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Status.objects.all()
+    conditional_models = ('tasks.Status',)
     serializer_class = StatusSerializer
     search_fields = ['name']  # Поиск по названию статуса
     ordering_fields = ['name']
 
 
 # ViewSet для Tag (Тег)
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = TagSerializer
+    conditional_models = ('tasks.Tag', 'auth.User')  # В ответе есть имя владельца тега
     filterset_fields = ['color']  # Фильтрация по цвету (DjangoFilterBackend)
     search_fields = ['name']  # Поиск по названию тега
 
@@ -65,20 +83,36 @@ class TagViewSet(viewsets.ModelViewSet):
 
 
 # ViewSet для Project (Проект)
-class ProjectViewSet(viewsets.ModelViewSet):
+class ProjectViewSet(AsyncReadMixin, ReplicaReadMixin, ConditionalGetMixin, SparseFieldsetMixin, KeysetPaginationMixin, viewsets.ModelViewSet):
     serializer_class = ProjectSerializer
+    async_actions = ('tasks',)  # Асинхронные версии (atasks) при запуске через ASGI
+    conditional_models = ('tasks.Project', 'tasks.Task', 'auth.User')  # Задачи меняют счетчики проекта
     filterset_fields = ['owner']  # Фильтрация по владельцу (DjangoFilterBackend)
     search_fields = ['name', 'description']  # Поиск по названию и описанию
+    search_vector_field = 'search_vector'  # Полнотекстовый поиск по tsvector (см. tasks/search.py)
+    search_trigram_fields = ('name',)  # Нечеткий поиск по триграммам
+    search_headline_fields = ('name', 'description')  # Подсветка совпадений в ответе
     ordering_fields = ['created_at', 'updated_at', 'name']  # Сортировка
+    keyset_orderings = ('-created_at', 'created_at', '-updated_at', 'updated_at')  # Сортировки для ?pagination=cursor
+    history_actions = ('history',)  # Лента истории листается курсором по дате изменения
+    fieldset_actions = ('list', 'retrieve', 'my_projects')  # ?fields=, ?omit=, ?expand=
+    fieldset_expansions = {'owner': ('owner_username',)}
+    fieldset_columns = {
+        'owner': ('owner_id',), 'owner_username': ('owner_id', 'owner__username'), 'tasks_count': ('tasks_total',),
+        'image_thumb': ('image', 'image_variants'), 'image_variants': ('image', 'image_variants'),
+    }
+    fieldset_select_related = {'owner_username': 'owner'}
 
     def get_queryset(self):
         """Возвращаем проекты текущего пользователя"""
         if self.request.user.is_authenticated:
-            return Project.objects.filter(owner=self.request.user)  # Фильтрация по текущему пользователю
+            return self.apply_fieldset(  # Фильтрация по текущему пользователю, JOIN и колонки - только для выбранных полей
+                Project.objects.filter(owner=self.request.user), select_related=('owner',), columns=self.get_keyset_columns()
+            )
         return Project.objects.none()
 
     def get_serializer_class(self):  # Используем разные сериализаторы для списка и деталей
-        if self.action == 'list':  # Для списка проектов
+        if self.action == 'list' and not self.fields_requested():  # Для списка проектов (с ?fields= - любые поля)
             return ProjectListSerializer  # Упрощенный сериализатор
         return ProjectSerializer  # Полный сериализатор для деталей
 
@@ -96,13 +130,36 @@ class ProjectViewSet(viewsets.ModelViewSet):
     def tasks(self, request, pk=None):
         """GET /api/projects/{id}/tasks/ - Получить задачи конкретного проекта"""
         project = self.get_object()
-        tasks = Task.objects.filter(project=project).select_related(
-            'priority', 'status', 'assigned_to', 'created_by'
-        ).prefetch_related('tags')
+        tasks = Task.objects.filter(project=project)
+        rows = TaskRows(TaskSerializer, request)  # Без объектов моделей: values() + теги одним запросом
+        return Response(rows.render(rows.values(tasks)))
+
+    async def atasks(self, request, pk=None):
+        """tasks() для ASGI: проверка проекта, задачи и их теги - тремя одновременными запросами"""
+        projects = await run_db(lambda: self.filter_queryset(self.get_queryset()))
+        rows = TaskRows(TaskSerializer, request)
+        try:
+            tasks = rows.values(Task.objects.filter(project_id=pk))
+        except (TypeError, ValueError):  # Как get_object_or_404 в DRF
+            raise Http404
+        found, task_rows, tags = await gather_db(
+            projects.filter(pk=pk).exists, lambda: list(tasks), lambda: rows.load_tags(tasks.values('id')),
+        )
+        if not found:
+            raise Http404('No Project matches the given query.')
+        return Response(await run_db(rows.render, task_rows, tags))
 
-        from .serializers import TaskSerializer
-        serializer = TaskSerializer(tasks, many=True)
-        return Response(serializer.data)
+    @action(detail=True, methods=['get'])
+    def history(self, request, pk=None):
+        """GET /api/projects/{id}/history/ - Лента изменений всех задач проекта"""
+        project = self.get_object()
+        records = self.paginate_queryset(
+            Task.history.filter(project_id=project.pk).select_related('history_user')  # Задача была в проекте на момент изменения
+        )
+        feed = history_diffs(records)
+        for record, item in zip(records, feed):
+            item['task'] = {'id': record.id, 'title': record.title}
+        return self.get_paginated_response(feed)
 
     @action(detail=True, methods=['post'])  # Дополнительный метод для объекта (detail=True)
     def archive(self, request, pk=None):
@@ -116,26 +173,64 @@ class ProjectViewSet(viewsets.ModelViewSet):
         })
 
 
+STATS_CACHE_TIMEOUT = 30  # Время жизни кэша статистики (в секундах)
+STATS_VERSION_LABELS = ('tasks.Task', 'tasks.Project', 'tasks.Status', 'tasks.Priority')  # От чего зависит статистика
+
+
 # ViewSet для Task (Задача) - основной с фильтрацией и Q-запросами
-class TaskViewSet(viewsets.ModelViewSet):
+class TaskViewSet(AsyncReadMixin, ReplicaReadMixin, ConditionalGetMixin, SparseFieldsetMixin, KeysetPaginationMixin, viewsets.ModelViewSet):
     serializer_class = TaskSerializer
+    async_actions = ('list', 'retrieve', 'upcoming_week', 'overdue', 'urgent_or_tomorrow')  # alist, aretrieve... под ASGI
+    conditional_models = (  # Задача выводится вместе с проектом, тегами, справочниками и пользователями
+        'tasks.Task', 'tasks.Project', 'tasks.Tag', 'tasks.Priority', 'tasks.Status', 'auth.User'
+    )
     filterset_fields = ['status', 'priority', 'project', 'assigned_to']  # Фильтрация (DjangoFilterBackend)
     search_fields = ['title', 'description']  # Поиск по названию и описанию
+    search_vector_field = 'search_vector'  # Полнотекстовый поиск по tsvector (см. tasks/search.py)
+    search_trigram_fields = ('title',)  # Нечеткий поиск по триграммам
+    search_headline_fields = ('title', 'description')  # Подсветка совпадений в ответе
     ordering_fields = ['created_at', 'due_date', 'priority__level']  # Сортировка
-
-    def get_queryset(self):
-        """Базовый queryset с возможностью фильтрации"""
-        queryset = Task.objects.select_related('project', 'priority', 'status', 'assigned_to', 'created_by').prefetch_related('tags')  # Оптимизация запросов
+    keyset_orderings = (  # Сортировки для ?pagination=cursor
+        '-created_at', 'created_at', 'due_date', '-due_date', 'priority__level', '-priority__level'
+    )
+    history_actions = ('history',)  # История листается курсором по дате изменения
+    fieldset_actions = (  # ?fields=, ?omit=, ?expand=
+        'list', 'retrieve', 'upcoming_week', 'overdue', 'urgent_or_tomorrow', 'others_in_progress_or_cancelled', 'export'
+    )
+    fieldset_expansions = {
+        'project': ('project', 'project_name'),
+        'priority': ('priority', 'priority_name', 'priority_details'),
+        'status': ('status', 'status_name', 'status_details'),
+        'assigned_to': ('assigned_to', 'assigned_to_username'),
+        'created_by': ('created_by', 'created_by_username'),
+        'tags': ('tags', 'tags_list', 'tags_details'),
+    }
+    fieldset_columns = COLUMNS  # Те же колонки, что у быстрой сериализации
+    fieldset_select_related = {
+        'project_name': 'project', 'assigned_to_username': 'assigned_to', 'created_by_username': 'created_by'
+    }
+    fieldset_prefetch_related = {'tags': 'tags', 'tags_list': 'tags', 'tags_details': 'tags'}
+
+    def get_queryset(self, visible_only=True):
+        """Базовый queryset с возможностью фильтрации (visible_only=False - без проверки видимости)"""
+        queryset = self.apply_fieldset(  # Приоритет и статус - из кэша справочников
+            Task.objects.all(),
+            select_related=('project', 'assigned_to', 'created_by'),
+            prefetch_related=(Prefetch('tags', queryset=Tag.objects.select_related('user')),),  # Владельцы тегов - тем же запросом
+        )
 
         # Фильтрация по статусу через URL (именованные аргументы)
         status_name = self.kwargs.get('status')  # Получаем статус из URL
         if status_name:
-            queryset = queryset.filter(status__name=status_name)
+            queryset = queryset.filter(status_id__in=reference_data.status_ids(status_name))
 
         # Фильтрация по GET параметрам (priority)
         priority_level = self.request.query_params.get('priority_level')  # ?priority_level=5
         if priority_level:
-            queryset = queryset.filter(priority__level=priority_level)
+            try:
+                queryset = queryset.filter(priority_id__in=reference_data.priority_ids(level=int(priority_level)))
+            except ValueError:  # Уровень не число - таких задач нет
+                queryset = queryset.none()
 
         # Фильтрация по GET параметрам (due_date)
         due_date_from = self.request.query_params.get('due_date_from')  # ?due_date_from=2026-01-10
@@ -147,82 +242,288 @@ class TaskViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(due_date__lte=due_date_to)
 
         # Фильтрация по текущему пользователю
-        if self.request.user.is_authenticated:
-            queryset = queryset.filter(
-                Q(project__owner=self.request.user)
-                | Q(assigned_to=self.request.user)
-                | Q(created_by=self.request.user)
-            )
+        if visible_only and self.request.user.is_authenticated:
+            queryset = queryset.visible_to(self.request.user)
 
         return queryset
 
+    def deadline_tasks(self, condition):
+        """
+        Задачи по таблице сроков (DeadlineEntry, см. tasks/deadlines.py): ее строки есть у каждого,
+        кто видит задачу, поэтому вместо подзапросов видимости - поиск по индексу (пользователь, срок)
+        """
+        entries = DeadlineEntry.objects.filter(condition)
+        if self.request.user.is_authenticated:
+            entries = entries.filter(user=self.request.user)
+        return self.get_queryset(visible_only=False).filter(pk__in=entries.values('task_id'))
+
     def get_serializer_class(self):
-        if self.action == 'list':
+        if self.action == 'list' and not self.fields_requested():  # С ?fields= - любые поля задачи
             return TaskListSerializer  # Упрощенный для списка
         return TaskSerializer
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)  # Автоматически устанавливаем создателя
 
+    def list(self, request, *args, **kwargs):
+        """Список задач через быструю сериализацию (тот же JSON, что у TaskListSerializer)"""
+        return self.conditional_response(request, lambda: self._list_rows(request))
+
+    def _list_rows(self, request):
+        queryset, rows = self._list_source(request)
+        extra = self.get_keyset_columns()  # Курсору нужны значения полей сортировки (в том числе priority__level)
+        page = self.paginate_queryset(rows.values(queryset, extra=extra))
+        if page is not None:
+            return self.get_paginated_response(rows.render(page))
+        return Response(rows.render(rows.values(queryset)))
+
+    def _list_source(self, request):
+        """Отфильтрованные задачи (django-filter проверяет значения фильтров запросами к БД) и их сериализация"""
+        queryset = self.filter_queryset(self.get_queryset())
+        return queryset, TaskRows(self.get_serializer_class(), request, fields=self.get_fieldset())
+
+    async def alist(self, request, *args, **kwargs):
+        """list() для ASGI: COUNT(*) и строки страницы - одновременно"""
+        return await self.aconditional_response(request, lambda: self._alist_rows(request))
+
+    async def _alist_rows(self, request):
+        if not self.keyset_requested():
+            queryset, rows = await run_db(self._list_source, request)
+            response = await self.apaginated_response(request, rows.values(queryset), rows.render)
+            if response is not None:
+                return response
+        return await run_db(self._list_rows, request)  # Курсор: одна выборка, параллелить нечего
+
+    async def aretrieve(self, request, *args, **kwargs):
+        """retrieve() для ASGI: задача и ее теги - двумя одновременными запросами (тот же JSON через TaskRows)"""
+        return await self.aconditional_response(request, lambda: self._aretrieve_row(request))
+
+    async def _aretrieve_row(self, request):
+        queryset, rows = await run_db(self._list_source, request)  # Та же область видимости, что у get_object()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            task = rows.values(queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]}))
+        except (TypeError, ValueError):  # Как get_object_or_404 в DRF
+            raise Http404
+        data = await self.arender_rows(rows, task)
+        if not data:
+            raise Http404('No Task matches the given query.')
+        return Response(data[0])
+
+    def task_rows(self, queryset):
+        """Задачи для дополнительных действий в формате TaskSerializer (только чтение)"""
+        rows = TaskRows(self.get_serializer_class(), self.request, fields=self.get_fieldset())
+        return rows.render(rows.values(queryset))
+
+    async def atask_rows(self, build_queryset):
+        """
+        task_rows() для ASGI: одним заданием пула. Теги зависят от выбранных задач, а подзапрос
+        с тем же условием повторил бы соединение с очередью сроков - параллелить здесь нечего
+        """
+        return await run_db(lambda: self.task_rows(build_queryset()))
+
+    async def arender_rows(self, rows, values):
+        """Строки задач и их теги - одновременно (для выборок по ключу, где подзапрос тегов дешевый)"""
+        if not rows.with_tags:
+            return await run_db(rows.render, values)
+        task_rows, tags = await gather_db(lambda: list(values), lambda: rows.load_tags(values.values('id')))
+        return await run_db(rows.render, task_rows, tags)
+
     # Q-запрос 1: Задачи на ближайшие 7 дней
     @action(detail=False, methods=['get'])
     def upcoming_week(self, request):
         """GET /api/tasks/upcoming_week/ - Задачи на ближайшие 7 дней"""
+        return Response(self.task_rows(self._upcoming_week_tasks()))
+
+    async def aupcoming_week(self, request):
+        return Response(await self.atask_rows(self._upcoming_week_tasks))
+
+    def _upcoming_week_tasks(self):
         today = timezone.now()  # Текущая дата
         week_later = today + timedelta(days=7)  # Через 7 дней
 
         # Q-запрос: задачи со сроком в ближайшие 7 дней
-        tasks = self.get_queryset().filter(
+        return self.deadline_tasks(
             Q(due_date__gte=today) & Q(due_date__lte=week_later)  # И дата >= сегодня И дата <= через 7 дней
         )
 
-        serializer = self.get_serializer(tasks, many=True)
-        return Response(serializer.data)
-
     # Q-запрос 2: Просроченные задачи
     @action(detail=False, methods=['get'])
     def overdue(self, request):
         """GET /api/tasks/overdue/ - Все просроченные задачи"""
-        # Q-запрос: задачи с просроченным сроком и не завершенные
-        tasks = self.get_queryset().filter(
-            Q(due_date__lt=timezone.now())
-            & ~Q(status__name='Завершена')
-        )
-
-        serializer = self.get_serializer(tasks, many=True)
+        data = self.task_rows(self._overdue_tasks())
         return Response({
-            'count': tasks.count(),
-            'tasks': serializer.data
+            'count': len(data),  # Все строки уже выбраны - отдельный COUNT не нужен
+            'tasks': data
         })
 
+    async def aoverdue(self, request):
+        data = await self.atask_rows(self._overdue_tasks)
+        return Response({'count': len(data), 'tasks': data})
+
+    def _overdue_tasks(self):
+        # Q-запрос: задачи с просроченным сроком и не завершенные
+        return self.deadline_tasks(Q(due_date__lt=timezone.now()) & Q(is_open=True))
+
     # Q-запрос 3: Задачи с высоким приоритетом и не завершенные ИЛИ задачи на завтра
     @action(detail=False, methods=['get'])
     def urgent_or_tomorrow(self, request):
         """GET /api/tasks/urgent_or_tomorrow/ - Срочные незавершенные задачи ИЛИ задачи на завтра"""
+        return Response(self.task_rows(self._urgent_or_tomorrow_tasks()))
+
+    async def aurgent_or_tomorrow(self, request):
+        return Response(await self.atask_rows(self._urgent_or_tomorrow_tasks))
+
+    def _urgent_or_tomorrow_tasks(self):
         tomorrow = timezone.now() + timedelta(days=1)  # Завтра
         tomorrow_start = tomorrow.replace(hour=0, minute=0, second=0)  # Начало завтрашнего дня
         tomorrow_end = tomorrow.replace(hour=23, minute=59, second=59)  # Конец завтрашнего дня
 
-        # Сложный Q-запрос с OR и AND
-        tasks = self.get_queryset().filter(
-            (Q(priority__level__gte=4) & ~Q(status__name='Завершена'))
-            | Q(due_date__range=[tomorrow_start, tomorrow_end])
-        )
-
-        serializer = self.get_serializer(tasks, many=True)
-        return Response(serializer.data)
+        # Q-запрос с OR: срочная (приоритет от URGENT_PRIORITY_LEVEL и не завершена) ИЛИ срок завтра
+        return self.deadline_tasks(Q(is_urgent=True) | Q(due_date__range=[tomorrow_start, tomorrow_end]))
 
     # Q-запрос 4: Задачи НЕ текущего пользователя И (статус "В работе" ИЛИ "Отменена")
     @action(detail=False, methods=['get'])
     def others_in_progress_or_cancelled(self, request):
-        """GET /api/tasks/others_in_progress_or_cancelled/ - Задачи других пользователей в работе или отмененные"""
-        tasks = Task.objects.filter(
+        """
+        GET /api/tasks/others_in_progress_or_cancelled/ - Задачи других пользователей в работе или отмененные
+        (среди задач, которые видит пользователь; постранично, как список, в том числе ?pagination=cursor)
+        """
+        tasks = self.get_queryset().filter(
             ~Q(created_by=request.user)
-            & (Q(status__name='В работе') | Q(status__name='Отменена'))
-        )
+            & Q(status_id__in=reference_data.status_ids(STATUS_IN_PROGRESS, STATUS_CANCELLED))
+        ).order_by('-created_at', '-id')
+        rows = TaskRows(self.get_serializer_class(), request, fields=self.get_fieldset())
+        page = self.paginate_queryset(rows.values(tasks, extra=self.get_keyset_columns()))
+        return self.get_paginated_response(rows.render(page))
 
-        serializer = self.get_serializer(tasks, many=True)
-        return Response(serializer.data)
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        GET /api/tasks/export/?file_format=ndjson|csv - Потоковая выгрузка всех задач
+        (фильтры, поиск и сортировка - как у списка; ?fields= - колонки; ?history=1 - история, только NDJSON)
+        """
+        file_format = request.query_params.get('file_format', 'ndjson')
+        if file_format not in EXPORT_CONTENT_TYPES:
+            return Response({'error': f'Формат выгрузки: {", ".join(EXPORT_CONTENT_TYPES)}'}, status=status.HTTP_400_BAD_REQUEST)
+        with_history = request.query_params.get('history') in ('1', 'true')
+        if with_history and file_format == 'csv':
+            return Response({'error': 'История выгружается только в NDJSON'}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        fields = self.get_fieldset() or (CSV_DEFAULT_FIELDS if file_format == 'csv' else None)
+        rows = TaskRows(TaskSerializer, request, fields=fields)
+        items = iter_task_rows(rows, queryset, with_history=with_history)  # Строки читаются по мере отправки
+        lines = csv_lines(items, rows.fields) if file_format == 'csv' else ndjson_lines(items)
+        response = StreamingHttpResponse(lines, content_type=EXPORT_CONTENT_TYPES[file_format])
+        response['Content-Disposition'] = f'attachment; filename="tasks-{timezone.localtime():%Y%m%d-%H%M}.{file_format}"'
+        return response
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """GET /api/tasks/stats/ - Статистика по задачам для главной страницы"""
+        if not request.user.is_authenticated:  # Как в ProjectViewSet: анонимному пользователю ничего не видно
+            return Response(self._collect_stats(request.user))
+        # Ключ кэша - версии данных (как ETag): после изменения задач, проектов или справочников
+        # статистика пересчитывается сразу. Срок кэша остается: задачи просрочиваются без изменений
+        versions = get_versions(STATS_VERSION_LABELS)
+        cache_key = ':'.join(['tasks:stats', str(request.user.pk)] + [versions[label]['v'] for label in STATS_VERSION_LABELS])
+        data = cache.get(cache_key)
+        cache_event('stats', data is not None)
+        if data is None:
+            data = self._collect_stats(request.user)
+            if not replica_may_lag(max(version['t'] for version in versions.values())):  # Данные с реплики могли отстать
+                cache.set(cache_key, data, STATS_CACHE_TIMEOUT)
+        return Response(data)
+
+    def _collect_stats(self, user):
+        """Считаем статистику одним запросом с группировкой по статусу и приоритету"""
+        if user.is_authenticated:  # Та же область видимости, что и в get_queryset()
+            tasks = Task.objects.visible_to(user)
+            projects = Project.objects.filter(owner=user)
+        else:  # Анонимному пользователю - пустая статистика без запросов (как в ProjectViewSet)
+            tasks, projects = Task.objects.none(), Project.objects.none()
+
+        # Один SQL-запрос: группы (статус, приоритет) с условным подсчетом просроченных, без JOIN;
+        # число проектов - скалярным подзапросом в той же строке
+        project_count = projects.order_by().values('owner').annotate(count=Count('pk')).values('count')
+        groups = list(tasks.order_by().values('status_id', 'priority_id').annotate(
+            total=Count('id'),
+            overdue=Count('id', filter=Q(due_date__lt=timezone.now())),
+            projects=Coalesce(Subquery(project_count), 0),
+        ))
+
+        data = {
+            'projects': groups[0]['projects'] if groups else projects.count(),  # Задач нет - проекты считаем отдельно
+            'total': 0,
+            'completed': 0,
+            'overdue': 0,
+            'in_progress': 0,
+            'urgent': 0,
+            'by_status': {},
+            'by_priority': {},
+        }
+        by_status = data['by_status']
+        by_priority = data['by_priority']
+        empty = {'name': None, 'color': None, 'level': None}  # Для задач без статуса или приоритета
+        for group in groups:  # Групп мало (статусы x приоритеты), сворачиваем их в Python
+            task_status = reference_data.status(group['status_id']) or empty  # Названия - из кэша справочников
+            priority = reference_data.priority(group['priority_id']) or empty
+            completed = task_status['name'] == STATUS_COMPLETED
+            data['total'] += group['total']
+            if completed:
+                data['completed'] += group['total']
+            else:
+                data['overdue'] += group['overdue']
+                if (priority['level'] or 0) >= URGENT_PRIORITY_LEVEL:
+                    data['urgent'] += group['total']
+            if task_status['name'] == STATUS_IN_PROGRESS:
+                data['in_progress'] += group['total']
+
+            status_item = by_status.setdefault(group['status_id'], {
+                'id': group['status_id'],
+                'name': task_status['name'],
+                'color': task_status['color'],
+                'count': 0,
+            })
+            status_item['count'] += group['total']
+
+            priority_item = by_priority.setdefault(group['priority_id'], {
+                'id': group['priority_id'],
+                'name': priority['name'],
+                'level': priority['level'],
+                'color': priority['color'],
+                'count': 0,
+            })
+            priority_item['count'] += group['total']
+
+        data['by_status'] = sorted(by_status.values(), key=lambda item: item['name'] or '')
+        data['by_priority'] = sorted(by_priority.values(), key=lambda item: item['level'] or 0)
+        return data
+
+    @action(detail=False, methods=['post', 'patch', 'delete'])
+    def bulk(self, request):
+        """
+        Массовые операции в одной транзакции:
+        POST /api/tasks/bulk/ - создать задачи (список задач или {"tasks": [...]})
+        PATCH /api/tasks/bulk/ - изменить задачи {"ids": [...], "status": 2, "tags_add": [1], ...}
+        DELETE /api/tasks/bulk/ - удалить задачи {"ids": [...]}
+        """
+        try:
+            if request.method == 'POST':
+                items = request.data if isinstance(request.data, list) else request.data.get('tasks')
+                tasks = bulk_create_tasks(items, request.user)
+                return Response({'created': len(tasks), 'ids': [task.pk for task in tasks]}, status=status.HTTP_201_CREATED)
+
+            queryset = self.get_queryset()  # Менять и удалять можно только видимые задачи
+            if request.method == 'PATCH':
+                tasks = bulk_update_tasks(queryset, request.data, request.user)
+                return Response({'updated': len(tasks), 'ids': [task.pk for task in tasks]})
+
+            tasks = bulk_delete_tasks(queryset, request.data, request.user)
+            return Response({'deleted': len(tasks), 'ids': [task.pk for task in tasks]})
+        except BulkError as error:
+            return Response(error.detail, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=True, methods=['post'])
     def change_status(self, request, pk=None):
@@ -248,31 +549,17 @@ class TaskViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'])
     def history(self, request, pk=None):
-        """GET /api/tasks/{id}/history/ - История изменений задачи"""
+        """GET /api/tasks/{id}/history/ - История изменений задачи (только измененные поля, по курсору)"""
         task = self.get_object()
-        history_records = task.history.all()  # Получаем историю изменений (simple_history)
-
-        history_data = []
-        for record in history_records:
-            history_data.append({
-                'id': record.history_id,
-                'title': record.title,
-                'status': record.status.name if record.status else None,
-                'priority': record.priority.name if record.priority else None,
-                'history_date': record.history_date.isoformat(),  # Форматируем дату в ISO формат
-                'history_user': record.history_user.username if record.history_user else None,
-                'history_type': record.history_type,  # +, ~, -
-                'history_change_reason': record.history_change_reason if hasattr(record, 'history_change_reason') else None,
-                'change_type_display': record.get_history_type_display()  # Created, Changed, Deleted
-            })
-
-        return Response(history_data)
+        records = self.paginate_queryset(task.history.select_related('history_user'))
+        return self.get_paginated_response(history_diffs(records))
 
 
 # ViewSet для User (Пользователь)
-class UserViewSet(viewsets.ReadOnlyModelViewSet):
+class UserViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet для просмотра пользователей (только чтение)"""
     queryset = User.objects.all()
+    conditional_models = ('auth.User',)
     serializer_class = UserSerializer
     search_fields = ['username', 'email']
     ordering_fields = ['username', 'date_joined']
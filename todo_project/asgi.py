@@ -5,12 +5,47 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+
+Запуск: uvicorn todo_project.asgi:application или
+GUNICORN_PROFILE=asgi gunicorn -c gunicorn_config.py todo_project.asgi:application.
+Кроме обычных страниц и API, обслуживает поток событий /api/events/ (tasks/push.py).
+Асинхронные читающие действия задач (tasks/asgi.py) включаются только явно: ASYNC_VIEWS=True.
 """
 
 import os
 
+from asgiref.sync import sync_to_async  # Подогрев пула подключений в отдельном потоке
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'todo_project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from tasks.asgi import shutdown_db_executor  # noqa: E402 - после настройки Django
+from tasks.db.base import close_pools, fill_pools  # noqa: E402
+from tasks.push import PUSH_PATH, EventStreamApp  # noqa: E402
+
+event_stream = EventStreamApp()
+
+
+async def lifespan(receive, send):
+    """Запуск и остановка процесса (Django сам lifespan не поддерживает)"""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await sync_to_async(fill_pools, thread_sensitive=False)()  # Первые запросы не ждут подключения к БД
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            shutdown_db_executor()
+            close_pools()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """Поток событий - отдельным ASGI-приложением, все остальное - Django"""
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] == 'http' and scope['path'] == PUSH_PATH:
+        return await event_stream(scope, receive, send)
+    return await django_application(scope, receive, send)
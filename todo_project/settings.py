@@ -22,6 +22,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',  # Система сессий
     'django.contrib.messages',  # Система сообщений
     'django.contrib.staticfiles',  # Управление статическими файлами (CSS, JS, изображения)
+    'django.contrib.postgres',  # Полнотекстовый и триграммный поиск PostgreSQL
 
     # Сторонние приложения
     'rest_framework',  # Django REST Framework для создания API
@@ -35,7 +36,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',  # Защита от различных атак
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # Служить статическим файлам
+    'tasks.asgi.AsyncWhiteNoiseMiddleware',  # Служить статическим файлам (WhiteNoise, под ASGI - без перехода в синхронный режим)
+    'tasks.metrics.MetricsMiddleware',  # Метрики Prometheus по маршрутам и журнал медленных запросов (статика не замеряется)
     'django.contrib.sessions.middleware.SessionMiddleware',  # Управление сессиями пользователей
     'django.middleware.common.CommonMiddleware',  # Общие функции (например, нормализация URL)
     'django.middleware.csrf.CsrfViewMiddleware',  # Защита от CSRF атак (подделка запросов)
@@ -43,8 +45,47 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',  # Система сообщений
     'django.middleware.clickjacking.XFrameOptionsMiddleware',  # Защита от clickjacking
     'simple_history.middleware.HistoryRequestMiddleware',  # Отслеживание кто изменял объекты
+    'tasks.history.DeferredHistoryMiddleware',  # Пакетная запись истории в изменяющих запросах (см. DEFERRED_HISTORY)
+    'tasks.replicas.PrimaryPinMiddleware',  # После записи пользователь читает основную базу, а не реплику (DATABASE_REPLICA_URLS)
 ]
 
+# Метрики Prometheus (tasks/metrics.py): /metrics доступен с заголовком
+# Authorization: Bearer <METRICS_TOKEN> или сотрудникам, вошедшим в систему.
+# В production, как и остальные адреса, только по HTTPS - токен не уходит открытым текстом
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 500))  # Запросы дольше пишутся в журнал tasks.slow_requests
+SLOW_REQUEST_SQL_LIMIT = 50  # Сколько SQL-запросов медленного запроса попадает в журнал
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,  # Журналы Django остаются как есть
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},  # В stderr (у gunicorn - в errorlog)
+    },
+    'loggers': {
+        'tasks.slow_requests': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+        'tasks.push': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
+# События об изменениях задач и проектов для открытых страниц (tasks/push.py, поток /api/events/ при запуске через ASGI).
+# local - брокер в памяти процесса (один процесс ASGI, проверка и тесты; при нескольких воркерах
+# gunicorn_config.py предупреждает при запуске - события других воркеров клиенты не получат);
+# unix:/путь/к/сокету - посредник manage.py push_broker, через него события доходят из всех воркеров WSGI и ASGI
+PUSH_BROKER = os.environ.get('PUSH_BROKER', 'local')
+
+# Асинхронный режим (tasks/asgi.py): под ASGI списки и карточки задач, сроки и задачи проекта
+# обслуживают асинхронные действия, независимые SQL-запросы выполняются одновременно.
+# По умолчанию выключен и под ASGI: в замере benchmark_servers (1 CPU, локальный PostgreSQL) профиль asgi
+# был медленнее и занимал больше памяти, чем sync (см. README). Выигрыш возможен, когда запросы ждут
+# медленную или удаленную БД. ASYNC_DB_THREADS - потоков (и подключений к БД) для них на процесс
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'False') == 'True'
+ASYNC_DB_THREADS = int(os.environ.get('ASYNC_DB_THREADS', 8))
+
+# Отложенная запись истории: в изменяющих запросах история копится в памяти
+# и пишется одним INSERT на модель перед коммитом транзакции запроса
+DEFERRED_HISTORY = os.environ.get('DEFERRED_HISTORY', 'False') == 'True'
+
 ROOT_URLCONF = 'todo_project.urls'  # Главный файл маршрутов (URLs)
 
 TEMPLATES = [  # Настройки шаблонов (HTML)
@@ -69,14 +110,36 @@ WSGI_APPLICATION = 'todo_project.wsgi.application'  # WSGI приложение
 # База данных
 # Поддержка DATABASE_URL для production (Render, Heroku и т.д.)
 
+# Пул подключений (tasks/db): процесс держит от DB_POOL_MIN_SIZE до DB_POOL_MAX_SIZE подключений
+# на все свои потоки и выдает их на время запроса. DB_POOL=False - постоянное подключение у каждого потока
+DB_POOL = os.environ.get('DB_POOL', 'True') == 'True'
+
+
+def database_from_url(url):
+    """Настройки базы из URL; PostgreSQL - с пулом подключений (если DB_POOL)"""
+    pooled = DB_POOL and url.split(':', 1)[0] in ('postgres', 'postgresql', 'pgsql')  # sqlite:// и т.п. - как есть
+    database = dj_database_url.parse(
+        url,
+        engine='tasks.db' if pooled else None,  # PostgreSQL с пулом подключений
+        conn_max_age=0 if pooled else 600,  # С пулом подключение возвращается в пул в конце запроса
+        conn_health_checks=not pooled,  # Пул сам проверяет подключения, простоявшие дольше CHECK_AFTER
+    )
+    if pooled:
+        database['POOL'] = {
+            'MIN_SIZE': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),  # Открываются при запуске воркера
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),  # Больше подключений воркер не откроет
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 10)),  # Секунд ожидания свободного подключения
+            'MAX_IDLE': 300,  # Лишние сверх MIN_SIZE закрываются после 5 минут простоя
+            'MAX_LIFETIME': 3600,  # Подключение старше часа закрывается при возврате
+            'CHECK_AFTER': 30,  # Простоявшее дольше 30 с проверяется SELECT 1 перед выдачей
+        }
+    return database
+
+
 if os.environ.get('DATABASE_URL'):
     # Используем DATABASE_URL если он установлен (production)
     DATABASES = {
-        'default': dj_database_url.config(
-            default=os.environ.get('DATABASE_URL'),
-            conn_max_age=600,
-            conn_health_checks=True,
-        )
+        'default': database_from_url(os.environ['DATABASE_URL'])
     }
 else:
     # Fallback для локальной разработки
@@ -91,6 +154,35 @@ else:
         }
     }
 
+# Реплики для чтения (tasks/replicas.py): DATABASE_REPLICA_URLS - адреса через запятую.
+# Безопасные запросы API задач, проектов и справочников читают реплику, отстающую не больше
+# REPLICA_MAX_LAG секунд (проверка раз в REPLICA_CHECK_INTERVAL секунд), иначе - основную базу.
+# После изменяющего запроса пользователь REPLICA_PIN_SECONDS читает основную базу
+# (окно должно перекрывать REPLICA_MAX_LAG + REPLICA_CHECK_INTERVAL)
+DATABASE_REPLICAS = []
+for number, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')), start=1):
+    DATABASES[f'replica_{number}'] = database_from_url(url.strip())
+    DATABASES[f'replica_{number}']['TEST'] = {'MIRROR': 'default'}  # Тесты читают ту же базу, что пишут
+    DATABASE_REPLICAS.append(f'replica_{number}')
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ['tasks.replicas.ReplicaRouter']
+REPLICA_MAX_LAG = float(os.environ.get('REPLICA_MAX_LAG', 2))
+REPLICA_CHECK_INTERVAL = 2
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+
+
+# Кэш
+# По умолчанию кэш в памяти процесса; для общего кэша между воркерами gunicorn
+# можно указать, например, CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+# (версии данных для ETag и кэша справочников хранятся в БД, см. tasks/conditional.py; общий кэш нужен окну после записи)
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'todo-cache'),
+    }
+}
+
 
 # Валидаторы паролей
 
@@ -129,6 +221,17 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'  # Папка для сборки ста
 # Медиа-файлы (загружаемые пользователями файлы, например изображения)
 MEDIA_URL = 'media/'  # URL для медиа-файлов
 MEDIA_ROOT = BASE_DIR / 'media'  # Папка для хранения медиа-файлов
+# Изображения проектов и задач хранятся по хэшу содержимого (tasks/storage.py): одинаковые файлы - один раз.
+# Хэш считается при приеме загрузки; MEDIA_SERVE=True - отдавать файлы по хэшу через Django (с Cache-Control
+# immutable), если их не отдает веб-сервер перед приложением. По умолчанию выключено: в рабочем режиме
+# медиа-файлы отдает веб-сервер; недописанные загрузки (content/.tmp) не отдаются никогда.
+# MEDIA_GC_GRACE - сколько секунд не удалять неиспользуемый файл (его может сохранять незакоммиченная транзакция)
+FILE_UPLOAD_HANDLERS = [
+    'tasks.storage.ContentHashMemoryFileUploadHandler',
+    'tasks.storage.ContentHashTemporaryFileUploadHandler',
+]
+MEDIA_SERVE = os.environ.get('MEDIA_SERVE', 'False') == 'True'
+MEDIA_GC_GRACE = int(os.environ.get('MEDIA_GC_GRACE', 600))
 
 # Тип первичного ключа по умолчанию для моделей
 
@@ -138,9 +241,13 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'  # Автоинкремен
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',  # Тип пагинации (по номерам страниц)
     'PAGE_SIZE': 10,  # Количество элементов на одной странице
+    'DEFAULT_RENDERER_CLASSES': [  # Форматы ответов
+        'tasks.renderers.FastJSONRenderer',  # JSON через orjson (тот же результат, что у JSONRenderer)
+        'rest_framework.renderers.BrowsableAPIRenderer',  # HTML-версия API для браузера
+    ],
     'DEFAULT_FILTER_BACKENDS': [  # Фильтры, которые будут доступны по умолчанию
         'django_filters.rest_framework.DjangoFilterBackend',  # Фильтрация через django-filter
-        'rest_framework.filters.SearchFilter',  # Поиск по текстовым полям
+        'tasks.search.FullTextSearchFilter',  # Поиск по текстовым полям (tsvector + триграммы для задач и проектов)
         'rest_framework.filters.OrderingFilter',  # Сортировка по полям
     ],
 }
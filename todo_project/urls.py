@@ -15,11 +15,12 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin  # Админ-панель Django
-from django.urls import path, include  # Для создания URL путей
+from django.urls import path, re_path, include  # Для создания URL путей
 from django.conf import settings  # Настройки проекта
-from django.conf.urls.static import static  # Для раздачи медиа-файлов в режиме разработки
 from django.contrib.auth import views as auth_views  # Встроенные views для аутентификации
 from tasks.views import home_view, projects_view, tasks_view  # HTML views
+from tasks.metrics import metrics_view  # Метрики Prometheus
+from tasks.storage import media_view  # Загруженные изображения с долгим кэшированием
 
 urlpatterns = [
     path('', home_view, name='home'),  # Главная страница
@@ -30,8 +31,11 @@ urlpatterns = [
     path('admin/', admin.site.urls),  # Админ-панель: http://127.0.0.1:8000/admin/
     path('api/', include('tasks.urls')),  # API приложения tasks: http://127.0.0.1:8000/api/
     path('api-auth/', include('rest_framework.urls')),  # Аутентификация DRF (для browsable API)
+    path('metrics', metrics_view, name='metrics'),  # Метрики Prometheus (токен METRICS_TOKEN или сотрудник)
 ]
 
-# Раздача медиа-файлов в режиме разработки (DEBUG=True)
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)  # Доступ к загруженным изображениям
+# Раздача медиа-файлов (в режиме разработки - всегда, в рабочем - если их не отдает веб-сервер, см. MEDIA_SERVE)
+if settings.DEBUG or settings.MEDIA_SERVE:
+    urlpatterns += [
+        re_path(rf'^{settings.MEDIA_URL.strip("/")}/(?P<path>.*)$', media_view, name='media'),  # Доступ к загруженным изображениям
+    ]